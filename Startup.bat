@@ -30,18 +30,23 @@ IF "%1"=="" (
         GOTO EndScript
     )
 
-    echo [1/3] Starting Celery Worker...
-    start "Celery Worker" cmd /k "cd /d "%BACKEND_DIR%" && call "%VENV_ACTIVATE_SCRIPT%" && echo Starting Celery Worker... && celery -A app.celery.celery:celery_app worker -l INFO -P gevent"
+    echo [1/4] Starting Celery Worker...
+    start "Celery Worker" cmd /k "cd /d "%BACKEND_DIR%" && call "%VENV_ACTIVATE_SCRIPT%" && echo Starting Celery Worker... && celery -A app.celery.celery:celery_app worker -l INFO -P gevent -Q celery,cpu"
 
     REM 稍微延遲一下，避免同時啟動造成資源競爭
     timeout /t 2 /nobreak > nul
 
-    echo [2/3] Starting FastAPI Server...
+    echo [2/4] Starting Celery Beat...
+    start "Celery Beat" cmd /k "cd /d "%BACKEND_DIR%" && call "%VENV_ACTIVATE_SCRIPT%" && echo Starting Celery Beat... && celery -A app.celery.celery:celery_app beat -l INFO"
+
+    timeout /t 2 /nobreak > nul
+
+    echo [3/4] Starting FastAPI Server...
     start "FastAPI Server" cmd /k "cd /d "%BACKEND_DIR%" && call "%VENV_ACTIVATE_SCRIPT%" && echo Starting FastAPI Server... && uvicorn main:app --reload --host 0.0.0.0 --port 8000"
 
     timeout /t 2 /nobreak > nul
 
-    echo [3/3] Starting React Frontend...
+    echo [4/4] Starting React Frontend...
     start "React Frontend" cmd /k "cd /d "%FRONTEND_APP_DIR%" && echo Starting React Frontend... && npm run dev"
 
     echo.
@@ -50,6 +55,7 @@ IF "%1"=="" (
     echo ============================================
     echo.
     echo   - Celery Worker:  Running in separate window
+    echo   - Celery Beat:    Running in separate window
     echo   - FastAPI Server: http://localhost:8000
     echo   - React Frontend: http://localhost:5173
     echo.
@@ -84,8 +90,8 @@ IF /I "%1"=="celery" (
         GOTO DeactivateAndEnd
     )
 
-    echo Starting Celery worker: celery -A app.celery.celery:celery_app worker -l INFO -P gevent
-    celery -A app.celery.celery:celery_app worker -l INFO -P gevent
+    echo Starting Celery worker: celery -A app.celery.celery:celery_app worker -l INFO -P gevent -Q celery,cpu
+    celery -A app.celery.celery:celery_app worker -l INFO -P gevent -Q celery,cpu
 
     echo Celery process finished or was interrupted.
     echo Returning to original directory...
@@ -93,6 +99,41 @@ IF /I "%1"=="celery" (
     
     GOTO DeactivateAndEnd
 
+) ELSE IF /I "%1"=="beat" (
+    echo Starting Celery Beat...
+
+    IF NOT EXIST "%VENV_ACTIVATE_SCRIPT%" (
+        echo Error: Virtual environment activation script not found at "%VENV_ACTIVATE_SCRIPT%"
+        GOTO EndScript
+    )
+    echo Activating virtual environment from "%VENV_ACTIVATE_SCRIPT%"
+    CALL "%VENV_ACTIVATE_SCRIPT%"
+    IF ERRORLEVEL 1 (
+        echo Failed to activate virtual environment.
+        GOTO EndScript
+    )
+
+    IF NOT EXIST "%BACKEND_DIR%" (
+        echo Error: Backend directory not found at "%BACKEND_DIR%"
+        GOTO DeactivateAndEnd
+    )
+    echo Changing directory to "%BACKEND_DIR%"
+    pushd "%BACKEND_DIR%"
+    IF ERRORLEVEL 1 (
+        echo Failed to change directory to "%BACKEND_DIR%"
+        GOTO DeactivateAndEnd
+    )
+
+    REM 定期任務（批次輪詢、Gemini 檔案回收）由 beat 排程，需與 worker 同時執行
+    echo Starting Celery beat: celery -A app.celery.celery:celery_app beat -l INFO
+    celery -A app.celery.celery:celery_app beat -l INFO
+
+    echo Celery beat process finished or was interrupted.
+    echo Returning to original directory...
+    popd
+
+    GOTO DeactivateAndEnd
+
 ) ELSE IF /I "%1"=="app" (
     echo Starting FastAPI app...
 
@@ -158,6 +199,7 @@ IF /I "%1"=="celery" (
     echo.
     echo   %~n0          - Start ALL services (each in separate window)
     echo   %~n0 celery   - Start Celery worker only
+    echo   %~n0 beat     - Start Celery beat only (periodic batch polling / file reaping)
     echo   %~n0 app      - Start FastAPI server only
     echo   %~n0 react    - Start React frontend only
     echo.
@@ -3,6 +3,7 @@ from pathlib import Path
 import json
 import time
 from types import SimpleNamespace
+from typing import Optional
 
 from fastapi import (
     APIRouter,
@@ -12,12 +13,14 @@ from fastapi import (
     HTTPException,
 )
 from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.celery.batch_task import batch_transcribe_task, batch_recover_task
+from app.celery.batch_poller import get_batch_api_key, is_tracked, register_batch_api_key
+from app.celery.batch_task import batch_recover_task, enqueue_batch_transcription
 from app.celery.models import BatchTranscriptionTaskParams, BatchFileItemParams
 from app.core.config import get_settings
-from app.database.session import get_db
-from app.repositories.batch_job_repository import BatchJobRepository
+from app.database.session import get_async_db, get_db
+from app.repositories.batch_job_repository import AsyncBatchJobRepository, BatchJobRepository
 from app.utils.logger import setup_logger
 from app.websocket.manager import manager
 from app.schemas.schemas import (
@@ -40,6 +43,8 @@ TEMP_UPLOADS_DIR = Path(settings.temp_uploads_dir)
 TEMP_UPLOADS_DIR.mkdir(exist_ok=True)
 
 batch_repo = BatchJobRepository()
+# Task 頁面的列表端點走 async engine，不佔用 threadpool
+async_batch_repo = AsyncBatchJobRepository()
 
 
 # ==================== Task Page Endpoints ====================
@@ -69,14 +74,41 @@ def _check_celery_task_alive(celery_task_id: str) -> bool | None:
         return None
 
 
+def _job_is_alive(job, elapsed: Optional[float]) -> bool | None:
+    """判斷批次是否仍有人處理（查詢 Redis / Celery 結果，同步呼叫）"""
+    if job.status == "POLLING" and is_tracked(job.batch_id):
+        # 提交任務已結束，改由集中輪詢器追蹤
+        return True
+    if job.status in ("UPLOADING", "POLLING", "RECOVERING"):
+        alive = _check_celery_task_alive(job.celery_task_id)
+        if alive is not None:
+            return alive
+        if elapsed and elapsed > 300:
+            # PENDING 狀態超過 5 分鐘，極大概率已死
+            return False
+    return None
+
+
 @router.get("/tasks", response_model=list[BatchTaskResponse])
-def get_batch_tasks(db: Session = Depends(get_db)):
+async def get_batch_tasks(db: AsyncSession = Depends(get_async_db)):
     """取得所有活躍的批次任務（Task 頁面用），自動歸檔超過 24 小時的已完成任務。"""
-    archived = batch_repo.archive_old_completed(db)
+    archived = await async_batch_repo.archive_old_completed(db)
     if archived > 0:
         logger.info(f"自動歸檔 {archived} 個超過 24 小時的已完成批次")
 
-    jobs = batch_repo.get_active_tasks(db)
+    jobs = await async_batch_repo.get_active_tasks(db)
+    now = datetime.utcnow()
+    elapsed_by_id = {
+        job.batch_id: (now - job.created_at).total_seconds() if job.created_at else None
+        for job in jobs
+    }
+    # 存活檢查需查詢 Redis / Celery（同步呼叫），整批一次丟到 threadpool
+    checked = [job for job in jobs if job.status in ("UPLOADING", "POLLING", "RECOVERING")]
+    alive_by_id = {}
+    if checked:
+        alive_by_id = await run_in_threadpool(
+            lambda: {job.batch_id: _job_is_alive(job, elapsed_by_id[job.batch_id]) for job in checked})
+
     results = []
     for job in jobs:
         files = []
@@ -89,27 +121,14 @@ def get_batch_tasks(db: Session = Depends(get_db)):
                     original_filename=entry["original_filename"],
                 ))
 
-        elapsed = None
-        if job.created_at:
-            elapsed = (datetime.utcnow() - job.created_at).total_seconds()
-
-        is_alive = None
-        if job.status in ("UPLOADING", "POLLING", "RECOVERING"):
-            alive = _check_celery_task_alive(job.celery_task_id)
-            if alive is not None:
-                is_alive = alive
-            elif elapsed and elapsed > 300:
-                # PENDING 狀態超過 5 分鐘，極大概率已死
-                is_alive = False
-
         results.append(BatchTaskResponse(
             batch_id=job.batch_id,
             status=job.status,
             file_count=job.file_count or len(files),
-            is_alive=is_alive,
+            is_alive=alive_by_id.get(job.batch_id),
             created_at=str(job.created_at) if job.created_at else None,
             updated_at=str(job.updated_at) if job.updated_at else None,
-            elapsed_seconds=elapsed,
+            elapsed_seconds=elapsed_by_id[job.batch_id],
             files=files,
             session_id=job.session_id or job.batch_id,
         ))
@@ -128,9 +147,9 @@ def dismiss_batch_task(batch_id: str, db: Session = Depends(get_db)):
 # ==================== Recovery REST Endpoints ====================
 
 @router.get("/pending", response_model=list[PendingBatchResponse])
-def get_pending_batches(db: Session = Depends(get_db)):
+async def get_pending_batches(db: AsyncSession = Depends(get_async_db)):
     """查詢未完成或尚未取回結果的批次任務"""
-    jobs = batch_repo.get_pending_jobs(db)
+    jobs = await async_batch_repo.get_pending_jobs(db)
     results = []
     for job in jobs:
         files = []
@@ -196,7 +215,8 @@ def recover_batch(batch_id: str, body: RecoverBatchRequest, db: Session = Depend
     if not job.gemini_job_name:
         raise HTTPException(status_code=400, detail="此任務尚未建立 Gemini batch job，無法恢復")
 
-    api_key = body.api_keys
+    # 優先使用提交時登記的 Key：多把 Key 分流時，只有建立 batch job 的那把能查詢
+    api_key = get_batch_api_key(batch_id) or body.api_keys
     if not api_key:
         raise HTTPException(
             status_code=400,
@@ -205,6 +225,9 @@ def recover_batch(batch_id: str, body: RecoverBatchRequest, db: Session = Depend
 
     logger.info(f"恢復批次 {batch_id}: 派送 Celery task 從 Gemini 取得結果 (當前狀態={job.status})")
 
+    # 登記 API Key：若 Gemini 尚未完成，恢復任務會把狀態退回 POLLING，之後由輪詢器接手
+    register_batch_api_key(batch_id, api_key)
+
     # 派送 Celery task 非同步處理。結果稍後透過 WebSocket / pending API 通知前端
     batch_repo.update_job(db, batch_id, {"status": "RECOVERING"})
     batch_recover_task.delay(batch_id, api_key)
@@ -253,7 +276,7 @@ def start_batch_celery_task(payload_str: str, batch_id: str) -> None:
         session_id=request_data.session_id or batch_id,
     )
 
-    batch_transcribe_task.delay(task_params.model_dump())
+    enqueue_batch_transcription(task_params.model_dump())
     logger.info(f"已為 batch_id: {batch_id} 啟動 Celery 批次轉錄任務 ({len(file_items)} 個檔案)。")
 
 
@@ -261,6 +284,7 @@ def start_batch_celery_task(payload_str: str, batch_id: str) -> None:
 async def batch_websocket_endpoint(
     websocket: WebSocket,
     batch_id: str,
+    last_event_id: Optional[str] = None,
 ):
     """
     批次轉錄的 WebSocket 端點。
@@ -272,26 +296,28 @@ async def batch_websocket_endpoint(
     - 連線後發送 JSON 格式的 WebSocketBatchRequest
     - 接收個別檔案的 PROCESSING / COMPLETED / FAILED 狀態
     - 接收整體批次的 BATCH_COMPLETED 狀態
+    - 斷線重連時帶上 ``?last_event_id=``：補送遺漏的事件，不再送出 payload
     """
-    await manager.connect(websocket, batch_id)
+    await manager.connect(websocket, batch_id, last_event_id=last_event_id)
     try:
-        payload_str = await websocket.receive_text()
+        if last_event_id is None:
+            payload_str = await websocket.receive_text()
 
-        await run_in_threadpool(
-            start_batch_celery_task, payload_str=payload_str, batch_id=batch_id
-        )
+            await run_in_threadpool(
+                start_batch_celery_task, payload_str=payload_str, batch_id=batch_id
+            )
 
         while True:
             await websocket.receive_text()
 
     except WebSocketDisconnect:
         logger.info(f"批次 WebSocket 連線由客戶端關閉: {batch_id}")
-        manager.disconnect(batch_id)
+        manager.disconnect(batch_id, websocket)
     except Exception as e:
         logger.error(
             f"批次 WebSocket 端點發生錯誤 (batch_id: {batch_id}): {e}",
             exc_info=True,
         )
-        if batch_id in manager.active_connections:
-            await manager.active_connections[batch_id].close()
-            manager.disconnect(batch_id)
+        if manager.active_connections.get(batch_id) is websocket:
+            await websocket.close()
+            manager.disconnect(batch_id, websocket)
@@ -5,11 +5,16 @@ from urllib.parse import quote
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.database.models import TranscriptionLog
-from app.database.session import get_db
-from app.repositories.history_repository import HistoryRepository
+from app.database.session import get_async_db, get_db
+from app.repositories.history_repository import (
+    AsyncHistoryRepository,
+    HistoryRepository,
+    encode_cursor,
+)
 from app.schemas.schemas import (
     HistoryLogResponse,
     HistoryListResponse,
@@ -22,6 +27,8 @@ logger = setup_logger(__name__)
 
 router = APIRouter()
 history_repo = HistoryRepository()
+# 唯讀端點走 async engine，不佔用 threadpool；下載（會回寫 lrc_content）與刪除維持同步
+async_history_repo = AsyncHistoryRepository()
 
 VALID_DOWNLOAD_FORMATS = frozenset({"lrc", "srt", "vtt", "txt"})
 DOWNLOAD_MIME_TYPES = {
@@ -32,7 +39,8 @@ DOWNLOAD_MIME_TYPES = {
 }
 
 
-def _log_to_response(log: TranscriptionLog, db: Session) -> HistoryLogResponse:
+def _log_to_response(log: TranscriptionLog) -> HistoryLogResponse:
+    """log 需由列表 / 詳情查詢取得（帶 has_transcript、未載入 lrc_content）"""
     return HistoryLogResponse(
         task_uuid=str(log.task_uuid),
         request_timestamp=str(log.request_timestamp) if log.request_timestamp else None,
@@ -50,7 +58,7 @@ def _log_to_response(log: TranscriptionLog, db: Session) -> HistoryLogResponse:
         error_message=log.error_message,
         is_batch=log.is_batch,
         batch_id=log.batch_id,
-        has_transcript=history_repo.has_transcript(db, log),
+        has_transcript=bool(log.has_transcript),
         session_id=log.session_id,
         file_uid=log.file_uid,
     )
@@ -70,16 +78,16 @@ def _download_filename(original_filename: Optional[str], fmt: str) -> str:
 
 
 @router.get("/stats", response_model=HistoryStatsResponse)
-def get_history_stats(db: Session = Depends(get_db)):
+async def get_history_stats(db: AsyncSession = Depends(get_async_db)):
     """取得歷史紀錄統計總覽"""
-    stats = history_repo.get_stats(db)
+    stats = await async_history_repo.get_stats(db)
     return HistoryStatsResponse(**stats)
 
 
 @router.get("/active", response_model=list[HistoryLogResponse])
-def get_active_single_tasks(
+async def get_active_single_tasks(
     hours: int = Query(6, ge=1, le=72, description="顯示最近多少小時內已完成/失敗的單檔任務"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     取得「Task 頁面」要顯示的單檔轉錄活躍紀錄：
@@ -88,30 +96,39 @@ def get_active_single_tasks(
 
     批次任務不包含在此（已由 GET /api/v1/batch/tasks 提供）。
     """
-    logs = history_repo.get_active_single_tasks(db, recent_hours=hours)
-    return [_log_to_response(log, db) for log in logs]
+    logs = await async_history_repo.get_active_single_tasks(db, recent_hours=hours)
+    return [_log_to_response(log) for log in logs]
 
 
 @router.get("", response_model=HistoryListResponse)
-def get_history(
+async def get_history(
     page: int = Query(1, ge=1, description="頁碼"),
     page_size: int = Query(20, ge=1, le=100, description="每頁筆數"),
     status: Optional[str] = Query(None, description="篩選狀態 (COMPLETED/FAILED/PROCESSING)"),
     is_batch: Optional[bool] = Query(None, description="篩選是否為批次任務"),
     keyword: Optional[str] = Query(None, description="搜尋關鍵字 (檔名/模型)"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="游標分頁：上一頁回傳的 next_cursor（提供時忽略 page）"),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """分頁查詢歷史紀錄"""
-    logs, total = history_repo.get_logs_paginated(
-        db,
-        page=page,
-        page_size=page_size,
-        status=status,
-        is_batch=is_batch,
-        keyword=keyword,
-    )
-
-    items = [_log_to_response(log, db) for log in logs]
+    """
+    分頁查詢歷史紀錄。
+    帶 cursor 時改用游標分頁：深頁成本與第一頁相同，total 取自短暫快取。
+    """
+    filters = {"status": status, "is_batch": is_batch, "keyword": keyword}
+    if cursor:
+        try:
+            logs, next_cursor, total = await async_history_repo.get_logs_by_cursor(
+                db, cursor=cursor, page_size=page_size, **filters)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="無效的分頁游標")
+        page = None
+    else:
+        logs, total = await async_history_repo.get_logs_paginated(
+            db, page=page, page_size=page_size, **filters)
+        has_more = page * page_size < total
+        next_cursor = encode_cursor(logs[-1]) if logs and has_more else None
+
+    items = [_log_to_response(log) for log in logs]
     total_pages = math.ceil(total / page_size) if total > 0 else 1
 
     return HistoryListResponse(
@@ -120,16 +137,17 @@ def get_history(
         page=page,
         page_size=page_size,
         total_pages=total_pages,
+        next_cursor=next_cursor,
     )
 
 
 @router.get("/{task_uuid}", response_model=HistoryLogResponse)
-def get_history_detail(task_uuid: str, db: Session = Depends(get_db)):
+async def get_history_detail(task_uuid: str, db: AsyncSession = Depends(get_async_db)):
     """查詢單筆歷史紀錄詳情"""
-    log = history_repo.get_log_by_uuid(db, task_uuid)
+    log = await async_history_repo.get_log_by_uuid(db, task_uuid)
     if not log:
         raise HTTPException(status_code=404, detail="找不到此任務紀錄")
-    return _log_to_response(log, db)
+    return _log_to_response(log)
 
 
 @router.get("/{task_uuid}/download/{fmt}")
@@ -1,4 +1,6 @@
+import json
 from pathlib import Path
+from typing import Optional
 
 from fastapi import (
     APIRouter,
@@ -6,13 +8,15 @@ from fastapi import (
     WebSocketDisconnect
 )
 from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
 
-from app.celery.task import transcribe_media_task
+from app.celery.notifier import publish_status
+from app.celery.task import enqueue_transcription
 from app.celery.models import TranscriptionTaskParams
 from app.core.config import get_settings
 from app.utils.logger import setup_logger
 from app.websocket.manager import manager
-from app.schemas.schemas import WebSocketTranscriptionRequest
+from app.schemas.schemas import WebSocketSessionSubmit, WebSocketTranscriptionRequest
 
 
 logger = setup_logger(__name__)
@@ -25,21 +29,18 @@ TEMP_UPLOADS_DIR = Path(settings.temp_uploads_dir)
 TEMP_UPLOADS_DIR.mkdir(exist_ok=True)
 
 
-def start_celery_task_sync(payload_str: str, file_uid: str) -> None:
+def _start_transcription(request_data: WebSocketTranscriptionRequest, client_id: str, file_uid: str) -> bool:
     """
-    一個同步函式，封裝了所有準備和啟動 Celery 任務的邏輯。
-    這個函式將在獨立的執行緒中執行，以避免阻塞事件迴圈。
+    準備並啟動單一檔案的 Celery 轉錄任務；狀態更新發布到 client_id 的頻道。
+    上傳檔不存在時回傳 False。
     """
-    request_data = WebSocketTranscriptionRequest.model_validate_json(
-        payload_str)
-
     temp_file_path = TEMP_UPLOADS_DIR / request_data.filename
 
     if temp_file_path.is_file():
         server_file_path = str(temp_file_path)
     else:
         logger.error(f"檔案不存在: {request_data.filename}")
-        return
+        return False
 
     task_params = TranscriptionTaskParams(
         file_path=server_file_path,
@@ -49,7 +50,7 @@ def start_celery_task_sync(payload_str: str, file_uid: str) -> None:
         source_lang=request_data.source_lang,
         target_lang=request_data.target_lang,  # 輸出語言
         original_filename=request_data.original_filename,
-        client_id=file_uid,
+        client_id=client_id,
         file_uid=file_uid,
         prompt=request_data.prompt,
         multi_speaker=request_data.multi_speaker,
@@ -57,23 +58,58 @@ def start_celery_task_sync(payload_str: str, file_uid: str) -> None:
         session_id=request_data.session_id,
     )
 
-    transcribe_media_task.delay(task_params.model_dump())
-    logger.info(f"已為 file_uid: {file_uid} 啟動 Celery 轉錄任務。")
+    enqueue_transcription(task_params.model_dump())
+    logger.info(f"已為 file_uid: {file_uid} 啟動 Celery 轉錄任務（client_id: {client_id}）。")
+    return True
+
+
+def start_celery_task_sync(payload_str: str, file_uid: str) -> None:
+    """
+    一個同步函式，封裝了所有準備和啟動 Celery 任務的邏輯。
+    這個函式將在獨立的執行緒中執行，以避免阻塞事件迴圈。
+    """
+    request_data = WebSocketTranscriptionRequest.model_validate_json(
+        payload_str)
+    _start_transcription(request_data, client_id=file_uid, file_uid=file_uid)
+
+
+def submit_session_file_sync(message: dict, session_id: str) -> None:
+    """
+    處理 session WebSocket 上的一筆 submit 訊息（於執行緒中執行）。
+    無法啟動時以 FAILED 狀態通知該檔案，前端不會一直停在處理中。
+    """
+    file_uid = message.get("file_uid")
+    try:
+        request_data = WebSocketSessionSubmit.model_validate(message)
+    except ValidationError as e:
+        logger.error(f"Session {session_id} 的提交內容格式錯誤 (file_uid: {file_uid}): {e}")
+        if isinstance(file_uid, str) and file_uid:
+            publish_status(session_id, "", "提交內容格式錯誤", "FAILED", file_uid=file_uid)
+        return
+
+    if not _start_transcription(request_data, client_id=session_id, file_uid=request_data.file_uid):
+        publish_status(session_id, "", "找不到上傳的檔案", "FAILED", file_uid=request_data.file_uid)
 
 
 @router.websocket("/ws/{file_uid}", name="WebSocket Transcription")
 async def websocket_endpoint(
     websocket: WebSocket,
-    file_uid: str
+    file_uid: str,
+    last_event_id: Optional[str] = None,
 ):
     """
     為每個轉錄任務建立一個獨立的 WebSocket 連線，提供即時進度更新。
+    多檔轉錄請改用 ``/ws/session/{session_id}``，連線數隨分頁而非檔案數成長。
+
+    斷線重連時帶上 ``?last_event_id=<最後收到的 event_id>``：伺服器補送之後的
+    狀態事件，且不再等待任務 payload（任務已在第一次連線時啟動）。
     """
-    await manager.connect(websocket, file_uid)
+    await manager.connect(websocket, file_uid, last_event_id=last_event_id)
     try:
-        payload_str = await websocket.receive_text()
+        if last_event_id is None:
+            payload_str = await websocket.receive_text()
 
-        await run_in_threadpool(start_celery_task_sync, payload_str=payload_str, file_uid=file_uid)
+            await run_in_threadpool(start_celery_task_sync, payload_str=payload_str, file_uid=file_uid)
 
         # 保持連線開啟以接收來自客戶端的訊息
         while True:
@@ -81,10 +117,49 @@ async def websocket_endpoint(
 
     except WebSocketDisconnect:
         logger.info(f"WebSocket 連線由客戶端或伺服器關閉: {file_uid}")
-        manager.disconnect(file_uid)
+        manager.disconnect(file_uid, websocket)
     except Exception as e:
         logger.error(
             f"WebSocket 端點發生錯誤 (file_uid: {file_uid}): {e}", exc_info=True)
-        if file_uid in manager.active_connections:
-            await manager.active_connections[file_uid].close()
-            manager.disconnect(file_uid)
+        if manager.active_connections.get(file_uid) is websocket:
+            await websocket.close()
+            manager.disconnect(file_uid, websocket)
+
+
+@router.websocket("/ws/session/{session_id}", name="WebSocket Transcription Session")
+async def session_websocket_endpoint(
+    websocket: WebSocket,
+    session_id: str,
+    last_event_id: Optional[str] = None,
+):
+    """
+    一個瀏覽器分頁共用一條 WebSocket：可在同一連線上陸續提交多個檔案，
+    每個檔案各自啟動 ``transcribe_media_task``，狀態更新都發布到 session_id
+    的頻道，並以訊息中的 ``file_uid`` 區分檔案。
+
+    客戶端訊息：``{"type": "submit", "file_uid": ..., <WebSocketTranscriptionRequest 欄位>}``；
+    其他訊息（例如心跳 ping）忽略。斷線重連時帶上 ``?last_event_id=``，
+    伺服器補送整個 session 遺漏的狀態事件；已提交的檔案不需重送。
+    """
+    await manager.connect(websocket, session_id, last_event_id=last_event_id)
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except ValueError:
+                continue
+            if not isinstance(message, dict) or message.get("type") != "submit":
+                continue
+
+            await run_in_threadpool(submit_session_file_sync, message=message, session_id=session_id)
+
+    except WebSocketDisconnect:
+        logger.info(f"Session WebSocket 連線由客戶端或伺服器關閉: {session_id}")
+        manager.disconnect(session_id, websocket)
+    except Exception as e:
+        logger.error(
+            f"Session WebSocket 端點發生錯誤 (session_id: {session_id}): {e}", exc_info=True)
+        if manager.active_connections.get(session_id) is websocket:
+            await websocket.close()
+            manager.disconnect(session_id, websocket)
@@ -0,0 +1,191 @@
+"""Gemini 批次任務集中輪詢模組。
+
+`batch_transcribe_task` 建立 Gemini batch job 後即結束，不再佔用 worker
+slot 輪詢。由 celery beat 定期觸發 ``poll_gemini_batches``，一次查詢所有
+``POLLING`` 狀態且已到期的 BatchJob；每個任務依輪詢次數做指數退避並加上
+隨機抖動，避免大量任務同時打 Gemini。任務進入 ``BATCH_COMPLETED_STATES``
+時 claim 為 ``RECOVERING``，再派送短任務 ``batch_process_results_task``
+處理結果。
+
+查詢 Gemini 需要提交時的 API Key。task_params_json 刻意不存 api_keys，
+因此改存在 Redis（帶 TTL），與 Celery broker 傳遞任務參數的信任範圍一致。
+"""
+
+from __future__ import annotations
+
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+import redis
+
+from app.celery.celery import celery_app
+from app.celery.notifier import publish_status
+from app.core.config import get_settings
+from app.database.session import SessionLocal
+from app.provider.google.gemini import (
+    GeminiClient,
+    poll_batch_job_status,
+    get_batch_job_state_name,
+    BATCH_COMPLETED_STATES,
+)
+from app.repositories.batch_job_repository import BatchJobRepository
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_settings = get_settings()
+BATCH_POLL_MIN_INTERVAL_SECONDS = _settings.batch_poll_min_interval_seconds
+BATCH_POLL_MAX_INTERVAL_SECONDS = _settings.batch_poll_max_interval_seconds
+BATCH_POLL_JITTER = _settings.batch_poll_jitter
+
+# Gemini batch job 最長 48 小時，API Key 保留稍長一些供結果處理使用
+API_KEY_TTL_SECONDS = 72 * 3600
+_API_KEY_PREFIX = "batch_poller:api_key:"
+# 同一時間只允許一個輪詢器執行（beat 觸發重疊或多 worker 時）
+_POLLER_LOCK_KEY = "batch_poller:lock"
+# KEYS: lock key；ARGV: 本輪持有的 token
+# 只刪除自己持有的鎖：本輪執行超過鎖 TTL 時，鎖可能已被下一個輪詢器取得
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_redis_client = redis.from_url(celery_app.conf.broker_url)
+
+
+def register_batch_api_key(batch_id: str, api_key: str) -> None:
+    """登記批次任務的 API Key，讓輪詢器與結果處理任務能查詢 Gemini。"""
+    try:
+        _redis_client.set(f"{_API_KEY_PREFIX}{batch_id}", api_key, ex=API_KEY_TTL_SECONDS)
+    except Exception as e:
+        logger.error(f"登記批次 {batch_id} 的 API Key 失敗: {e}")
+
+
+def get_batch_api_key(batch_id: str) -> Optional[str]:
+    try:
+        value = _redis_client.get(f"{_API_KEY_PREFIX}{batch_id}")
+    except Exception as e:
+        logger.error(f"讀取批次 {batch_id} 的 API Key 失敗: {e}")
+        return None
+    if value is None:
+        return None
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def forget_batch_api_key(batch_id: str) -> None:
+    try:
+        _redis_client.delete(f"{_API_KEY_PREFIX}{batch_id}")
+    except Exception as e:
+        logger.warning(f"刪除批次 {batch_id} 的 API Key 失敗: {e}")
+
+
+def is_tracked(batch_id: str) -> bool:
+    """批次任務是否由輪詢器追蹤中（有可用的 API Key）。"""
+    return get_batch_api_key(batch_id) is not None
+
+
+def next_poll_delay(
+    poll_count: int,
+    *,
+    min_interval: float = BATCH_POLL_MIN_INTERVAL_SECONDS,
+    max_interval: float = BATCH_POLL_MAX_INTERVAL_SECONDS,
+    jitter: float = BATCH_POLL_JITTER,
+    rand: Callable[[], float] = random.random,
+) -> float:
+    """
+    第 poll_count 次查詢後的等待秒數：min × 1.5^n，上限 max，再乘上 ±jitter 抖動。
+    """
+    base = min(min_interval * (1.5 ** poll_count), max_interval)
+    return base * (1.0 + jitter * (2.0 * rand() - 1.0))
+
+
+def _publish(batch_id: str, status_text: str) -> None:
+    publish_status(batch_id, "", status_text, extra={"batch_id": batch_id})
+
+
+@celery_app.task(name="poll_gemini_batches")
+def poll_gemini_batches() -> Dict[str, int]:
+    """
+    beat 週期任務：查詢所有到期的 POLLING 批次，完成者派送結果處理任務。
+
+    回傳本輪統計 {"polled", "dispatched", "skipped"}。
+    """
+    stats = {"polled": 0, "dispatched": 0, "skipped": 0}
+    lock_ttl = max(int(_settings.batch_poll_tick_seconds * 4), 60)
+    lock_token = uuid.uuid4().hex
+    if not _redis_client.set(_POLLER_LOCK_KEY, lock_token, nx=True, ex=lock_ttl):
+        logger.info("另一個批次輪詢器正在執行，略過本輪")
+        return stats
+
+    db = SessionLocal()
+    batch_repo = BatchJobRepository()
+
+    try:
+        now = datetime.utcnow()
+        for job in batch_repo.get_due_polling_jobs(db, now):
+            batch_id = job.batch_id
+            api_key = get_batch_api_key(batch_id)
+            if not api_key:
+                # 沒有 API Key 無法查詢，只能等使用者手動恢復
+                stats["skipped"] += 1
+                continue
+
+            poll_count = (job.poll_count or 0) + 1
+            try:
+                client = GeminiClient(api_key).client  # 進程內共用，不會重建連線
+                batch_job = poll_batch_job_status(client, job.gemini_job_name)
+                state_name = get_batch_job_state_name(batch_job)
+            except Exception as e:
+                logger.warning(f"輪詢批次 {batch_id} 失敗: {e}")
+                batch_repo.schedule_next_poll(
+                    db, batch_id, now + timedelta(seconds=next_poll_delay(poll_count)), poll_count)
+                continue
+
+            stats["polled"] += 1
+
+            if state_name in BATCH_COMPLETED_STATES:
+                # 先 claim 再派送：已被其他流程（例如手動恢復）接手時不重複處理
+                if not batch_repo.claim_for_processing(db, batch_id):
+                    continue
+                try:
+                    result = celery_app.send_task("batch_process_results_task", args=[batch_id])
+                except Exception as e:
+                    logger.error(f"派送批次 {batch_id} 結果處理任務失敗: {e}")
+                    batch_repo.update_job(db, batch_id, {"status": "POLLING"})
+                    continue
+                batch_repo.update_job(db, batch_id, {"celery_task_id": result.id})
+                logger.info(f"批次 {batch_id} 已結束 ({state_name})，派送結果處理任務 {result.id}")
+                stats["dispatched"] += 1
+                continue
+
+            delay = next_poll_delay(poll_count)
+            batch_repo.schedule_next_poll(db, batch_id, now + timedelta(seconds=delay), poll_count)
+
+            elapsed = int((now - job.created_at).total_seconds()) if job.created_at else 0
+            _publish(
+                job.parent_batch_id or batch_id,
+                f"Gemini 批次處理中... (已等待 {elapsed} 秒, 狀態: {state_name})",
+            )
+
+        if stats["polled"] or stats["skipped"]:
+            logger.info(f"批次輪詢完成: {stats}")
+        return stats
+
+    finally:
+        db.close()
+        _release_poller_lock(lock_token)
+
+
+def _release_poller_lock(token: str) -> None:
+    try:
+        released = _redis_client.register_script(_RELEASE_LOCK_SCRIPT)(
+            keys=[_POLLER_LOCK_KEY], args=[token])
+    except Exception as e:
+        logger.error(f"釋放批次輪詢鎖失敗: {e}")
+        return
+    if not released:
+        logger.warning("批次輪詢鎖已逾時並由其他輪詢器持有，本輪執行時間超過鎖的 TTL")
@@ -1,36 +1,59 @@
 import time
 import uuid
 import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from pathlib import Path
 import json
 from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 
+from celery import group, uuid as celery_uuid
 
+from app.celery.batch_poller import forget_batch_api_key, get_batch_api_key, register_batch_api_key
 from app.celery.celery import celery_app
-from app.celery.models import BatchTranscriptionTaskParams
+from app.celery.models import BatchFileItemParams, BatchTranscriptionTaskParams
 from app.celery.notifier import publish_status
 from app.core.config import get_settings
 from app.database.session import SessionLocal
 from app.exceptions import GeminiTransientError
+from app.provider.google.client_pool import get_client_pool
+from app.provider.google.file_registry import (
+    BATCH_MIN_REMAINING_SECONDS,
+    acquire_gemini_file,
+    release_gemini_file,
+)
 from app.provider.google.gemini import (
     GeminiClient,
-    upload_file_to_gemini,
-    cleanup_gemini_file,
     create_batch_transcription_job,
+    estimate_inline_batch_bytes,
+    iter_batch_job_responses,
+    cleanup_batch_job_files,
     poll_batch_job_status,
     get_batch_job_state_name,
     BATCH_COMPLETED_STATES,
 )
 from app.repositories.transcription_log_repository import TranscriptionLogRepository
+from app.repositories.transcription_log_writer import (
+    TRANSCRIPTION_LOG_WRITE_BATCH_SIZE,
+    get_transcription_log_writer,
+)
 from app.repositories.batch_job_repository import BatchJobRepository
 from app.services.calculator.service import CalculatorService
 from app.services.calculator.models import CalculationItem
-from app.services.converter.service import convert_from_lrc
+from app.services.converter.service import compact_transcripts
+from app.services.transcription.cache import (
+    BATCH_SERVICE_TIER,
+    CachedTranscript,
+    audio_fingerprint,
+    get_transcript_cache,
+    transcript_cache_key,
+)
 from app.services.transcription.models import TranscriptionResponse
 from app.services.transcription.flows import _remap_lrc_timestamps
 from app.services.vad.preprocess import run_vad_extraction
 from app.services.vad.artifacts import persist_speech_extraction
-from app.utils.audio import get_audio_duration
+from app.utils.audio import AudioAsset, encode_for_upload, get_audio_duration
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -39,6 +62,16 @@ _settings = get_settings()
 BATCH_COST_DISCOUNT = _settings.batch_cost_discount
 # 語音佔比超過此閾值時，視為原音檔幾乎全是語音，跳過 VAD 預處理
 VAD_SPEECH_RATIO_SKIP_THRESHOLD = _settings.vad_speech_ratio_skip_threshold
+# 上傳前 wav 的編碼格式（opus / flac / wav）
+UPLOAD_AUDIO_CODEC = _settings.upload_audio_codec
+UPLOAD_OPUS_BITRATE_KBPS = _settings.upload_opus_bitrate_kbps
+# 上傳階段的併發上限（前處理的併發由 CPU worker 的 -c 決定）
+BATCH_UPLOAD_CONCURRENCY = _settings.batch_upload_concurrency
+BATCH_PREPROCESS_POLL_SECONDS = _settings.batch_preprocess_poll_seconds
+# 分片：單一 Gemini batch job 的檔案數 / 音訊大小上限，與改用 JSONL 輸入的門檻
+BATCH_SHARD_MAX_FILES = _settings.batch_shard_max_files
+BATCH_SHARD_MAX_BYTES = int(_settings.batch_shard_max_mb * 1024 * 1024)
+BATCH_INLINE_MAX_BYTES = int(_settings.batch_inline_max_mb * 1024 * 1024)
 
 
 def _publish_batch_status(
@@ -78,6 +111,7 @@ def _vad_preprocess_file(
     *,
     file_uid: str | None = None,
     original_filename: str | None = None,
+    asset: AudioAsset | None = None,
 ):
     """對單一音檔執行 VAD 前處理（批次用）。
 
@@ -92,7 +126,7 @@ def _vad_preprocess_file(
         logger.warning(f"VAD 服務不可用: {e}，跳過前處理")
         return file_path, None, []
 
-    result = run_vad_extraction(file_path, temp_dir, vad_service)
+    result = run_vad_extraction(file_path, temp_dir, vad_service, asset=asset)
     if not result.success:
         return file_path, None, result.cleanup_files
 
@@ -126,6 +160,254 @@ def _vad_preprocess_file(
     return file_path, None, result.cleanup_files
 
 
+@dataclass
+class _PreprocessedFile:
+    """單檔前處理結果（由 CPU 佇列的前處理任務經 result backend 交給提交任務）"""
+    upload_path: Path
+    duration: float
+    segments: Optional[list] = None
+    cleanup_files: List[Path] = field(default_factory=list)
+    # 原始音訊的內容雜湊（轉錄結果快取用）；無法計算時為 None
+    audio_hash: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "upload_path": str(self.upload_path),
+            "duration": self.duration,
+            "segments": self.segments,
+            "cleanup_files": [str(p) for p in self.cleanup_files],
+            "audio_hash": self.audio_hash,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "_PreprocessedFile":
+        return cls(
+            upload_path=Path(data["upload_path"]),
+            duration=data["duration"],
+            segments=data.get("segments"),
+            cleanup_files=[Path(p) for p in data.get("cleanup_files", [])],
+            audio_hash=data.get("audio_hash"),
+        )
+
+
+def _preprocess_file_for_upload(
+    file_path: str,
+    file_uid: str,
+    original_filename: str,
+) -> _PreprocessedFile:
+    """單檔前處理：解碼 → 時長 / 內容雜湊 → VAD → 上傳編碼"""
+    local_path = Path(file_path)
+
+    # 只解碼一次：時長、內容雜湊與 VAD 共用同一份 16kHz PCM
+    asset = AudioAsset.open(local_path, local_path.parent)
+    if asset is not None:
+        duration = asset.duration
+    else:
+        duration = get_audio_duration(local_path) or 0.0
+    audio_hash = audio_fingerprint(local_path, asset)
+
+    try:
+        upload_path, segments, cleanup = _vad_preprocess_file(
+            local_path, local_path.parent,
+            file_uid=file_uid,
+            original_filename=original_filename,
+            asset=asset,
+        )
+    finally:
+        # 解碼快取只在前處理階段使用，結束後立即釋放磁碟空間
+        if asset is not None:
+            asset.close()
+            for cache_file in asset.cleanup_files:
+                _cleanup_local_file(str(cache_file))
+
+    # 純語音 wav 編碼後再上傳（時長不變，不影響時間戳重映射）
+    cleanup = list(cleanup)
+    encoded_path = encode_for_upload(
+        upload_path, local_path.parent, UPLOAD_AUDIO_CODEC, UPLOAD_OPUS_BITRATE_KBPS)
+    if encoded_path != upload_path:
+        cleanup.append(encoded_path)
+        upload_path = encoded_path
+
+    return _PreprocessedFile(
+        upload_path=upload_path,
+        duration=duration,
+        segments=segments,
+        cleanup_files=cleanup,
+        audio_hash=audio_hash,
+    )
+
+
+def enqueue_batch_transcription(task_params_dict: dict) -> str:
+    """
+    啟動批次轉錄：每個檔案一個 CPU 佇列的前處理任務（group），同時派送
+    I/O 佇列的 batch_transcribe_task，由它依完成順序取用前處理結果並上傳，
+    檔案 i 上傳時檔案 i+1 仍在前處理（不等整個 group 完成）。
+    回傳提交任務的 task id（前處理任務推送狀態時沿用）。
+    """
+    task_id = celery_uuid()
+    batch_id = task_params_dict["batch_id"]
+    preprocess_task_ids = [celery_uuid() for _ in task_params_dict["files"]]
+    group(
+        batch_preprocess_file_task.si(file_item, batch_id, task_id).set(task_id=preprocess_task_id)
+        for file_item, preprocess_task_id in zip(task_params_dict["files"], preprocess_task_ids)
+    ).apply_async()
+    batch_transcribe_task.apply_async(args=(preprocess_task_ids, task_params_dict), task_id=task_id)
+    return task_id
+
+
+@celery_app.task(bind=True)
+def batch_preprocess_file_task(self, file_item_dict: dict, batch_id: str, batch_task_id: str) -> Optional[dict]:
+    """
+    CPU 佇列（prefork）：批次中單一檔案的解碼、時長 / 內容雜湊、VAD 與上傳編碼。
+    失敗時回傳 None 而不拋出例外，提交任務改用原始檔上傳。
+    """
+    file_item = BatchFileItemParams.model_validate(file_item_dict)
+    try:
+        prepared = _preprocess_file_for_upload(
+            file_item.file_path, file_item.file_uid, file_item.original_filename)
+    except Exception as e:
+        logger.warning(f"前處理失敗 ({file_item.original_filename}): {e}，改用原始檔上傳", exc_info=True)
+        return None
+    _publish_batch_status(
+        batch_id, batch_task_id, f"前處理完成，等待上傳: {file_item.original_filename}",
+        file_uid=file_item.file_uid,
+    )
+    return prepared.to_dict()
+
+
+def _prepared_or_original(data: Optional[dict], file_item) -> _PreprocessedFile:
+    """前處理任務的結果；沒有結果（前處理失敗）時與 VAD 失敗相同，回退為原始檔上傳"""
+    if data:
+        return _PreprocessedFile.from_dict(data)
+    local_path = Path(file_item.file_path)
+    return _PreprocessedFile(upload_path=local_path, duration=get_audio_duration(local_path) or 0.0)
+
+
+def _iter_preprocessed(
+    preprocess_task_ids: list,
+    poll_seconds: float = BATCH_PREPROCESS_POLL_SECONDS,
+) -> Iterator[Tuple[int, Optional[dict]]]:
+    """
+    依完成順序產生前處理任務的結果 (檔案索引, 結果)；任務失敗（例如 worker 中止）時結果為 None。
+    結果保留在 result backend，提交任務重試時可再次取用。
+    """
+    pending = dict(enumerate(preprocess_task_ids))
+    while pending:
+        ready = []
+        for i, preprocess_task_id in pending.items():
+            result = celery_app.AsyncResult(preprocess_task_id)
+            if result.ready():
+                ready.append((i, result.result if result.successful() else None))
+        for i, data in ready:
+            del pending[i]
+            yield i, data
+        if pending and not ready:
+            time.sleep(poll_seconds)
+
+
+def _iter_uploads(
+    files: list,
+    preprocessed: Iterable[Tuple[int, Optional[dict]]],
+    client,
+    upload_concurrency: int = BATCH_UPLOAD_CONCURRENCY,
+    lookup: Optional[Callable[[int, _PreprocessedFile], Optional[CachedTranscript]]] = None,
+) -> Iterator[Tuple[str, int, object]]:
+    """
+    上傳階段：依完成順序取用前處理結果 (檔案索引, 結果)、查詢轉錄快取，
+    未命中的檔案立即送進有限大小的 I/O 執行緒池上傳，其餘檔案的前處理同時進行。
+    產生 (事件, 檔案索引, 內容)，上傳事件依完成順序：
+
+      - ("preprocessed", i, _PreprocessedFile)
+      - ("cached", i, CachedTranscript)：lookup 命中轉錄快取，不上傳
+      - ("uploaded", i, gemini_file)
+      - ("upload_failed", i, exception)
+
+    每取得一個前處理結果就先交出已完成的上傳，分片不必等所有前處理結束才提交。
+    lookup 在送出上傳前於呼叫端執行緒查詢快取。
+    DB 與狀態推送都留在呼叫端（主執行緒）處理。
+    """
+    upload_executor = ThreadPoolExecutor(max_workers=max(1, upload_concurrency))
+    pending = {}
+
+    def finished_uploads(block: bool):
+        done, _ = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            i = pending.pop(future)
+            try:
+                gemini_file = future.result()
+            except Exception as e:
+                yield "upload_failed", i, e
+                continue
+            yield "uploaded", i, gemini_file
+
+    try:
+        for i, data in preprocessed:
+            prepared = _prepared_or_original(data, files[i])
+            cached = lookup(i, prepared) if lookup is not None else None
+            if cached is None:
+                upload_future = upload_executor.submit(
+                    acquire_gemini_file, prepared.upload_path, client,
+                    min_remaining_seconds=BATCH_MIN_REMAINING_SECONDS)
+                pending[upload_future] = i
+            yield "preprocessed", i, prepared
+            if cached is not None:
+                yield "cached", i, cached
+            if pending:
+                yield from finished_uploads(block=False)
+
+        while pending:
+            yield from finished_uploads(block=True)
+    finally:
+        upload_executor.shutdown(wait=True, cancel_futures=True)
+
+
+@dataclass
+class _BatchShard:
+    """一個待提交的 Gemini batch job（檔案索引依上傳完成順序加入）"""
+    index: int
+    file_indices: List[int] = field(default_factory=list)
+    total_bytes: int = 0
+
+
+class _ShardPlanner:
+    """
+    將上傳完成的檔案累積成分片：檔案數或音訊總大小達到上限即封裝回傳，
+    讓呼叫端立刻提交，不必等整個 session 的檔案都上傳完成。
+    """
+
+    def __init__(self, max_files: int = BATCH_SHARD_MAX_FILES, max_bytes: int = BATCH_SHARD_MAX_BYTES):
+        self.max_files = max(1, max_files)
+        self.max_bytes = max_bytes
+        self._next_index = 0
+        self._current: Optional[_BatchShard] = None
+
+    def add(self, file_index: int, size_bytes: int) -> Optional[_BatchShard]:
+        """加入一個上傳完成的檔案；分片已滿時回傳該分片"""
+        if self._current is None:
+            self._current = _BatchShard(index=self._next_index)
+            self._next_index += 1
+        shard = self._current
+        shard.file_indices.append(file_index)
+        shard.total_bytes += size_bytes
+
+        if len(shard.file_indices) >= self.max_files or (
+            self.max_bytes > 0 and shard.total_bytes >= self.max_bytes
+        ):
+            self._current = None
+            return shard
+        return None
+
+    def flush(self) -> Optional[_BatchShard]:
+        """所有檔案上傳結束後，回傳尚未湊滿的最後一個分片"""
+        shard, self._current = self._current, None
+        return shard
+
+
+def _shard_batch_id(batch_id: str, shard_index: int) -> str:
+    """分片的 BatchJob ID：第一個分片沿用前端的 batch_id"""
+    return batch_id if shard_index == 0 else f"{batch_id}-s{shard_index}"
+
+
 def _process_single_result(
     inline_response,
     file_item,
@@ -134,19 +416,23 @@ def _process_single_result(
     file_task_uuid: str,
     audio_duration: float,
     start_time: float,
-    db,
-    log_repo,
+    log_writer,
     update_fn,
     vad_segments=None,
+    cache_key: Optional[str] = None,
 ):
-    """處理批次中單一檔案的結果：轉換格式、翻譯、計算費用"""
+    """
+    處理批次中單一檔案的結果：轉換格式、翻譯、計算費用，並寫入轉錄快取。
+    日誌只進 write-behind 佇列；COMPLETED 經 update_fn 交給呼叫端，
+    由呼叫端在 flush 後才推送（前端收到後可能立即下載）。
+    """
     file_uid = file_item.file_uid
 
     if not inline_response.response:
         error_msg = str(getattr(inline_response, "error", "未知錯誤"))
         logger.error(f"檔案 {file_item.original_filename} 批次轉錄失敗: {error_msg}")
         update_fn(f"轉錄失敗: {error_msg}", status_code="FAILED", file_uid=file_uid)
-        log_repo.update_log(db, file_task_uuid, {
+        log_writer.submit(file_task_uuid, {
             "status": "FAILED",
             "error_message": error_msg,
             "processing_time_seconds": time.time() - start_time,
@@ -162,7 +448,7 @@ def _process_single_result(
         except Exception:
             pass
         update_fn(error_text, status_code="FAILED", file_uid=file_uid)
-        log_repo.update_log(db, file_task_uuid, {
+        log_writer.submit(file_task_uuid, {
             "status": "FAILED",
             "error_message": error_text,
             "processing_time_seconds": time.time() - start_time,
@@ -186,9 +472,15 @@ def _process_single_result(
         final_lrc_text = _remap_lrc_timestamps(final_lrc_text, vad_segments)
         logger.info(f"檔案 {file_item.original_filename}: 時間戳已重映射回原始時間軸")
 
-    # --- 格式轉換 ---
-    transcripts_model = convert_from_lrc(final_lrc_text)
-    final_transcripts = transcripts_model.model_dump() if transcripts_model else {}
+    get_transcript_cache().put(cache_key, CachedTranscript(
+        lrc_text=final_lrc_text,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        total_tokens=total_tokens,
+    ))
+
+    # --- 精簡結果：只帶 LRC，其他格式由下載端點即時轉換 ---
+    final_transcripts = compact_transcripts(final_lrc_text)
 
     # --- 費用計算 (含 Batch 50% 折扣) ---
     processing_time = time.time() - start_time
@@ -216,8 +508,8 @@ def _process_single_result(
     batch_input_cost = metrics.input_cost * BATCH_COST_DISCOUNT
     batch_output_cost = metrics.output_cost * BATCH_COST_DISCOUNT
 
-    # --- 更新資料庫 ---
-    if not log_repo.update_log(db, file_task_uuid, {
+    # --- 更新資料庫（write-behind，由 process_gemini_batch_results 分段 flush）---
+    log_writer.submit(file_task_uuid, {
         "status": "COMPLETED",
         "audio_duration_seconds": audio_duration,
         "processing_time_seconds": processing_time,
@@ -225,10 +517,7 @@ def _process_single_result(
         "cost": batch_cost,
         "completed_at": datetime.now(),
         "lrc_content": final_lrc_text or None,
-    }):
-        logger.warning(
-            f"無法更新 transcription_log: task_uuid={file_task_uuid} "
-            f"file={file_item.original_filename}")
+    })
 
     # --- 回傳結果 ---
     file_response = TranscriptionResponse(
@@ -253,6 +542,56 @@ def _process_single_result(
     logger.info(f"檔案 {file_item.original_filename} 處理完成, 費用: ${batch_cost:.6f}")
 
 
+def _complete_from_cache(
+    cached: CachedTranscript,
+    file_item,
+    task_params,
+    file_task_uuid: str,
+    audio_duration: float,
+    start_time: float,
+    log_writer,
+) -> dict:
+    """
+    轉錄快取命中的檔案：直接以快取的 LRC 完成，不上傳、不計費。
+    日誌只進 write-behind 佇列；COMPLETED 由呼叫端在 flush 後推送
+    （前端收到後可能立即下載，推播前必須已寫入）。
+    """
+    processing_time = time.time() - start_time
+
+    log_writer.submit(file_task_uuid, {
+        "status": "COMPLETED",
+        "audio_duration_seconds": audio_duration,
+        "processing_time_seconds": processing_time,
+        "total_tokens": 0,
+        "cost": 0.0,
+        "completed_at": datetime.now(),
+        "lrc_content": cached.lrc_text,
+    })
+
+    result_dict = TranscriptionResponse(
+        task_uuid=file_task_uuid,
+        transcripts=compact_transcripts(cached.lrc_text),
+        tokens_used=0,
+        cost=0.0,
+        model=task_params.model,
+        source_language=task_params.source_lang,
+        processing_time_seconds=processing_time,
+        audio_duration_seconds=audio_duration,
+    ).model_dump()
+    result_dict["task_uuid"] = str(result_dict["task_uuid"])
+
+    logger.info(f"檔案 {file_item.original_filename} 命中轉錄快取，略過上傳與批次轉錄")
+    return result_dict
+
+
+def _publish_cached_completions(pending: list, update_fn) -> None:
+    """推送快取命中檔案的 COMPLETED（呼叫前日誌須已 flush）；推送後清空 pending"""
+    for file_uid, result_dict in pending:
+        update_fn("任務完成（沿用先前的轉錄結果）", status_code="COMPLETED",
+                  result_data=result_dict, file_uid=file_uid)
+    pending.clear()
+
+
 @celery_app.task(
     bind=True,
     autoretry_for=(GeminiTransientError,),
@@ -260,16 +599,23 @@ def _process_single_result(
     retry_backoff=True,
     retry_backoff_max=60,
 )
-def batch_transcribe_task(self, task_params_dict: dict):
+def batch_transcribe_task(self, preprocess_task_ids: list, task_params_dict: dict):
     """
-    使用 Gemini Batch API 進行批次轉錄的 Celery 任務。
+    使用 Gemini Batch API 進行批次轉錄的 Celery 任務（只負責提交）。
+
+    與各檔案的前處理任務（``batch_preprocess_file_task``，CPU 佇列）同時派送，
+    在 I/O 佇列執行：preprocess_task_ids 為前處理任務的 task id，順序與 files 相同。
 
     流程：
-    1. 將所有音訊檔案上傳至 Gemini File API
-    2. 建立 Batch API 任務 (inline requests)
-    3. 輪詢直到任務完成
-    4. 逐一處理每個檔案的結果 (格式轉換、翻譯、費用計算)
-    5. 透過 Redis Pub/Sub 發布個別檔案與整體批次的狀態更新
+    1. 前處理任務一完成就將該檔案上傳至 Gemini File API（有限併發），
+       與其餘檔案的前處理重疊；命中轉錄快取的檔案直接完成，不上傳也不進入批次
+    2. 上傳完成的檔案依檔案數 / 大小累積成分片，分片湊滿即建立 Batch API 任務
+       （小分片用 inline requests，大分片用 JSONL 檔案輸入），狀態記為 POLLING
+    3. 所有分片提交後立即結束
+
+    每個分片是一筆獨立的 BatchJob（第一個分片沿用 batch_id，其餘為
+    ``{batch_id}-s{n}``，共用 session_id），由 ``batch_poller.poll_gemini_batches``
+    各自輪詢，哪個分片先完成就先派送 ``batch_process_results_task`` 處理結果。
     """
     task_params = BatchTranscriptionTaskParams.model_validate(task_params_dict)
     task_uuid = self.request.id
@@ -282,11 +628,22 @@ def batch_transcribe_task(self, task_params_dict: dict):
             batch_id, task_uuid, status_text, status_code, result_data, file_uid
         )
 
-    db = SessionLocal()
+    # 整個提交流程可能長達數小時（上傳大量檔案），DB session 只在寫入時短暫開啟
     log_repo = TranscriptionLogRepository()
+    log_writer = get_transcription_log_writer()
     batch_repo = BatchJobRepository()
-    gemini_files = []
     client = None
+    lease = None
+    lease_error = None
+    file_gemini_mapping = {}   # {檔案索引: (file_item, gemini_file)}
+    file_log_uuids = {}
+    vad_cleanup_files = []     # 需要清理的 VAD 暫存檔案
+    submitted_shards = []      # 已建立 Gemini batch job 的分片 batch_id
+    submitted_indices = set()  # 已隨分片提交的檔案索引（Gemini 檔案保留到批次結束）
+    cache_keys = {}            # {檔案索引: 轉錄快取 key}
+    cached_results = {}        # {file_uid: 命中快取的結果}
+    cached_pending = []        # [(file_uid, 結果)]：日誌 flush 後才推送 COMPLETED
+    will_retry = False
     start_time = time.time()
 
     try:
@@ -296,10 +653,12 @@ def batch_transcribe_task(self, task_params_dict: dict):
                 f"Provider '{task_params.provider}' is not supported. Only 'google' is allowed."
             )
 
-        # --- 初始化 Gemini Client ---
-        client = GeminiClient(task_params.api_keys).client
-        if not client:
-            raise ValueError("Failed to initialize Gemini Client. Check API key.")
+        # --- 初始化 Gemini Client：從 client 池挑選一把 Key，上傳與所有分片都使用同一把 ---
+        try:
+            lease = get_client_pool().acquire(task_params.api_keys)
+        except Exception as e:
+            raise ValueError(f"Failed to initialize Gemini Client. Check API key. ({e})") from e
+        client = lease.client
 
         from app.core.default_prompt import build_prompt
         # 取得提示詞
@@ -312,322 +671,395 @@ def batch_transcribe_task(self, task_params_dict: dict):
         total_files = len(task_params.files)
         update_status(f"正在初始化批次任務 ({total_files} 個檔案)...")
 
-        # === 持久化節點 1：任務開始，建立 BatchJob 記錄 ===
-        batch_repo.create_job(db, batch_id, json.dumps({
+        # === 持久化節點 1：任務開始，建立 BatchJob 記錄（同時作為第一個分片）===
+        task_params_json = json.dumps({
             "model": task_params.model,
             "provider": task_params.provider,
             "source_lang": task_params.source_lang,
             "target_lang": task_params.target_lang,
             "prompt": prompt,
-        }))
-        session_id = task_params.session_id or batch_id
-        batch_repo.update_job(db, batch_id, {
-            "celery_task_id": task_uuid,
-            "file_count": len(task_params.files),
-            "completed_file_count": 0,
-            "session_id": session_id,
         })
-
-        # --- 1. 取得音訊時長 & 建立資料庫日誌 ---
+        session_id = task_params.session_id or batch_id
         file_durations = {}
-        file_log_uuids = {}
-
-        for file_item in task_params.files:
-            local_path = Path(file_item.file_path)
-            duration = get_audio_duration(local_path) or 0.0
-            file_durations[file_item.file_uid] = duration
-
-            file_task_uuid = str(uuid.uuid4())
-            file_log_uuids[file_item.file_uid] = file_task_uuid
-            log_repo.insert_log(db, {
-                "status": "PROCESSING",
-                "original_filename": file_item.original_filename,
-                "model_used": task_params.model,
-                "source_language": task_params.source_lang,
-                "task_uuid": file_task_uuid,
-                "is_batch": True,
-                "batch_id": batch_id,
-                "provider": task_params.provider,
-                "target_language": task_params.target_lang,
+        file_sizes = {}          # {檔案索引: 上傳檔案大小}
+        file_vad_segments = {}   # {file_uid: segments_list or None}
+
+        with SessionLocal() as db:
+            batch_repo.create_job(db, batch_id, task_params_json)
+            batch_repo.update_job(db, batch_id, {
+                "celery_task_id": task_uuid,
+                "file_count": len(task_params.files),
+                "completed_file_count": 0,
                 "session_id": session_id,
-                "file_uid": file_item.file_uid,
             })
 
-        # --- 2. VAD 前處理 + 上傳所有檔案至 Gemini ---
-        file_gemini_mapping = {}
-        file_vad_segments = {}   # {file_uid: segments_list or None}
-        vad_cleanup_files = []   # 需要清理的 VAD 暫存檔案
+            # --- 1. 建立資料庫日誌 ---
+            for file_item in task_params.files:
+                file_task_uuid = str(uuid.uuid4())
+                file_log_uuids[file_item.file_uid] = file_task_uuid
+                log_repo.insert_log(db, {
+                    "status": "PROCESSING",
+                    "original_filename": file_item.original_filename,
+                    "model_used": task_params.model,
+                    "source_language": task_params.source_lang,
+                    "task_uuid": file_task_uuid,
+                    "is_batch": True,
+                    "batch_id": batch_id,
+                    "provider": task_params.provider,
+                    "target_language": task_params.target_lang,
+                    "session_id": session_id,
+                    "file_uid": file_item.file_uid,
+                })
 
-        for i, file_item in enumerate(task_params.files):
-            update_status(
-                f"前處理與上傳 ({i + 1}/{total_files}): {file_item.original_filename}",
-                file_uid=file_item.file_uid,
+        def submit_shard(shard: _BatchShard) -> None:
+            """建立分片的 Gemini batch job 並持久化，交給輪詢器追蹤"""
+            shard_id = _shard_batch_id(batch_id, shard.index)
+            indices = sorted(shard.file_indices)
+            shard_gemini_files = [file_gemini_mapping[i][1] for i in indices]
+            use_file_input = estimate_inline_batch_bytes(shard_gemini_files, prompt) > BATCH_INLINE_MAX_BYTES
+
+            update_status(f"建立 Gemini 批次任務 (分片 {shard.index + 1}, {len(indices)} 個檔案)...")
+            batch_job = create_batch_transcription_job(
+                client=client,
+                gemini_files=shard_gemini_files,
+                model=task_params.model,
+                prompt=prompt,
+                display_name=f"transcription-{batch_id[:8]}-{shard.index + 1}",
+                keys=[str(i) for i in indices],
+                use_file_input=use_file_input,
             )
-            local_path = Path(file_item.file_path)
-
-            # VAD 前處理
-            upload_path, segments, cleanup = _vad_preprocess_file(
-                local_path, local_path.parent,
-                file_uid=file_item.file_uid,
-                original_filename=file_item.original_filename,
+            logger.info(
+                f"分片 {shard_id} 已建立 Gemini 批次任務: {batch_job.name} "
+                f"({len(indices)} 個檔案, {shard.total_bytes / 1024 / 1024:.1f} MB, "
+                f"{'JSONL' if use_file_input else 'inline'})"
             )
-            file_vad_segments[file_item.file_uid] = segments
-            vad_cleanup_files.extend(cleanup)
 
-            try:
-                gemini_file = upload_file_to_gemini(upload_path, client)
-                gemini_files.append(gemini_file)
-                file_gemini_mapping[i] = (file_item, gemini_file)
-            except Exception as e:
-                logger.error(f"上傳檔案失敗 {file_item.original_filename}: {e}")
+            shard_uids = [file_gemini_mapping[i][0].file_uid for i in indices]
+            if shard.index > 0:
+                with SessionLocal() as db:
+                    batch_repo.create_job(db, shard_id, task_params_json)
+                    batch_repo.update_job(db, shard_id, {
+                        "celery_task_id": task_uuid,
+                        "session_id": session_id,
+                        "parent_batch_id": batch_id,
+                    })
+                for fuid in shard_uids:
+                    log_writer.submit(file_log_uuids[fuid], {"batch_id": shard_id})
+
+            # === 持久化節點 2：分片的 Gemini batch job 建立後，存入 job_name 和檔案映射 ===
+            file_mapping = {
+                str(i): {
+                    "file_uid": file_gemini_mapping[i][0].file_uid,
+                    "original_filename": file_gemini_mapping[i][0].original_filename,
+                    "vad_segments": file_vad_segments.get(file_gemini_mapping[i][0].file_uid),
+                    "gemini_file_name": file_gemini_mapping[i][1].name,
+                    "cache_key": cache_keys.get(i),
+                }
+                for i in indices
+            }
+            with SessionLocal() as db:
+                batch_repo.update_job(db, shard_id, {
+                    "gemini_job_name": batch_job.name,
+                    "status": "POLLING",
+                    "file_count": len(indices),
+                    "file_mapping_json": json.dumps(file_mapping),
+                    "file_durations_json": json.dumps(
+                        {fuid: file_durations[fuid] for fuid in shard_uids if fuid in file_durations}),
+                    "file_log_uuids_json": json.dumps(
+                        {fuid: file_log_uuids[fuid] for fuid in shard_uids}),
+                })
+
+            # 交給集中輪詢器追蹤（batch_poller）；Gemini 上的檔案需保留到批次結束
+            register_batch_api_key(shard_id, lease.api_key)
+            submitted_shards.append(shard_id)
+            submitted_indices.update(indices)
+
+        transcript_cache = get_transcript_cache()
+
+        def lookup_cache(i: int, prepared: _PreprocessedFile) -> Optional[CachedTranscript]:
+            """上傳前查詢轉錄快取（音訊雜湊 + 模型 + prompt + batch tier）"""
+            if not transcript_cache.enabled or not prepared.audio_hash:
+                return None
+            cache_keys[i] = transcript_cache_key(
+                prepared.audio_hash, task_params.model, prompt, BATCH_SERVICE_TIER)
+            return transcript_cache.get(cache_keys[i])
+
+        # --- 2. 上傳前處理後的檔案，分片湊滿即提交 ---
+        planner = _ShardPlanner(BATCH_SHARD_MAX_FILES, BATCH_SHARD_MAX_BYTES)
+
+        update_status(f"上傳 {total_files} 個檔案...")
+        preprocessed_count = 0
+        for event, i, payload in _iter_uploads(
+            task_params.files, _iter_preprocessed(preprocess_task_ids), client, lookup=lookup_cache
+        ):
+            file_item = task_params.files[i]
+
+            if event == "preprocessed":
+                preprocessed_count += 1
+                file_durations[file_item.file_uid] = payload.duration
+                file_vad_segments[file_item.file_uid] = payload.segments
+                vad_cleanup_files.extend(payload.cleanup_files)
+                try:
+                    file_sizes[i] = Path(payload.upload_path).stat().st_size
+                except OSError:
+                    file_sizes[i] = 0
                 update_status(
-                    f"檔案上傳失敗: {e}",
+                    f"上傳中 ({preprocessed_count}/{total_files}): {file_item.original_filename}",
+                    file_uid=file_item.file_uid,
+                )
+            elif event == "cached":
+                cached_results[file_item.file_uid] = _complete_from_cache(
+                    payload,
+                    file_item,
+                    task_params,
+                    file_log_uuids[file_item.file_uid],
+                    file_durations.get(file_item.file_uid, 0.0),
+                    start_time,
+                    log_writer,
+                )
+                cached_pending.append((file_item.file_uid, cached_results[file_item.file_uid]))
+            elif event == "uploaded":
+                file_gemini_mapping[i] = (file_item, payload)
+                shard = planner.add(i, file_sizes.get(i, 0))
+                if shard is not None:
+                    submit_shard(shard)
+            else:
+                logger.error(f"上傳檔案失敗 {file_item.original_filename}: {payload}")
+                update_status(
+                    f"檔案上傳失敗: {payload}",
                     status_code="FAILED",
                     file_uid=file_item.file_uid,
                 )
-                log_repo.update_log(db, file_log_uuids[file_item.file_uid], {
+                log_writer.submit(file_log_uuids[file_item.file_uid], {
                     "status": "FAILED",
-                    "error_message": f"檔案上傳失敗: {str(e)}",
+                    "error_message": f"檔案上傳失敗: {str(payload)}",
                     "processing_time_seconds": time.time() - start_time,
                 })
 
-        if not file_gemini_mapping:
+        # --- 3. 提交最後一個未湊滿的分片 ---
+        last_shard = planner.flush()
+        if last_shard is not None:
+            submit_shard(last_shard)
+
+        # 結束前寫入所有檔案狀態（含快取命中的檔案，一次寫入），前端收到後看到的歷史紀錄即為最新
+        log_writer.flush()
+        _publish_cached_completions(cached_pending, update_status)
+
+        if not submitted_shards:
+            if cached_results:
+                # 全部由快取完成（或其餘檔案上傳失敗）：不需要 Gemini 批次
+                with SessionLocal() as db:
+                    batch_repo.update_job(db, batch_id, {
+                        "status": "COMPLETED",
+                        "completed_file_count": len(cached_results),
+                        "results_json": json.dumps(cached_results, default=str, ensure_ascii=False),
+                    })
+                update_status(
+                    f"{len(cached_results)} 個檔案沿用先前的轉錄結果，批次任務完成",
+                    status_code="BATCH_COMPLETED",
+                )
+                return
             update_status("所有檔案上傳失敗，批次任務終止", status_code="BATCH_COMPLETED")
             return
 
-        # --- 3. 建立 Gemini Batch 任務 ---
-        update_status(f"建立 Gemini 批次任務 ({len(file_gemini_mapping)} 個檔案)...")
-
-        ordered_indices = sorted(file_gemini_mapping.keys())
-        ordered_gemini_files = [
-            file_gemini_mapping[i][1] for i in ordered_indices
-        ]
-
-        batch_job = create_batch_transcription_job(
-            client=client,
-            gemini_files=ordered_gemini_files,
-            model=task_params.model,
-            prompt=prompt,
-            display_name=f"transcription-{batch_id[:8]}",
-        )
-
-        job_name = batch_job.name
-        logger.info(f"Gemini 批次任務已建立: {job_name}")
-
-        # === 持久化節點 2：Gemini batch job 建立後，存入 job_name 和檔案映射 ===
-        file_mapping = {
-            str(i): {
-                "file_uid": file_gemini_mapping[i][0].file_uid,
-                "original_filename": file_gemini_mapping[i][0].original_filename,
-                "vad_segments": file_vad_segments.get(file_gemini_mapping[i][0].file_uid),
-            }
-            for i in ordered_indices
-        }
-        batch_repo.update_job(db, batch_id, {
-            "gemini_job_name": job_name,
-            "status": "POLLING",
-            "file_mapping_json": json.dumps(file_mapping),
-            "file_durations_json": json.dumps(file_durations),
-            "file_log_uuids_json": json.dumps(file_log_uuids),
-        })
+        if cached_results:
+            # 快取命中的結果由第一個分片處理結果時一併存入 results_json；
+            # 若該分片在上傳其餘檔案期間已處理完畢，改由這裡補寫
+            with SessionLocal() as db:
+                job = batch_repo.get_job(db, batch_id)
+                if job is not None and job.results_json:
+                    stored_results = json.loads(job.results_json)
+                    stored_results.update(
+                        {fuid: r for fuid, r in cached_results.items() if fuid not in stored_results})
+                    batch_repo.update_job(db, batch_id, {
+                        "results_json": json.dumps(stored_results, default=str, ensure_ascii=False),
+                    })
 
-        # 通知前端：檔案已全部提交，可以釋放 UI（結果可稍後恢復）
+        # 通知前端：檔案已全部提交，可以釋放 UI（結果由輪詢器依分片完成後推送）
+        cached_note = f"，{len(cached_results)} 個檔案沿用先前結果" if cached_results else ""
         update_status(
-            f"批次任務已提交至 Gemini，共 {len(file_gemini_mapping)} 個檔案，等待處理中...",
+            f"批次任務已提交至 Gemini，共 {len(submitted_indices)} 個檔案"
+            f"（{len(submitted_shards)} 個分片）{cached_note}，等待處理中...",
             status_code="BATCH_SUBMITTED",
         )
+        logger.info(
+            f"批次任務已提交: {batch_id}, {len(submitted_shards)} 個分片, "
+            f"耗時 {time.time() - start_time:.1f} 秒，後續由輪詢器追蹤")
 
-        # --- 4. 輪詢等待完成 ---
-        poll_count = 0
-        poll_interval = 10
-
-        while True:
-            batch_job = poll_batch_job_status(client, job_name)
-            state_name = get_batch_job_state_name(batch_job)
-
-            if state_name in BATCH_COMPLETED_STATES:
-                break
-
-            poll_count += 1
-            elapsed = int(time.time() - start_time)
-            update_status(f"Gemini 批次處理中... (已等待 {elapsed} 秒, 狀態: {state_name})")
+    except Exception as e:
+        lease_error = e
+        if isinstance(e, GeminiTransientError) and not submitted_shards and self.request.retries < self.max_retries:
+            # 暫時性錯誤：交給 Celery autoretry，狀態保留 UPLOADING 以便恢復；
+            # 重試沿用同一份前處理結果，本地檔案保留到下一次嘗試
+            will_retry = True
+            logger.warning(f"批次任務 {batch_id} hit transient Gemini error, will retry: {e}")
+            update_status(f"暫時性錯誤，將重試: {e}", status_code="PROCESSING")
+            raise
 
-            time.sleep(poll_interval)
-            poll_interval = min(poll_interval * 1.5, 60)
+        error_message = traceback.format_exc()
+        logger.error(f"批次任務發生嚴重錯誤: {error_message}")
 
-        state_name = get_batch_job_state_name(batch_job)
-        logger.info(f"批次任務結束，狀態: {state_name}")
+        # === 持久化節點 3b：任務失敗（已提交的分片不受影響，照常由輪詢器處理）===
+        if not submitted_shards:
+            with SessionLocal() as db:
+                batch_repo.update_job(db, batch_id, {"status": "FAILED"})
 
-        # --- 處理非成功狀態 ---
-        if state_name != "JOB_STATE_SUCCEEDED":
-            error_msg = f"批次任務失敗，狀態: {state_name}"
-            logger.error(error_msg)
-            for file_item in task_params.files:
-                fuid = file_item.file_uid
-                if fuid in file_log_uuids:
-                    update_status(error_msg, status_code="FAILED", file_uid=fuid)
-                    log_repo.update_log(db, file_log_uuids[fuid], {
-                        "status": "FAILED",
-                        "error_message": error_msg,
-                        "processing_time_seconds": time.time() - start_time,
-                    })
-            update_status(error_msg, status_code="BATCH_COMPLETED")
+        failed_uids = []
+        for i, file_item in enumerate(task_params.files):
+            fuid = file_item.file_uid
+            if i in submitted_indices or fuid in cached_results or fuid not in file_log_uuids:
+                continue
+            log_writer.submit(file_log_uuids[fuid], {
+                "status": "FAILED",
+                "error_message": str(e),
+                "processing_time_seconds": time.time() - start_time,
+            })
+            failed_uids.append(fuid)
+        log_writer.flush()
+        _publish_cached_completions(cached_pending, update_status)
+        for fuid in failed_uids:
+            update_status(f"批次任務失敗: {e}", status_code="FAILED", file_uid=fuid)
+
+        if submitted_shards:
+            # 部分分片已提交：重試會重複提交，改為結束任務並釋放前端
+            update_status(
+                f"部分檔案提交失敗: {e}；已提交 {len(submitted_indices)} 個檔案，等待處理中...",
+                status_code="BATCH_SUBMITTED",
+            )
             return
 
-        # --- 5. 逐一處理結果 ---
-        update_status("批次任務完成，正在處理結果...")
-
-        # 包裝 update_status 以捕獲各檔案結果（供恢復時使用）
-        captured_results = {}
-
-        def update_status_capture(
-            status_text, status_code="PROCESSING", result_data=None, file_uid=None
-        ):
-            update_status(status_text, status_code, result_data, file_uid)
-            if file_uid and result_data and status_code == "COMPLETED":
-                captured_results[file_uid] = result_data
+        update_status(f"批次任務失敗: {e}", status_code="BATCH_COMPLETED")
+        raise e
 
-        if batch_job.dest and batch_job.dest.inlined_responses:
-            for response_idx, inline_response in enumerate(
-                batch_job.dest.inlined_responses
-            ):
-                if response_idx >= len(ordered_indices):
-                    break
+    finally:
+        if lease is not None:
+            get_client_pool().release(lease, lease_error)
 
-                original_idx = ordered_indices[response_idx]
-                file_item = file_gemini_mapping[original_idx][0]
-                file_uid = file_item.file_uid
-                file_task_uuid = file_log_uuids[file_uid]
-                audio_duration = file_durations.get(file_uid, 0.0)
+        # 未隨分片提交的 Gemini 檔案立即釋放；已提交的由結果處理任務在批次結束後釋放
+        # （釋放後保留一段時間供重試沿用，再由 reaper 刪除）
+        if client:
+            for i, (_, gf) in file_gemini_mapping.items():
+                if i in submitted_indices:
+                    continue
+                try:
+                    release_gemini_file(client, gf)
+                except Exception as e:
+                    logger.warning(f"清理 Gemini 檔案失敗: {e}")
 
-                update_status(
-                    f"處理結果 ({response_idx + 1}/{len(ordered_indices)}): "
-                    f"{file_item.original_filename}",
-                    file_uid=file_uid,
-                )
+        # 清理本地暫存檔案與 VAD 暫存檔案；即將重試時保留給下一次嘗試沿用
+        if not will_retry:
+            for file_item in task_params.files:
+                _cleanup_local_file(file_item.file_path)
 
+            for vad_file in vad_cleanup_files:
                 try:
-                    _process_single_result(
-                        inline_response=inline_response,
-                        file_item=file_item,
-                        task_params=task_params,
-                        client=client,
-                        file_task_uuid=file_task_uuid,
-                        audio_duration=audio_duration,
-                        start_time=start_time,
-                        db=db,
-                        log_repo=log_repo,
-                        update_fn=update_status_capture,
-                        vad_segments=file_vad_segments.get(file_uid),
-                    )
+                    if vad_file.exists() and "temp_uploads" in str(vad_file):
+                        vad_file.unlink()
+                        logger.info(f"已清理 VAD 暫存檔: {vad_file.name}")
                 except Exception as e:
-                    logger.error(
-                        f"處理檔案 {file_item.original_filename} 結果時發生錯誤: {e}",
-                        exc_info=True,
-                    )
-                    update_status(
-                        f"處理結果失敗: {e}", status_code="FAILED", file_uid=file_uid
-                    )
-                    log_repo.update_log(db, file_task_uuid, {
-                        "status": "FAILED",
-                        "error_message": str(e),
-                        "processing_time_seconds": time.time() - start_time,
-                    })
-        else:
-            logger.warning("批次任務成功但沒有回傳結果")
+                    logger.warning(f"清理 VAD 暫存檔失敗: {e}")
 
-        # --- 批次完成 ---
-        # === 持久化節點 3a：任務完成，同時存入結果 ===
-        batch_repo.update_job(db, batch_id, {
-            "status": "COMPLETED",
-            "results_json": json.dumps(captured_results, default=str, ensure_ascii=False),
-        })
+        # 重試或失敗離開時仍有未寫入的狀態（例如分片的 batch_id）
+        log_writer.flush()
 
-        elapsed = time.time() - start_time
-        update_status(
-            f"批次任務全部完成 (耗時 {elapsed:.1f} 秒)", status_code="BATCH_COMPLETED"
-        )
-        logger.info(f"批次任務完成: {batch_id}, 耗時 {elapsed:.1f} 秒")
 
-    except GeminiTransientError as e:
-        # 暫時性錯誤：交給 Celery autoretry，狀態保留 POLLING/UPLOADING 以便恢復
-        logger.warning(f"批次任務 {batch_id} hit transient Gemini error, will retry: {e}")
-        update_status(f"暫時性錯誤，將重試: {e}", status_code="PROCESSING")
-        raise
-    except Exception as e:
-        error_message = traceback.format_exc()
-        logger.error(f"批次任務發生嚴重錯誤: {error_message}")
+# 批次中單一檔案的終態：日誌已是這些狀態的檔案重新處理時會略過
+_BATCH_FILE_DONE_STATUSES = ("COMPLETED", "FAILED")
 
-        # === 持久化節點 3b：任務失敗 ===
-        batch_repo.update_job(db, batch_id, {"status": "FAILED"})
 
-        for file_item in task_params.files:
-            fuid = file_item.file_uid
-            if fuid in file_log_uuids:
-                log_repo.update_log(db, file_log_uuids[fuid], {
-                    "status": "FAILED",
-                    "error_message": str(e),
-                    "processing_time_seconds": time.time() - start_time,
-                })
-                update_status(f"批次任務失敗: {e}", status_code="FAILED", file_uid=fuid)
+def _result_from_log(log, task_params) -> dict:
+    """由已完成檔案的 transcription_log 重建結果（格式同 _process_single_result 推送的 result_data）"""
+    result = TranscriptionResponse(
+        task_uuid=log.task_uuid,
+        transcripts=compact_transcripts(log.lrc_content),
+        tokens_used=log.total_tokens or 0,
+        cost=log.cost or 0.0,
+        model=log.model_used or task_params.model,
+        source_language=log.source_language or task_params.source_lang,
+        processing_time_seconds=log.processing_time_seconds or 0.0,
+        audio_duration_seconds=log.audio_duration_seconds or 0.0,
+    ).model_dump()
+    result["task_uuid"] = str(result["task_uuid"])
+    return result
 
-        update_status(f"批次任務失敗: {e}", status_code="BATCH_COMPLETED")
-        raise e
 
-    finally:
-        # 清理 Gemini 上的檔案
-        if client:
-            for gf in gemini_files:
-                try:
-                    cleanup_gemini_file(client, gf)
-                except Exception as e:
-                    logger.warning(f"清理 Gemini 檔案失敗: {e}")
+def _cleanup_batch_gemini_files(client, file_mapping: dict) -> None:
+    """批次結束後釋放 Gemini 上的輸入檔案（交給 file_reaper 延後刪除）"""
+    from types import SimpleNamespace
 
-        # 清理本地暫存檔案
-        for file_item in task_params.files:
-            _cleanup_local_file(file_item.file_path)
+    for entry in file_mapping.values():
+        name = entry.get("gemini_file_name")
+        if name:
+            release_gemini_file(client, SimpleNamespace(name=name))
 
-        # 清理 VAD 暫存檔案
-        for vad_file in vad_cleanup_files:
-            try:
-                if vad_file.exists() and "temp_uploads" in str(vad_file):
-                    vad_file.unlink()
-                    logger.info(f"已清理 VAD 暫存檔: {vad_file.name}")
-            except Exception as e:
-                logger.warning(f"清理 VAD 暫存檔失敗: {e}")
 
-        db.close()
+def _fail_batch_files(file_log_uuids: dict, error_msg: str, log_writer, update_status) -> None:
+    """批次任務本身失敗時，將所有檔案的日誌標記為 FAILED"""
+    for file_task_uuid in file_log_uuids.values():
+        log_writer.submit(file_task_uuid, {
+            "status": "FAILED",
+            "error_message": error_msg,
+        })
+    log_writer.flush()
+    for fuid in file_log_uuids:
+        update_status(error_msg, status_code="FAILED", file_uid=fuid)
 
 
-def process_gemini_batch_results(batch_id: str, api_key: str, db, batch_repo, log_repo):
+def process_gemini_batch_results(
+    batch_id: str,
+    api_key: str,
+    batch_repo,
+    log_repo,
+    is_recovery: bool = True,
+):
     """
-    從 db 和 Gemini 恢復批次任務結果（同步函式）。
-    由 API endpoints 或 Celery Task 呼叫。
+    從 db 和 Gemini 取得批次任務結果並逐一處理（同步函式）。
+
+    由輪詢器派送的 ``batch_process_results_task``（is_recovery=False）、
+    手動恢復的 ``batch_recover_task`` 或 API endpoints 呼叫。
+    批次結束（成功或失敗）後會清理 Gemini 上的輸入檔案並移除輪詢用的 API Key。
+
+    查詢與下載 Gemini 結果期間不持有 DB 連線：讀寫各自開短 session，
+    檔案日誌經 write-behind 佇列寫入，每 ``TRANSCRIPTION_LOG_WRITE_BATCH_SIZE``
+    個檔案與結束時一併記錄 completed_file_count。
     """
     from types import SimpleNamespace
 
+    label = "恢復" if is_recovery else "處理結果"
+    log_writer = get_transcription_log_writer()
+
+    def save_job(update_data: dict) -> None:
+        with SessionLocal() as db:
+            batch_repo.update_job(db, batch_id, update_data)
+
     try:
-        job = batch_repo.get_job(db, batch_id)
+        with SessionLocal() as db:
+            job = batch_repo.get_job(db, batch_id)
         if not job:
-            logger.error(f"恢復任務找不到 batch_id: {batch_id}")
+            logger.error(f"{label}任務找不到 batch_id: {batch_id}")
             return
 
         if not job.gemini_job_name:
-            logger.error(f"恢復任務 {batch_id} 沒有 gemini_job_name")
-            batch_repo.update_job(db, batch_id, {"status": "POLLING"})
+            logger.error(f"{label}任務 {batch_id} 沒有 gemini_job_name")
+            save_job({"status": "POLLING"})
             return {"status": "POLLING", "files": []}
 
-        # 發布狀態更新
+        # 發布狀態更新（分片推送到前端的原 batch_id 頻道）
+        channel_id = job.parent_batch_id or batch_id
+
         def update_status(status_text, status_code="PROCESSING", result_data=None, file_uid=None):
-            _publish_batch_status(batch_id, "", status_text, status_code, result_data, file_uid)
+            _publish_batch_status(channel_id, "", status_text, status_code, result_data, file_uid)
 
-        update_status("正在從 Gemini 恢復批次任務結果...")
+        if is_recovery:
+            update_status("正在從 Gemini 恢復批次任務結果...")
+        else:
+            update_status("批次任務完成，正在處理結果...")
 
         # 初始化客戶端
         client = GeminiClient(api_key).client
         if not client:
             update_status("API Key 無效", status_code="BATCH_COMPLETED")
-            batch_repo.update_job(db, batch_id, {"status": "POLLING"})
+            save_job({"status": "POLLING"})
             return {"status": "POLLING", "files": []}
 
         # 查詢 Gemini 批次任務
@@ -635,32 +1067,37 @@ def process_gemini_batch_results(batch_id: str, api_key: str, db, batch_repo, lo
             batch_job = poll_batch_job_status(client, job.gemini_job_name)
         except Exception as e:
             update_status(f"查詢 Gemini 失敗: {e}", status_code="BATCH_COMPLETED")
-            batch_repo.update_job(db, batch_id, {"status": "POLLING"})
+            save_job({"status": "POLLING"})
             return {"status": "POLLING", "files": []}
 
         state_name = get_batch_job_state_name(batch_job)
-        logger.info(f"恢復任務 {batch_id}: Gemini 狀態 = {state_name} (raw: {batch_job.state})")
+        logger.info(f"{label}任務 {batch_id}: Gemini 狀態 = {state_name} (raw: {batch_job.state})")
 
         if state_name not in BATCH_COMPLETED_STATES:
-            logger.info(f"恢復任務 {batch_id}: 任務尚未完成，狀態={state_name}")
+            logger.info(f"{label}任務 {batch_id}: 任務尚未完成，狀態={state_name}")
             update_status(f"任務仍在進行中 ({state_name})", status_code="BATCH_COMPLETED")
-            batch_repo.update_job(db, batch_id, {"status": "POLLING"})
+            save_job({"status": "POLLING"})
             return {"status": "POLLING", "files": []}
 
-        if state_name != "JOB_STATE_SUCCEEDED":
-            logger.info(f"恢復任務 {batch_id}: 任務失敗，狀態={state_name}")
-            batch_repo.update_job(db, batch_id, {"status": "FAILED"})
-            update_status(f"任務失敗 ({state_name})", status_code="BATCH_COMPLETED")
-            return {"status": "FAILED", "files": []}
-
-        logger.info(f"恢復任務 {batch_id}: 任務成功，開始處理結果...")
-
         # 解析映射
         file_mapping = json.loads(job.file_mapping_json) if job.file_mapping_json else {}
         file_durations = json.loads(job.file_durations_json) if job.file_durations_json else {}
         file_log_uuids = json.loads(job.file_log_uuids_json) if job.file_log_uuids_json else {}
         task_params_data = json.loads(job.task_params_json) if job.task_params_json else {}
 
+        if state_name != "JOB_STATE_SUCCEEDED":
+            error_msg = f"批次任務失敗，狀態: {state_name}"
+            logger.info(f"{label}任務 {batch_id}: {error_msg}")
+            save_job({"status": "FAILED"})
+            _fail_batch_files(file_log_uuids, error_msg, log_writer, update_status)
+            _cleanup_batch_gemini_files(client, file_mapping)
+            cleanup_batch_job_files(client, batch_job)
+            forget_batch_api_key(batch_id)
+            update_status(error_msg, status_code="BATCH_COMPLETED")
+            return {"status": "FAILED", "files": []}
+
+        logger.info(f"{label}任務 {batch_id}: 任務成功，開始處理結果...")
+
         task_params = SimpleNamespace(
             model=task_params_data.get("model", ""),
             provider=task_params_data.get("provider", "google"),
@@ -671,29 +1108,67 @@ def process_gemini_batch_results(batch_id: str, api_key: str, db, batch_repo, lo
 
         start_time = time.time()
         captured_results = {}
+        pending_completions = []  # [(status_text, file_uid, 結果)]：日誌 flush 後才推送 COMPLETED
 
         def update_status_capture(status_text, status_code="PROCESSING", result_data=None, file_uid=None):
-            update_status(status_text, status_code, result_data, file_uid)
             if file_uid and result_data and status_code == "COMPLETED":
                 captured_results[file_uid] = result_data
+                pending_completions.append((status_text, file_uid, result_data))
+                return
+            update_status(status_text, status_code, result_data, file_uid)
 
-        ordered_indices = sorted(file_mapping.keys(), key=int)
-
-        if batch_job.dest and batch_job.dest.inlined_responses:
-            for response_idx, inline_response in enumerate(batch_job.dest.inlined_responses):
-                if response_idx >= len(ordered_indices):
-                    break
+        # 每個檔案處理完即寫入自己的 transcription_log（checkpoint）；
+        # 重新處理（worker 中斷後輪詢器重派、手動恢復）時略過日誌已是終態的檔案
+        with SessionLocal() as db:
+            done_logs = {
+                task_uuid: log
+                for task_uuid, log in log_repo.get_logs_by_uuids(db, file_log_uuids.values()).items()
+                if log.status in _BATCH_FILE_DONE_STATUSES
+            }
+        done_count = len(done_logs)
+        if done_count:
+            logger.info(f"{label}任務 {batch_id}: {done_count} 個檔案已處理過，略過")
 
-                idx_str = ordered_indices[response_idx]
-                entry = file_mapping[idx_str]
+        ordered_indices = sorted(file_mapping.keys(), key=int)
+        received = 0
+
+        checkpointed_count = done_count
+
+        def checkpoint_progress() -> None:
+            # 日誌先落地再記錄進度；completed_file_count 只是顯示用，重新處理以日誌為準
+            nonlocal checkpointed_count
+            log_writer.flush()
+            if done_count != checkpointed_count:
+                save_job({"completed_file_count": done_count})
+                checkpointed_count = done_count
+            for status_text, file_uid, result_data in pending_completions:
+                update_status(status_text, "COMPLETED", result_data, file_uid)
+            pending_completions.clear()
+
+        # inline 結果依提交順序對應；JSONL 輸出檔帶有提交時的 key（檔案索引）。
+        # 逐筆取出逐筆處理，不預先展開整個回應列表
+        try:
+            for position, (key, inline_response) in enumerate(iter_batch_job_responses(client, batch_job)):
+                if key is None and position < len(ordered_indices):
+                    key = ordered_indices[position]
+                if key not in file_mapping:
+                    logger.warning(f"{label}任務 {batch_id}: 無法對應的批次結果 key={key}")
+                    continue
+
+                received += 1
+                entry = file_mapping[key]
                 file_uid = entry["file_uid"]
                 original_filename = entry["original_filename"]
                 vad_segments = entry.get("vad_segments")
+                file_task_uuid = file_log_uuids.get(file_uid, "")
+
+                if str(file_task_uuid) in done_logs:
+                    continue
 
                 file_item = SimpleNamespace(file_uid=file_uid, original_filename=original_filename)
 
                 update_status(
-                    f"恢復 ({response_idx + 1}/{len(ordered_indices)}): {original_filename}",
+                    f"{label} ({received}/{len(ordered_indices)}): {original_filename}",
                     file_uid=file_uid,
                 )
 
@@ -703,48 +1178,93 @@ def process_gemini_batch_results(batch_id: str, api_key: str, db, batch_repo, lo
                         file_item=file_item,
                         task_params=task_params,
                         client=client,
-                        file_task_uuid=file_log_uuids.get(file_uid, ""),
+                        file_task_uuid=file_task_uuid,
                         audio_duration=file_durations.get(file_uid, 0.0),
                         start_time=start_time,
-                        db=db,
-                        log_repo=log_repo,
+                        log_writer=log_writer,
                         update_fn=update_status_capture,
                         vad_segments=vad_segments,
+                        cache_key=entry.get("cache_key"),
                     )
                 except Exception as e:
-                    logger.error(f"恢復檔案 {original_filename} 失敗: {e}", exc_info=True)
-                    update_status(f"恢復失敗: {e}", status_code="FAILED", file_uid=file_uid)
+                    logger.error(f"{label}檔案 {original_filename} 失敗: {e}", exc_info=True)
+                    update_status(f"{label}失敗: {e}", status_code="FAILED", file_uid=file_uid)
+                    if file_uid in file_log_uuids:
+                        log_writer.submit(file_log_uuids[file_uid], {
+                            "status": "FAILED",
+                            "error_message": str(e),
+                        })
+
+                done_count += 1
+                if done_count - checkpointed_count >= TRANSCRIPTION_LOG_WRITE_BATCH_SIZE:
+                    checkpoint_progress()
+        finally:
+            # 中途離開（例外、worker 被終止）也寫入已處理的檔案，重新處理時略過
+            checkpoint_progress()
+
+        if not received:
+            logger.warning("批次任務成功但沒有回傳結果")
+
+        # 先前執行已完成的檔案：由日誌重建結果，results_json 仍涵蓋整個分片
+        for file_uid, file_task_uuid in file_log_uuids.items():
+            log = done_logs.get(str(file_task_uuid))
+            if log is not None and log.status == "COMPLETED" and file_uid not in captured_results:
+                captured_results[file_uid] = _result_from_log(log, task_params)
+
+        # 第一個分片（原 batch_id）一併保存命中轉錄快取的檔案：它們不在任何分片的映射中，
+        # 日誌仍記錄原 batch_id，恢復與歷史紀錄才找得到這些結果
+        if not job.parent_batch_id:
+            mapped_uuids = {str(u) for u in file_log_uuids.values()}
+            with SessionLocal() as db:
+                cached_logs = log_repo.get_logs_by_batch(db, batch_id, status="COMPLETED")
+            for log in cached_logs:
+                if str(log.task_uuid) not in mapped_uuids and log.file_uid not in captured_results:
+                    captured_results[log.file_uid] = _result_from_log(log, task_params)
 
         # 存入結果
-        batch_repo.update_job(db, batch_id, {
+        save_job({
             "status": "COMPLETED",
             "results_json": json.dumps(captured_results, default=str, ensure_ascii=False),
         })
+        _cleanup_batch_gemini_files(client, file_mapping)
+        cleanup_batch_job_files(client, batch_job)
+        forget_batch_api_key(batch_id)
 
         elapsed = time.time() - start_time
-        update_status(f"恢復完成 (耗時 {elapsed:.1f} 秒)", status_code="BATCH_COMPLETED")
-        logger.info(f"批次 {batch_id} 恢復完成，{len(captured_results)} 個檔案")
+        update_status(f"{label}完成 (耗時 {elapsed:.1f} 秒)", status_code="BATCH_COMPLETED")
+        logger.info(f"批次 {batch_id} {label}完成，{len(captured_results)} 個檔案")
         return {"status": "COMPLETED", "files": captured_results}
 
     except Exception as e:
-        logger.error(f"恢復任務 {batch_id} 失敗: {e}", exc_info=True)
+        logger.error(f"{label}任務 {batch_id} 失敗: {e}", exc_info=True)
         try:
-            batch_repo.update_job(db, batch_id, {"status": "POLLING"})
+            save_job({"status": "POLLING"})
         except Exception:
             pass
         return {"status": "ERROR", "files": []}
 
 
-@celery_app.task(name="batch_recover_task", bind=True, max_retries=0)
-def batch_recover_task(self, batch_id: str, api_key: str):
+@celery_app.task(name="batch_process_results_task", bind=True, max_retries=0)
+def batch_process_results_task(self, batch_id: str):
     """
-    從 Celery worker 中恢復批次任務結果的 Task wrapper。
+    輪詢器偵測到 Gemini 批次結束後派送的短任務：處理結果並推送狀態。
     """
-    db = SessionLocal()
+    api_key = get_batch_api_key(batch_id)
     batch_repo = BatchJobRepository()
     log_repo = TranscriptionLogRepository()
-    try:
-        process_gemini_batch_results(batch_id, api_key, db, batch_repo, log_repo)
-    finally:
-        db.close()
+    if not api_key:
+        logger.error(f"批次 {batch_id} 缺少 API Key，無法處理結果，等待手動恢復")
+        with SessionLocal() as db:
+            batch_repo.update_job(db, batch_id, {"status": "POLLING"})
+        return
+    process_gemini_batch_results(
+        batch_id, api_key, batch_repo, log_repo, is_recovery=False)
+
 
+@celery_app.task(name="batch_recover_task", bind=True, max_retries=0)
+def batch_recover_task(self, batch_id: str, api_key: str):
+    """
+    從 Celery worker 中恢復批次任務結果的 Task wrapper。
+    """
+    process_gemini_batch_results(
+        batch_id, api_key, BatchJobRepository(), TranscriptionLogRepository())
@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.signals import worker_init
 from app.core.config import get_settings
 
 # 取得集中管理的設定
@@ -10,7 +11,12 @@ celery_app = Celery(
     "app",
     broker=settings.redis_url,
     backend=settings.celery_backend_url,
-    include=["app.celery.task", "app.celery.batch_task"]
+    include=[
+        "app.celery.task",
+        "app.celery.batch_task",
+        "app.celery.batch_poller",
+        "app.celery.file_reaper",
+    ]
 )
 
 # Celery 的設定
@@ -23,7 +29,36 @@ celery_app.conf.update(
     task_track_started=True,
     # 任務結果的過期時間
     result_expires=settings.celery_result_expires,
+    # CPU 密集的前處理（解碼 / 切塊 / VAD）與網路 I/O（上傳 / Gemini / DB）分開佇列，
+    # 分別由 prefork 與 gevent pool 的 worker 消費，VAD 不再卡住 gevent hub 上的 I/O
+    task_default_queue=settings.celery_io_queue,
+    task_routes={
+        "app.celery.task.preprocess_media_task": {"queue": settings.celery_cpu_queue},
+        "app.celery.batch_task.batch_preprocess_file_task": {"queue": settings.celery_cpu_queue},
+    },
+    # 由 celery beat 定期觸發 Gemini 批次集中輪詢（取代每個批次各自 sleep 輪詢）
+    beat_schedule={
+        "poll-gemini-batches": {
+            "task": "poll_gemini_batches",
+            "schedule": float(settings.batch_poll_tick_seconds),
+            "options": {"expires": float(settings.batch_poll_tick_seconds)},
+        },
+        # 刪除保留期已過、不再重用的 Gemini 上傳檔案
+        "reap-gemini-files": {
+            "task": "reap_gemini_files",
+            "schedule": float(settings.gemini_file_reap_tick_seconds),
+            "options": {"expires": float(settings.gemini_file_reap_tick_seconds)},
+        },
+    },
 )
 
+
+@worker_init.connect
+def _install_cooperative_db_io(**kwargs):
+    """gevent pool 的 worker 啟動時讓 psycopg2 改為協作式等待，DB 來回不再卡住其他 greenlet"""
+    from app.database.green import make_psycopg_green
+    make_psycopg_green()
+
+
 if __name__ == "__main__":
     celery_app.start()
@@ -0,0 +1,28 @@
+"""Gemini 上傳檔案的延後刪除。
+
+轉錄與批次任務結束時不再立即刪除 Gemini 上的檔案，而是交給
+``provider.google.file_registry`` 保留一段時間供重試沿用。
+celery beat 定期觸發 ``reap_gemini_files``，刪除保留期已過的檔案。
+"""
+
+from app.celery.celery import celery_app
+from app.provider.google.file_registry import get_file_registry
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# 單輪最多刪除的檔案數，其餘留待下一輪
+_REAP_BATCH_SIZE = 200
+
+
+@celery_app.task(name="reap_gemini_files")
+def reap_gemini_files() -> int:
+    """beat 週期任務：刪除保留期已過的 Gemini 檔案，回傳刪除筆數"""
+    try:
+        reaped = get_file_registry().reap(_REAP_BATCH_SIZE)
+    except Exception as e:
+        logger.warning(f"清理 Gemini 檔案登記表失敗: {e}")
+        return 0
+    if reaped:
+        logger.info(f"已刪除 {reaped} 個保留期已過的 Gemini 檔案")
+    return reaped
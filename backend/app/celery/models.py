@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Union
 
 
 class TranscriptionTaskParams(BaseModel):
@@ -10,7 +10,7 @@ class TranscriptionTaskParams(BaseModel):
     file_path: str
     provider: str
     model: str
-    api_keys: str
+    api_keys: Union[str, List[str]]  # 單一 Key 或多把 Key（由 client 池挑選）
     source_lang: str
     original_filename: str
     client_id: str  # 新增: 用於 WebSocket 通訊
@@ -38,7 +38,7 @@ class BatchTranscriptionTaskParams(BaseModel):
     files: List[BatchFileItemParams]
     provider: str
     model: str
-    api_keys: str
+    api_keys: Union[str, List[str]]  # 單一 Key 或多把 Key（由 client 池挑選）
     source_lang: str
     target_lang: Optional[str] = None
     multi_speaker: bool = False
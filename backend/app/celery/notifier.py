@@ -1,25 +1,57 @@
 """Celery 任務統一狀態廣播模組。
 
-`task.py` 與 `batch_task.py` 都透過此模組將狀態更新 publish 到 Redis 的
-``transcription_updates`` 頻道，由 `ConnectionManager` 轉發至對應 WebSocket。
+`task.py` 與 `batch_task.py` 都透過此模組將狀態更新 publish 到 Redis。
+每個 client_id 有自己的頻道 ``transcription_updates:<client_id>``，
+API 進程的 `ConnectionManager` 只訂閱自己持有 WebSocket 的 client，
+Redis fan-out 與 JSON 解碼量隨本機連線數成長，而非全域任務量。
+
+每筆狀態同時寫入該 client 的 Redis Stream ``transcription_stream:<client_id>``
+（保留最近 ``STATUS_STREAM_MAX_LEN`` 筆），stream entry id 即為 ``event_id``，
+隨 pub/sub 訊息一起送出；WebSocket 斷線重連時帶上最後收到的 event_id，
+即可補送期間遺漏的事件（包含帶完整結果的 COMPLETED）。
+
+``PROCESSING`` 進度訊息在 ``STATUS_COALESCE_WINDOW_SECONDS`` 視窗內依
+(client_id, file_uid) 合併，只送出最新一筆；其他狀態（COMPLETED / FAILED /
+BATCH_COMPLETED 等）一律立即送出，且送出前先補送同一 client 其他檔案待送的進度，
+順序不會被打亂。
 """
 
 from __future__ import annotations
 
 import json
-from typing import Optional
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
 
 import redis
 
 from app.celery.celery import celery_app
+from app.core.config import get_settings
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
-CHANNEL = "transcription_updates"
+_settings = get_settings()
+STATUS_STREAM_MAX_LEN = _settings.status_stream_max_len
+STATUS_STREAM_TTL_SECONDS = _settings.status_stream_ttl_seconds
+STATUS_COALESCE_WINDOW_SECONDS = _settings.status_coalesce_window_seconds
+
+CHANNEL_PREFIX = "transcription_updates:"
+STREAM_PREFIX = "transcription_stream:"
+
+# XADD 與 PUBLISH 在同一個 script 內原子執行：訂閱端收到的事件必定已可由 XRANGE 讀到，
+# 重連補送與即時訊息得以依 event_id 去重而不漏接。event_id 直接拼入 JSON 開頭，
+# 避免在 Lua 內以 cjson 重新編碼（空陣列會變成物件）
+_PUBLISH_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'data', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('PUBLISH', ARGV[4], '{"event_id":"' .. id .. '",' .. string.sub(ARGV[2], 2))
+return id
+"""
 
 # 與 FastAPI 端共用同一 Redis 設定
 _redis_client = redis.from_url(celery_app.conf.broker_url)
+_publish_script = _redis_client.register_script(_PUBLISH_SCRIPT)
 
 
 def publish_status(
@@ -31,8 +63,8 @@ def publish_status(
     file_uid: Optional[str] = None,
     result_data: Optional[dict] = None,
     extra: Optional[dict] = None,
-) -> None:
-    """向 Redis pub/sub 廣播狀態更新。
+) -> Optional[str]:
+    """寫入狀態事件流並向 Redis pub/sub 廣播狀態更新。
 
     Args:
         client_id: WebSocket 對應的 client_id（單檔轉錄為 file_uid，批次為 batch_id）。
@@ -42,6 +74,10 @@ def publish_status(
         file_uid: 批次任務中，單一檔案的識別碼。
         result_data: 任務完成時的結果 payload。
         extra: 其他需要併入訊息的欄位（例如 batch_id）。
+
+    Returns:
+        事件的 event_id（stream entry id）；發布失敗或 PROCESSING 訊息被合併、
+        稍後才送出時為 None。
     """
     message = {
         "client_id": client_id,
@@ -56,9 +92,134 @@ def publish_status(
     if extra:
         message.update(extra)
 
+    return _coalescer.publish(message)
+
+
+def _publish_now(message: dict) -> Optional[str]:
+    """以 Lua script 寫入事件流並廣播，回傳 event_id；失敗時為 None"""
+    client_id = message["client_id"]
     try:
-        _redis_client.publish(
-            CHANNEL, json.dumps(message, default=str, ensure_ascii=False)
+        event_id = _publish_script(
+            keys=[stream_for(client_id)],
+            args=[
+                STATUS_STREAM_MAX_LEN,
+                json.dumps(message, default=str, ensure_ascii=False),
+                STATUS_STREAM_TTL_SECONDS,
+                channel_for(client_id),
+            ],
         )
+        return event_id.decode("utf-8") if isinstance(event_id, bytes) else event_id
     except Exception as e:
         logger.error(f"發布狀態更新至 Redis 時失敗: {e}")
+        return None
+
+
+_CoalesceKey = Tuple[str, Optional[str]]
+
+# 超過此數量才清理 _last_sent 中已過視窗的 key（沒收到最終狀態的 client / 檔案）
+_LAST_SENT_PRUNE_THRESHOLD = 10_000
+
+
+class _StatusCoalescer:
+    """依 (client_id, file_uid) 合併 PROCESSING 訊息。
+
+    同一 key 距離上次送出未滿視窗時，只保留最新一筆，於視窗結束時由背景
+    flusher 送出；其他狀態碼立即送出並清掉同 key 的待送訊息。送出都在鎖內
+    進行，flusher 與呼叫端之間不會交錯。window_seconds <= 0 時停用。
+    """
+
+    def __init__(
+        self,
+        send: Callable[[dict], Optional[str]],
+        window_seconds: float = STATUS_COALESCE_WINDOW_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._send = send
+        self.window_seconds = window_seconds
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._last_sent: Dict[_CoalesceKey, float] = {}
+        # key -> (預定送出時間, 最新訊息)
+        self._pending: Dict[_CoalesceKey, Tuple[float, dict]] = {}
+        self._flusher: Optional[threading.Thread] = None
+
+    def publish(self, message: dict) -> Optional[str]:
+        """送出或暫存訊息；被合併（稍後送出）時回傳 None"""
+        if self.window_seconds <= 0:
+            return self._send(message)
+
+        key = (message["client_id"], message.get("file_uid"))
+        with self._cond:
+            now = self._clock()
+            if message.get("status_code") != "PROCESSING":
+                self._pending.pop(key, None)
+                self._last_sent.pop(key, None)
+                for other in [k for k in self._pending if k[0] == key[0]]:
+                    self._last_sent[other] = now
+                    self._send(self._pending.pop(other)[1])
+                return self._send(message)
+
+            pending = self._pending.get(key)
+            if pending is not None:
+                self._pending[key] = (pending[0], message)
+                return None
+            last = self._last_sent.get(key)
+            if last is None or now - last >= self.window_seconds:
+                self._last_sent[key] = now
+                if len(self._last_sent) > _LAST_SENT_PRUNE_THRESHOLD:
+                    self._prune(now)
+                return self._send(message)
+
+            self._pending[key] = (last + self.window_seconds, message)
+            self._ensure_flusher()
+            self._cond.notify()
+            return None
+
+    def flush_due(self) -> None:
+        """送出已到預定時間的待送訊息"""
+        with self._cond:
+            now = self._clock()
+            for key, (due_at, message) in list(self._pending.items()):
+                if due_at <= now:
+                    del self._pending[key]
+                    self._last_sent[key] = now
+                    self._send(message)
+
+    def _prune(self, now: float) -> None:
+        for key, sent_at in list(self._last_sent.items()):
+            if now - sent_at >= self.window_seconds and key not in self._pending:
+                del self._last_sent[key]
+
+    def _ensure_flusher(self) -> None:
+        # 首次需要延後送出時才啟動（prefork 子進程 fork 之後才建立執行緒）
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(
+                target=self._run_flusher, name="status-coalescer", daemon=True)
+            self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        while True:
+            with self._cond:
+                if not self._pending:
+                    self._cond.wait()
+                else:
+                    delay = min(due_at for due_at, _ in self._pending.values()) - self._clock()
+                    if delay > 0:
+                        self._cond.wait(delay)
+            try:
+                self.flush_due()
+            except Exception as e:
+                logger.error(f"送出合併後的狀態更新時失敗: {e}")
+
+
+_coalescer = _StatusCoalescer(_publish_now)
+
+
+def channel_for(client_id: str) -> str:
+    """client_id 對應的 Redis pub/sub 頻道"""
+    return f"{CHANNEL_PREFIX}{client_id}"
+
+
+def stream_for(client_id: str) -> str:
+    """client_id 對應的狀態事件流（Redis Stream）"""
+    return f"{STREAM_PREFIX}{client_id}"
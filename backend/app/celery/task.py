@@ -1,10 +1,9 @@
 import time
 import traceback
 from pathlib import Path
-from typing import Generator
 from datetime import datetime
 
-from sqlalchemy.orm import Session
+from celery import chain, uuid
 
 from app.celery.celery import celery_app
 from app.celery.models import TranscriptionTaskParams
@@ -12,16 +11,27 @@ from app.celery.notifier import publish_status
 from app.core.config import get_settings
 from app.database.session import SessionLocal
 from app.exceptions import GeminiTransientError
-from app.provider.google.gemini import GeminiClient
+from app.provider.google.client_pool import get_client_pool
 from app.repositories.transcription_log_repository import TranscriptionLogRepository
+from app.repositories.transcription_log_writer import get_transcription_log_writer
 from app.services.calculator.service import CalculatorService
 from app.services.calculator.models import CalculationItem
-from app.services.converter.service import convert_from_lrc
+from app.services.converter.service import compact_transcripts
+from app.services.transcription.cache import (
+    CachedTranscript,
+    audio_fingerprint,
+    get_transcript_cache,
+    transcript_cache_key,
+)
+from app.services.transcription.checkpoint import (
+    TRANSCRIPTION_CHECKPOINT_ENABLED,
+    get_task_checkpoint,
+)
 from app.services.transcription.flows import (
     TranscriptionTask,
 )
-from app.utils.audio import get_audio_duration
-from app.services.transcription.models import TranscriptionResponse
+from app.utils.audio import AudioAsset, get_audio_duration
+from app.services.transcription.models import TranscriptionResponse, TranscriptionTaskResult
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -32,13 +42,103 @@ _settings = get_settings()
 FLEX_COST_DISCOUNT = _settings.flex_cost_discount
 
 
-def get_db_session() -> Generator[Session, None, None]:
-    """Provide a database session for the Celery task."""
-    db = SessionLocal()
+def _build_user_prompt(task_params: TranscriptionTaskParams) -> str:
+    """依是否提供 original_text 決定 prompt（對齊既有逐字稿或一般轉錄）"""
+    if task_params.original_text:
+        # 如果有提供文本，我們就建立一個對齊用的 prompt
+        return f"""
+請你扮演一位專業的逐字稿專家。你的任務是將提供的音檔與以下的完整逐字稿內容進行對齊，並生成一個帶有時間戳的LRC格式檔案。
+
+這是完整的逐字稿：
+---
+{task_params.original_text}
+---
+
+請仔細聆聽音檔，為這份逐字稿加上精確的時間戳，並以LRC格式輸出。
+"""
+    # 永遠透過 build_prompt 建構最終 prompt：
+    # 以 DB 裡的模板為基底，根據前端選項動態填入 source_lang、speaker_instruction、translate_instruction
+    from app.core.default_prompt import build_prompt
+    return build_prompt(
+        source_lang=task_params.source_lang,
+        target_lang=task_params.target_lang,
+        multi_speaker=task_params.multi_speaker,
+        template=task_params.prompt or None,
+    )
+
+
+def enqueue_transcription(task_params_dict: dict) -> str:
+    """
+    以 Celery canvas 啟動單檔轉錄：CPU 佇列的前處理 → I/O 佇列的轉錄。
+    回傳轉錄任務的 task id（即 transcription_log 的 task_uuid）。
+    """
+    task_id = uuid()
+    if not TRANSCRIPTION_CHECKPOINT_ENABLED:
+        # 前處理結果經由 checkpoint 交給轉錄任務；停用時直接在 I/O 佇列完成所有階段
+        transcribe_media_task.apply_async((task_params_dict,), task_id=task_id)
+        return task_id
+    chain(
+        preprocess_media_task.si(task_params_dict, task_id),
+        transcribe_media_task.si(task_params_dict).set(task_id=task_id),
+    ).apply_async()
+    return task_id
+
+
+@celery_app.task(bind=True)
+def preprocess_media_task(self, task_params_dict: dict, transcription_task_id: str):
+    """
+    CPU 佇列（prefork）：解碼、探測時長、長音檔切塊與 VAD，結果寫入轉錄任務的 checkpoint，
+    之後在 gevent I/O 佇列執行的 transcribe_media_task 直接沿用。
+    失敗不拋出例外：未完成的階段由轉錄任務自行補做。
+    """
+    task_params = TranscriptionTaskParams.model_validate(task_params_dict)
+    checkpoint = get_task_checkpoint(transcription_task_id)
+    if not checkpoint.enabled or task_params.provider.lower() != 'google':
+        return
+
+    def update_status(status_text: str, status_code: str = "PROCESSING", result_data: dict = None):
+        publish_status(
+            task_params.client_id,
+            transcription_task_id,
+            status_text,
+            status_code=status_code,
+            file_uid=task_params.file_uid,
+            result_data=result_data,
+        )
+
+    local_path = Path(task_params.file_path)
     try:
-        yield db
-    finally:
-        db.close()
+        update_status("檔案處理與分析...")
+        audio_asset = AudioAsset.open(local_path, local_path.parent)
+        if audio_asset is None:
+            return
+        checkpoint.set("duration", audio_asset.duration)
+
+        # 相同音訊 + 模型 + prompt + tier 已有快取時，轉錄任務不會用到 VAD 結果；
+        # 只確認是否存在，命中統計由轉錄任務實際取用時累計
+        transcript_cache = get_transcript_cache()
+        if transcript_cache.enabled:
+            audio_hash = audio_fingerprint(local_path, audio_asset)
+            if audio_hash and transcript_cache.contains(transcript_cache_key(
+                    audio_hash, task_params.model, _build_user_prompt(task_params),
+                    task_params.service_tier)):
+                return
+
+        TranscriptionTask(
+            client=None,
+            model=task_params.model,
+            prompt="",
+            temp_dir=local_path.parent,
+            status_callback=update_status,
+            service_tier=task_params.service_tier,
+            artifact_task_id=transcription_task_id,
+            original_filename=task_params.original_filename,
+            audio_asset=audio_asset,
+            checkpoint=checkpoint,
+        ).prepare(local_path)
+        logger.info(f"Preprocessing finished for task {transcription_task_id}.")
+    except Exception as e:
+        logger.error(f"前處理失敗，改由轉錄任務處理 (task {transcription_task_id}): {e}", exc_info=True)
 
 
 @celery_app.task(
@@ -69,16 +169,21 @@ def transcribe_media_task(self, task_params_dict: dict):
             result_data=result_data,
         )
 
-    db_generator = get_db_session()
-    db = next(db_generator)
-
+    # DB session 只在寫入時短暫開啟；狀態轉換交給 write-behind 佇列
     start_time = time.time()
     local_path = Path(task_params.file_path)
     log_repo = TranscriptionLogRepository()
+    log_writer = get_transcription_log_writer()
     task_manager = None
+    cache_cleanup_files = []
+    lease = None
+    lease_error = None
+    # 階段 checkpoint：暫時性錯誤重試時沿用已完成的階段；即將重試時本地暫存檔不刪除
+    checkpoint = get_task_checkpoint(task_uuid)
+    will_retry = False
 
     try:
-        # 1. 新增一筆任務
+        # 1. 新增一筆任務（重試時 log 已存在，不重複建立）
         initial_log_data = {
             "status": "PROCESSING",
             "original_filename": task_params.original_filename,
@@ -91,7 +196,13 @@ def transcribe_media_task(self, task_params_dict: dict):
             "session_id": task_params.session_id,
             "file_uid": task_params.file_uid,
         }
-        log_repo.insert_log(db, initial_log_data)
+        if checkpoint.get("log"):
+            logger.info(
+                f"Celery task retry #{self.request.retries}, resuming from checkpoint. Task ID: {task_uuid}")
+        else:
+            with SessionLocal() as db:
+                log_repo.insert_log(db, initial_log_data)
+            checkpoint.set("log", True)
         if task_params.session_id:
             logger.info(
                 f"TranscriptionLog created session_id={task_params.session_id} "
@@ -104,8 +215,16 @@ def transcribe_media_task(self, task_params_dict: dict):
 
         update_status("檔案處理與分析...")
 
-        # 2. 獲取音訊時長
-        audio_duration_seconds = get_audio_duration(local_path) or 0.0
+        # 2. 解碼一次為 16kHz PCM，時長 / VAD / 分割共用；解碼失敗時退回 ffprobe
+        #    （重試時解碼快取仍在，直接沿用；時長由 checkpoint 取得）
+        audio_asset = AudioAsset.open(local_path, local_path.parent)
+        audio_duration_seconds = checkpoint.get("duration")
+        if audio_duration_seconds is None:
+            if audio_asset is not None:
+                audio_duration_seconds = audio_asset.duration
+            else:
+                audio_duration_seconds = get_audio_duration(local_path) or 0.0
+            checkpoint.set("duration", audio_duration_seconds)
         if audio_duration_seconds > 0:
             logger.info(f"Audio file info for task {task_uuid}:")
             logger.info(f" - Filename: {local_path.name}")
@@ -115,59 +234,69 @@ def transcribe_media_task(self, task_params_dict: dict):
             logger.warning(
                 f"Could not read audio duration for {local_path.name}.")
 
-        # 3. 初始化 Gemini Client
         if task_params.provider.lower() != 'google':
             raise ValueError(
                 f"Provider '{task_params.provider}' is not supported. Only 'google' is allowed.")
 
-        logger.info(
-            f"Initializing Gemini Client for model: {task_params.model}")
-        client = GeminiClient(task_params.api_keys).client
-        if not client:
-            raise ValueError(
-                "Failed to initialize Gemini Client. Check API key.")
-
-        update_status("正在初始化模型...")
-
-        # 4. 初始化轉錄任務管理器
-        # 根據是否提供 original_text 來決定 prompt
-        if task_params.original_text:
-            # 如果有提供文本，我們就建立一個對齊用的 prompt
-            user_prompt = f"""
-請你扮演一位專業的逐字稿專家。你的任務是將提供的音檔與以下的完整逐字稿內容進行對齊，並生成一個帶有時間戳的LRC格式檔案。
-
-這是完整的逐字稿：
----
-{task_params.original_text}
----
-
-請仔細聆聽音檔，為這份逐字稿加上精確的時間戳，並以LRC格式輸出。
-"""
+        # 3. 決定 prompt
+        user_prompt = _build_user_prompt(task_params)
+
+        # 4. 查詢轉錄結果快取：相同音訊 + 模型 + prompt + tier 直接沿用先前的 LRC，不呼叫 Gemini
+        transcript_cache = get_transcript_cache()
+        cache_key = None
+        cached = None
+        if transcript_cache.enabled:
+            audio_hash = audio_fingerprint(local_path, audio_asset)
+            if audio_hash:
+                cache_key = transcript_cache_key(
+                    audio_hash, task_params.model, user_prompt, task_params.service_tier)
+                cached = transcript_cache.get(cache_key)
+
+        if cached is not None:
+            update_status("已找到相同音訊的轉錄結果，直接沿用...")
+            cache_cleanup_files = [local_path]
+            if audio_asset is not None:
+                audio_asset.close()
+                cache_cleanup_files.extend(audio_asset.cleanup_files)
+            transcription_result = TranscriptionTaskResult(success=True, text=cached.lrc_text)
         else:
-            # 永遠透過 build_prompt 建構最終 prompt：
-            # 以 DB 裡的模板為基底，根據前端選項動態填入 source_lang、speaker_instruction、translate_instruction
-            from app.core.default_prompt import build_prompt
-            user_prompt = build_prompt(
-                source_lang=task_params.source_lang,
-                target_lang=task_params.target_lang,
-                multi_speaker=task_params.multi_speaker,
-                template=task_params.prompt or None,
+            # 5. 初始化 Gemini Client
+            logger.info(
+                f"Initializing Gemini Client for model: {task_params.model}")
+            # 從 client 池挑選一把 Key（多把時依進行中任務數分流），整個任務使用同一把
+            try:
+                lease = get_client_pool().acquire(task_params.api_keys)
+            except Exception as e:
+                raise ValueError(
+                    f"Failed to initialize Gemini Client. Check API key. ({e})") from e
+            client = lease.client
+
+            update_status("正在初始化模型...")
+
+            task_manager = TranscriptionTask(
+                client=client,
+                model=task_params.model,
+                prompt=user_prompt,  # 使用上面決定的 prompt
+                temp_dir=local_path.parent,
+                status_callback=update_status,
+                service_tier=task_params.service_tier,
+                artifact_task_id=str(task_uuid),
+                original_filename=task_params.original_filename,
+                audio_asset=audio_asset,
+                checkpoint=checkpoint,
             )
 
-        task_manager = TranscriptionTask(
-            client=client,
-            model=task_params.model,
-            prompt=user_prompt,  # 使用上面決定的 prompt
-            temp_dir=local_path.parent,
-            status_callback=update_status,
-            service_tier=task_params.service_tier,
-            artifact_task_id=str(task_uuid),
-            original_filename=task_params.original_filename,
-        )
+            # 6. 執行轉錄 (包含VAD失敗重試邏輯)
+            logger.info(f"Starting transcription. Task ID : {task_uuid}")
+            transcription_result = task_manager.transcribe_audio(local_path)
 
-        # 5. 執行轉錄 (包含VAD失敗重試邏輯)
-        logger.info(f"Starting transcription. Task ID : {task_uuid}")
-        transcription_result = task_manager.transcribe_audio(local_path)
+            if transcription_result.success:
+                transcript_cache.put(cache_key, CachedTranscript(
+                    lrc_text=transcription_result.text,
+                    input_tokens=transcription_result.input_tokens,
+                    output_tokens=transcription_result.output_tokens,
+                    total_tokens=transcription_result.total_tokens,
+                ))
 
         raw_lrc_text = transcription_result.text
         input_tokens = transcription_result.input_tokens
@@ -178,10 +307,8 @@ def transcribe_media_task(self, task_params_dict: dict):
 
         final_lrc_text = raw_lrc_text
 
-        # 8. 轉換格式
-        update_status("正在轉換字幕格式...")
-        transcripts_model = convert_from_lrc(final_lrc_text)
-        final_transcripts = transcripts_model.model_dump() if transcripts_model else {}
+        # 8. 完成訊息只帶 LRC，其他格式由下載端點即時轉換
+        final_transcripts = compact_transcripts(final_lrc_text)
 
         # 9. 計算費用
         update_status("正在計算費用...")
@@ -231,11 +358,10 @@ def transcribe_media_task(self, task_params_dict: dict):
             "completed_at": datetime.now(),
             "lrc_content": final_lrc_text or None,
         }
-        if not log_repo.update_log(db, task_uuid, update_data):
-            logger.warning(
-                f"無法更新 transcription_log（可能 task_uuid 不符）: {task_uuid}")
-        else:
-            logger.info(f"Task status updated to COMPLETED. Task ID: {task_uuid}")
+        # 推播前先寫入：前端收到 COMPLETED 後會立即向 DB 讀取其他格式
+        log_writer.submit(task_uuid, update_data)
+        log_writer.flush()
+        logger.info(f"Task status updated to COMPLETED. Task ID: {task_uuid}")
 
         # 準備回傳結果
         final_response = TranscriptionResponse(
@@ -259,18 +385,25 @@ def transcribe_media_task(self, task_params_dict: dict):
 
         update_status("任務完成", status_code="COMPLETED",
                       result_data=final_response_dict)
+        checkpoint.clear()
 
         # 只需要把最原汁原味的 LRC 文字回傳給 Celery 存進 DB
         return {"raw_lrc_text": final_lrc_text}
 
-    except GeminiTransientError as e:
-        # 暫時性錯誤：交給 Celery autoretry 處理，不寫入 FAILED log
-        logger.warning(
-            f"Transcription task {task_uuid} hit transient Gemini error, will retry: {e}"
-        )
-        update_status(f"暫時性錯誤，將重試: {e}", status_code="PROCESSING")
-        raise
     except Exception as e:
+        lease_error = e
+        if isinstance(e, GeminiTransientError) and self.request.retries < self.max_retries:
+            # 暫時性錯誤：交給 Celery autoretry 處理，不寫入 FAILED log；
+            # 429 / quota 錯誤的 Key 會被暫停，重試時改用其他 Key，並從 checkpoint 繼續
+            will_retry = True
+            logger.warning(
+                f"Transcription task {task_uuid} hit transient Gemini error, will retry: {e}"
+            )
+            update_status(f"暫時性錯誤，將重試: {e}", status_code="PROCESSING")
+            raise
+
+        # 一般錯誤，或暫時性錯誤已用完重試次數
+        checkpoint.clear()
         processing_time_seconds = time.time() - start_time
         error_message = traceback.format_exc()
         logger.error(
@@ -282,16 +415,24 @@ def transcribe_media_task(self, task_params_dict: dict):
             "error_message": str(e),
             "processing_time_seconds": processing_time_seconds
         }
-        log_repo.update_log(db, task_uuid, failure_update_data)
+        log_writer.submit(task_uuid, failure_update_data)
+        log_writer.flush()
 
         update_status(f"任務失敗: {e}", status_code="FAILED")
         raise e
     finally:
-        # 刪除轉錄完成的檔案
+        if lease is not None:
+            get_client_pool().release(lease, lease_error)
+
+        # 刪除轉錄完成的檔案；即將重試時保留本地檔案給下一次嘗試沿用
         if task_manager:
-            task_manager.cleanup()
+            task_manager.cleanup(keep_local_files=will_retry)
             logger.info(
                 f"Temporary files cleaned up for task {task_uuid}.")
-
-        # 確保資料庫 session 被關閉
-        next(db_generator, None)
+        # 快取命中時沒有建立 task_manager，上傳檔與解碼快取在此清理
+        for local_file in cache_cleanup_files:
+            try:
+                if local_file.exists() and "temp_uploads" in str(local_file.parent):
+                    local_file.unlink()
+            except Exception as e:
+                logger.warning(f"清理本地檔案 {local_file} 失敗: {e}")
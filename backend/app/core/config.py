@@ -1,5 +1,6 @@
 from functools import lru_cache
 from pathlib import Path
+from typing import Dict
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 # 設定檔搜尋順序：backend/.env → 專案根目錄/.env.prod
@@ -33,6 +34,15 @@ class Settings(BaseSettings):
     database_url: str | None = None
     db_pool_size: int = 10
     db_max_overflow: int = 20
+    # API 進程的 async 讀取端點另有一個 asyncpg 連線池（Celery worker 不建立）；
+    # API 進程最多同時佔用 db_pool_size + db_max_overflow + async_db_pool_size + async_db_max_overflow 條連線
+    async_db_pool_size: int = 5
+    async_db_max_overflow: int = 10
+    # transcription_logs 狀態更新的 write-behind：每隔多久（秒）或累積幾筆就寫入一次
+    transcription_log_flush_interval_seconds: float = 0.5
+    transcription_log_write_batch_size: int = 50
+    # 歷史紀錄游標分頁的總筆數快取（秒）：同一組篩選條件在期間內不重新 COUNT
+    history_total_cache_seconds: float = 30.0
 
     @property
     def sync_database_url(self) -> str:
@@ -44,8 +54,10 @@ class Settings(BaseSettings):
 
     @property
     def async_database_url(self) -> str:
-        """取得非同步資料庫連線 URL (如果需要)"""
+        """取得非同步資料庫連線 URL（FastAPI 讀取端點的 asyncpg engine 使用）"""
         url = self.sync_database_url
+        if url.startswith("postgresql+psycopg2://"):
+            return url.replace("postgresql+psycopg2://", "postgresql+asyncpg://")
         if url.startswith("postgresql://"):
             return url.replace("postgresql://", "postgresql+asyncpg://")
         return url
@@ -54,10 +66,25 @@ class Settings(BaseSettings):
     # Redis
     redis_host: str = "localhost"
     redis_port: int = 6379
+    # 任務狀態事件流（Redis Streams）：每個 client_id 保留最近 N 筆狀態，
+    # WebSocket 重連時以 last_event_id 補送遺漏的事件；最後一筆寫入後保留的秒數。
+    # session WebSocket 的所有檔案共用一個 stream，上限需涵蓋整個 session 的事件
+    status_stream_max_len: int = 2000
+    status_stream_ttl_seconds: int = 86400
+    # PROCESSING 進度訊息合併視窗（秒）：同一 client / 檔案在視窗內只送出最新一筆；0 停用
+    status_coalesce_window_seconds: float = 1.0
 
     # Celery
     celery_timezone: str = "Asia/Taipei"
     celery_result_expires: int = 86400
+    # 佇列：I/O 佇列（gevent worker；沿用 Celery 預設名稱）與 CPU 前處理佇列（prefork worker）
+    celery_io_queue: str = "celery"
+    celery_cpu_queue: str = "cpu"
+    # Gemini 批次集中輪詢：beat 觸發間隔（秒），單一任務的退避間隔下限 / 上限（秒）與抖動比例
+    batch_poll_tick_seconds: int = 15
+    batch_poll_min_interval_seconds: float = 10.0
+    batch_poll_max_interval_seconds: float = 300.0
+    batch_poll_jitter: float = 0.2
 
     # App
     temp_uploads_dir: str = "temp_uploads"
@@ -68,12 +95,62 @@ class Settings(BaseSettings):
     # Transcription tuning
     # 單檔轉錄的最大可接受時長（秒）；超過此值且轉錄失敗時，會嘗試 VAD 分割重試
     transcription_max_duration_seconds: int = 180
+    # 長音檔預先切塊：每塊的目標時長（秒）；音檔長度達此值 1.5 倍以上時，
+    # 直接在靜音處切成 N 塊並行轉錄，不再先送整檔。設為 0 停用
+    transcription_chunk_target_seconds: int = 600
+    # 切塊轉錄時同時呼叫 Gemini 的最大併發數
+    transcription_chunk_concurrency: int = 4
     # Batch / Flex 推論的費用折扣率（0.5 表示原價 50%）
     batch_cost_discount: float = 0.5
     flex_cost_discount: float = 0.5
     # 語音佔比 >= 此閾值（預設 0.8）時跳過 VAD 預處理，直接用原檔轉錄；
     # 空白超過 20%（語音佔比 < 80%）才執行 VAD 靜音移除
     vad_speech_ratio_skip_threshold: float = 0.80
+    # VAD 記憶體上限（MB）：解碼後音訊超過此大小時改以 soundfile 分塊兩段式串流，
+    # 峰值記憶體只與 block 大小有關，不隨檔案長度成長
+    vad_memory_budget_mb: int = 256
+    # 批次上傳階段的併發上限（前處理在 CPU 佇列執行，併發由該 worker 的 -c 決定）
+    batch_upload_concurrency: int = 4
+    # 提交任務查詢前處理任務是否完成的間隔（秒）：逐檔完成即上傳，與其餘檔案的前處理重疊
+    batch_preprocess_poll_seconds: float = 1.0
+    # 批次分片：單一 Gemini batch job 的檔案數與上傳音訊總大小上限（MB）；
+    # 分片湊滿即提交，不等其他檔案上傳完成，結果也依分片各自回收
+    batch_shard_max_files: int = 50
+    batch_shard_max_mb: int = 500
+    # 分片的 inline requests 估計大小超過此值（MB）時改用 JSONL 檔案輸入 / 輸出
+    batch_inline_max_mb: float = 10.0
+    # Gemini client 池：每個 worker 進程最多快取的 client 數（每把 API Key 一個），
+    # 以及 Key 遇到 429 / quota 錯誤後暫停輪替的起始與最長秒數（連續失敗時加倍）
+    gemini_client_pool_size: int = 32
+    gemini_key_cooldown_seconds: float = 60.0
+    gemini_key_max_cooldown_seconds: float = 900.0
+    # Gemini 呼叫前的 RPM / TPM 限流（每把 Key × 每個模型一組 Redis token bucket，0 = 不限制）；
+    # 個別模型可用 JSON 覆寫，例如 {"gemini-2.5-pro": {"rpm": 150, "tpm": 2000000}}，
+    # 另有 "files"（上傳）與 "batches"（建立批次）兩組 bucket
+    gemini_rpm_limit: int = 1000
+    gemini_tpm_limit: int = 1_000_000
+    gemini_model_rate_limits: Dict[str, Dict[str, int]] = {}
+    # 等待額度超過此秒數時放棄，視為暫時性錯誤交給 Celery 重試
+    gemini_rate_limit_max_wait_seconds: float = 300.0
+    # 轉錄結果快取（Redis，所有 worker 共用）：以音訊內容雜湊 + 模型 + 最終 prompt + service tier
+    # 為 key，命中時直接回傳 LRC、不呼叫 Gemini；TTL（秒）到期或超過筆數上限時淘汰最久未使用者
+    transcript_cache_enabled: bool = True
+    transcript_cache_ttl_seconds: int = 7 * 86400
+    transcript_cache_max_entries: int = 10000
+    # Gemini 上傳檔案重用：以 API Key + 內容雜湊登記已上傳的檔案（Gemini 保留 48 小時），
+    # 重試 / 恢復 / 重複送出時沿用；用完後保留此秒數再由 reaper（beat 每 tick 秒執行）刪除
+    gemini_file_reuse_enabled: bool = True
+    gemini_file_retain_seconds: int = 6 * 3600
+    gemini_file_reap_tick_seconds: int = 300
+    # 單檔轉錄的階段 checkpoint（Redis，以 Celery task id 為 key）：暫時性錯誤重試時
+    # 沿用已完成的 log / 時長 / VAD / 切塊 / 片段轉錄結果；TTL（秒）需涵蓋所有重試
+    transcription_checkpoint_enabled: bool = True
+    transcription_checkpoint_ttl_seconds: int = 6 * 3600
+    # 上傳前的音訊編碼：wav 類（純語音檔、分割片段等未壓縮 PCM）上傳前轉為
+    # 16kHz 單聲道 opus / flac，減少上傳量與 File API 處理時間；設為 wav 停用
+    upload_audio_codec: str = "opus"
+    # opus 編碼位元率（kbps）
+    upload_opus_bitrate_kbps: int = 32
 
     model_config = SettingsConfigDict(
         env_file=ENV_FILE_PATH if ENV_FILE_PATH else None,
@@ -0,0 +1,59 @@
+"""讓 psycopg2 在 gevent worker 內以協作式 I/O 等待 Postgres。
+
+psycopg2 是 C 擴充，socket I/O 在 libpq 內阻塞，gevent 的 monkey patch 管不到；
+gevent pool 的 Celery worker 每次 commit 都會卡住整個 hub，同一進程其他
+greenlet（Gemini 上傳 / 推論、Redis 推播）都得等這趟 DB 來回。
+
+``set_wait_callback`` 讓 psycopg2 改用非同步連線，由 callback 以
+``gevent.socket.wait_read`` / ``wait_write`` 讓出控制權等待 socket 就緒
+（與 psycogreen 相同的做法）。只在 gevent 已 monkey patch 的進程安裝，
+prefork 的 CPU worker 與 API 進程不受影響。
+"""
+
+from __future__ import annotations
+
+import psycopg2
+from psycopg2 import extensions
+
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def gevent_wait_callback(conn, timeout=None):
+    """psycopg2 的 wait callback：輪詢連線狀態，未就緒時讓出給其他 greenlet"""
+    from gevent.socket import wait_read, wait_write
+
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f"Bad result from poll: {state!r}")
+
+
+def _gevent_patched() -> bool:
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+
+def make_psycopg_green() -> bool:
+    """在 gevent 進程內安裝協作式的 wait callback；回傳是否有安裝"""
+    if not _gevent_patched():
+        return False
+    if extensions.get_wait_callback() is gevent_wait_callback:
+        return True
+
+    extensions.set_wait_callback(gevent_wait_callback)
+    # 安裝前建立的連線仍是同步模式，丟掉讓連線池重新建立
+    from app.database.session import engine
+    engine.dispose()
+    logger.info("Installed gevent wait callback for psycopg2")
+    return True
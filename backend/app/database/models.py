@@ -6,13 +6,14 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
     UUID,
     func,
 )
-from sqlalchemy.orm import declarative_base
+from sqlalchemy.orm import declarative_base, query_expression
 
 Base = declarative_base()
 
@@ -34,6 +35,7 @@ class BatchJob(Base):
 
     batch_id = Column(String, primary_key=True)         # 前端的 batch ID
     session_id = Column(String, nullable=True, index=True)  # 同一次 Start 的任務群組
+    parent_batch_id = Column(String, nullable=True, index=True)  # 分片所屬的前端 batch ID（狀態推送頻道），第一個分片為 NULL
     gemini_job_name = Column(String, nullable=True)      # Gemini API 的 job name
     status = Column(String, default="UPLOADING", index=True)  # UPLOADING / POLLING / BATCH_SUBMITTED / COMPLETED / FAILED / RETRIEVED / RECOVERING
     task_params_json = Column(Text, nullable=True)       # 序列化的任務參數（不含 api_keys）
@@ -44,6 +46,9 @@ class BatchJob(Base):
     celery_task_id = Column(String, nullable=True, index=True)  # Celery task ID
     file_count = Column(Integer, nullable=True)
     completed_file_count = Column(Integer, default=0, nullable=True)
+    # 集中輪詢器排程：下次查詢 Gemini 的時間（UTC）與已查詢次數（決定退避間隔）
+    next_poll_at = Column(DateTime, nullable=True)
+    poll_count = Column(Integer, default=0, nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
@@ -51,6 +56,17 @@ class BatchJob(Base):
 class TranscriptionLog(Base):
     """ transcription_logs 資料表"""
     __tablename__ = 'transcription_logs'
+    # 歷史紀錄列表（含游標分頁）依 (request_timestamp, task_uuid) 倒序，
+    # 每種篩選組合各有一個以排序欄位結尾的複合 index，可直接依序掃描
+    __table_args__ = (
+        Index("ix_transcription_logs_list", "request_timestamp", "task_uuid"),
+        Index("ix_transcription_logs_status_list", "status", "request_timestamp", "task_uuid"),
+        Index("ix_transcription_logs_is_batch_list", "is_batch", "request_timestamp", "task_uuid"),
+        Index(
+            "ix_transcription_logs_status_is_batch_list",
+            "status", "is_batch", "request_timestamp", "task_uuid",
+        ),
+    )
 
     task_uuid = Column(UUID(as_uuid=True),
                        primary_key=True, default=uuid.uuid4)
@@ -80,3 +96,6 @@ class TranscriptionLog(Base):
     lrc_content = Column(Text, nullable=True)
     file_uid = Column(String, nullable=True, index=True)  # 前端檔案 uid
     session_id = Column(String, nullable=True, index=True)  # 同一次 Start 的任務群組
+
+    # 非實體欄位：列表查詢以 with_expression 於 SQL 內算出是否有逐字稿（見 history_repository）
+    has_transcript = query_expression()
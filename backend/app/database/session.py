@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine, select, text, inspect as sa_inspect
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from .models import Base, ModelConfiguration
 from app.core.config import get_settings
@@ -20,6 +21,36 @@ engine = create_engine(
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# FastAPI 的讀取端點（歷史紀錄、批次任務列表）改用 asyncpg，不佔用 threadpool 的執行緒。
+# async engine 只在 API 進程建立（lifespan 呼叫 init_async_engine），Celery worker 匯入此模組時
+# 不需要 asyncpg，也不會多一個連線池；連線數上限由 ASYNC_DB_POOL_SIZE / ASYNC_DB_MAX_OVERFLOW 另外設定
+_async_engine = None
+_async_session_factory = None
+
+
+def init_async_engine():
+    """建立 async engine 與 session factory（已建立時直接沿用）"""
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        logger.info("Creating async database engine...")
+        _async_engine = create_async_engine(
+            settings.async_database_url,
+            pool_size=settings.async_db_pool_size,
+            max_overflow=settings.async_db_max_overflow,
+            pool_pre_ping=True,
+        )
+        _async_session_factory = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+async def dispose_async_engine():
+    """關閉 async engine 的連線池（API 關閉時呼叫）"""
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_session_factory = None
+
 
 def _migrate_add_missing_columns():
     """檢查並自動新增 models 中有但 DB 表中缺少的欄位。
@@ -96,3 +127,10 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """FastAPI 依賴注入，提供非同步資料庫 session（async 讀取端點用）"""
+    init_async_engine()
+    async with _async_session_factory() as db:
+        yield db
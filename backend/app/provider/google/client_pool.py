@@ -0,0 +1,207 @@
+"""Gemini client 池：以 API Key 為單位重用 genai.Client，並在多把 Key 之間分流。
+
+每個 worker 進程只為同一把 Key 建立一個 ``genai.Client``，任務之間共用其
+HTTP 連線池，不再每個任務重新建立連線與 TLS。
+
+``acquire`` 會從任務可用的 Key 中挑選「進行中任務最少」且未被暫停的 Key；
+遇到 429 / quota 類錯誤的 Key 會被暫時移出輪替（退避時間隨連續失敗次數加倍），
+冷卻結束後自動恢復。Gemini 上傳的檔案只屬於上傳時使用的 Key，因此同一個任務
+從上傳到取得結果都必須使用同一份 lease。
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from google import genai
+
+from app.core.config import get_settings
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_settings = get_settings()
+GEMINI_CLIENT_POOL_SIZE = _settings.gemini_client_pool_size
+GEMINI_KEY_COOLDOWN_SECONDS = _settings.gemini_key_cooldown_seconds
+GEMINI_KEY_MAX_COOLDOWN_SECONDS = _settings.gemini_key_max_cooldown_seconds
+
+
+def parse_api_keys(value: Union[str, Iterable[str], None]) -> List[str]:
+    """
+    將任務參數中的 api_keys 正規化為去重後的 Key 列表。
+
+    接受單一 Key 字串、JSON 陣列字串（ProviderConfig 的儲存格式）或字串列表。
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith("["):
+            try:
+                value = json.loads(text)
+            except json.JSONDecodeError:
+                value = [text]
+        else:
+            value = [text]
+
+    keys: List[str] = []
+    for key in value:
+        key = str(key).strip()
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def is_rate_limit_error(err: Exception) -> bool:
+    """是否為 429 / quota 耗盡類錯誤（應暫停該 Key，而非單純重試）"""
+    if getattr(err, "code", None) == 429 or getattr(err, "status_code", None) == 429:
+        return True
+    message = str(err).lower()
+    return "429" in message or "resource_exhausted" in message or "quota" in message
+
+
+def _mask_key(api_key: str) -> str:
+    return f"...{api_key[-4:]}" if len(api_key) > 4 else "****"
+
+
+@dataclass
+class GeminiLease:
+    """一次 acquire 取得的 Key 與對應的共用 client"""
+    api_key: str
+    client: genai.Client
+
+
+@dataclass
+class _KeyState:
+    outstanding: int = 0
+    strikes: int = 0
+    ejected_until: float = 0.0
+
+
+class GeminiClientPool:
+    """進程內共用的 Gemini client 池（執行緒 / greenlet 安全）"""
+
+    def __init__(
+        self,
+        max_clients: int = GEMINI_CLIENT_POOL_SIZE,
+        cooldown_seconds: float = GEMINI_KEY_COOLDOWN_SECONDS,
+        max_cooldown_seconds: float = GEMINI_KEY_MAX_COOLDOWN_SECONDS,
+        client_factory: Callable[[str], genai.Client] = lambda key: genai.Client(api_key=key),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_clients = max(1, max_clients)
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self._client_factory = client_factory
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._clients: "OrderedDict[str, genai.Client]" = OrderedDict()
+        self._states: Dict[str, _KeyState] = {}
+        self._tiebreak = itertools.count()
+
+    def get_client(self, api_key: str) -> genai.Client:
+        """取得（必要時建立）該 Key 的共用 client；超過上限時淘汰最久未使用者"""
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is not None:
+                self._clients.move_to_end(api_key)
+                return client
+
+        # 建立 client 不持有鎖，避免阻塞其他 Key
+        client = self._client_factory(api_key)
+        with self._lock:
+            existing = self._clients.get(api_key)
+            if existing is not None:
+                return existing
+            self._clients[api_key] = client
+            while len(self._clients) > self.max_clients:
+                evicted, _ = self._clients.popitem(last=False)
+                logger.info(f"Gemini client 池已滿，移除 Key {_mask_key(evicted)}")
+        logger.info(f"已建立 Gemini client (Key {_mask_key(api_key)})")
+        return client
+
+    def key_for_client(self, client) -> Optional[str]:
+        """反查 client 對應的 API Key（限流器以 Key 區分 bucket）；非池內 client 回傳 None"""
+        with self._lock:
+            for api_key, pooled in self._clients.items():
+                if pooled is client:
+                    return api_key
+        return None
+
+    def _select_key(self, api_keys: List[str]) -> str:
+        now = self._clock()
+        states = {key: self._states.setdefault(key, _KeyState()) for key in api_keys}
+        healthy = [key for key in api_keys if states[key].ejected_until <= now]
+        if not healthy:
+            # 全部暫停中：選最快恢復的 Key，交由上層的重試 / 退避處理
+            return min(api_keys, key=lambda k: states[k].ejected_until)
+        # 進行中最少者優先；同分時輪流（以遞增序號打散）
+        offset = next(self._tiebreak)
+        return min(
+            healthy,
+            key=lambda k: (states[k].outstanding, (api_keys.index(k) - offset) % len(api_keys)),
+        )
+
+    def acquire(self, api_keys: Union[str, Iterable[str]]) -> GeminiLease:
+        """挑選一把 Key 並佔用；使用完畢必須呼叫 release()"""
+        keys = parse_api_keys(api_keys)
+        if not keys:
+            raise ValueError("未提供 Gemini API Key")
+        with self._lock:
+            api_key = self._select_key(keys)
+            self._states[api_key].outstanding += 1
+        return GeminiLease(api_key=api_key, client=self.get_client(api_key))
+
+    def release(self, lease: GeminiLease, error: Optional[Exception] = None) -> None:
+        """
+        歸還 lease。error 為 429 / quota 類錯誤時暫停該 Key，
+        成功歸還（error=None）則清除連續失敗次數。
+        """
+        with self._lock:
+            state = self._states.setdefault(lease.api_key, _KeyState())
+            state.outstanding = max(0, state.outstanding - 1)
+            if error is None:
+                state.strikes = 0
+                return
+            if not is_rate_limit_error(error):
+                return
+            state.strikes += 1
+            cooldown = min(
+                self.cooldown_seconds * (2 ** (state.strikes - 1)), self.max_cooldown_seconds)
+            state.ejected_until = self._clock() + cooldown
+        logger.warning(
+            f"Gemini Key {_mask_key(lease.api_key)} 觸發限流 / quota，暫停 {cooldown:.0f} 秒: {error}")
+
+    def snapshot(self) -> Dict[str, dict]:
+        """各 Key 的狀態（遮罩後），供除錯與監控使用"""
+        now = self._clock()
+        with self._lock:
+            return {
+                _mask_key(key): {
+                    "outstanding": state.outstanding,
+                    "strikes": state.strikes,
+                    "ejected_for_seconds": max(0.0, state.ejected_until - now),
+                }
+                for key, state in self._states.items()
+            }
+
+
+_client_pool_instance: Optional[GeminiClientPool] = None
+_client_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> GeminiClientPool:
+    """取得進程內共用的 GeminiClientPool"""
+    global _client_pool_instance
+
+    if _client_pool_instance is None:
+        with _client_pool_lock:
+            if _client_pool_instance is None:
+                _client_pool_instance = GeminiClientPool()
+    return _client_pool_instance
@@ -0,0 +1,300 @@
+"""Gemini File API 檔案登記表：同一份內容在 48 小時內重用已上傳的檔案。
+
+Gemini 上傳的檔案保留 48 小時，但過去每次嘗試（Celery 重試、恢復、
+重複送出）都重新上傳並在結束時立刻刪除。登記表以「API Key + 上傳檔案
+內容的 SHA-256」為 key 記錄 Gemini 檔案名稱與到期時間：
+
+- ``acquire``：有仍然有效（剩餘時間足夠）的檔案時，以一次 ``files.get``
+  確認狀態後直接沿用，略過上傳與 ``PROCESSING`` 輪詢；否則上傳並登記。
+- ``release``：使用結束不再立即刪除，而是保留 ``GEMINI_FILE_RETAIN_SECONDS``
+  供後續重試沿用；仍有其他任務使用中（holders > 0）時不排入刪除。
+- ``reap``：由 celery beat 週期呼叫，刪除保留期已過的檔案。
+
+使用中的檔案刪除時間固定為到期時間，避免仍在等待中的批次任務引用的
+檔案被提早刪除。Gemini 檔案只屬於上傳它的 API Key，因此 key 必須包含
+API Key。Redis 無法使用時退回原本的行為（每次上傳、用完立即刪除）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, List, Optional, Tuple
+
+import redis
+
+from app.core.config import get_settings
+from app.provider.google.client_pool import get_client_pool
+from app.provider.google.gemini import cleanup_gemini_file, upload_file_to_gemini
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_settings = get_settings()
+GEMINI_FILE_REUSE_ENABLED = _settings.gemini_file_reuse_enabled
+GEMINI_FILE_RETAIN_SECONDS = _settings.gemini_file_retain_seconds
+
+# Gemini File API 的檔案保留期限
+GEMINI_FILE_LIFETIME_SECONDS = 48 * 3600
+# 沿用既有檔案時至少需要的剩餘時間：同步轉錄數分鐘內用完；
+# 批次任務可能排隊到 24 小時，需要更長的餘裕
+SYNC_MIN_REMAINING_SECONDS = 3600
+BATCH_MIN_REMAINING_SECONDS = 26 * 3600
+
+_KEY_PREFIX = "gemini_files:"
+_INDEX_PREFIX = f"{_KEY_PREFIX}index:"
+_FILE_PREFIX = f"{_KEY_PREFIX}file:"
+_REAP_KEY = f"{_KEY_PREFIX}reap"
+
+# KEYS: index key, reap zset；ARGV: now, 最少剩餘秒數, file key prefix
+# 找到有效檔案時 holders + 1 並把刪除時間固定為到期時間，回傳檔案名稱
+_LOOKUP_SCRIPT = """
+local name = redis.call('GET', KEYS[1])
+if not name then return false end
+local fkey = ARGV[3] .. name
+local expires_at = tonumber(redis.call('HGET', fkey, 'expires_at'))
+if not expires_at or expires_at - tonumber(ARGV[1]) < tonumber(ARGV[2]) then return false end
+if not redis.call('ZSCORE', KEYS[2], name) then return false end
+redis.call('HINCRBY', fkey, 'holders', 1)
+redis.call('ZADD', KEYS[2], expires_at, name)
+return name
+"""
+
+# KEYS: file key, reap zset；ARGV: 檔案名稱, 保留期結束時間
+# 回傳 1 表示已登記（交給 reaper 刪除），0 表示未登記（呼叫端應立即刪除）
+_RELEASE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+local holders = redis.call('HINCRBY', KEYS[1], 'holders', -1)
+if holders <= 0 then
+    redis.call('HSET', KEYS[1], 'holders', 0)
+    local expires_at = tonumber(redis.call('HGET', KEYS[1], 'expires_at'))
+    redis.call('ZADD', KEYS[2], math.min(tonumber(ARGV[2]), expires_at), ARGV[1])
+end
+return 1
+"""
+
+# KEYS: reap zset；ARGV: now, 上限筆數, file key prefix
+# 原子地取出到期的檔案並移除登記，回傳 [name1, api_key1, name2, api_key2, ...]
+_CLAIM_SCRIPT = """
+local names = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local out = {}
+for _, name in ipairs(names) do
+    redis.call('ZREM', KEYS[1], name)
+    local fkey = ARGV[3] .. name
+    local data = redis.call('HMGET', fkey, 'api_key', 'index')
+    if data[2] then redis.call('DEL', data[2]) end
+    redis.call('DEL', fkey)
+    if data[1] then
+        table.insert(out, name)
+        table.insert(out, data[1])
+    end
+end
+return out
+"""
+
+
+def file_content_hash(file_path: Path) -> str:
+    """上傳檔案內容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _index_id(api_key: str, content_hash: str) -> str:
+    key_digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return f"{key_digest}:{content_hash}"
+
+
+def _expires_at(gemini_file, now: float) -> float:
+    """Gemini 檔案的到期時間（epoch 秒）；回應沒有 expiration_time 時以 48 小時估算"""
+    expiration = getattr(gemini_file, "expiration_time", None)
+    if isinstance(expiration, datetime):
+        if expiration.tzinfo is None:
+            expiration = expiration.replace(tzinfo=timezone.utc)
+        return expiration.timestamp()
+    return now + GEMINI_FILE_LIFETIME_SECONDS
+
+
+def _text(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class _RedisFileStore:
+    """Redis 上的共用登記表（查詢 / 釋放 / 認領以 Lua script 原子執行）"""
+
+    def __init__(self, client: redis.Redis):
+        self._redis = client
+        self._lookup = client.register_script(_LOOKUP_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+        self._claim = client.register_script(_CLAIM_SCRIPT)
+
+    def lookup(self, index_id: str, now: float, min_remaining: float) -> Optional[str]:
+        name = self._lookup(
+            keys=[f"{_INDEX_PREFIX}{index_id}", _REAP_KEY],
+            args=[now, min_remaining, _FILE_PREFIX],
+        )
+        return _text(name) if name else None
+
+    def register(self, index_id: str, name: str, api_key: str, expires_at: float, now: float) -> None:
+        ttl = max(1, int(expires_at - now))
+        index_key = f"{_INDEX_PREFIX}{index_id}"
+        file_key = f"{_FILE_PREFIX}{name}"
+        pipe = self._redis.pipeline()
+        pipe.set(index_key, name, ex=ttl)
+        pipe.hset(file_key, mapping={
+            "api_key": api_key, "index": index_key, "expires_at": expires_at, "holders": 1,
+        })
+        pipe.expire(file_key, ttl)
+        pipe.zadd(_REAP_KEY, {name: expires_at})
+        pipe.execute()
+
+    def release(self, name: str, delete_after: float) -> bool:
+        return bool(self._release(keys=[f"{_FILE_PREFIX}{name}", _REAP_KEY], args=[name, delete_after]))
+
+    def forget(self, name: str) -> None:
+        file_key = f"{_FILE_PREFIX}{name}"
+        index_key = self._redis.hget(file_key, "index")
+        pipe = self._redis.pipeline()
+        if index_key:
+            pipe.delete(_text(index_key))
+        pipe.delete(file_key)
+        pipe.zrem(_REAP_KEY, name)
+        pipe.execute()
+
+    def claim_due(self, now: float, limit: int) -> List[Tuple[str, str]]:
+        flat = self._claim(keys=[_REAP_KEY], args=[now, limit, _FILE_PREFIX])
+        flat = [_text(v) for v in flat]
+        return list(zip(flat[0::2], flat[1::2]))
+
+
+class GeminiFileRegistry:
+    """上傳檔案的登記與重用；store 為 None 時退回「每次上傳、用完即刪」"""
+
+    def __init__(
+        self,
+        store,
+        retain_seconds: float = GEMINI_FILE_RETAIN_SECONDS,
+        key_resolver: Optional[Callable[[object], Optional[str]]] = None,
+        uploader: Callable = upload_file_to_gemini,
+        deleter: Callable = cleanup_gemini_file,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._store = store
+        self.retain_seconds = retain_seconds
+        self._key_resolver = key_resolver or (lambda client: get_client_pool().key_for_client(client))
+        self._upload = uploader
+        self._delete = deleter
+        self._clock = clock
+
+    def _reuse(self, client, index_id: str, min_remaining: float):
+        """查詢登記表並確認 Gemini 上的檔案仍為 ACTIVE；不可用時移除登記"""
+        name = self._store.lookup(index_id, self._clock(), min_remaining)
+        if not name:
+            return None
+        try:
+            gemini_file = client.files.get(name=name)
+            if gemini_file.state is not None and gemini_file.state.name == "ACTIVE":
+                return gemini_file
+            logger.info(f"登記的 Gemini 檔案 {name} 狀態為 {gemini_file.state}，改為重新上傳")
+        except Exception as e:
+            logger.info(f"登記的 Gemini 檔案 {name} 已無法使用，改為重新上傳: {e}")
+        self._store.forget(name)
+        return None
+
+    def acquire(
+        self,
+        file_path: Path,
+        client,
+        status_callback=None,
+        min_remaining_seconds: float = SYNC_MIN_REMAINING_SECONDS,
+    ):
+        """
+        取得檔案對應的 Gemini 檔案：有效期足夠的既有檔案直接沿用，否則上傳並登記。
+        使用結束後必須呼叫 release()。
+        """
+        api_key = self._key_resolver(client) if self._store is not None else None
+        if not api_key:
+            return self._upload(file_path, client, status_callback)
+
+        index_id = None
+        try:
+            index_id = _index_id(api_key, file_content_hash(file_path))
+            gemini_file = self._reuse(client, index_id, min_remaining_seconds)
+            if gemini_file is not None:
+                logger.info(f"沿用已上傳的 Gemini 檔案 {gemini_file.name}（{Path(file_path).name}），略過上傳")
+                return gemini_file
+        except Exception as e:
+            logger.warning(f"查詢 Gemini 檔案登記表失敗，改為直接上傳: {e}")
+
+        gemini_file = self._upload(file_path, client, status_callback)
+        if index_id is not None:
+            try:
+                now = self._clock()
+                self._store.register(index_id, gemini_file.name, api_key, _expires_at(gemini_file, now), now)
+            except Exception as e:
+                logger.warning(f"登記 Gemini 檔案 {gemini_file.name} 失敗: {e}")
+        return gemini_file
+
+    def release(self, client, gemini_file) -> None:
+        """使用結束：已登記的檔案保留一段時間交給 reaper 刪除，未登記的立即刪除"""
+        if self._store is not None:
+            try:
+                if self._store.release(gemini_file.name, self._clock() + self.retain_seconds):
+                    logger.info(
+                        f"Gemini 檔案 {gemini_file.name} 保留 {self.retain_seconds / 3600:.1f} 小時供重試沿用")
+                    return
+            except Exception as e:
+                logger.warning(f"釋放 Gemini 檔案登記失敗，改為立即刪除: {e}")
+        self._delete(client, gemini_file)
+
+    def reap(self, limit: int = 100) -> int:
+        """刪除保留期已過的檔案，回傳處理筆數"""
+        if self._store is None:
+            return 0
+        claimed = self._store.claim_due(self._clock(), limit)
+        pool = get_client_pool()
+        for name, api_key in claimed:
+            self._delete(pool.get_client(api_key), SimpleNamespace(name=name))
+        return len(claimed)
+
+
+_file_registry_instance: Optional[GeminiFileRegistry] = None
+_file_registry_lock = threading.Lock()
+
+
+def get_file_registry() -> GeminiFileRegistry:
+    """取得進程內共用的 Gemini 檔案登記表（資料存放於 Redis，所有 worker 共用）"""
+    global _file_registry_instance
+
+    if _file_registry_instance is None:
+        with _file_registry_lock:
+            if _file_registry_instance is None:
+                store = None
+                if GEMINI_FILE_REUSE_ENABLED:
+                    try:
+                        store = _RedisFileStore(redis.from_url(_settings.redis_url))
+                    except Exception as e:
+                        logger.warning(f"無法建立 Gemini 檔案登記表，停用檔案重用: {e}")
+                _file_registry_instance = GeminiFileRegistry(store)
+    return _file_registry_instance
+
+
+def acquire_gemini_file(
+    file_path: Path,
+    client,
+    status_callback=None,
+    min_remaining_seconds: float = SYNC_MIN_REMAINING_SECONDS,
+):
+    """取得（必要時上傳）Gemini 檔案，見 GeminiFileRegistry.acquire"""
+    return get_file_registry().acquire(file_path, client, status_callback, min_remaining_seconds)
+
+
+def release_gemini_file(client, gemini_file) -> None:
+    """釋放 Gemini 檔案，見 GeminiFileRegistry.release"""
+    get_file_registry().release(client, gemini_file)
@@ -1,11 +1,22 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from types import SimpleNamespace
 from google import genai
 from google.genai import types
 from pathlib import Path
 import hashlib
+import io
+import json
+import tempfile
 import time
 
 from app.exceptions import GeminiPermanentError, GeminiTransientError
+from app.provider.google.client_pool import get_client_pool
+from app.provider.google.rate_limiter import (
+    BATCHES_BUCKET,
+    FILES_BUCKET,
+    estimate_request_tokens,
+    get_rate_limiter,
+)
 from app.schemas.schemas import ServiceStatus
 from app.utils.logger import setup_logger
 from app.utils.audio import get_mime_type
@@ -78,6 +89,12 @@ def _extract_actual_service_tier(response) -> Optional[str]:
     return None
 
 
+def _throttle(client, model: str, tokens: int = 0) -> None:
+    """呼叫 Gemini 前先向限流器取得 (API Key, model) 的 RPM / TPM 額度"""
+    api_key = get_client_pool().key_for_client(client) or "default"
+    get_rate_limiter().acquire(api_key, model, tokens=tokens)
+
+
 class GeminiClient:
     """
     與 Google Gemini API 進行互動的客戶端。
@@ -94,8 +111,8 @@ class GeminiClient:
             return
 
         try:
-            self.client = genai.Client(api_key=api_key)
-            logger.info("GeminiClient 初始化成功")
+            # 同一把 Key 在進程內共用 client 與其 HTTP 連線池
+            self.client = get_client_pool().get_client(api_key)
         except Exception as e:
             self.client = None
             logger.error(f"初始化 GeminiClient 失敗: {e}")
@@ -136,6 +153,7 @@ def upload_file_to_gemini(file_path: Path, client: genai.Client, status_callback
         config["mime_type"] = mime_type
         logger.info(f"使用 MIME 類型: {mime_type}")
 
+    _throttle(client, FILES_BUCKET)
     try:
         with open(file_path, "rb") as f:
             gemini_file = client.files.upload(file=f, config=config)
@@ -194,10 +212,14 @@ def transcribe_with_uploaded_file(
     model: str,
     prompt: str,
     service_tier: Optional[str] = None,
+    audio_seconds: Optional[float] = None,
 ) -> Dict[str, Any]:
     """
     使用已上傳的檔案進行轉錄。
 
+    每次呼叫 generate_content 前先向限流器取得額度；audio_seconds 用於預估
+    本次請求的 token 數（TPM），未提供時只以 prompt 長度估算。
+
     service_tier:
       - None / "standard": 使用標準同步 API（原有行為）
       - "flex": 使用 Flex 推論（50% 折扣、分鐘級延遲、可捨棄）；
@@ -210,6 +232,7 @@ def transcribe_with_uploaded_file(
 
     response = None
     tier_used = "standard"
+    estimated_tokens = estimate_request_tokens(prompt, audio_seconds)
 
     if service_tier == "flex":
         flex_config = _build_transcription_config(model, "flex")
@@ -224,6 +247,7 @@ def transcribe_with_uploaded_file(
         )
         last_error: Optional[Exception] = None
         for attempt in range(FLEX_MAX_RETRIES):
+            _throttle(client, model, estimated_tokens)
             try:
                 response = client.models.generate_content(
                     model=model,
@@ -253,6 +277,7 @@ def transcribe_with_uploaded_file(
             logger.warning(
                 f"[FLEX] 推論耗盡，自動降級改以 Standard 層級重試: {last_error}"
             )
+            _throttle(client, model, estimated_tokens)
             try:
                 response = client.models.generate_content(
                     model=model,
@@ -264,6 +289,7 @@ def transcribe_with_uploaded_file(
             tier_used = "standard"
     else:
         logger.info(f"[STANDARD] 呼叫 Gemini 標準同步 API model={model}")
+        _throttle(client, model, estimated_tokens)
         try:
             response = client.models.generate_content(
                 model=model,
@@ -359,40 +385,91 @@ BATCH_COMPLETED_STATES = frozenset({
 })
 
 
+def _build_batch_request(gemini_file, prompt: str) -> dict:
+    """單一音檔的批次請求內容（inline 與 JSONL 共用）"""
+    return {
+        'contents': [{
+            'parts': [
+                {'text': prompt},
+                {'file_data': {
+                    'file_uri': gemini_file.uri,
+                    'mime_type': gemini_file.mime_type
+                }}
+            ],
+            'role': 'user'
+        }]
+    }
+
+
+def estimate_inline_batch_bytes(gemini_files: list, prompt: str) -> int:
+    """估算 inline requests 序列化後的大小（決定是否改用 JSONL 檔案輸入）"""
+    return sum(
+        len(json.dumps(_build_batch_request(gemini_file, prompt), ensure_ascii=False).encode("utf-8"))
+        for gemini_file in gemini_files
+    )
+
+
+def _upload_batch_input_file(
+    client: genai.Client,
+    requests: List[Tuple[str, dict]],
+    display_name: str,
+) -> Any:
+    """將 (key, request) 寫成 JSONL 並上傳到 File API，作為批次任務的輸入檔"""
+    _throttle(client, FILES_BUCKET)
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".jsonl", encoding="utf-8", delete=False
+    ) as f:
+        for key, request in requests:
+            f.write(json.dumps({"key": key, "request": request}, ensure_ascii=False))
+            f.write("\n")
+        jsonl_path = Path(f.name)
+
+    try:
+        return client.files.upload(
+            file=str(jsonl_path),
+            config={"display_name": display_name, "mime_type": "jsonl"},
+        )
+    finally:
+        jsonl_path.unlink(missing_ok=True)
+
+
 def create_batch_transcription_job(
     client: genai.Client,
     gemini_files: list,
     model: str,
     prompt: str,
-    display_name: str = "transcription-batch"
+    display_name: str = "transcription-batch",
+    keys: Optional[List[str]] = None,
+    use_file_input: bool = False,
 ) -> Any:
     """
-    使用 Gemini Batch API 建立批次轉錄任務。
-    將多個已上傳的音訊檔案打包為 inline requests 提交，
-    享有標準 API 50% 的費用折扣。
+    使用 Gemini Batch API 建立批次轉錄任務，享有標準 API 50% 的費用折扣。
+
+    預設將已上傳的音訊檔案打包為 inline requests 提交；
+    use_file_input=True 時改為上傳 JSONL 輸入檔（每行帶 key），
+    Gemini 會將結果寫成 JSONL 輸出檔（dest.file_name），不受 inline 請求大小限制。
+    keys 為每個請求的識別字串，預設為序號。
     """
-    inline_requests = []
-    for gemini_file in gemini_files:
-        request = {
-            'contents': [{
-                'parts': [
-                    {'text': prompt},
-                    {'file_data': {
-                        'file_uri': gemini_file.uri,
-                        'mime_type': gemini_file.mime_type
-                    }}
-                ],
-                'role': 'user'
-            }]
-        }
-        inline_requests.append(request)
-
-    logger.info(f"建立批次任務: {len(inline_requests)} 個請求, 模型: {model}")
+    if keys is None:
+        keys = [str(i) for i in range(len(gemini_files))]
+    requests = [
+        (key, _build_batch_request(gemini_file, prompt))
+        for key, gemini_file in zip(keys, gemini_files)
+    ]
+
+    mode = "JSONL 檔案" if use_file_input else "inline"
+    logger.info(f"建立批次任務: {len(requests)} 個請求 ({mode}), 模型: {model}")
     logger.info(f"Batch prompt fingerprint: {_prompt_fingerprint(prompt)}")
+    _throttle(client, BATCHES_BUCKET)
     try:
+        if use_file_input:
+            input_file = _upload_batch_input_file(client, requests, f"{display_name}-input")
+            src = input_file.name
+        else:
+            src = [request for _, request in requests]
         batch_job = client.batches.create(
             model=model,
-            src=inline_requests,
+            src=src,
             config={'display_name': display_name},
         )
     except Exception as e:
@@ -401,6 +478,54 @@ def create_batch_transcription_job(
     return batch_job
 
 
+def iter_batch_job_responses(
+    client: genai.Client,
+    batch_job,
+) -> Iterator[Tuple[Optional[str], Any]]:
+    """
+    依序產生批次任務的 (key, response)。
+
+    inline 結果沒有 key（依提交順序對應，key 為 None）；
+    JSONL 輸出檔的每一行帶有提交時的 key，解析為與 inline 相同介面的
+    物件（.response 為 GenerateContentResponse，失敗時 .error 帶錯誤內容）。
+    """
+    dest = batch_job.dest
+    if not dest:
+        return
+    if dest.inlined_responses:
+        for inline_response in dest.inlined_responses:
+            yield None, inline_response
+        return
+    if not dest.file_name:
+        return
+
+    try:
+        content = client.files.download(file=dest.file_name)
+    except Exception as e:
+        raise _classify_gemini_error(e) from e
+
+    # 逐行解析，不先把整個輸出檔轉成字串或回應列表
+    for line in io.BytesIO(content):
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        response = None
+        if item.get("response"):
+            response = types.GenerateContentResponse.model_validate(item["response"])
+        yield item.get("key"), types.InlinedResponse(response=response, error=item.get("error"))
+
+
+def cleanup_batch_job_files(client: genai.Client, batch_job) -> None:
+    """刪除檔案型批次任務在 File API 上的 JSONL 輸入 / 輸出檔"""
+    names = [
+        getattr(getattr(batch_job, "src", None), "file_name", None),
+        getattr(getattr(batch_job, "dest", None), "file_name", None),
+    ]
+    for name in names:
+        if name:
+            cleanup_gemini_file(client, SimpleNamespace(name=name))
+
+
 def poll_batch_job_status(client: genai.Client, job_name: str) -> Any:
     """查詢 Gemini Batch API 任務狀態"""
     try:
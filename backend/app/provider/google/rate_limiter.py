@@ -0,0 +1,248 @@
+"""Gemini 呼叫的分散式 RPM / TPM 限流器。
+
+以 (API Key, model) 為單位維護兩個 token bucket：每分鐘請求數（RPM）與
+每分鐘預估 token 數（TPM）。所有 worker 進程共用 Redis 上的 bucket，
+``generate_content``、``files.upload`` 與 ``batches.create`` 呼叫前先取得額度，
+額度不足時依 bucket 回補速度等待，讓請求平滑送出，而不是一起撞上 429
+再一起退避。
+
+bucket 的讀取、回補與扣除在 Redis Lua script 內原子完成，時間取自 Redis
+伺服器（``TIME``），避免各 worker 時鐘不一致。Redis 無法連線時退回進程內
+bucket（仍限制單一進程的速率）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+import redis
+
+from app.core.config import get_settings
+from app.exceptions import GeminiTransientError
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_settings = get_settings()
+GEMINI_RPM_LIMIT = _settings.gemini_rpm_limit
+GEMINI_TPM_LIMIT = _settings.gemini_tpm_limit
+GEMINI_MODEL_RATE_LIMITS = _settings.gemini_model_rate_limits
+GEMINI_RATE_LIMIT_MAX_WAIT_SECONDS = _settings.gemini_rate_limit_max_wait_seconds
+
+# Gemini 音訊輸入約每秒 32 個 token；文字以 4 字元約 1 token 粗估
+AUDIO_TOKENS_PER_SECOND = 32
+_CHARS_PER_TOKEN = 4
+
+# 不對應特定模型的呼叫各自使用獨立的 bucket
+FILES_BUCKET = "files"
+BATCHES_BUCKET = "batches"
+
+_BUCKET_PREFIX = "gemini_rate:"
+_BUCKET_TTL_SECONDS = 120
+
+# KEYS: rpm bucket, tpm bucket
+# ARGV: rpm 容量, rpm 每秒回補, tpm 容量, tpm 每秒回補, 請求數, token 數
+# 回傳需等待的秒數（字串）；"0" 表示已扣除額度
+_TAKE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local function level(key, cap, rate)
+    local data = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(data[1]) or cap
+    local ts = tonumber(data[2]) or now
+    return math.min(cap, tokens + math.max(0, now - ts) * rate)
+end
+
+local rpm_cap, rpm_rate = tonumber(ARGV[1]), tonumber(ARGV[2])
+local tpm_cap, tpm_rate = tonumber(ARGV[3]), tonumber(ARGV[4])
+local req, tok = tonumber(ARGV[5]), tonumber(ARGV[6])
+
+local wait = 0
+local r, k = 0, 0
+if rpm_cap > 0 then
+    r = level(KEYS[1], rpm_cap, rpm_rate)
+    if r < req then wait = math.max(wait, (req - r) / rpm_rate) end
+end
+if tpm_cap > 0 and tok > 0 then
+    k = level(KEYS[2], tpm_cap, tpm_rate)
+    if k < tok then wait = math.max(wait, (tok - k) / tpm_rate) end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+
+if rpm_cap > 0 then
+    redis.call('HSET', KEYS[1], 'tokens', r - req, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], tonumber(ARGV[7]))
+end
+if tpm_cap > 0 and tok > 0 then
+    redis.call('HSET', KEYS[2], 'tokens', k - tok, 'ts', now)
+    redis.call('EXPIRE', KEYS[2], tonumber(ARGV[7]))
+end
+return '0'
+"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """每分鐘請求數與 token 數上限；0 表示不限制"""
+    rpm: int
+    tpm: int = 0
+
+
+def estimate_request_tokens(prompt: str = "", audio_seconds: Optional[float] = None) -> int:
+    """預估一次轉錄請求的輸入 token 數（prompt + 音訊）"""
+    tokens = len(prompt or "") // _CHARS_PER_TOKEN
+    if audio_seconds:
+        tokens += int(audio_seconds * AUDIO_TOKENS_PER_SECOND)
+    return tokens
+
+
+def limit_for(model: str) -> RateLimit:
+    """取得 bucket 的上限：GEMINI_MODEL_RATE_LIMITS 有設定者優先，否則用全域 RPM / TPM"""
+    override = GEMINI_MODEL_RATE_LIMITS.get(model)
+    if override:
+        return RateLimit(rpm=int(override.get("rpm", 0)), tpm=int(override.get("tpm", 0)))
+    if model in (FILES_BUCKET, BATCHES_BUCKET):
+        return RateLimit(rpm=GEMINI_RPM_LIMIT)
+    return RateLimit(rpm=GEMINI_RPM_LIMIT, tpm=GEMINI_TPM_LIMIT)
+
+
+def _bucket_id(api_key: str, model: str) -> str:
+    digest = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return f"{_BUCKET_PREFIX}{digest}:{model}"
+
+
+def _clamp(cost: int, capacity: int) -> int:
+    # 單次需求超過容量時以容量計，否則永遠取不到額度
+    return min(cost, capacity) if capacity > 0 else cost
+
+
+class _LocalBucketStore:
+    """進程內 bucket（Redis 不可用時的退路，也用於測試）"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._levels: Dict[str, Tuple[float, float]] = {}
+
+    def _level(self, key: str, cap: int, now: float) -> float:
+        tokens, ts = self._levels.get(key, (float(cap), now))
+        return min(cap, tokens + max(0.0, now - ts) * cap / 60.0)
+
+    def take(self, bucket_id: str, limit: RateLimit, requests: int, tokens: int) -> float:
+        with self._lock:
+            now = self._clock()
+            wait = 0.0
+            r = k = 0.0
+            if limit.rpm > 0:
+                r = self._level(f"{bucket_id}:rpm", limit.rpm, now)
+                if r < requests:
+                    wait = max(wait, (requests - r) / (limit.rpm / 60.0))
+            if limit.tpm > 0 and tokens > 0:
+                k = self._level(f"{bucket_id}:tpm", limit.tpm, now)
+                if k < tokens:
+                    wait = max(wait, (tokens - k) / (limit.tpm / 60.0))
+            if wait > 0:
+                return wait
+            if limit.rpm > 0:
+                self._levels[f"{bucket_id}:rpm"] = (r - requests, now)
+            if limit.tpm > 0 and tokens > 0:
+                self._levels[f"{bucket_id}:tpm"] = (k - tokens, now)
+            return 0.0
+
+
+class _RedisBucketStore:
+    """Redis 上的共用 bucket（Lua script 原子扣除）"""
+
+    def __init__(self, client: redis.Redis):
+        self._script = client.register_script(_TAKE_SCRIPT)
+
+    def take(self, bucket_id: str, limit: RateLimit, requests: int, tokens: int) -> float:
+        result = self._script(
+            keys=[f"{bucket_id}:rpm", f"{bucket_id}:tpm"],
+            args=[
+                limit.rpm, limit.rpm / 60.0,
+                limit.tpm, limit.tpm / 60.0,
+                requests, tokens, _BUCKET_TTL_SECONDS,
+            ],
+        )
+        return float(result.decode() if isinstance(result, bytes) else result)
+
+
+class GeminiRateLimiter:
+    """依 (API Key, model) 取得 RPM / TPM 額度，不足時等待"""
+
+    def __init__(
+        self,
+        store,
+        fallback_store=None,
+        max_wait_seconds: float = GEMINI_RATE_LIMIT_MAX_WAIT_SECONDS,
+        limit_resolver: Callable[[str], RateLimit] = limit_for,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._store = store
+        self._fallback_store = fallback_store or _LocalBucketStore()
+        self.max_wait_seconds = max_wait_seconds
+        self._limit_resolver = limit_resolver
+        self._sleep = sleep
+        self._clock = clock
+
+    def _take(self, bucket_id: str, limit: RateLimit, requests: int, tokens: int) -> float:
+        if self._store is not None:
+            try:
+                return self._store.take(bucket_id, limit, requests, tokens)
+            except Exception as e:
+                logger.warning(f"Redis 限流 bucket 不可用，改用進程內限流: {e}")
+        return self._fallback_store.take(bucket_id, limit, requests, tokens)
+
+    def acquire(self, api_key: str, model: str, *, tokens: int = 0, requests: int = 1) -> float:
+        """
+        取得一次呼叫的額度，回傳實際等待的秒數。
+        等待超過 max_wait_seconds 時拋出 GeminiTransientError，交給上層重試。
+        """
+        limit = self._limit_resolver(model)
+        if limit.rpm <= 0 and limit.tpm <= 0:
+            return 0.0
+        requests = _clamp(requests, limit.rpm)
+        tokens = _clamp(tokens, limit.tpm)
+        bucket_id = _bucket_id(api_key, model)
+
+        start = self._clock()
+        while True:
+            wait = self._take(bucket_id, limit, requests, tokens)
+            waited = self._clock() - start
+            if wait <= 0:
+                if waited > 0:
+                    logger.info(f"[RATE] {model} 等待 {waited:.1f} 秒取得額度 (tokens={tokens})")
+                return waited
+            if waited + wait > self.max_wait_seconds:
+                raise GeminiTransientError(
+                    f"Gemini 限流等待超過 {self.max_wait_seconds:.0f} 秒 (model={model})")
+            self._sleep(wait)
+
+
+_rate_limiter_instance: Optional[GeminiRateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> GeminiRateLimiter:
+    """取得進程內共用的限流器（bucket 存放於 Redis，所有 worker 共用）"""
+    global _rate_limiter_instance
+
+    if _rate_limiter_instance is None:
+        with _rate_limiter_lock:
+            if _rate_limiter_instance is None:
+                store = None
+                try:
+                    store = _RedisBucketStore(redis.from_url(_settings.redis_url))
+                except Exception as e:
+                    logger.warning(f"無法建立 Redis 限流 bucket，改用進程內限流: {e}")
+                _rate_limiter_instance = GeminiRateLimiter(store)
+    return _rate_limiter_instance
@@ -1,8 +1,15 @@
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.database.models import BatchJob
 
+# 尚未結束或尚未取回結果的批次（恢復與 Task 頁面共用）
+_ACTIVE_STATUSES = ["UPLOADING", "POLLING", "COMPLETED", "RECOVERING"]
+# 已完成超過此時間的批次自動歸檔
+_ARCHIVE_AFTER = timedelta(hours=24)
+
 
 class BatchJobRepository:
     """
@@ -43,9 +50,38 @@ class BatchJobRepository:
         - COMPLETED：任務已完成但前端尚未取回結果
         - RECOVERING：恢復任務正在進行中
         """
+        return db.query(BatchJob).filter(BatchJob.status.in_(_ACTIVE_STATUSES)).all()
+
+    def get_due_polling_jobs(self, db: Session, now: datetime) -> List[BatchJob]:
+        """
+        查詢輪詢器本輪需要查詢 Gemini 的任務：
+        status=POLLING、已有 gemini_job_name，且已到達 next_poll_at（或尚未排程）。
+        """
         return db.query(BatchJob).filter(
-            BatchJob.status.in_(["UPLOADING", "POLLING", "COMPLETED", "RECOVERING"])
-        ).all()
+            BatchJob.status == "POLLING",
+            BatchJob.gemini_job_name.isnot(None),
+            or_(BatchJob.next_poll_at.is_(None), BatchJob.next_poll_at <= now),
+        ).order_by(BatchJob.next_poll_at.asc().nullsfirst()).all()
+
+    def schedule_next_poll(self, db: Session, batch_id: str, next_poll_at: datetime, poll_count: int) -> None:
+        """記錄下次輪詢時間與已輪詢次數。"""
+        db.query(BatchJob).filter(BatchJob.batch_id == batch_id).update({
+            "next_poll_at": next_poll_at,
+            "poll_count": poll_count,
+        })
+        db.commit()
+
+    def claim_for_processing(self, db: Session, batch_id: str) -> bool:
+        """
+        將 POLLING 任務原子地標記為 RECOVERING（結果處理中）。
+        只有一個流程能成功 claim，回傳是否 claim 成功。
+        """
+        count = db.query(BatchJob).filter(
+            BatchJob.batch_id == batch_id,
+            BatchJob.status == "POLLING",
+        ).update({"status": "RECOVERING"})
+        db.commit()
+        return count == 1
 
     def get_job(self, db: Session, batch_id: str) -> Optional[BatchJob]:
         """
@@ -59,7 +95,7 @@ class BatchJobRepository:
         不包含 RETRIEVED 和 FAILED 狀態。
         """
         return db.query(BatchJob).filter(
-            BatchJob.status.in_(["UPLOADING", "POLLING", "COMPLETED", "RECOVERING"])
+            BatchJob.status.in_(_ACTIVE_STATUSES)
         ).order_by(BatchJob.created_at.desc()).all()
 
     def archive_old_completed(self, db: Session) -> int:
@@ -67,7 +103,7 @@ class BatchJobRepository:
         將已完成超過 24 小時的批次標記為 RETRIEVED。
         回傳受影響的筆數。
         """
-        cutoff = datetime.utcnow() - timedelta(hours=24)
+        cutoff = datetime.utcnow() - _ARCHIVE_AFTER
         count = db.query(BatchJob).filter(
             BatchJob.status == "COMPLETED",
             BatchJob.updated_at < cutoff,
@@ -83,3 +119,38 @@ class BatchJobRepository:
             db.commit()
             return True
         return False
+
+
+class AsyncBatchJobRepository:
+    """
+    BatchJobRepository 的非同步版本，供 FastAPI 的 async 讀取端點使用。
+    """
+
+    async def get_job(self, db: AsyncSession, batch_id: str) -> Optional[BatchJob]:
+        """依 batch_id 查詢單筆記錄。"""
+        return await db.get(BatchJob, batch_id)
+
+    async def get_pending_jobs(self, db: AsyncSession) -> List[BatchJob]:
+        """查詢需要恢復的任務（條件同 BatchJobRepository.get_pending_jobs）。"""
+        results = await db.scalars(select(BatchJob).where(BatchJob.status.in_(_ACTIVE_STATUSES)))
+        return list(results)
+
+    async def get_active_tasks(self, db: AsyncSession) -> List[BatchJob]:
+        """取得所有活躍的批次任務（Task 頁面用），依建立時間倒序。"""
+        results = await db.scalars(
+            select(BatchJob)
+            .where(BatchJob.status.in_(_ACTIVE_STATUSES))
+            .order_by(BatchJob.created_at.desc())
+        )
+        return list(results)
+
+    async def archive_old_completed(self, db: AsyncSession) -> int:
+        """將已完成超過 24 小時的批次標記為 RETRIEVED，回傳受影響的筆數。"""
+        cutoff = datetime.utcnow() - _ARCHIVE_AFTER
+        result = await db.execute(
+            update(BatchJob)
+            .where(BatchJob.status == "COMPLETED", BatchJob.updated_at < cutoff)
+            .values(status="RETRIEVED")
+        )
+        await db.commit()
+        return result.rowcount
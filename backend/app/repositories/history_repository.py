@@ -1,16 +1,281 @@
+import base64
 import json
+import threading
+import time
 import uuid as _uuid_module
-from typing import Optional, List, Tuple
+from typing import Dict, Optional, List, Tuple
 from datetime import datetime, timedelta
 
-from sqlalchemy import or_, desc
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, desc, exists, func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, defer, with_expression
 
+from app.core.config import get_settings
 from app.database.models import TranscriptionLog, BatchJob
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+_settings = get_settings()
+HISTORY_TOTAL_CACHE_SECONDS = _settings.history_total_cache_seconds
+
+
+def _coerce_uuid(task_uuid):
+    """確保 task_uuid 為 Python uuid.UUID 物件（相容 PostgreSQL 與 SQLite）。"""
+    if isinstance(task_uuid, _uuid_module.UUID):
+        return task_uuid
+    try:
+        return _uuid_module.UUID(str(task_uuid))
+    except (ValueError, AttributeError):
+        return None
+
+
+def _log_filters(
+    status: Optional[str] = None,
+    is_batch: Optional[bool] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    keyword: Optional[str] = None,
+) -> list:
+    """歷史紀錄分頁查詢的篩選條件（同步與非同步 Repository 共用）。"""
+    conditions = []
+    if status:
+        conditions.append(TranscriptionLog.status == status)
+    if is_batch is not None:
+        conditions.append(TranscriptionLog.is_batch == is_batch)
+    if start_date:
+        conditions.append(TranscriptionLog.request_timestamp >= start_date)
+    if end_date:
+        conditions.append(TranscriptionLog.request_timestamp <= end_date)
+    if keyword:
+        conditions.append(
+            or_(
+                TranscriptionLog.original_filename.ilike(f"%{keyword}%"),
+                TranscriptionLog.model_used.ilike(f"%{keyword}%"),
+            )
+        )
+    return conditions
+
+
+def _active_single_filters(recent_hours: int) -> list:
+    """Task 頁面「活躍」單檔紀錄的篩選條件。"""
+    cutoff = datetime.utcnow() - timedelta(hours=recent_hours)
+    return [
+        TranscriptionLog.is_batch.is_(False),
+        or_(
+            TranscriptionLog.status == "PROCESSING",
+            (TranscriptionLog.status.in_(["COMPLETED", "FAILED"]))
+            & (TranscriptionLog.request_timestamp >= cutoff),
+        ),
+    ]
+
+
+def _lrc_from_batch_results(job: Optional[BatchJob], log: TranscriptionLog) -> Optional[str]:
+    """從 batch_jobs.results_json 找出該日誌對應檔案的 LRC。"""
+    if not job or not job.results_json:
+        return None
+
+    try:
+        results = json.loads(job.results_json)
+        file_log_uuids = json.loads(job.file_log_uuids_json or "{}")
+    except json.JSONDecodeError as e:
+        logger.warning(f"解析批次 {log.batch_id} 結果 JSON 失敗: {e}")
+        return None
+
+    task_uuid_str = str(log.task_uuid)
+    file_uid = None
+    for fuid, tuuid in file_log_uuids.items():
+        if str(tuuid) == task_uuid_str:
+            file_uid = fuid
+            break
+
+    if not file_uid:
+        return None
+
+    result = results.get(file_uid) or {}
+    transcripts = result.get("transcripts") or {}
+    return (transcripts.get("lrc") or "").strip() or None
+
+
+# has_transcript 在 SQL 內計算：日誌本身有 LRC，或是已完成、但 lrc_content 寫入前的舊批次檔案
+# （批次已存 results_json）。後者只看批次有無結果，不逐列解析 results_json；
+# 確切內容於下載時由 resolve_lrc_content 回退並回寫。
+_HAS_TRANSCRIPT = case(
+    (
+        or_(
+            func.length(func.trim(TranscriptionLog.lrc_content)) > 0,
+            and_(
+                TranscriptionLog.status == "COMPLETED",
+                exists().where(
+                    BatchJob.batch_id == TranscriptionLog.batch_id,
+                    BatchJob.results_json.isnot(None),
+                ),
+            ),
+        ),
+        True,
+    ),
+    else_=False,
+)
+
+# 列表 / 詳情查詢的載入選項：lrc_content 不離開 DB（誤存取時直接拋錯而非逐列 lazy load）
+_LIST_OPTIONS = (
+    defer(TranscriptionLog.lrc_content, raiseload=True),
+    with_expression(TranscriptionLog.has_transcript, _HAS_TRANSCRIPT),
+)
+
+
+# 列表排序：發起時間倒序，同時間以 task_uuid 決定先後（游標分頁需要全序）
+_LIST_ORDER = (desc(TranscriptionLog.request_timestamp), desc(TranscriptionLog.task_uuid))
+
+
+def encode_cursor(log: TranscriptionLog) -> Optional[str]:
+    """以最後一筆的 (request_timestamp, task_uuid) 產生不透明游標。"""
+    if log.request_timestamp is None:
+        return None
+    payload = json.dumps([log.request_timestamp.isoformat(), log.task_uuid.hex])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, _uuid_module.UUID]:
+    """解析游標；格式錯誤時拋出 ValueError。"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, task_uuid = json.loads(payload)
+        return datetime.fromisoformat(timestamp), _uuid_module.UUID(task_uuid)
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ValueError(f"無效的分頁游標: {cursor!r}") from e
+
+
+# 查詢 statement 一律在此建立，同步與非同步 Repository 只負責執行，避免兩邊的條件或排序各自演變
+def _cursor_page_statement(conditions: list, cursor: Optional[str], page_size: int):
+    """
+    游標分頁查詢：以 (request_timestamp, task_uuid) 的列比較接續上一頁，
+    由複合 index 直接定位，任何深度的頁面成本都與第一頁相同。
+    多取一筆判斷是否還有下一頁。
+    """
+    # 沒有發起時間的紀錄無法排入游標（欄位預設 now()，正常不會出現）
+    stmt = (
+        select(TranscriptionLog)
+        .options(*_LIST_OPTIONS)
+        .where(*conditions, TranscriptionLog.request_timestamp.isnot(None))
+    )
+    if cursor:
+        stmt = stmt.where(
+            tuple_(TranscriptionLog.request_timestamp, TranscriptionLog.task_uuid)
+            < decode_cursor(cursor)
+        )
+    return stmt.order_by(*_LIST_ORDER).limit(page_size + 1)
+
+
+def _count_statement(conditions: list):
+    return select(func.count()).select_from(TranscriptionLog).where(*conditions)
+
+
+def _offset_page_statement(conditions: list, page: int, page_size: int):
+    """OFFSET 分頁查詢（帶 has_transcript，不載入 lrc_content）。"""
+    return (
+        select(TranscriptionLog)
+        .options(*_LIST_OPTIONS)
+        .where(*conditions)
+        .order_by(*_LIST_ORDER)
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+    )
+
+
+def _log_by_uuid_statement(uuid_val: _uuid_module.UUID, *options):
+    """單筆紀錄查詢；列表 / 詳情傳入 _LIST_OPTIONS，下載與刪除需要完整欄位則不帶。"""
+    return (
+        select(TranscriptionLog)
+        .options(*options)
+        .where(TranscriptionLog.task_uuid == uuid_val)
+        .limit(1)
+    )
+
+
+def _active_single_statement(recent_hours: int):
+    """Task 頁面「活躍」單檔紀錄，以發起時間倒序。"""
+    return (
+        select(TranscriptionLog)
+        .options(*_LIST_OPTIONS)
+        .where(*_active_single_filters(recent_hours))
+        .order_by(desc(TranscriptionLog.request_timestamp))
+    )
+
+
+def _cursor_page(logs: List[TranscriptionLog], page_size: int) -> Tuple[List[TranscriptionLog], Optional[str]]:
+    if len(logs) <= page_size:
+        return logs, None
+    logs = logs[:page_size]
+    return logs, encode_cursor(logs[-1])
+
+
+class _TotalCache:
+    """
+    游標分頁的總筆數快取（每個進程一份），以篩選條件為 key。
+    COUNT 與表大小成正比，翻頁時不必每頁重算；數字最多落後 ttl_seconds。
+    """
+
+    _MAX_ENTRIES = 256
+
+    def __init__(self, ttl_seconds: float = HISTORY_TOTAL_CACHE_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[tuple, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and time.monotonic() - entry[0] < self.ttl_seconds:
+            return entry[1]
+        return None
+
+    def put(self, key: tuple, total: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self._MAX_ENTRIES:
+                self._entries = {
+                    k: v for k, v in self._entries.items() if now - v[0] < self.ttl_seconds
+                }
+                if len(self._entries) >= self._MAX_ENTRIES:
+                    self._entries.clear()
+            self._entries[key] = (now, total)
+
+
+_total_cache = _TotalCache()
+
+
+def _stats_response(
+    total, completed, failed, total_cost, total_tokens, total_duration, avg_processing_time,
+) -> dict:
+    total = total or 0
+    completed = completed or 0
+    total_cost = total_cost or 0.0
+    total_duration = total_duration or 0.0
+    avg_processing_time = avg_processing_time or 0.0
+    return {
+        "total_tasks": total,
+        "completed_tasks": completed,
+        "failed_tasks": failed or 0,
+        "success_rate": round(completed / total * 100, 1) if total > 0 else 0,
+        "total_cost": round(total_cost, 6),
+        "total_tokens": total_tokens or 0,
+        "total_audio_duration_seconds": round(total_duration, 1),
+        "avg_processing_time_seconds": round(avg_processing_time, 1),
+    }
+
+
+# 統計總覽以單一查詢取得所有彙總值
+_STATS_COLUMNS = (
+    func.count(TranscriptionLog.task_uuid),
+    func.count(TranscriptionLog.task_uuid).filter(TranscriptionLog.status == "COMPLETED"),
+    func.count(TranscriptionLog.task_uuid).filter(TranscriptionLog.status == "FAILED"),
+    func.sum(TranscriptionLog.cost),
+    func.sum(TranscriptionLog.total_tokens),
+    func.sum(TranscriptionLog.audio_duration_seconds),
+    func.avg(TranscriptionLog.processing_time_seconds).filter(TranscriptionLog.status == "COMPLETED"),
+)
+
 
 class HistoryRepository:
     """
@@ -31,61 +296,56 @@ class HistoryRepository:
     ) -> Tuple[List[TranscriptionLog], int]:
         """
         分頁查詢 TranscriptionLog，支援篩選。
-        回傳 (結果列表, 總筆數)。
+        回傳 (結果列表, 總筆數)；結果已帶 has_transcript，不載入 lrc_content。
         """
-        query = db.query(TranscriptionLog)
-
-        if status:
-            query = query.filter(TranscriptionLog.status == status)
-        if is_batch is not None:
-            query = query.filter(TranscriptionLog.is_batch == is_batch)
-        if start_date:
-            query = query.filter(TranscriptionLog.request_timestamp >= start_date)
-        if end_date:
-            query = query.filter(TranscriptionLog.request_timestamp <= end_date)
-        if keyword:
-            query = query.filter(
-                or_(
-                    TranscriptionLog.original_filename.ilike(f"%{keyword}%"),
-                    TranscriptionLog.model_used.ilike(f"%{keyword}%"),
-                )
-            )
+        conditions = _log_filters(status, is_batch, start_date, end_date, keyword)
+        total = db.scalar(_count_statement(conditions)) or 0
+        results = db.scalars(_offset_page_statement(conditions, page, page_size))
+        return list(results), total
 
-        total = query.count()
-        results = (
-            query.order_by(desc(TranscriptionLog.request_timestamp))
-            .offset((page - 1) * page_size)
-            .limit(page_size)
-            .all()
-        )
-        return results, total
+    def get_logs_by_cursor(
+        self,
+        db: Session,
+        cursor: Optional[str] = None,
+        page_size: int = 20,
+        status: Optional[str] = None,
+        is_batch: Optional[bool] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        keyword: Optional[str] = None,
+    ) -> Tuple[List[TranscriptionLog], Optional[str], int]:
+        """
+        游標分頁查詢 TranscriptionLog（篩選條件同 get_logs_paginated）。
+        回傳 (結果列表, 下一頁游標或 None, 總筆數)；總筆數取自快取，可能落後數秒。
+        cursor 無效時拋出 ValueError。
+        """
+        conditions = _log_filters(status, is_batch, start_date, end_date, keyword)
+        logs, next_cursor = _cursor_page(
+            list(db.scalars(_cursor_page_statement(conditions, cursor, page_size))), page_size)
+
+        cache_key = (status, is_batch, start_date, end_date, keyword)
+        total = _total_cache.get(cache_key)
+        if total is None:
+            total = db.scalar(_count_statement(conditions)) or 0
+            _total_cache.put(cache_key, total)
+        return logs, next_cursor, total
 
     def _coerce_uuid(self, task_uuid):
-        """確保 task_uuid 為 Python uuid.UUID 物件（相容 PostgreSQL 與 SQLite）。"""
-        if isinstance(task_uuid, _uuid_module.UUID):
-            return task_uuid
-        try:
-            return _uuid_module.UUID(str(task_uuid))
-        except (ValueError, AttributeError):
-            return None
+        return _coerce_uuid(task_uuid)
 
     def get_log_by_uuid(self, db: Session, task_uuid) -> Optional[TranscriptionLog]:
         """根據 task_uuid 查詢單筆紀錄。"""
         uuid_val = self._coerce_uuid(task_uuid)
         if uuid_val is None:
             return None
-        return db.query(TranscriptionLog).filter(
-            TranscriptionLog.task_uuid == uuid_val
-        ).first()
+        return db.scalar(_log_by_uuid_statement(uuid_val))
 
     def delete_log(self, db: Session, task_uuid) -> bool:
         """刪除單筆紀錄。"""
         uuid_val = self._coerce_uuid(task_uuid)
         if uuid_val is None:
             return False
-        log = db.query(TranscriptionLog).filter(
-            TranscriptionLog.task_uuid == uuid_val
-        ).first()
+        log = db.scalar(_log_by_uuid_statement(uuid_val))
         if log:
             db.delete(log)
             db.commit()
@@ -105,20 +365,7 @@ class HistoryRepository:
         排除批次任務 (is_batch=True)，避免與 BatchJob 區段重複。
         以發起時間倒序排列。
         """
-        cutoff = datetime.utcnow() - timedelta(hours=recent_hours)
-        return (
-            db.query(TranscriptionLog)
-            .filter(TranscriptionLog.is_batch.is_(False))
-            .filter(
-                or_(
-                    TranscriptionLog.status == "PROCESSING",
-                    (TranscriptionLog.status.in_(["COMPLETED", "FAILED"]))
-                    & (TranscriptionLog.request_timestamp >= cutoff),
-                )
-            )
-            .order_by(desc(TranscriptionLog.request_timestamp))
-            .all()
-        )
+        return list(db.scalars(_active_single_statement(recent_hours)))
 
     def resolve_lrc_content(
         self,
@@ -136,29 +383,7 @@ class HistoryRepository:
             return None
 
         job = db.query(BatchJob).filter(BatchJob.batch_id == log.batch_id).first()
-        if not job or not job.results_json:
-            return None
-
-        try:
-            results = json.loads(job.results_json)
-            file_log_uuids = json.loads(job.file_log_uuids_json or "{}")
-        except json.JSONDecodeError as e:
-            logger.warning(f"解析批次 {log.batch_id} 結果 JSON 失敗: {e}")
-            return None
-
-        task_uuid_str = str(log.task_uuid)
-        file_uid = None
-        for fuid, tuuid in file_log_uuids.items():
-            if str(tuuid) == task_uuid_str:
-                file_uid = fuid
-                break
-
-        if not file_uid:
-            return None
-
-        result = results.get(file_uid) or {}
-        transcripts = result.get("transcripts") or {}
-        lrc = (transcripts.get("lrc") or "").strip()
+        lrc = _lrc_from_batch_results(job, log)
         if not lrc:
             return None
 
@@ -169,38 +394,85 @@ class HistoryRepository:
                 db.refresh(log)
             except Exception as e:
                 db.rollback()
-                logger.warning(f"回寫 lrc_content 失敗 ({task_uuid_str}): {e}")
+                logger.warning(f"回寫 lrc_content 失敗 ({log.task_uuid}): {e}")
 
         return lrc
 
     def has_transcript(self, db: Session, log: TranscriptionLog) -> bool:
+        # 列表查詢已於 SQL 算好；其餘情況才讀取 lrc_content / 批次結果
+        if log.has_transcript is not None:
+            return bool(log.has_transcript)
         return bool(self.resolve_lrc_content(db, log, backfill=False))
 
     def get_stats(self, db: Session) -> dict:
         """取得統計總覽。"""
-        from sqlalchemy import func
-
-        total = db.query(func.count(TranscriptionLog.task_uuid)).scalar() or 0
-        completed = db.query(func.count(TranscriptionLog.task_uuid)).filter(
-            TranscriptionLog.status == "COMPLETED"
-        ).scalar() or 0
-        failed = db.query(func.count(TranscriptionLog.task_uuid)).filter(
-            TranscriptionLog.status == "FAILED"
-        ).scalar() or 0
-        total_cost = db.query(func.sum(TranscriptionLog.cost)).scalar() or 0.0
-        total_tokens = db.query(func.sum(TranscriptionLog.total_tokens)).scalar() or 0
-        total_duration = db.query(func.sum(TranscriptionLog.audio_duration_seconds)).scalar() or 0.0
-        avg_processing_time = db.query(func.avg(TranscriptionLog.processing_time_seconds)).filter(
-            TranscriptionLog.status == "COMPLETED"
-        ).scalar() or 0.0
-
-        return {
-            "total_tasks": total,
-            "completed_tasks": completed,
-            "failed_tasks": failed,
-            "success_rate": round(completed / total * 100, 1) if total > 0 else 0,
-            "total_cost": round(total_cost, 6),
-            "total_tokens": total_tokens,
-            "total_audio_duration_seconds": round(total_duration, 1),
-            "avg_processing_time_seconds": round(avg_processing_time, 1),
-        }
+        return _stats_response(*db.execute(select(*_STATS_COLUMNS)).one())
+
+
+class AsyncHistoryRepository:
+    """
+    HistoryRepository 的非同步版本，供 FastAPI 的 async 讀取端點使用。
+    只包含唯讀查詢；刪除與 lrc_content 回寫仍走同步版本。
+    """
+
+    async def get_logs_paginated(
+        self,
+        db: AsyncSession,
+        page: int = 1,
+        page_size: int = 20,
+        status: Optional[str] = None,
+        is_batch: Optional[bool] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        keyword: Optional[str] = None,
+    ) -> Tuple[List[TranscriptionLog], int]:
+        """
+        分頁查詢 TranscriptionLog，支援篩選。
+        回傳 (結果列表, 總筆數)；結果已帶 has_transcript，不載入 lrc_content。
+        """
+        conditions = _log_filters(status, is_batch, start_date, end_date, keyword)
+        total = await db.scalar(_count_statement(conditions)) or 0
+        results = await db.scalars(_offset_page_statement(conditions, page, page_size))
+        return list(results), total
+
+    async def get_logs_by_cursor(
+        self,
+        db: AsyncSession,
+        cursor: Optional[str] = None,
+        page_size: int = 20,
+        status: Optional[str] = None,
+        is_batch: Optional[bool] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        keyword: Optional[str] = None,
+    ) -> Tuple[List[TranscriptionLog], Optional[str], int]:
+        """游標分頁查詢（回傳與例外同 HistoryRepository.get_logs_by_cursor）。"""
+        conditions = _log_filters(status, is_batch, start_date, end_date, keyword)
+        results = await db.scalars(_cursor_page_statement(conditions, cursor, page_size))
+        logs, next_cursor = _cursor_page(list(results), page_size)
+
+        cache_key = (status, is_batch, start_date, end_date, keyword)
+        total = _total_cache.get(cache_key)
+        if total is None:
+            total = await db.scalar(_count_statement(conditions)) or 0
+            _total_cache.put(cache_key, total)
+        return logs, next_cursor, total
+
+    async def get_log_by_uuid(self, db: AsyncSession, task_uuid) -> Optional[TranscriptionLog]:
+        """根據 task_uuid 查詢單筆紀錄（帶 has_transcript，不載入 lrc_content）。"""
+        uuid_val = _coerce_uuid(task_uuid)
+        if uuid_val is None:
+            return None
+        return await db.scalar(_log_by_uuid_statement(uuid_val, *_LIST_OPTIONS))
+
+    async def get_active_single_tasks(
+        self,
+        db: AsyncSession,
+        recent_hours: int = 6,
+    ) -> List[TranscriptionLog]:
+        """取得單檔轉錄的「活躍」紀錄（條件同 HistoryRepository.get_active_single_tasks）。"""
+        return list(await db.scalars(_active_single_statement(recent_hours)))
+
+    async def get_stats(self, db: AsyncSession) -> dict:
+        """取得統計總覽。"""
+        return _stats_response(*(await db.execute(select(*_STATS_COLUMNS))).one())
@@ -1,5 +1,5 @@
 import uuid
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterable, List, Optional
 from sqlalchemy.orm import Session
 from app.database.models import TranscriptionLog
 
@@ -58,3 +58,51 @@ class TranscriptionLogRepository:
             db.refresh(log_to_update)
             return log_to_update
         return None
+
+    def apply_updates(self, db: Session, updates: Dict[str, Dict[str, Any]]) -> List[str]:
+        """
+        在同一個交易中套用多筆日誌更新（write-behind 佇列批次寫入用）。
+
+        :param db: SQLAlchemy Session.
+        :param updates: {task_uuid: 要更新欄位和值的字典}。
+        :return: 找不到對應日誌的 task_uuid 列表。
+        """
+        missing = []
+        for task_uuid, update_data in updates.items():
+            uuid_val = self._coerce_task_uuid(task_uuid)
+            matched = 0
+            if uuid_val is not None:
+                matched = db.query(TranscriptionLog).filter(
+                    TranscriptionLog.task_uuid == uuid_val).update(update_data, synchronize_session=False)
+            if not matched:
+                missing.append(task_uuid)
+        db.commit()
+        return missing
+
+    def get_logs_by_uuids(self, db: Session, task_uuids: Iterable) -> Dict[str, TranscriptionLog]:
+        """
+        一次查詢多筆日誌（批次結果處理判斷哪些檔案已完成用）。
+
+        :param db: SQLAlchemy Session.
+        :param task_uuids: 日誌 UUID（字串或 UUID）。
+        :return: {str(task_uuid): TranscriptionLog}，找不到的 UUID 不會出現在結果中。
+        """
+        uuid_vals = [u for u in (self._coerce_task_uuid(t) for t in task_uuids) if u is not None]
+        if not uuid_vals:
+            return {}
+        logs = db.query(TranscriptionLog).filter(TranscriptionLog.task_uuid.in_(uuid_vals)).all()
+        return {str(log.task_uuid): log for log in logs}
+
+    def get_logs_by_batch(self, db: Session, batch_id: str, status: Optional[str] = None) -> List[TranscriptionLog]:
+        """
+        查詢屬於某個批次（分片）的日誌。
+
+        :param db: SQLAlchemy Session.
+        :param batch_id: 日誌記錄的 batch_id。
+        :param status: 只取此狀態的日誌；None 表示不限。
+        :return: TranscriptionLog 列表。
+        """
+        query = db.query(TranscriptionLog).filter(TranscriptionLog.batch_id == batch_id)
+        if status is not None:
+            query = query.filter(TranscriptionLog.status == status)
+        return query.all()
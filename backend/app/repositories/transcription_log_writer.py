@@ -0,0 +1,125 @@
+"""transcription_logs 狀態更新的 write-behind 佇列。
+
+Celery 任務不再為了幾次狀態轉換而整段持有 DB session：更新先放進進程內佇列，
+同一 task_uuid 的多次更新合併為一筆，由背景執行緒每
+``TRANSCRIPTION_LOG_FLUSH_INTERVAL_SECONDS`` 秒（或累積
+``TRANSCRIPTION_LOG_WRITE_BATCH_SIZE`` 筆）以一個短交易寫入。連線只在實際寫入時借用。
+
+前端收到後會立即讀取 DB 的狀態（例如 COMPLETED 後下載其他格式），
+呼叫端需在推播前呼叫 ``flush()``，確保資料已提交。
+"""
+
+from __future__ import annotations
+
+import atexit
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.repositories.transcription_log_repository import TranscriptionLogRepository
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_settings = get_settings()
+TRANSCRIPTION_LOG_FLUSH_INTERVAL_SECONDS = _settings.transcription_log_flush_interval_seconds
+TRANSCRIPTION_LOG_WRITE_BATCH_SIZE = _settings.transcription_log_write_batch_size
+
+
+class TranscriptionLogWriter:
+    """合併並批次寫入 transcription_logs 的更新。
+
+    ``flush()`` 在寫入鎖內取出並寫入目前所有待寫更新，背景 flusher 與呼叫端
+    之間不會交錯，同一 task_uuid 的更新依提交順序落地。批次交易失敗時改為逐筆寫入，
+    單筆錯誤不會拖累同批其他日誌。
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        repo: Optional[TranscriptionLogRepository] = None,
+        flush_interval_seconds: float = TRANSCRIPTION_LOG_FLUSH_INTERVAL_SECONDS,
+        max_batch_size: int = TRANSCRIPTION_LOG_WRITE_BATCH_SIZE,
+    ):
+        if session_factory is None:
+            from app.database.session import SessionLocal
+            session_factory = SessionLocal
+        self._session_factory = session_factory
+        self._repo = repo or TranscriptionLogRepository()
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_batch_size = max_batch_size
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._flusher: Optional[threading.Thread] = None
+
+    def submit(self, task_uuid, update_data: Dict[str, Any]) -> None:
+        """加入一筆日誌更新；與尚未寫入的同一 task_uuid 更新合併"""
+        with self._cond:
+            self._pending.setdefault(str(task_uuid), {}).update(update_data)
+            self._ensure_flusher()
+            if len(self._pending) >= self.max_batch_size:
+                self._cond.notify()
+
+    def flush(self) -> None:
+        """立即寫入目前所有待寫的更新，寫入完成才返回"""
+        with self._write_lock:
+            with self._cond:
+                batch, self._pending = self._pending, {}
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: Dict[str, Dict[str, Any]]) -> None:
+        try:
+            with self._session_factory() as db:
+                missing = self._repo.apply_updates(db, batch)
+        except Exception as e:
+            logger.error(f"批次寫入 {len(batch)} 筆轉錄日誌失敗，改為逐筆寫入: {e}")
+            missing = []
+            for task_uuid, update_data in batch.items():
+                try:
+                    with self._session_factory() as db:
+                        missing.extend(self._repo.apply_updates(db, {task_uuid: update_data}))
+                except Exception as item_error:
+                    logger.error(f"寫入轉錄日誌 {task_uuid} 失敗: {item_error}")
+        for task_uuid in missing:
+            logger.warning(f"找不到要更新的轉錄日誌 (可能 task_uuid 不符): {task_uuid}")
+
+    def _ensure_flusher(self) -> None:
+        # 首次有待寫更新時才啟動（prefork 子進程 fork 之後才建立執行緒）
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(
+                target=self._run_flusher, name="transcription-log-writer", daemon=True)
+            self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                self._cond.wait_for(
+                    lambda: len(self._pending) >= self.max_batch_size,
+                    timeout=self.flush_interval_seconds,
+                )
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"寫入轉錄日誌更新時失敗: {e}")
+
+
+_log_writer_instance: Optional[TranscriptionLogWriter] = None
+_log_writer_lock = threading.Lock()
+
+
+def get_transcription_log_writer() -> TranscriptionLogWriter:
+    """取得進程內共用的 TranscriptionLogWriter（進程結束前寫入剩餘更新）"""
+    global _log_writer_instance
+
+    if _log_writer_instance is None:
+        with _log_writer_lock:
+            if _log_writer_instance is None:
+                _log_writer_instance = TranscriptionLogWriter()
+                atexit.register(_log_writer_instance.flush)
+    return _log_writer_instance
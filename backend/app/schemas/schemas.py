@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Union
 from pydantic import ConfigDict
 
 
@@ -60,7 +60,7 @@ class WebSocketTranscriptionRequest(BaseModel):
     original_filename: str
     provider: str
     model: str
-    api_keys: str  # 注意：這是單個字符串，不是列表
+    api_keys: Union[str, List[str]]  # 單一 Key 或多把 Key（由 worker 的 client 池分流）
     source_lang: str
     target_lang: Optional[str] = None  # 新增: 目標語言
     prompt: Optional[str] = None
@@ -70,6 +70,12 @@ class WebSocketTranscriptionRequest(BaseModel):
     session_id: Optional[str] = None  # 同一次 Start 的任務群組 ID
 
 
+class WebSocketSessionSubmit(WebSocketTranscriptionRequest):
+    """Session WebSocket 上提交單一檔案的訊息（``{"type": "submit", ...}``）"""
+    type: str = "submit"
+    file_uid: str
+
+
 class BatchFileItem(BaseModel):
     """批次處理中的單一檔案項目"""
     filename: str
@@ -82,7 +88,7 @@ class WebSocketBatchRequest(BaseModel):
     files: List[BatchFileItem]
     provider: str
     model: str
-    api_keys: str
+    api_keys: Union[str, List[str]]
     source_lang: str
     target_lang: Optional[str] = None
     prompt: Optional[str] = None
@@ -178,9 +184,10 @@ class HistoryListResponse(BaseModel):
     """GET /history 的分頁回應"""
     items: List[HistoryLogResponse]
     total: int
-    page: int
+    page: Optional[int] = None          # 游標分頁時為 None
     page_size: int
     total_pages: int
+    next_cursor: Optional[str] = None   # 還有下一頁時，帶入 ?cursor= 取得下一頁
 
 
 class HistoryStatsResponse(BaseModel):
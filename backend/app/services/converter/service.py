@@ -1,5 +1,5 @@
 import re
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from app.utils.logger import setup_logger
 from .models import SubtitleFormats
@@ -33,8 +33,8 @@ def _parse_lrc(lrc_text: str) -> List[_ParsedLine]:
         return parsed_lines
 
     for line in lrc_text.strip().split('\n'):
-        # 匹配 [mm:ss.xx] 或 [mm:ss.xxx] 格式
-        match = re.match(r'\[(\d{2}):(\d{2})\.(\d{2,3})\](.*)', line)
+        # 匹配 [mm:ss.xx] 或 [mm:ss.xxx] 格式（超過 99 分鐘時 mm 可為三位數）
+        match = re.match(r'\[(\d{2,}):(\d{2})\.(\d{2,3})\](.*)', line)
         if match:
             minutes, seconds, ms_str, text_content = match.groups()
             time_in_seconds = int(
@@ -91,6 +91,16 @@ def _to_txt(lines: List[_ParsedLine]) -> str:
     return "\n".join(line.text for line in lines)
 
 
+def compact_transcripts(lrc_text: Optional[str]) -> Dict[str, str]:
+    """
+    完成訊息與 batch_jobs.results_json 使用的精簡轉錄結果：只帶 LRC。
+
+    SRT / VTT / TXT 由 ``/history/{task_uuid}/download/{fmt}`` 從 DB 中的 LRC
+    即時轉換，不再隨每則完成訊息經過 Redis、API 與 WebSocket 傳送四份。
+    """
+    return {"lrc": lrc_text or ""}
+
+
 def convert_from_lrc(lrc_text: str) -> SubtitleFormats:
     """
     接收 LRC 格式的純文字，並將其轉換為所有支援的字幕格式。
@@ -0,0 +1,233 @@
+"""轉錄結果快取（內容定址）。
+
+同一段錄音常被重複送出（前端重試、重新送出同一批檔案、不同使用者上傳
+同一個檔案），每次都要付一次完整的 Gemini 費用。快取 key 由以下內容的
+SHA-256 組成：
+
+- 解碼後 16kHz PCM 的雜湊（解碼失敗時退回原始檔案位元組的雜湊）
+- 模型名稱
+- ``build_prompt`` 產生的最終 prompt（已包含語言、多人對話等選項）
+- service tier（standard / flex / batch）
+
+值為時間軸已對齊原始音檔的 LRC 與當時的 token 用量。快取存放在 Redis，
+所有 worker 共用：每筆帶 TTL（命中時重新計算），另以 sorted set 記錄最近存取時間，
+超過筆數上限時淘汰最久未使用者；命中 / 未命中次數與省下的 token 數
+記在同一組計數器。Redis 無法使用時一律視為未命中，不影響轉錄。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import redis
+
+from app.core.config import get_settings
+from app.utils.audio import AudioAsset
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_settings = get_settings()
+TRANSCRIPT_CACHE_ENABLED = _settings.transcript_cache_enabled
+TRANSCRIPT_CACHE_TTL_SECONDS = _settings.transcript_cache_ttl_seconds
+TRANSCRIPT_CACHE_MAX_ENTRIES = _settings.transcript_cache_max_entries
+
+# 批次轉錄使用的 service tier 名稱（與單檔的 standard / flex 分開快取）
+BATCH_SERVICE_TIER = "batch"
+
+_KEY_PREFIX = "transcript_cache:"
+_ENTRY_PREFIX = f"{_KEY_PREFIX}entry:"
+_LRU_KEY = f"{_KEY_PREFIX}lru"
+_STATS_KEY = f"{_KEY_PREFIX}stats"
+
+
+@dataclass
+class CachedTranscript:
+    """快取的轉錄結果：原始時間軸的 LRC 與產生時的 token 用量"""
+    lrc_text: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    total_tokens: int = 0
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, data) -> "CachedTranscript":
+        return cls(**json.loads(data))
+
+
+def audio_fingerprint(source_path: Path, asset: Optional[AudioAsset] = None) -> Optional[str]:
+    """音訊內容的 SHA-256：優先使用解碼後的 PCM，沒有 AudioAsset 時雜湊原始檔案；失敗回傳 None"""
+    try:
+        if asset is not None:
+            return f"pcm:{asset.sha256()}"
+        digest = hashlib.sha256()
+        with open(source_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return f"file:{digest.hexdigest()}"
+    except OSError as e:
+        logger.warning(f"無法計算音訊雜湊 ({Path(source_path).name}): {e}")
+        return None
+
+
+def transcript_cache_key(
+    audio_hash: str,
+    model: str,
+    prompt: str,
+    service_tier: Optional[str] = None,
+) -> str:
+    """組合快取 key（音訊雜湊 + 模型 + 最終 prompt + service tier）"""
+    payload = json.dumps(
+        [audio_hash, model, prompt, service_tier or "standard"], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _RedisTranscriptStore:
+    """Redis 上的共用快取：entry 帶 TTL（命中時延長），sorted set 依最近存取時間淘汰"""
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        max_entries: int = TRANSCRIPT_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = TRANSCRIPT_CACHE_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._redis = client
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+
+    def get(self, key: str) -> Optional[str]:
+        entry_key = f"{_ENTRY_PREFIX}{key}"
+        value = self._redis.get(entry_key)
+        if value is None:
+            self._redis.zrem(_LRU_KEY, key)
+            return None
+        # 命中即視為最近使用：延長 TTL 並更新 LRU 索引（put 以最近存取時間清理過期 entry）
+        pipe = self._redis.pipeline()
+        pipe.expire(entry_key, self.ttl_seconds)
+        pipe.zadd(_LRU_KEY, {key: self._clock()})
+        pipe.execute()
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def contains(self, key: str) -> bool:
+        return bool(self._redis.exists(f"{_ENTRY_PREFIX}{key}"))
+
+    def put(self, key: str, value: str) -> None:
+        now = self._clock()
+        pipe = self._redis.pipeline()
+        pipe.set(f"{_ENTRY_PREFIX}{key}", value, ex=self.ttl_seconds)
+        pipe.zadd(_LRU_KEY, {key: now})
+        # 最近存取早於 TTL 的 entry 已過期，順手從 LRU 索引移除
+        pipe.zremrangebyscore(_LRU_KEY, "-inf", now - self.ttl_seconds)
+        pipe.zcard(_LRU_KEY)
+        size = pipe.execute()[-1]
+
+        excess = size - self.max_entries
+        if excess > 0:
+            evicted = [member for member, _ in self._redis.zpopmin(_LRU_KEY, excess)]
+            if evicted:
+                self._redis.delete(*[
+                    f"{_ENTRY_PREFIX}{m.decode('utf-8') if isinstance(m, bytes) else m}"
+                    for m in evicted
+                ])
+                logger.info(f"轉錄快取超過 {self.max_entries} 筆，淘汰 {len(evicted)} 筆最久未使用的結果")
+
+    def incr(self, field: str, amount: int = 1) -> None:
+        self._redis.hincrby(_STATS_KEY, field, amount)
+
+    def stats(self) -> Dict[str, int]:
+        raw = self._redis.hgetall(_STATS_KEY)
+        stats = {
+            (k.decode("utf-8") if isinstance(k, bytes) else k): int(v)
+            for k, v in raw.items()
+        }
+        stats["entries"] = self._redis.zcard(_LRU_KEY)
+        return stats
+
+
+class TranscriptCache:
+    """轉錄結果快取；store 為 None 時停用（get 永遠未命中、put 不做事）"""
+
+    def __init__(self, store):
+        self._store = store
+
+    @property
+    def enabled(self) -> bool:
+        return self._store is not None
+
+    def get(self, key: Optional[str]) -> Optional[CachedTranscript]:
+        """查詢快取並累計命中 / 未命中次數；任何錯誤都視為未命中"""
+        if self._store is None or not key:
+            return None
+        try:
+            value = self._store.get(key)
+            if value is None:
+                self._store.incr("misses")
+                return None
+            cached = CachedTranscript.from_json(value)
+            self._store.incr("hits")
+            self._store.incr("tokens_saved", cached.total_tokens)
+            logger.info(f"轉錄快取命中 key={key[:12]} (省下 {cached.total_tokens:,} tokens)")
+            return cached
+        except Exception as e:
+            logger.warning(f"查詢轉錄快取失敗，視為未命中: {e}")
+            return None
+
+    def contains(self, key: Optional[str]) -> bool:
+        """是否已有快取結果；不累計命中統計、不更新最近存取時間（只用於判斷可否略過前處理）"""
+        if self._store is None or not key:
+            return False
+        try:
+            return self._store.contains(key)
+        except Exception as e:
+            logger.warning(f"查詢轉錄快取失敗，視為未命中: {e}")
+            return False
+
+    def put(self, key: Optional[str], transcript: CachedTranscript) -> None:
+        """寫入轉錄結果；空白 LRC 不快取"""
+        if self._store is None or not key or not transcript.lrc_text:
+            return
+        try:
+            self._store.put(key, transcript.to_json())
+        except Exception as e:
+            logger.warning(f"寫入轉錄快取失敗: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        """命中 / 未命中次數、省下的 token 數與目前筆數"""
+        if self._store is None:
+            return {}
+        try:
+            return self._store.stats()
+        except Exception as e:
+            logger.warning(f"讀取轉錄快取統計失敗: {e}")
+            return {}
+
+
+_transcript_cache_instance: Optional[TranscriptCache] = None
+_transcript_cache_lock = threading.Lock()
+
+
+def get_transcript_cache() -> TranscriptCache:
+    """取得進程內共用的轉錄快取（資料存放於 Redis，所有 worker 共用）"""
+    global _transcript_cache_instance
+
+    if _transcript_cache_instance is None:
+        with _transcript_cache_lock:
+            if _transcript_cache_instance is None:
+                store = None
+                if TRANSCRIPT_CACHE_ENABLED:
+                    try:
+                        store = _RedisTranscriptStore(redis.from_url(_settings.redis_url))
+                    except Exception as e:
+                        logger.warning(f"無法建立轉錄快取，停用快取: {e}")
+                _transcript_cache_instance = TranscriptCache(store)
+    return _transcript_cache_instance
@@ -0,0 +1,132 @@
+"""單檔轉錄的階段 checkpoint（以 Celery task id 為 key）。
+
+``transcribe_media_task`` 遇到 GeminiTransientError 時由 Celery autoretry
+從頭再執行一次；若沒有 checkpoint，每次重試都會重新建立 log、探測時長、
+跑 VAD、切塊並重新轉錄已完成的片段，實際失敗的往往只是最後一次
+generate 呼叫。每完成一個階段就寫入一筆：
+
+- ``log``：transcription_log 已建立
+- ``duration``：音檔時長
+- ``vad:<檔名>``：VAD 結果（純語音檔路徑、語音區段、待清理檔案）
+- ``chunks:<檔名>``：長音檔切塊結果
+- ``result:<檔名>``：成功的轉錄結果（整檔或單一片段，時間軸尚未校正）
+
+重試時同一 task id 的 checkpoint 仍在，已完成的階段直接沿用（暫存檔在重試
+前保留不刪）；上傳檔由 Gemini 檔案登記表以內容雜湊沿用，不另外記錄。
+任務成功或最終失敗時清除；Redis 無法使用時視同沒有 checkpoint，照常從頭執行。
+
+同一份 checkpoint 也是 CPU 佇列前處理任務（``preprocess_media_task``）與 I/O
+佇列轉錄任務之間的交接：前處理先寫入 ``duration`` / ``chunks`` / ``vad``，
+轉錄任務以相同 task id 讀取後直接上傳與轉錄。
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any, Optional
+
+import redis
+
+from app.core.config import get_settings
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_settings = get_settings()
+TRANSCRIPTION_CHECKPOINT_ENABLED = _settings.transcription_checkpoint_enabled
+TRANSCRIPTION_CHECKPOINT_TTL_SECONDS = _settings.transcription_checkpoint_ttl_seconds
+
+_KEY_PREFIX = "transcription_checkpoint:"
+
+
+class _RedisCheckpointStore:
+    """Redis 上的 checkpoint：每個任務一個 hash，每次寫入都延長 TTL"""
+
+    def __init__(self, client: redis.Redis, ttl_seconds: int = TRANSCRIPTION_CHECKPOINT_TTL_SECONDS):
+        self._redis = client
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, task_id: str, stage: str) -> Optional[str]:
+        value = self._redis.hget(f"{_KEY_PREFIX}{task_id}", stage)
+        if value is None:
+            return None
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set(self, task_id: str, stage: str, value: str) -> None:
+        key = f"{_KEY_PREFIX}{task_id}"
+        pipe = self._redis.pipeline()
+        pipe.hset(key, stage, value)
+        pipe.expire(key, self.ttl_seconds)
+        pipe.execute()
+
+    def delete(self, task_id: str) -> None:
+        self._redis.delete(f"{_KEY_PREFIX}{task_id}")
+
+
+class TaskCheckpoint:
+    """單一任務的 checkpoint；store 為 None 時停用（get 永遠回傳 None、set 不做事）。
+
+    值以 JSON 儲存；讀寫錯誤只記錄警告，不影響轉錄。
+    """
+
+    def __init__(self, store, task_id: Optional[str]):
+        self._store = store if task_id else None
+        self.task_id = task_id
+
+    @property
+    def enabled(self) -> bool:
+        return self._store is not None
+
+    def get(self, stage: str) -> Optional[Any]:
+        if self._store is None:
+            return None
+        try:
+            value = self._store.get(self.task_id, stage)
+            return json.loads(value) if value is not None else None
+        except Exception as e:
+            logger.warning(f"讀取 checkpoint 失敗 ({self.task_id} {stage}): {e}")
+            return None
+
+    def set(self, stage: str, value: Any) -> None:
+        if self._store is None:
+            return
+        try:
+            self._store.set(self.task_id, stage, json.dumps(value, ensure_ascii=False))
+        except Exception as e:
+            logger.warning(f"寫入 checkpoint 失敗 ({self.task_id} {stage}): {e}")
+
+    def clear(self) -> None:
+        if self._store is None:
+            return
+        try:
+            self._store.delete(self.task_id)
+        except Exception as e:
+            logger.warning(f"清除 checkpoint 失敗 ({self.task_id}): {e}")
+
+
+_checkpoint_store_instance = None
+_checkpoint_store_initialized = False
+_checkpoint_store_lock = threading.Lock()
+
+
+def _get_checkpoint_store():
+    """取得進程內共用的 checkpoint store（Redis）；停用或無法連線時回傳 None"""
+    global _checkpoint_store_instance, _checkpoint_store_initialized
+
+    if not _checkpoint_store_initialized:
+        with _checkpoint_store_lock:
+            if not _checkpoint_store_initialized:
+                if TRANSCRIPTION_CHECKPOINT_ENABLED:
+                    try:
+                        _checkpoint_store_instance = _RedisCheckpointStore(
+                            redis.from_url(_settings.redis_url))
+                    except Exception as e:
+                        logger.warning(f"無法建立轉錄 checkpoint store，停用 checkpoint: {e}")
+                _checkpoint_store_initialized = True
+    return _checkpoint_store_instance
+
+
+def get_task_checkpoint(task_id: Optional[str]) -> TaskCheckpoint:
+    """取得指定 Celery task id 的 checkpoint"""
+    return TaskCheckpoint(_get_checkpoint_store(), task_id)
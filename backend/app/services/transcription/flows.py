@@ -1,19 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Optional
 
 from app.core.config import get_settings
+from app.exceptions import GeminiTransientError
 from app.utils.logger import setup_logger
-from app.utils.audio import get_audio_duration as _ffprobe_duration, convert_to_wav
-from app.provider.google.gemini import (
-    upload_file_to_gemini,
-    transcribe_with_uploaded_file,
-    cleanup_gemini_file
-)
+from app.utils.audio import AudioAsset, encode_for_upload, get_audio_duration as _ffprobe_duration
+from app.provider.google.file_registry import acquire_gemini_file, release_gemini_file
+from app.provider.google.gemini import transcribe_with_uploaded_file
 from app.services.converter.service import _parse_lrc
 from app.services.vad.preprocess import run_vad_extraction
 from app.services.vad.artifacts import persist_speech_extraction, persist_split
 from app.services.vad.service import get_vad_service
 
+from .checkpoint import TaskCheckpoint
 from .models import (
     TranscriptionTaskResult
 )
@@ -23,6 +23,9 @@ logger = setup_logger(__name__)
 _settings = get_settings()
 # 語音佔比 >= 此閾值時跳過 VAD 預處理；低於則使用純語音檔轉錄
 VAD_SPEECH_RATIO_SKIP_THRESHOLD = _settings.vad_speech_ratio_skip_threshold
+# 上傳前 wav 的編碼格式（opus / flac / wav）
+UPLOAD_AUDIO_CODEC = _settings.upload_audio_codec
+UPLOAD_OPUS_BITRATE_KBPS = _settings.upload_opus_bitrate_kbps
 
 
 def _remap_lrc_timestamps(lrc_text: str, segments: List[Dict[str, float]]) -> str:
@@ -70,7 +73,7 @@ def _adjust_lrc_timestamps(lrc_text: str, offset_seconds: float) -> str:
         return lrc_text
     adjusted_lines = []
     for line in lrc_text.strip().split('\n'):
-        match = re.match(r'\[(\d{2}):(\d{2})\.(\d{2,3})\](.*)', line)
+        match = re.match(r'\[(\d{2,}):(\d{2})\.(\d{2,3})\](.*)', line)
         if match:
             minutes, seconds, ms_str, text_content = match.groups()
             original_time = int(minutes) * 60 + \
@@ -115,6 +118,8 @@ class TranscriptionTask:
         service_tier: Optional[str] = None,
         artifact_task_id: Optional[str] = None,
         original_filename: Optional[str] = None,
+        audio_asset: Optional[AudioAsset] = None,
+        checkpoint: Optional[TaskCheckpoint] = None,
     ):
         self.client = client
         self.model = model
@@ -126,8 +131,17 @@ class TranscriptionTask:
         self.original_filename = original_filename
         self.local_cleanup_list = []
         self.gemini_cleanup_list = []
-        self.max_duration_seconds = get_settings().transcription_max_duration_seconds
+        settings = get_settings()
+        self.max_duration_seconds = settings.transcription_max_duration_seconds
+        self.chunk_target_seconds = settings.transcription_chunk_target_seconds
+        self.chunk_concurrency = max(1, settings.transcription_chunk_concurrency)
         self.original_file = None  # 明確標記原始檔案
+        # 階段 checkpoint：重試時沿用已完成的 VAD / 切塊 / 片段轉錄結果
+        self.checkpoint = checkpoint or TaskCheckpoint(None, None)
+        # 已解碼的 16kHz PCM 資源（以音檔路徑為 key），時長 / VAD / 分割共用
+        self._assets: Dict[Path, AudioAsset] = {}
+        if audio_asset is not None:
+            self._register_asset(audio_asset.source_path, audio_asset)
 
         # 使用單例 VAD 服務
         try:
@@ -137,15 +151,18 @@ class TranscriptionTask:
             logger.warning(f"無法取得 VAD 服務: {e}")
             self.vad_service = None
 
-    def transcribe_audio(self, audio_path: Path) -> TranscriptionTaskResult:
+    def transcribe_audio(self, audio_path: Path, allow_chunking: bool = True) -> TranscriptionTaskResult:
         """
         轉錄音訊檔案的主要方法
 
         流程：
+        0. 長音檔（>= 1.5 倍切塊目標時長）直接在靜音處切成 N 塊並行轉錄
         1. VAD 靜音移除 → 建立純語音檔案
         2. 轉錄純語音檔案
         3. 時間戳重映射回原始時間軸
         4. 如果轉錄失敗且檔案夠長，嘗試分割重試
+
+        allow_chunking=False 用於已切好的片段，避免再次切塊。
         """
         logger.info(f"開始轉錄音訊: {audio_path.name}")
 
@@ -166,6 +183,13 @@ class TranscriptionTask:
                 total_tokens=0
             )
 
+        # --- 長音檔預先切塊並行轉錄 ---
+        if allow_chunking and self._should_chunk(duration):
+            chunked_result = self._transcribe_in_chunks(audio_path, duration)
+            if chunked_result is not None:
+                return chunked_result
+            logger.warning("預先切塊失敗，改以整檔轉錄")
+
         # --- VAD 靜音移除前處理 ---
         speech_segments = None
         transcription_path = audio_path  # 預設直接使用原始檔案
@@ -218,16 +242,155 @@ class TranscriptionTask:
 
         return result
 
+    def prepare(self, audio_path: Path) -> None:
+        """只執行 CPU 密集的前處理（解碼、切塊、VAD），結果寫入 checkpoint。
+
+        由 CPU 佇列的前處理任務呼叫；I/O 佇列的轉錄任務以同一個 checkpoint
+        執行 transcribe_audio 時直接沿用，不在 gevent worker 內跑 VAD。
+        產生的暫存檔留給轉錄任務使用並清理。
+        """
+        if not self.checkpoint.enabled or not self.vad_service:
+            return
+        duration = self._get_audio_duration(audio_path)
+        if duration is None:
+            return
+
+        if self._should_chunk(duration):
+            chunks = self._plan_chunks(audio_path)
+            if chunks is not None:
+                for chunk in chunks:
+                    self._extract_speech_only(chunk.path)
+                return
+        self._extract_speech_only(audio_path)
+
+    def _should_chunk(self, duration: float) -> bool:
+        """音檔可切成至少 2 塊目標時長時才預先切塊"""
+        if not self.vad_service or self.chunk_target_seconds <= 0:
+            return False
+        return round(duration / self.chunk_target_seconds) >= 2
+
+    def _transcribe_in_chunks(self, audio_path: Path, duration: float) -> Optional[TranscriptionTaskResult]:
+        """在靜音處將長音檔切成 N 塊，以有限併發並行轉錄後接回原始時間軸。
+
+        回傳 None 表示切塊本身失敗，呼叫端應回退為整檔流程。
+        """
+        if self.status_callback:
+            self.status_callback("切割長音檔...")
+
+        chunks = self._plan_chunks(audio_path)
+        if chunks is None:
+            return None
+
+        total = len(chunks)
+        workers = min(self.chunk_concurrency, total)
+        logger.info(
+            f"長音檔 {audio_path.name} ({duration:.1f}s) 切為 {total} 塊，併發 {workers} 路轉錄")
+        if self.status_callback:
+            self.status_callback(f"並行轉錄 {total} 個片段...")
+
+        def _transcribe_chunk(index: int) -> TranscriptionTaskResult:
+            chunk = chunks[index]
+            logger.info(f"轉錄片段 {index + 1}/{total}: {chunk}")
+            return self.transcribe_audio(chunk.path, allow_chunking=False)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            chunk_results = list(executor.map(_transcribe_chunk, range(total)))
+
+        return self._merge_segment_results(chunks, chunk_results)
+
+    def _plan_chunks(self, audio_path: Path) -> Optional[List[AudioSegment]]:
+        """在靜音處切塊（或沿用 checkpoint 的切塊結果）；不足 2 塊時回傳 None"""
+        # 重試時沿用上一次的切塊結果（片段檔在重試前保留不刪）
+        stage = f"chunks:{audio_path.name}"
+        chunk_specs = self.checkpoint.get(stage)
+        if chunk_specs and all(Path(path).exists() for path, _, _ in chunk_specs):
+            logger.info(f"沿用 checkpoint 的切塊結果: {len(chunk_specs)} 塊")
+        else:
+            # 切塊讀取 temp_dir 下同一份 PCM 快取，不再另外轉 wav
+            chunk_specs = self.vad_service.split_audio_into_chunks(
+                audio_path=str(audio_path),
+                output_dir=str(self.temp_dir),
+                target_chunk_seconds=self.chunk_target_seconds,
+            )
+            if len(chunk_specs) < 2:
+                return None
+            self.checkpoint.set(stage, [[str(path), start, end] for path, start, end in chunk_specs])
+
+        chunks = [
+            AudioSegment(path=Path(path), start_time=start, duration=end - start)
+            for path, start, end in chunk_specs
+        ]
+        for chunk in chunks:
+            if chunk.path not in self.local_cleanup_list:
+                self.local_cleanup_list.append(chunk.path)
+            self._register_asset(chunk.path, AudioAsset.open(chunk.path, self.temp_dir))
+        return chunks
+
+    def _merge_segment_results(
+        self,
+        segments: List[AudioSegment],
+        segment_results: List[TranscriptionTaskResult],
+    ) -> TranscriptionTaskResult:
+        """依片段開始時間校正時間戳並合併轉錄結果，任一片段失敗即視為失敗"""
+        results = []
+        total_input_tokens = 0
+        total_output_tokens = 0
+        total_tokens = 0
+        all_flex = True  # 所有片段皆用 flex 才回報 "flex"，只要有一段 fallback 就視為 standard
+
+        for i, (segment, segment_result) in enumerate(zip(segments, segment_results)):
+            total_input_tokens += segment_result.input_tokens
+            total_output_tokens += segment_result.output_tokens
+            total_tokens += segment_result.total_tokens
+
+            if not segment_result.success:
+                logger.error(f"片段 {i+1} 轉錄失敗")
+                return TranscriptionTaskResult(
+                    success=False,
+                    text=f"[[片段 {i+1} 轉錄失敗]]",
+                    total_tokens=total_tokens
+                )
+
+            results.append(self._adjust_timestamps(
+                segment_result.text,
+                segment.start_time
+            ))
+            if segment_result.service_tier_used != "flex":
+                all_flex = False
+
+        final_tier = "flex" if (self.service_tier == "flex" and all_flex) else "standard"
+
+        return TranscriptionTaskResult(
+            success=True,
+            text="\n".join(results),
+            input_tokens=total_input_tokens,
+            output_tokens=total_output_tokens,
+            total_tokens=total_tokens,
+            service_tier_used=final_tier,
+        )
+
     def _extract_speech_only(self, audio_path: Path) -> Optional[dict]:
         """使用 VAD 提取純語音檔案。
 
         實際 VAD 流程由 :mod:`app.services.vad.preprocess` 共用實作，
         此處只負責呼叫 callback、把產生的暫存檔登記進 cleanup 列表。
         """
+        stage = f"vad:{audio_path.name}"
+        saved = self.checkpoint.get(stage)
+        if saved and Path(saved["speech_only_path"]).exists():
+            logger.info(f"沿用 checkpoint 的 VAD 結果: {audio_path.name}")
+            for cf in saved.pop("cleanup_files", []):
+                if Path(cf) not in self.local_cleanup_list:
+                    self.local_cleanup_list.append(Path(cf))
+            return saved
+
         if self.status_callback:
             self.status_callback("分析語音活動...")
 
-        result = run_vad_extraction(audio_path, self.temp_dir, self.vad_service)
+        result = run_vad_extraction(
+            audio_path, self.temp_dir, self.vad_service,
+            asset=self._get_asset(audio_path),
+        )
 
         # 不論成功與否，cleanup 都要登記，避免暫存檔殘留
         for cf in result.cleanup_files:
@@ -252,26 +415,68 @@ class TranscriptionTask:
                 used_for_transcription=used_for_transcription,
             )
 
-        return {
+        vad_result = {
             "speech_only_path": str(result.speech_only_path),
             "segments": result.segments,
             "speech_ratio": result.speech_ratio,
             "speech_duration": result.speech_duration,
         }
+        if result.speech_only_path:
+            self.checkpoint.set(stage, {
+                **vad_result,
+                "cleanup_files": [str(cf) for cf in result.cleanup_files],
+            })
+        return vad_result
+
+    def _register_asset(self, audio_path: Path, asset: Optional[AudioAsset]) -> None:
+        """登記已開啟的 AudioAsset，並把其解碼快取加入清理列表"""
+        if asset is None:
+            return
+        self._assets[audio_path] = asset
+        for cf in asset.cleanup_files:
+            if cf not in self.local_cleanup_list:
+                self.local_cleanup_list.append(cf)
+
+    def _get_asset(self, audio_path: Path) -> Optional[AudioAsset]:
+        """取得音檔的共用 PCM 資源，首次使用時才解碼；失敗回傳 None"""
+        asset = self._assets.get(audio_path)
+        if asset is None:
+            asset = AudioAsset.open(audio_path, self.temp_dir)
+            self._register_asset(audio_path, asset)
+        return asset
 
     def _get_audio_duration(self, audio_path: Path) -> Optional[float]:
-        """取得音訊檔案時長"""
+        """取得音訊檔案時長（有 VAD 時由共用 PCM 計算，否則以 ffprobe 探測）"""
+        asset = self._get_asset(audio_path) if self.vad_service else self._assets.get(audio_path)
+        if asset is not None:
+            return asset.duration
         duration = _ffprobe_duration(audio_path)
         if duration is None:
             logger.error(f"無法取得音訊時長 {audio_path.name}")
         return duration
 
     def _attempt_transcription(self, audio_path: Path) -> TranscriptionTaskResult:
-        """嘗試轉錄單一音訊檔案"""
+        """嘗試轉錄單一音訊檔案。
+
+        成功結果寫入 checkpoint，重試時直接沿用；GeminiTransientError 不吞掉，
+        交給 Celery autoretry 重試整個任務（已完成的片段不會重新轉錄）。
+        """
+        stage = f"result:{audio_path.name}"
+        saved = self.checkpoint.get(stage)
+        if saved:
+            logger.info(f"沿用 checkpoint 的轉錄結果: {audio_path.name}")
+            return TranscriptionTaskResult(**saved)
+
         try:
-            # 上傳檔案到 Gemini
-            gemini_file = upload_file_to_gemini(
-                audio_path, self.client, self.status_callback)
+            # 未壓縮的 wav 先編碼再上傳
+            upload_path = encode_for_upload(
+                audio_path, self.temp_dir, UPLOAD_AUDIO_CODEC, UPLOAD_OPUS_BITRATE_KBPS)
+            if upload_path != audio_path and upload_path not in self.local_cleanup_list:
+                self.local_cleanup_list.append(upload_path)
+
+            # 上傳檔案到 Gemini（同一內容 48 小時內已上傳過時直接沿用）
+            gemini_file = acquire_gemini_file(
+                upload_path, self.client, self.status_callback)
             self.gemini_cleanup_list.append(gemini_file)
 
             # 執行轉錄
@@ -281,9 +486,10 @@ class TranscriptionTask:
             result = transcribe_with_uploaded_file(
                 self.client, gemini_file, self.model, self.prompt,
                 service_tier=self.service_tier,
+                audio_seconds=self._get_audio_duration(audio_path),
             )
 
-            return TranscriptionTaskResult(
+            task_result = TranscriptionTaskResult(
                 success=result["success"],
                 text=result.get("text", ""),
                 input_tokens=result.get("input_tokens", 0),
@@ -291,6 +497,11 @@ class TranscriptionTask:
                 total_tokens=result.get("total_tokens", 0),
                 service_tier_used=result.get("service_tier_used"),
             )
+            if task_result.success:
+                self.checkpoint.set(stage, task_result.model_dump())
+            return task_result
+        except GeminiTransientError:
+            raise
         except Exception as e:
             logger.error(f"轉錄過程發生錯誤: {e}")
             return TranscriptionTaskResult(
@@ -301,20 +512,16 @@ class TranscriptionTask:
 
     def _transcribe_with_splitting(self, audio_path: Path) -> TranscriptionTaskResult:
         """使用 VAD 分割音訊並分別轉錄"""
-        # VAD (soundfile/libsndfile) 不支援 m4a 等壓縮格式，先轉為 wav
-        wav_path = convert_to_wav(audio_path, self.temp_dir)
-        if wav_path is None:
-            logger.error(f"無法將 {audio_path.name} 轉換為 WAV 格式")
+        if self._get_asset(audio_path) is None:
+            logger.error(f"無法解碼 {audio_path.name}")
             return TranscriptionTaskResult(
                 success=False,
-                text="[[音訊格式轉換失敗]]",
+                text="[[音訊解碼失敗]]",
                 total_tokens=0
             )
-        if wav_path != audio_path:
-            self.local_cleanup_list.append(wav_path)
 
-        # 使用 VAD 尋找靜音點並分割
-        segments = self._split_audio_file(wav_path)
+        # 使用 VAD 尋找靜音點並分割（讀取同一份 PCM 快取）
+        segments = self._split_audio_file(audio_path)
 
         if not segments or len(segments) < 2:
             logger.error("無法分割音訊檔案")
@@ -324,52 +531,16 @@ class TranscriptionTask:
                 total_tokens=0
             )
 
-        # 轉錄所有片段
-        results = []
-        total_input_tokens = 0
-        total_output_tokens = 0
-        total_tokens = 0
-        all_flex = True  # 所有片段皆用 flex 才回報 "flex"，只要有一段 fallback 就視為 standard
-
+        # 逐一轉錄片段（如果片段仍然太長，transcribe_audio 會再次分割）
+        segment_results = []
         for i, segment in enumerate(segments):
             logger.info(f"轉錄片段 {i+1}/{len(segments)}: {segment}")
-
-            # 遞迴轉錄每個片段（如果片段仍然太長，會再次分割）
-            segment_result = self.transcribe_audio(segment.path)
-
+            segment_result = self.transcribe_audio(segment.path, allow_chunking=False)
+            segment_results.append(segment_result)
             if not segment_result.success:
-                logger.error(f"片段 {i+1} 轉錄失敗")
-                return TranscriptionTaskResult(
-                    success=False,
-                    text=f"[[片段 {i+1} 轉錄失敗]]",
-                    total_tokens=total_tokens
-                )
-
-            # 調整時間戳並收集結果
-            adjusted_text = self._adjust_timestamps(
-                segment_result.text,
-                segment.start_time
-            )
-            results.append(adjusted_text)
-            total_input_tokens += segment_result.input_tokens
-            total_output_tokens += segment_result.output_tokens
-            total_tokens += segment_result.total_tokens
-            if segment_result.service_tier_used != "flex":
-                all_flex = False
-
-        # 合併所有結果
-        combined_text = "\n".join(results)
+                break
 
-        final_tier = "flex" if (self.service_tier == "flex" and all_flex) else "standard"
-
-        return TranscriptionTaskResult(
-            success=True,
-            text=combined_text,
-            input_tokens=total_input_tokens,
-            output_tokens=total_output_tokens,
-            total_tokens=total_tokens,
-            service_tier_used=final_tier,
-        )
+        return self._merge_segment_results(segments, segment_results)
 
     def _split_audio_file(self, audio_path: Path) -> List[AudioSegment]:
         """使用 VAD 分割音訊檔案"""
@@ -382,6 +553,8 @@ class TranscriptionTask:
             if not (part1_path and part2_path and split_point is not None):
                 return []
 
+            total_duration = self._get_audio_duration(audio_path) or 0.0
+
             # 建立片段資訊
             segments = [
                 AudioSegment(
@@ -392,13 +565,14 @@ class TranscriptionTask:
                 AudioSegment(
                     path=Path(part2_path),
                     start_time=split_point,
-                    duration=self._get_audio_duration(Path(part2_path)) or 0.0
+                    duration=max(0.0, total_duration - split_point)
                 )
             ]
 
             # 加入清理列表
             for segment in segments:
                 self.local_cleanup_list.append(segment.path)
+                self._register_asset(segment.path, AudioAsset.open(segment.path, self.temp_dir))
 
             artifact_id = self.artifact_task_id or audio_path.stem
             artifact_name = self.original_filename or audio_path.name
@@ -422,14 +596,22 @@ class TranscriptionTask:
             return lrc_text
         return _adjust_lrc_timestamps(lrc_text, offset_seconds)
 
-    def cleanup(self):
-        """清理所有相關的暫存檔案，包括 Gemini 檔案、本地暫存檔和原始上傳檔案。"""
-        # 清理 Gemini 檔案
+    def cleanup(self, keep_local_files: bool = False):
+        """清理所有相關的暫存檔案，包括 Gemini 檔案、本地暫存檔和原始上傳檔案。
+
+        keep_local_files=True 用於即將重試的任務：只釋放 Gemini 檔案，
+        本地檔案保留給下一次嘗試沿用 checkpoint。
+        """
+        # 釋放 Gemini 檔案（保留一段時間供重試沿用，之後由 reaper 刪除）
         for gemini_file in self.gemini_cleanup_list:
             try:
-                cleanup_gemini_file(self.client, gemini_file)
+                release_gemini_file(self.client, gemini_file)
             except Exception as e:
                 logger.warning(f"清理 Gemini 檔案失敗: {e}")
+        self.gemini_cleanup_list = []
+
+        if keep_local_files:
+            return
 
         # 清理本地檔案 (包含原始檔案)
         # 將原始檔案加入清理列表，確保它也被處理
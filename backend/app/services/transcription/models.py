@@ -33,7 +33,9 @@ class TranscriptionResponse(BaseModel):
     完整轉錄服務的回應模型
     """
     task_uuid: uuid.UUID = Field(..., description="此次轉錄任務的唯一標識符")
-    transcripts: Dict[str, Any] = Field(..., description="各種格式的轉錄結果")
+    transcripts: Dict[str, Any] = Field(
+        ..., description="轉錄結果（僅 LRC；其他格式由 /history/{task_uuid}/download/{fmt} 取得）"
+    )
     tokens_used: int = Field(..., description="使用的 token 總數")
     cost: float = Field(..., description="轉錄費用")
     input_cost: float = Field(0.0, description="輸入費用")
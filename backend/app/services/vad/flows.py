@@ -1,14 +1,20 @@
 import soundfile as sf
 import numpy as np
+import torch
 import torchaudio
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
 
+from app.core.config import get_settings
+from app.utils.audio import AudioAsset
 from app.utils.logger import setup_logger
 from .models import (
     SpeechSegment,
     SpeechExtractionResult,
     AudioSplitResult,
+    AudioChunk,
+    AudioChunkRequest,
+    AudioChunkResult,
     VADProcessRequest,
     AudioSplitRequest
 )
@@ -23,10 +29,280 @@ def _convert_segments_to_pydantic(segments: List[Dict[str, float]]) -> List[Spee
     return [SpeechSegment(start=seg['start'], end=seg['end']) for seg in segments]
 
 
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """回傳布林陣列中連續 True 區段的 [start, end) 索引（run-length encoding）"""
+    if mask.size == 0:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty
+    change = np.flatnonzero(mask[1:] != mask[:-1]) + 1
+    starts = np.concatenate(([0], change))
+    ends = np.concatenate((change, [len(mask)]))
+    is_true = mask[starts]
+    return starts[is_true], ends[is_true]
+
+
+def _speech_timestamps_from_mask(
+    is_speech: np.ndarray,
+    *,
+    frame_length_s: float,
+    total_duration: float,
+    min_silence_frames: int,
+    min_speech_frames: int,
+    padding_s: float = 0.3,
+) -> List[Dict[str, float]]:
+    """
+    由逐幀有聲遮罩產生語音時間戳（全部以 NumPy 向量化運算）
+
+    1. 填補「後面接著有聲」且短於 min_silence_frames 的靜音
+    2. 取出長度 >= min_speech_frames 的有聲區段，前後各加 padding_s 安全邊距
+       （最後一段若延伸到結尾，結束時間直接取 total_duration）
+    3. 合併因邊距而重疊的區段
+    """
+    num_frames = len(is_speech)
+    is_speech = np.asarray(is_speech, dtype=bool)
+
+    # 1. 填補短靜音：保留下來的靜音之間即為有聲區段
+    silence_starts, silence_ends = _runs(~is_speech)
+    fill = ((silence_ends - silence_starts) < min_silence_frames) & (silence_ends < num_frames)
+    kept_starts = silence_starts[~fill]
+    kept_ends = silence_ends[~fill]
+
+    # 2. 有聲區段 + 安全邊距
+    speech_starts = np.concatenate(([0], kept_ends))
+    speech_ends = np.concatenate((kept_starts, [num_frames]))
+    keep = (speech_ends - speech_starts) >= max(min_speech_frames, 1)
+    speech_starts = speech_starts[keep]
+    speech_ends = speech_ends[keep]
+    if len(speech_starts) == 0:
+        return []
+
+    start_times = np.maximum(0.0, speech_starts * frame_length_s - padding_s)
+    end_times = np.minimum(total_duration, speech_ends * frame_length_s + padding_s)
+    end_times[speech_ends == num_frames] = total_duration
+
+    # 3. 合併重疊：結束時間單調遞增，因此群組的結束時間即群組最後一段的結束時間
+    group_first = np.concatenate(([True], start_times[1:] > end_times[:-1]))
+    group_last = np.concatenate((group_first[1:], [True]))
+
+    return [
+        {'start': start, 'end': end}
+        for start, end in zip(start_times[group_first].tolist(), end_times[group_last].tolist())
+    ]
+
+
+# RMS 分析窗口（秒）
+FRAME_LENGTH_S = 0.05
+
+
+def _frame_rms(mono_data: np.ndarray, frame_length: int) -> np.ndarray:
+    """以 frame_length 為窗口計算逐幀 RMS，不足一幀的尾端補零"""
+    pad_len = frame_length - (len(mono_data) % frame_length)
+    if pad_len != frame_length:
+        mono_data = np.pad(mono_data, (0, pad_len))
+
+    frames = mono_data.reshape(-1, frame_length)
+    return np.sqrt(np.mean(frames**2, axis=1) + 1e-10)  # 避免計算結果等於 0
+
+
+def _speech_timestamps_from_rms(rms: np.ndarray, total_duration: float) -> List[Dict[str, float]]:
+    """依相對音量閾值把逐幀 RMS 轉為語音時間戳；全段無聲時回傳空列表"""
+    # 相對音量閾值：以最大音量為基準 (-45dB 或是絕對最小值)
+    max_rms = np.max(rms)
+    if max_rms < 1e-4:
+        logger.warning("音軌完全無聲")
+        return []
+
+    threshold = max(max_rms * 0.005, 0.0005)
+    is_speech = rms > threshold
+
+    # 平滑處理：填補短靜音，移除極短的有聲段
+    # 靜音持續超過 1.0 秒才視為真正的靜音 (ASMR 的空白可能較多)
+    min_silence_frames = int(1.0 / FRAME_LENGTH_S)
+    # 聲音至少要持續 0.1 秒才不算是雜訊
+    min_speech_frames = int(0.1 / FRAME_LENGTH_S)
+
+    speech_timestamps = _speech_timestamps_from_mask(
+        is_speech,
+        frame_length_s=FRAME_LENGTH_S,
+        total_duration=total_duration,
+        min_silence_frames=min_silence_frames,
+        min_speech_frames=min_speech_frames,
+    )
+    if not speech_timestamps:
+        logger.warning("未檢測到任何高於閾值的有聲片段")
+    return speech_timestamps
+
+
+def _speech_only_output_file(request: VADProcessRequest) -> Path:
+    output_path = Path(request.output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    input_filename = Path(request.audio_path).stem
+    return output_path / f"{input_filename}_speech_only.wav"
+
+
+def _extraction_result(
+    output_file: Path,
+    speech_timestamps: List[Dict[str, float]],
+    total_duration: float,
+) -> SpeechExtractionResult:
+    """統計並回傳提取結果"""
+    segments = _convert_segments_to_pydantic(speech_timestamps)
+    total_speech_duration = sum(seg.duration for seg in segments)
+
+    logger.info(f"有聲段提取完成:")
+    logger.info(f"  - 有聲片段數: {len(segments):>6}")
+    logger.info(f"  - 總有聲時長: {total_speech_duration:>6.2f} 秒")
+    logger.info(
+        f"  - 有聲佔比:   {(total_speech_duration/total_duration)*100:>6.1f}%")
+
+    return SpeechExtractionResult(
+        success=True,
+        speech_only_path=str(output_file),
+        segments=segments,
+        total_speech_duration=total_speech_duration,
+        total_duration=total_duration
+    )
+
+
+def _stream_block_size(channels: int, frame_length: int, memory_budget_bytes: int) -> int:
+    """
+    依記憶體上限決定串流每次讀取的樣本數（對齊 RMS 窗口）
+
+    每個 block 同時存在 float32 原始資料、單聲道、平方暫存與輸出切片，
+    以 4 份 block 大小估算峰值。
+    """
+    bytes_per_sample = 4 * max(channels, 1) * 4
+    block_frames = (memory_budget_bytes // bytes_per_sample) // frame_length
+    return max(block_frames, 1) * frame_length
+
+
+def _should_stream(audio_path: str, memory_budget_bytes: int) -> bool:
+    """解碼後的 float32 音訊超過記憶體上限時改用串流模式"""
+    try:
+        info = sf.info(audio_path)
+    except Exception:
+        # soundfile 無法讀取的格式（例如 m4a）只能走 torchaudio 整檔解碼
+        return False
+    return info.frames * info.channels * 4 > memory_budget_bytes
+
+
+def _two_pass_extract(
+    iter_blocks: Callable[[], Iterator[np.ndarray]],
+    sample_rate: int,
+    channels: int,
+    num_frames: int,
+    block_size: int,
+    output_file: Path,
+) -> SpeechExtractionResult:
+    """
+    兩段式串流提取有聲片段，峰值記憶體只與 block 大小有關
+
+    第一輪：逐 block 計算逐幀 RMS（與整檔模式相同的 50ms 窗口與尾端補零）
+    第二輪：再讀一次來源，把落在語音時間戳內的樣本逐 block 寫入輸出檔
+
+    Args:
+        iter_blocks: 每次呼叫都從頭產生 (n, channels) float32 區塊的函式
+    """
+    total_duration = num_frames / sample_rate
+    frame_length = int(FRAME_LENGTH_S * sample_rate)
+
+    if num_frames < frame_length:
+        return SpeechExtractionResult(success=False, total_duration=total_duration)
+
+    logger.info(
+        f"串流模式: {total_duration:.1f} 秒, {channels} 聲道, "
+        f"block={block_size} 樣本 ({block_size / sample_rate:.1f} 秒)")
+
+    # --- 第一輪：逐幀 RMS ---
+    rms_blocks = []
+    for block in iter_blocks():
+        mono_block = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+        rms_blocks.append(_frame_rms(mono_block, frame_length))
+    rms = np.concatenate(rms_blocks)
+
+    speech_timestamps = _speech_timestamps_from_rms(rms, total_duration)
+    if not speech_timestamps:
+        return SpeechExtractionResult(success=False, total_duration=total_duration)
+
+    sample_ranges = [
+        (max(0, int(ts['start'] * sample_rate)), min(num_frames, int(ts['end'] * sample_rate)))
+        for ts in speech_timestamps
+    ]
+
+    # --- 第二輪：逐 block 寫出純語音 ---
+    range_index = 0
+    block_start = 0
+    with sf.SoundFile(str(output_file), mode='w', samplerate=sample_rate, channels=channels) as out:
+        for block in iter_blocks():
+            block_end = block_start + len(block)
+            # 跳過已在此 block 之前結束的片段
+            while range_index < len(sample_ranges) and sample_ranges[range_index][1] <= block_start:
+                range_index += 1
+            i = range_index
+            while i < len(sample_ranges) and sample_ranges[i][0] < block_end:
+                start, end = sample_ranges[i]
+                out.write(block[max(start, block_start) - block_start:min(end, block_end) - block_start])
+                i += 1
+            block_start = block_end
+            if range_index >= len(sample_ranges):
+                break
+
+    logger.info(f"純有聲檔案已儲存: {output_file}")
+    return _extraction_result(output_file, speech_timestamps, total_duration)
+
+
+def _extract_speech_segments_streaming(
+    request: VADProcessRequest,
+    memory_budget_bytes: int,
+) -> SpeechExtractionResult:
+    """以 soundfile.blocks 兩段式串流提取有聲片段"""
+    info = sf.info(request.audio_path)
+    frame_length = int(FRAME_LENGTH_S * info.samplerate)
+    block_size = _stream_block_size(info.channels, frame_length, memory_budget_bytes)
+
+    def iter_blocks():
+        return sf.blocks(request.audio_path, blocksize=block_size, dtype='float32', always_2d=True)
+
+    return _two_pass_extract(
+        iter_blocks, info.samplerate, info.channels, info.frames, block_size,
+        _speech_only_output_file(request),
+    )
+
+
+def extract_speech_segments_from_asset(asset: AudioAsset, output_dir: str) -> SpeechExtractionResult:
+    """
+    從已解碼的 AudioAsset（16kHz 單聲道 PCM memmap）提取有聲片段
+
+    直接讀取共用 PCM 快取，不再重新解碼來源檔；一律以串流方式處理，
+    輸出為 16kHz 單聲道 wav。
+    """
+    logger.info(f"開始提取有聲片段 (音量閾值模式): {asset.source_path.name}")
+
+    try:
+        memory_budget_bytes = get_settings().vad_memory_budget_mb * 1024 * 1024
+        frame_length = int(FRAME_LENGTH_S * asset.SAMPLE_RATE)
+        block_size = _stream_block_size(1, frame_length, memory_budget_bytes)
+
+        def iter_blocks():
+            return (block[:, None] for block in asset.iter_blocks(block_size))
+
+        request = VADProcessRequest(audio_path=str(asset.source_path), output_dir=output_dir)
+        return _two_pass_extract(
+            iter_blocks, asset.SAMPLE_RATE, 1, asset.num_samples, block_size,
+            _speech_only_output_file(request),
+        )
+
+    except Exception as e:
+        logger.error(f"有聲段提取失敗: {e}", exc_info=True)
+        return SpeechExtractionResult(success=False)
+
+
 def extract_speech_segments(request: VADProcessRequest, vad_service=None) -> SpeechExtractionResult:
     """
     使用音量閾值提取有聲片段並建立純語音檔案 (針對 ASMR 優化)
 
+    解碼後音訊超過 ``vad_memory_budget_mb`` 時改用兩段式串流處理。
+
     Args:
         request: VAD 處理請求
         vad_service: (現在不需依賴 VAD 模型，但為保持向下相容保留參數)
@@ -34,100 +310,34 @@ def extract_speech_segments(request: VADProcessRequest, vad_service=None) -> Spe
     logger.info(f"開始提取有聲片段 (音量閾值模式): {Path(request.audio_path).name}")
 
     try:
+        memory_budget_bytes = get_settings().vad_memory_budget_mb * 1024 * 1024
+        if _should_stream(request.audio_path, memory_budget_bytes):
+            return _extract_speech_segments_streaming(request, memory_budget_bytes)
+
         # 讀取音訊
         logger.info("正在讀取音訊檔案...")
         waveform, original_sr = torchaudio.load(request.audio_path)
         audio_data = waveform.numpy().T if waveform.shape[0] > 1 else waveform.squeeze(0).numpy()
-        
+
         # 計算總長度
         num_frames = audio_data.shape[0] if audio_data.ndim > 1 else len(audio_data)
         total_duration = num_frames / original_sr
-        
-        # 檢測有聲片段 (RMS based) 
+
+        # 檢測有聲片段 (RMS based)
         logger.info("正在分析音量以檢測有聲片段...")
         # 轉成單聲道計算能量
         mono_data = audio_data.mean(axis=1) if audio_data.ndim > 1 else audio_data
-        
+
         # 50ms 窗口計算 RMS
-        frame_length_s = 0.05
-        frame_length = int(frame_length_s * original_sr)
-        
+        frame_length = int(FRAME_LENGTH_S * original_sr)
+
         if len(mono_data) < frame_length:
             return SpeechExtractionResult(success=False, total_duration=total_duration)
-            
-        pad_len = frame_length - (len(mono_data) % frame_length)
-        if pad_len != frame_length:
-            mono_data = np.pad(mono_data, (0, pad_len))
-            
-        frames = mono_data.reshape(-1, frame_length)
-        rms = np.sqrt(np.mean(frames**2, axis=1) + 1e-10) # 避免計算結果等於 0
-        
-        # 相對音量閾值：以最大音量為基準 (-45dB 或是絕對最小值)
-        max_rms = np.max(rms)
-        if max_rms < 1e-4:
-            logger.warning("音軌完全無聲")
-            return SpeechExtractionResult(success=False, total_duration=total_duration)
-            
-        threshold = max(max_rms * 0.005, 0.0005) 
-        is_speech = rms > threshold
-        
-        # 平滑處理：填補短靜音，移除極短的有聲段
-        # 靜音持續超過 1.0 秒才視為真正的靜音 (ASMR 的空白可能較多)
-        min_silence_frames = int(1.0 / frame_length_s)
-        # 聲音至少要持續 0.1 秒才不算是雜訊
-        min_speech_frames = int(0.1 / frame_length_s)
-        
-        # 填補短靜音
-        current_silence = 0
-        for i in range(len(is_speech)):
-            if not is_speech[i]:
-                current_silence += 1
-            else:
-                if 0 < current_silence < min_silence_frames:
-                    is_speech[i-current_silence:i] = True
-                current_silence = 0
-        
-        # 產生時間戳
-        speech_timestamps = []
-        is_in_speech = False
-        start_frame = 0
-        
-        for i, speech_flag in enumerate(is_speech):
-            if speech_flag and not is_in_speech:
-                start_frame = i
-                is_in_speech = True
-            elif not speech_flag and is_in_speech:
-                end_frame = i
-                if end_frame - start_frame >= min_speech_frames:
-                    # 給每個片段增加 0.3 秒的安全邊距
-                    start_time = max(0.0, start_frame * frame_length_s - 0.3)
-                    end_time = min(total_duration, end_frame * frame_length_s + 0.3)
-                    speech_timestamps.append({'start': float(start_time), 'end': float(end_time)})
-                is_in_speech = False
-                
-        if is_in_speech:
-            end_frame = len(is_speech)
-            if end_frame - start_frame >= min_speech_frames:
-                start_time = max(0.0, start_frame * frame_length_s - 0.3)
-                end_time = float(total_duration)
-                speech_timestamps.append({'start': start_time, 'end': end_time})
-                
-        # 合併可能因為增加安全邊距而重疊的片段
-        merged_timestamps = []
-        for ts in speech_timestamps:
-            if not merged_timestamps:
-                merged_timestamps.append(ts)
-            else:
-                last_ts = merged_timestamps[-1]
-                if ts['start'] <= last_ts['end']:
-                    last_ts['end'] = max(last_ts['end'], ts['end'])
-                else:
-                    merged_timestamps.append(ts)
-                    
-        speech_timestamps = merged_timestamps
+
+        rms = _frame_rms(mono_data, frame_length)
+        speech_timestamps = _speech_timestamps_from_rms(rms, total_duration)
 
         if not speech_timestamps:
-            logger.warning("未檢測到任何高於閾值的有聲片段")
             return SpeechExtractionResult(
                 success=False,
                 total_duration=total_duration
@@ -138,7 +348,7 @@ def extract_speech_segments(request: VADProcessRequest, vad_service=None) -> Spe
         for ts in speech_timestamps:
             start_sample = max(0, int(ts['start'] * original_sr))
             end_sample = min(num_frames, int(ts['end'] * original_sr))
-            
+
             segment_data = audio_data[start_sample:end_sample]
             if len(segment_data) > 0:
                 speech_segments.append(segment_data)
@@ -147,32 +357,11 @@ def extract_speech_segments(request: VADProcessRequest, vad_service=None) -> Spe
         concatenated_audio = np.concatenate(speech_segments)
 
         # 儲存純語音檔案
-        output_path = Path(request.output_dir)
-        output_path.mkdir(parents=True, exist_ok=True)
-
-        input_filename = Path(request.audio_path).stem
-        output_file = output_path / f"{input_filename}_speech_only.wav"
-
+        output_file = _speech_only_output_file(request)
         sf.write(str(output_file), concatenated_audio, original_sr)
         logger.info(f"純有聲檔案已儲存: {output_file}")
 
-        # 計算統計資訊
-        segments = _convert_segments_to_pydantic(speech_timestamps)
-        total_speech_duration = sum(seg.duration for seg in segments)
-
-        logger.info(f"有聲段提取完成:")
-        logger.info(f"  - 有聲片段數: {len(segments):>6}")
-        logger.info(f"  - 總有聲時長: {total_speech_duration:>6.2f} 秒")
-        logger.info(
-            f"  - 有聲佔比:   {(total_speech_duration/total_duration)*100:>6.1f}%")
-
-        return SpeechExtractionResult(
-            success=True,
-            speech_only_path=str(output_file),
-            segments=segments,
-            total_speech_duration=total_speech_duration,
-            total_duration=total_duration
-        )
+        return _extraction_result(output_file, speech_timestamps, total_duration)
 
     except Exception as e:
         logger.error(f"有聲段提取失敗: {e}", exc_info=True)
@@ -192,17 +381,17 @@ def split_audio_on_silence(request: AudioSplitRequest, vad_service) -> AudioSpli
     try:
         # 從 service 取得模型和工具
         model, utils = vad_service.get_model_and_utils()
-        get_speech_timestamps, _, read_audio, _, _ = utils
+        get_speech_timestamps = utils[0]
 
-        # 讀取音訊（使用 torchaudio 支援 M4A 等格式）
-        wav = read_audio(request.audio_path, sampling_rate=SAMPLING_RATE)
-        waveform, original_sr = torchaudio.load(request.audio_path)
-        audio_data = waveform.numpy().T if waveform.shape[0] > 1 else waveform.squeeze(0).numpy()
-        total_duration = len(audio_data) / original_sr if audio_data.ndim == 1 else audio_data.shape[0] / original_sr
+        # 共用 16kHz PCM（同一輸出目錄下已解碼過則直接重用快取）
+        asset = AudioAsset.open(Path(request.audio_path), Path(request.output_dir))
+        if asset is None:
+            return AudioSplitResult(success=False, error_message="音訊解碼失敗")
+        total_duration = asset.duration
 
         # 檢測語音片段
         speech_timestamps = get_speech_timestamps(
-            wav, model, sampling_rate=SAMPLING_RATE, return_seconds=True)
+            torch.from_numpy(asset.read()), model, sampling_rate=SAMPLING_RATE, return_seconds=True)
 
         if not speech_timestamps:
             return AudioSplitResult(
@@ -235,11 +424,6 @@ def split_audio_on_silence(request: AudioSplitRequest, vad_service) -> AudioSpli
             logger.info(
                 f"找到分割點: {best_split_point:.2f}秒（靜音時長: {max_silence_duration:.2f}秒）")
 
-        # 分割音訊
-        split_sample = int(best_split_point * original_sr)
-        part1_data = audio_data[:split_sample]
-        part2_data = audio_data[split_sample:]
-
         # 儲存分割後的檔案
         output_path = Path(request.output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
@@ -248,8 +432,8 @@ def split_audio_on_silence(request: AudioSplitRequest, vad_service) -> AudioSpli
         part1_file = output_path / f"{input_filename}.part1.wav"
         part2_file = output_path / f"{input_filename}.part2.wav"
 
-        sf.write(str(part1_file), part1_data, original_sr)
-        sf.write(str(part2_file), part2_data, original_sr)
+        asset.write_wav(part1_file, 0.0, best_split_point)
+        asset.write_wav(part2_file, best_split_point)
 
         logger.info(f"音訊分割完成:")
         logger.info(
@@ -270,3 +454,110 @@ def split_audio_on_silence(request: AudioSplitRequest, vad_service) -> AudioSpli
             success=False,
             error_message=str(e)
         )
+
+
+def plan_chunk_boundaries(
+    speech_timestamps: List[Dict[str, float]],
+    total_duration: float,
+    target_chunk_seconds: float,
+    min_silence_duration: float = 1.0,
+) -> List[Tuple[float, float]]:
+    """
+    規劃長音檔的切塊邊界，盡量讓切點落在靜音中央
+
+    以 ``round(total / target)`` 決定塊數 N，理想切點為等分點；
+    每個切點在 ±1/4 塊長的範圍內尋找最接近的靜音間隙（>= min_silence_duration），
+    找不到時退回理想切點。
+
+    Returns:
+        依時間排序的 (start, end) 列表；不需切塊時回傳單一 (0, total)。
+    """
+    if total_duration <= 0 or target_chunk_seconds <= 0:
+        return [(0.0, max(total_duration, 0.0))]
+
+    num_chunks = int(round(total_duration / target_chunk_seconds))
+    if num_chunks < 2:
+        return [(0.0, total_duration)]
+
+    chunk_length = total_duration / num_chunks
+    search_window = chunk_length / 4
+
+    # 所有夠長的靜音間隙中點
+    silence_midpoints = []
+    for i in range(len(speech_timestamps) - 1):
+        current_end = speech_timestamps[i]['end']
+        next_start = speech_timestamps[i + 1]['start']
+        if next_start - current_end >= min_silence_duration:
+            silence_midpoints.append((current_end + next_start) / 2)
+
+    cut_points = []
+    previous_cut = 0.0
+    for k in range(1, num_chunks):
+        ideal = k * chunk_length
+        candidates = [
+            mid for mid in silence_midpoints
+            if previous_cut < mid < total_duration and abs(mid - ideal) <= search_window
+        ]
+        cut = min(candidates, key=lambda mid: abs(mid - ideal)) if candidates else ideal
+        if cut <= previous_cut:
+            cut = ideal
+        cut_points.append(cut)
+        previous_cut = cut
+
+    starts = [0.0] + cut_points
+    ends = cut_points + [total_duration]
+    return list(zip(starts, ends))
+
+
+def split_audio_into_chunks(request: AudioChunkRequest, vad_service) -> AudioChunkResult:
+    """
+    將長音檔在靜音處切成 N 個接近目標時長的片段（16kHz 單聲道 wav）
+
+    Args:
+        request: 切塊請求
+        vad_service: VADService 實例，用於取得模型
+    """
+    logger.info(f"開始切塊: {Path(request.audio_path).name} (目標 {request.target_chunk_seconds:.0f} 秒/塊)")
+
+    try:
+        model, utils = vad_service.get_model_and_utils()
+        get_speech_timestamps = utils[0]
+
+        # 同一份 16kHz PCM 同時用於偵測語音與寫出片段
+        asset = AudioAsset.open(Path(request.audio_path), Path(request.output_dir))
+        if asset is None:
+            return AudioChunkResult(success=False, error_message="音訊解碼失敗")
+        total_duration = asset.duration
+
+        speech_timestamps = get_speech_timestamps(
+            torch.from_numpy(asset.read()), model, sampling_rate=SAMPLING_RATE, return_seconds=True)
+
+        boundaries = plan_chunk_boundaries(
+            speech_timestamps or [],
+            total_duration,
+            request.target_chunk_seconds,
+            request.min_silence_duration,
+        )
+        if len(boundaries) < 2:
+            return AudioChunkResult(success=False, error_message="音訊長度不需切塊")
+
+        output_path = Path(request.output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        input_filename = Path(request.audio_path).stem
+
+        chunks = []
+        for i, (start, end) in enumerate(boundaries):
+            chunk_file = output_path / f"{input_filename}.chunk{i + 1:02d}.wav"
+            asset.write_wav(chunk_file, start, end)
+            chunks.append(AudioChunk(path=str(chunk_file), start=start, end=end))
+
+        logger.info(f"音訊切塊完成: {len(chunks)} 塊")
+        for chunk in chunks:
+            logger.info(
+                f"  - {Path(chunk.path).name}: {chunk.start:>8.2f}s ~ {chunk.end:>8.2f}s")
+
+        return AudioChunkResult(success=True, chunks=chunks)
+
+    except Exception as e:
+        logger.error(f"音訊切塊失敗: {e}")
+        return AudioChunkResult(success=False, error_message=str(e))
@@ -51,6 +51,39 @@ class AudioSplitRequest(BaseModel):
     min_silence_duration: float = Field(1.0, description="最小靜音時長（秒）")
 
 
+class AudioChunkRequest(BaseModel):
+    """
+    長音檔切塊請求
+    """
+    audio_path: str = Field(..., description="音訊檔案路徑")
+    output_dir: str = Field(..., description="輸出目錄路徑")
+    target_chunk_seconds: float = Field(..., description="每塊目標時長（秒）")
+    min_silence_duration: float = Field(1.0, description="最小靜音時長（秒）")
+
+
+class AudioChunk(BaseModel):
+    """
+    切塊後的單一音訊片段（時間為原始時間軸）
+    """
+    path: str = Field(..., description="片段檔案路徑")
+    start: float = Field(..., description="片段在原始音訊的開始時間（秒）")
+    end: float = Field(..., description="片段在原始音訊的結束時間（秒）")
+
+    @property
+    def duration(self) -> float:
+        """片段時長"""
+        return self.end - self.start
+
+
+class AudioChunkResult(BaseModel):
+    """
+    長音檔切塊結果
+    """
+    success: bool = Field(..., description="是否成功")
+    chunks: List[AudioChunk] = Field(default_factory=list, description="依時間排序的片段")
+    error_message: Optional[str] = Field(None, description="錯誤訊息")
+
+
 class AudioSplitResult(BaseModel):
     """
     音訊分割結果
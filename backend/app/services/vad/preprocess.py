@@ -1,8 +1,9 @@
 """VAD 前處理共用模組。
 
 `transcription/flows.py`（單檔轉錄）與 `celery/batch_task.py`（批次轉錄）
-皆需要先把音檔轉成 wav 再用 Silero VAD 萃取「純語音」檔，這裡集中
-該流程，回傳結構化結果。是否要採用純語音檔（例如語音佔比閾值判斷）
+皆需要先把音檔解碼再萃取「純語音」檔，這裡集中該流程，回傳結構化結果。
+解碼結果為共用的 ``AudioAsset``（16kHz PCM 快取），呼叫端可傳入已開啟的
+asset，讓時長、VAD、分割共用同一次解碼。是否要採用純語音檔（例如語音佔比閾值判斷）
 由呼叫端依情境決定。
 """
 
@@ -12,9 +13,8 @@ from dataclasses import dataclass, field
 from pathlib import Path
 from typing import List, Optional
 
-from app.services.vad.flows import extract_speech_segments
-from app.services.vad.models import VADProcessRequest
-from app.utils.audio import convert_to_wav
+from app.services.vad.flows import extract_speech_segments_from_asset
+from app.utils.audio import AudioAsset
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -45,12 +45,13 @@ def run_vad_extraction(
     audio_path: Path,
     temp_dir: Path,
     vad_service,
+    asset: Optional[AudioAsset] = None,
 ) -> VadPreprocessResult:
     """執行 VAD 純語音提取流程。
 
     流程：
-      1. 將輸入轉成 wav（若已是 wav 則略過）
-      2. 呼叫 Silero VAD 提取語音段
+      1. 取得 16kHz PCM 資源（未傳入 asset 時才解碼，解碼快取列入待清理）
+      2. 從 PCM 提取語音段
       3. 回傳結構化結果與待清理檔案清單
 
     任何步驟失敗皆回傳 ``success=False``，由呼叫端決定是否回退到原始檔。
@@ -60,25 +61,21 @@ def run_vad_extraction(
     if vad_service is None:
         return VadPreprocessResult(success=False, cleanup_files=cleanup_files)
 
-    try:
-        wav_path = convert_to_wav(audio_path, temp_dir)
-    except Exception as e:
-        logger.warning(f"VAD 前處理：轉 wav 失敗 ({audio_path.name}): {e}")
-        return VadPreprocessResult(success=False, cleanup_files=cleanup_files)
+    if asset is None:
+        try:
+            asset = AudioAsset.open(audio_path, temp_dir)
+        except Exception as e:
+            logger.warning(f"VAD 前處理：解碼失敗 ({audio_path.name}): {e}")
+            return VadPreprocessResult(success=False, cleanup_files=cleanup_files)
 
-    if wav_path is None:
-        logger.warning(f"VAD 前處理：無法轉換 {audio_path.name} 為 WAV")
-        return VadPreprocessResult(success=False, cleanup_files=cleanup_files)
+        if asset is None:
+            logger.warning(f"VAD 前處理：無法解碼 {audio_path.name}")
+            return VadPreprocessResult(success=False, cleanup_files=cleanup_files)
 
-    if wav_path != audio_path:
-        cleanup_files.append(wav_path)
+        cleanup_files.extend(asset.cleanup_files)
 
     try:
-        request = VADProcessRequest(
-            audio_path=str(wav_path),
-            output_dir=str(temp_dir),
-        )
-        extraction = extract_speech_segments(request, vad_service)
+        extraction = extract_speech_segments_from_asset(asset, str(temp_dir))
     except Exception as e:
         logger.warning(f"VAD 前處理：提取語音段失敗 ({audio_path.name}): {e}")
         return VadPreprocessResult(success=False, cleanup_files=cleanup_files)
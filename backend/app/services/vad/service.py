@@ -5,10 +5,11 @@ from app.utils.logger import setup_logger
 from .models import (
     VADProcessRequest,
     AudioSplitRequest,
+    AudioChunkRequest,
     SpeechExtractionResult,
     AudioSplitResult
 )
-from .flows import extract_speech_segments, split_audio_on_silence
+from .flows import extract_speech_segments, split_audio_on_silence, split_audio_into_chunks
 
 logger = setup_logger(__name__)
 
@@ -116,6 +117,39 @@ class VADService:
             logger.warning(f"VADService: 音訊分割失敗 - {result.error_message}")
             return None, None, None
 
+    def split_audio_into_chunks(
+        self,
+        audio_path: str,
+        output_dir: str,
+        target_chunk_seconds: float,
+        min_silence_duration: float = 1.0
+    ) -> List[Tuple[str, float, float]]:
+        """
+        在靜音處將長音檔切成 N 個接近目標時長的片段
+
+        回傳 (片段路徑, 原始開始時間, 原始結束時間) 列表；失敗時回傳空列表
+        """
+        logger.info(f"VADService: 開始切塊 - {audio_path}")
+
+        # 確保模型已載入
+        self._load_model_if_needed()
+
+        request = AudioChunkRequest(
+            audio_path=audio_path,
+            output_dir=output_dir,
+            target_chunk_seconds=target_chunk_seconds,
+            min_silence_duration=min_silence_duration
+        )
+
+        result = split_audio_into_chunks(request, self)
+
+        if result.success:
+            logger.info(f"VADService: 音訊切塊成功 - {len(result.chunks)} 塊")
+            return [(chunk.path, chunk.start, chunk.end) for chunk in result.chunks]
+        else:
+            logger.warning(f"VADService: 音訊切塊失敗 - {result.error_message}")
+            return []
+
     def get_speech_statistics(self, audio_path: str) -> dict:
         """
         獲取音訊的語音統計資訊
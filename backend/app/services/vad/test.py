@@ -10,7 +10,7 @@ from app.core.config import get_settings
 from app.services.vad.artifacts import persist_speech_extraction, persist_split
 from app.services.vad.preprocess import run_vad_extraction
 from app.services.vad.service import get_vad_service
-from app.utils.audio import convert_to_wav, get_audio_duration
+from app.utils.audio import AudioAsset, get_audio_duration
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -49,13 +49,19 @@ def run_vad_test(
     except Exception as e:
         return {"success": False, "error": f"VAD 服務不可用: {e}"}
 
-    total_duration = get_audio_duration(file_path) or 0.0
+    # 只解碼一次：時長、靜音移除與分割共用同一份 16kHz PCM
+    asset = AudioAsset.open(file_path, temp_dir)
+    if asset is not None:
+        to_cleanup.extend(asset.cleanup_files)
+        total_duration = asset.duration
+    else:
+        total_duration = get_audio_duration(file_path) or 0.0
     extraction_payload: Optional[dict[str, Any]] = None
     split_payload: Optional[dict[str, Any]] = None
     artifact_dir: Optional[str] = None
 
     # --- 1. 靜音移除 ---
-    extract_result = run_vad_extraction(file_path, temp_dir, vad_service)
+    extract_result = run_vad_extraction(file_path, temp_dir, vad_service, asset=asset)
     to_cleanup.extend(extract_result.cleanup_files)
 
     if extract_result.success and extract_result.speech_only_path:
@@ -92,15 +98,11 @@ def run_vad_test(
 
     # --- 2. 靜音分割（模擬轉錄失敗後的重試切割）---
     if include_split:
-        wav_path = convert_to_wav(file_path, temp_dir)
-        if wav_path is None:
-            split_payload = {"success": False, "error": "無法轉換為 WAV 格式"}
+        if asset is None:
+            split_payload = {"success": False, "error": "無法解碼音訊"}
         else:
-            if wav_path != file_path:
-                to_cleanup.append(wav_path)
-
             part1_path, part2_path, split_point = vad_service.split_audio_on_silence(
-                audio_path=str(wav_path),
+                audio_path=str(file_path),
                 output_dir=str(temp_dir),
             )
             if part1_path and part2_path and split_point is not None:
@@ -119,7 +121,7 @@ def run_vad_test(
                 if saved and artifact_dir is None:
                     artifact_dir = str(saved.resolve())
 
-                part2_dur = get_audio_duration(p2) or max(0.0, total_duration - split_point)
+                part2_dur = max(0.0, total_duration - split_point)
                 split_payload = {
                     "success": True,
                     "split_point_seconds": round(split_point, 2),
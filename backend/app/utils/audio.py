@@ -1,8 +1,12 @@
 import subprocess
+import hashlib
 import json
 import mimetypes
+import struct
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
 
 from app.utils.logger import setup_logger
 
@@ -113,3 +117,297 @@ def convert_to_wav(file_path: Path, output_dir: Path) -> Optional[Path]:
     except Exception as e:
         logger.error(f"音訊轉換時發生未知錯誤 ({file_path.name}): {e}")
         return None
+
+
+# ==================== Decode-once 音訊資源 ====================
+
+# 共用 PCM 格式：16kHz / 單聲道 / signed 16-bit little-endian
+PCM_SAMPLE_RATE = 16000
+_PCM_DTYPE = np.dtype("<i2")
+_PCM_SCALE = 32768.0
+# 長音檔（數小時）解碼所需時間較長
+_DECODE_TIMEOUT_SECONDS = 900
+
+
+# 上傳編碼：codec -> (副檔名, ffmpeg 編碼參數)
+_UPLOAD_ENCODERS = {
+    "opus": (".ogg", ["-c:a", "libopus", "-application", "voip"]),
+    "flac": (".flac", ["-c:a", "flac", "-sample_fmt", "s16", "-compression_level", "5"]),
+}
+
+
+def encode_for_upload(
+    file_path: Path,
+    output_dir: Path,
+    codec: str,
+    opus_bitrate_kbps: int = 32,
+) -> Path:
+    """
+    將未壓縮的 wav 編碼為 16kHz 單聲道 opus / flac 以供上傳。
+
+    只處理 .wav（純語音檔、分割片段、切塊等本系統產生的 PCM）；原本就是壓縮格式
+    的檔案、codec 為 wav 或編碼失敗時，直接回傳原始路徑。編碼不改變時長，
+    時間戳重映射不受影響。
+    """
+    codec = (codec or "wav").lower()
+    if codec == "wav" or file_path.suffix.lower() != ".wav":
+        return file_path
+
+    encoder = _UPLOAD_ENCODERS.get(codec)
+    if encoder is None:
+        logger.warning(f"不支援的上傳編碼 '{codec}'，直接上傳 wav")
+        return file_path
+
+    suffix, codec_args = encoder
+    if codec == "opus":
+        codec_args = codec_args + ["-b:a", f"{opus_bitrate_kbps}k"]
+    output_path = output_dir / f"{file_path.stem}.upload{suffix}"
+    try:
+        result = subprocess.run(
+            [
+                "ffmpeg", "-y",
+                "-i", str(file_path),
+                "-vn",
+                "-ar", str(PCM_SAMPLE_RATE),
+                "-ac", "1",
+                *codec_args,
+                str(output_path),
+            ],
+            capture_output=True,
+            text=True,
+            timeout=_DECODE_TIMEOUT_SECONDS,
+        )
+        if result.returncode != 0:
+            logger.error(f"ffmpeg 編碼失敗 ({file_path.name}): {result.stderr.strip()}")
+            return file_path
+
+        original_size = file_path.stat().st_size
+        encoded_size = output_path.stat().st_size
+        logger.info(
+            f"上傳檔已編碼為 {codec}: {file_path.name} "
+            f"{original_size / 1024 / 1024:.1f}MB -> {encoded_size / 1024 / 1024:.1f}MB")
+        return output_path
+
+    except FileNotFoundError:
+        logger.error("ffmpeg 未安裝或不在 PATH 中")
+        return file_path
+    except subprocess.TimeoutExpired:
+        logger.error(f"ffmpeg 編碼逾時 ({file_path.name})")
+        return file_path
+    except Exception as e:
+        logger.error(f"音訊編碼時發生未知錯誤 ({file_path.name}): {e}")
+        return file_path
+
+
+def _pcm16_mono_16k_wav_layout(file_path: Path) -> Optional[Tuple[int, int]]:
+    """
+    若檔案本身就是 16kHz / 單聲道 / 16-bit PCM 的 wav，回傳 (data 起始位移, 樣本數)，
+    可直接 memory-map 而不必再解碼；其他格式回傳 None。
+    """
+    if file_path.suffix.lower() != ".wav":
+        return None
+    try:
+        with open(file_path, "rb") as f:
+            header = f.read(12)
+            if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+                return None
+            fmt_ok = False
+            while True:
+                chunk_header = f.read(8)
+                if len(chunk_header) < 8:
+                    return None
+                chunk_id, chunk_size = chunk_header[:4], struct.unpack("<I", chunk_header[4:])[0]
+                if chunk_id == b"fmt ":
+                    fmt = f.read(chunk_size)
+                    audio_format, channels, sample_rate = struct.unpack("<HHI", fmt[:8])
+                    bits_per_sample = struct.unpack("<H", fmt[14:16])[0]
+                    fmt_ok = (audio_format == 1 and channels == 1
+                              and sample_rate == PCM_SAMPLE_RATE and bits_per_sample == 16)
+                    if chunk_size % 2:
+                        f.seek(1, 1)
+                elif chunk_id == b"data":
+                    if not fmt_ok:
+                        return None
+                    offset = f.tell()
+                    available = file_path.stat().st_size - offset
+                    return offset, min(chunk_size, available) // _PCM_DTYPE.itemsize
+                else:
+                    f.seek(chunk_size + (chunk_size % 2), 1)
+    except (OSError, struct.error):
+        return None
+
+
+def _decode_to_pcm(file_path: Path, pcm_path: Path) -> bool:
+    """使用 ffmpeg 將任意音訊/影片解碼為 16kHz 單聲道 s16le raw PCM"""
+    partial_path = pcm_path.with_name(pcm_path.name + ".part")
+    try:
+        result = subprocess.run(
+            [
+                "ffmpeg", "-y",
+                "-i", str(file_path),
+                "-vn",
+                "-f", "s16le",
+                "-acodec", "pcm_s16le",
+                "-ar", str(PCM_SAMPLE_RATE),
+                "-ac", "1",
+                str(partial_path),
+            ],
+            capture_output=True,
+            text=True,
+            timeout=_DECODE_TIMEOUT_SECONDS,
+        )
+        if result.returncode != 0:
+            logger.error(f"ffmpeg 解碼失敗 ({file_path.name}): {result.stderr.strip()}")
+            return False
+        partial_path.replace(pcm_path)
+        return True
+
+    except FileNotFoundError:
+        logger.error("ffmpeg 未安裝或不在 PATH 中")
+        return False
+    except subprocess.TimeoutExpired:
+        logger.error(f"ffmpeg 解碼逾時 ({file_path.name})")
+        return False
+    except Exception as e:
+        logger.error(f"音訊解碼時發生未知錯誤 ({file_path.name}): {e}")
+        return False
+    finally:
+        if partial_path.exists():
+            partial_path.unlink()
+
+
+class AudioAsset:
+    """
+    來源音檔「只解碼一次」的 16kHz 單聲道 PCM 資源。
+
+    解碼結果以 raw PCM 快取在磁碟（``{stem}.{來源指紋}.16k.pcm``），並以 numpy memmap 讀取；
+    時長、VAD、分割、切塊與編碼都讀同一份 PCM，不再各自呼叫 ffprobe / ffmpeg /
+    torchaudio 重新解碼。已經是 16kHz 單聲道 16-bit wav 的檔案（例如本系統輸出的
+    片段）直接 memmap 其 data 區段，不產生快取檔。
+    """
+
+    SAMPLE_RATE = PCM_SAMPLE_RATE
+
+    def __init__(
+        self,
+        source_path: Path,
+        pcm_path: Path,
+        offset: int,
+        num_samples: int,
+        cache_path: Optional[Path] = None,
+    ):
+        self.source_path = source_path
+        self.pcm_path = pcm_path
+        self.offset = offset
+        self.num_samples = num_samples
+        # 由 AudioAsset 產生、呼叫端應負責清理的快取檔（直接 memmap wav 時為 None）
+        self.cache_path = cache_path
+        self._samples: Optional[np.memmap] = None
+
+    @classmethod
+    def cache_path_for(cls, source_path: Path, cache_dir: Path) -> Path:
+        """
+        快取檔名帶來源指紋（完整路徑 + 大小 + mtime）：不同 session 上傳的同名檔、
+        由其他來源重新產生的同名片段不會共用同一份 PCM；來源被覆寫後也會重新解碼。
+        """
+        stat = source_path.stat()
+        fingerprint = hashlib.sha1(
+            f"{source_path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8")
+        ).hexdigest()[:16]
+        return cache_dir / f"{source_path.stem}.{fingerprint}.16k.pcm"
+
+    @classmethod
+    def open(cls, source_path: Path, cache_dir: Optional[Path] = None) -> Optional["AudioAsset"]:
+        """
+        開啟（必要時解碼）音訊資源；失敗回傳 None。
+
+        同一 cache_dir 下若已有同一來源（路徑、大小、mtime 皆相同）的快取 PCM，直接重用，不再解碼。
+        """
+        source_path = Path(source_path)
+        if not source_path.exists():
+            logger.error(f"音訊檔案不存在: {source_path}")
+            return None
+
+        layout = _pcm16_mono_16k_wav_layout(source_path)
+        if layout is not None:
+            offset, num_samples = layout
+            return cls(source_path, source_path, offset, num_samples)
+
+        cache_dir = Path(cache_dir) if cache_dir is not None else source_path.parent
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        pcm_path = cls.cache_path_for(source_path, cache_dir)
+
+        if not pcm_path.exists():
+            logger.info(f"解碼音訊為 16kHz PCM: {source_path.name}")
+            if not _decode_to_pcm(source_path, pcm_path):
+                return None
+        else:
+            logger.info(f"重用已解碼的 PCM 快取: {pcm_path.name}")
+
+        num_samples = pcm_path.stat().st_size // _PCM_DTYPE.itemsize
+        return cls(source_path, pcm_path, 0, num_samples, cache_path=pcm_path)
+
+    @property
+    def duration(self) -> float:
+        """音訊時長（秒）"""
+        return self.num_samples / self.SAMPLE_RATE
+
+    @property
+    def samples(self) -> np.ndarray:
+        """int16 樣本的唯讀 memmap（延遲開啟）"""
+        if self._samples is None:
+            if self.num_samples == 0:
+                return np.zeros(0, dtype=_PCM_DTYPE)
+            self._samples = np.memmap(
+                self.pcm_path, dtype=_PCM_DTYPE, mode="r",
+                offset=self.offset, shape=(self.num_samples,),
+            )
+        return self._samples
+
+    def _sample_range(self, start_s: float, end_s: Optional[float]) -> Tuple[int, int]:
+        start = max(0, int(start_s * self.SAMPLE_RATE))
+        end = self.num_samples if end_s is None else min(self.num_samples, int(end_s * self.SAMPLE_RATE))
+        return start, max(start, end)
+
+    def read(self, start_s: float = 0.0, end_s: Optional[float] = None) -> np.ndarray:
+        """讀取 [start_s, end_s) 區間為 float32（-1.0 ~ 1.0）"""
+        start, end = self._sample_range(start_s, end_s)
+        return self.samples[start:end].astype(np.float32) / _PCM_SCALE
+
+    def iter_blocks(self, block_size: int) -> Iterator[np.ndarray]:
+        """以 block_size 樣本為單位依序產生 float32 區塊，記憶體用量與檔案長度無關"""
+        for start in range(0, self.num_samples, block_size):
+            yield self.samples[start:start + block_size].astype(np.float32) / _PCM_SCALE
+
+    def sha256(self, chunk_size: int = 1 << 20) -> str:
+        """解碼後 PCM 內容的 SHA-256（轉錄結果快取以此作為音訊指紋）"""
+        digest = hashlib.sha256()
+        remaining = self.num_samples * _PCM_DTYPE.itemsize
+        with open(self.pcm_path, "rb") as f:
+            f.seek(self.offset)
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+        return digest.hexdigest()
+
+    def write_wav(self, output_path: Path, start_s: float = 0.0, end_s: Optional[float] = None) -> Path:
+        """將 [start_s, end_s) 區間寫成 16kHz 單聲道 16-bit wav"""
+        import soundfile as sf
+
+        start, end = self._sample_range(start_s, end_s)
+        sf.write(str(output_path), np.asarray(self.samples[start:end]), self.SAMPLE_RATE, subtype="PCM_16")
+        return output_path
+
+    def close(self) -> None:
+        """釋放 memmap（不刪除快取檔）"""
+        self._samples = None
+
+    @property
+    def cleanup_files(self) -> List[Path]:
+        return [self.cache_path] if self.cache_path else []
+
+    def __repr__(self):
+        return f"AudioAsset(source={self.source_path.name}, duration={self.duration:.2f}s)"
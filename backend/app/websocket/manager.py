@@ -1,11 +1,12 @@
 import asyncio
 import json
 from contextlib import suppress
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 import redis.asyncio as redis
 from fastapi import WebSocket
 
+from app.celery.notifier import CHANNEL_PREFIX, channel_for, stream_for
 from app.core.config import get_settings
 from app.utils.logger import setup_logger
 
@@ -17,17 +18,42 @@ REDIS_URL = settings.redis_url
 # Redis listener 重連退避（秒）
 _RECONNECT_INITIAL_DELAY = 1
 _RECONNECT_MAX_DELAY = 30
+# 尚無任何訂閱（pubsub 還沒有連線）時的輪詢間隔（秒）
+_IDLE_POLL_SECONDS = 0.5
+
+
+def _parse_event_id(event_id: str) -> Tuple[int, int]:
+    """Redis stream entry id（"<ms>-<seq>"）轉為可比較的 tuple"""
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
 
 
 class ConnectionManager:
-    """管理 WebSocket 連線和 Redis 訊息監聽。"""
+    """管理 WebSocket 連線和 Redis 訊息監聽。
+
+    每個 client_id 有自己的 Redis 頻道（見 :func:`app.celery.notifier.channel_for`），
+    本進程只訂閱自己持有 WebSocket 的 client：connect 時訂閱、disconnect 時退訂，
+    listener 重連後重新訂閱目前所有連線。
+
+    每則訊息帶有 event_id（Redis Stream entry id）。重連時帶上 last_event_id，
+    先從 stream 補送遺漏的事件再接即時訊息；兩者經由同一把 per-client lock 依
+    event_id 去重，順序與不重複都能保證。
+    """
 
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
         self._listener_task: Optional[asyncio.Task] = None
         self._stopping = False
+        self._pubsub = None
+        # 保護 pubsub 的 subscribe / unsubscribe（首次訂閱時才建立連線）
+        self._subscribe_lock = asyncio.Lock()
+        # 每個 client 最後送出的 event_id 與保護其順序的 lock
+        self._last_event_ids: Dict[str, str] = {}
+        self._client_locks: Dict[str, asyncio.Lock] = {}
+        self._history_redis = None
 
-    async def connect(self, websocket: WebSocket, client_id: str):
+    async def connect(self, websocket: WebSocket, client_id: str, last_event_id: Optional[str] = None):
+        """接受連線並訂閱 client 頻道；帶 last_event_id 時先補送之後的事件"""
         await websocket.accept()
         # 若同一 client_id 已存在舊連線，先關閉避免洩漏
         old = self.active_connections.get(client_id)
@@ -35,13 +61,91 @@ class ConnectionManager:
             logger.info(f"偵測到重複 client_id={client_id}，關閉舊 WebSocket 連線")
             with suppress(Exception):
                 await old.close(code=1000)
-        self.active_connections[client_id] = websocket
-        logger.info(f"新的 WebSocket 連線: {client_id}")
+        async with self._client_lock(client_id):
+            self.active_connections[client_id] = websocket
+            self._last_event_ids.pop(client_id, None)
+            logger.info(f"新的 WebSocket 連線: {client_id}")
+            # 先訂閱再讀 stream：讀取之後才發布的事件必定會經由 pub/sub 送達
+            await self._subscribe(client_id)
+            if last_event_id:
+                await self._replay(client_id, last_event_id)
 
-    def disconnect(self, client_id: str):
+    def disconnect(self, client_id: str, websocket: Optional[WebSocket] = None):
+        """移除連線；傳入 websocket 時只在它仍是目前連線才移除（避免舊連線關閉時誤刪重連後的新連線）"""
+        if websocket is not None and self.active_connections.get(client_id) is not websocket:
+            return
         if client_id in self.active_connections:
             del self.active_connections[client_id]
+            self._last_event_ids.pop(client_id, None)
+            self._client_locks.pop(client_id, None)
             logger.info(f"WebSocket 連線關閉: {client_id}")
+            try:
+                asyncio.get_running_loop().create_task(self._unsubscribe(client_id))
+            except RuntimeError:
+                pass  # 沒有執行中的 event loop（shutdown 後），listener 重連時不會再訂閱
+
+    async def _subscribe(self, client_id: str):
+        """訂閱 client 的頻道；listener 尚未連上 Redis 時由其重連後統一訂閱"""
+        async with self._subscribe_lock:
+            if self._pubsub is None:
+                return
+            try:
+                await self._pubsub.subscribe(channel_for(client_id))
+            except Exception as e:
+                logger.error(f"訂閱 {client_id} 的 Redis 頻道失敗: {e}")
+
+    async def _unsubscribe(self, client_id: str):
+        """退訂 client 的頻道（同一 client_id 已重新連線時保留訂閱）"""
+        async with self._subscribe_lock:
+            if self._pubsub is None or client_id in self.active_connections:
+                return
+            try:
+                await self._pubsub.unsubscribe(channel_for(client_id))
+            except Exception as e:
+                logger.error(f"退訂 {client_id} 的 Redis 頻道失敗: {e}")
+
+    def _client_lock(self, client_id: str) -> asyncio.Lock:
+        lock = self._client_locks.get(client_id)
+        if lock is None:
+            lock = self._client_locks[client_id] = asyncio.Lock()
+        return lock
+
+    async def _replay(self, client_id: str, last_event_id: str):
+        """補送 stream 中 last_event_id 之後的事件（呼叫端需持有 client lock）"""
+        try:
+            if self._history_redis is None:
+                self._history_redis = redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+            entries = await self._history_redis.xrange(
+                stream_for(client_id), min=f"({last_event_id}", max="+")
+        except Exception as e:
+            logger.error(f"讀取 {client_id} 的狀態事件流失敗 (last_event_id={last_event_id}): {e}")
+            return
+
+        if entries:
+            logger.info(f"補送 {client_id} 遺漏的 {len(entries)} 筆狀態事件")
+        self._last_event_ids[client_id] = last_event_id
+        for entry_id, fields in entries:
+            data = json.loads(fields["data"])
+            data["event_id"] = entry_id
+            await self._send_event(data, client_id)
+
+    async def _deliver(self, data: dict, client_id: str):
+        """轉送即時訊息（與補送共用 client lock，依 event_id 去重）"""
+        async with self._client_lock(client_id):
+            await self._send_event(data, client_id)
+
+    async def _send_event(self, data: dict, client_id: str):
+        event_id = data.get("event_id")
+        if event_id:
+            last = self._last_event_ids.get(client_id)
+            try:
+                if last and _parse_event_id(event_id) <= _parse_event_id(last):
+                    return
+            except ValueError:
+                pass
+        await self.send_personal_message(data, client_id)
+        if event_id and client_id in self.active_connections:
+            self._last_event_ids[client_id] = event_id
 
     async def send_personal_message(self, message: dict, client_id: str):
         websocket = self.active_connections.get(client_id)
@@ -57,10 +161,10 @@ class ConnectionManager:
                 await websocket.close(code=1011)
 
     async def redis_listener(self):
-        """訂閱 Redis pub/sub 並轉送至對應 WebSocket。
+        """訂閱本進程連線 client 的 Redis 頻道並轉送至對應 WebSocket。
 
-        外層 while 確保 Redis 短暫斷線時自動以指數退避重連，
-        直到 shutdown() 被呼叫設定 _stopping=True。
+        外層 while 確保 Redis 短暫斷線時自動以指數退避重連（重連後重新訂閱
+        目前所有連線），直到 shutdown() 被呼叫設定 _stopping=True。
         """
         delay = _RECONNECT_INITIAL_DELAY
         while not self._stopping:
@@ -69,11 +173,20 @@ class ConnectionManager:
             try:
                 r = redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
                 pubsub = r.pubsub()
-                await pubsub.subscribe("transcription_updates")
-                logger.info("已訂閱 'transcription_updates' Redis 頻道。")
+                async with self._subscribe_lock:
+                    client_ids = list(self.active_connections)
+                    if client_ids:
+                        await pubsub.subscribe(*[channel_for(c) for c in client_ids])
+                    self._pubsub = pubsub
+                logger.info(
+                    f"Redis listener 已啟動，訂閱 {len(client_ids)} 個 client 的 '{CHANNEL_PREFIX}*' 頻道。")
                 delay = _RECONNECT_INITIAL_DELAY  # 連線成功後重置退避
 
                 while not self._stopping:
+                    if pubsub.connection is None:
+                        # 尚未訂閱任何頻道時 pubsub 沒有連線，等待第一個 client 連入
+                        await asyncio.sleep(_IDLE_POLL_SECONDS)
+                        continue
                     try:
                         message = await pubsub.get_message(
                             ignore_subscribe_messages=True, timeout=1.0
@@ -88,11 +201,12 @@ class ConnectionManager:
                         continue
 
                     try:
-                        logger.info(f"從 Redis 收到訊息: {message['data']}")
-                        data = json.loads(message["data"])
-                        client_id = data.get("client_id")
-                        if client_id:
-                            await self.send_personal_message(data, client_id)
+                        # 每則訊息都記錄 INFO 會在大量檔案時淹沒日誌；內容只在 DEBUG 記錄
+                        logger.debug(f"從 Redis 收到訊息: {message['channel']}")
+                        client_id = message["channel"][len(CHANNEL_PREFIX):]
+                        if client_id in self.active_connections:
+                            data = json.loads(message["data"])
+                            await self._deliver(data, client_id)
                     except Exception as e:
                         logger.error(f"處理 Redis 訊息時發生錯誤: {e}")
 
@@ -102,9 +216,10 @@ class ConnectionManager:
             except Exception as e:
                 logger.error(f"Redis listener 連線失敗: {e}")
             finally:
+                self._pubsub = None
                 if pubsub is not None:
                     with suppress(Exception):
-                        await pubsub.unsubscribe("transcription_updates")
+                        await pubsub.unsubscribe()
                     with suppress(Exception):
                         await pubsub.close()
                 if r is not None:
@@ -142,6 +257,10 @@ class ConnectionManager:
             with suppress(Exception):
                 await ws.close(code=1001)
             self.active_connections.pop(client_id, None)
+        if self._history_redis is not None:
+            with suppress(Exception):
+                await self._history_redis.close()
+            self._history_redis = None
         logger.info("ConnectionManager shutdown complete")
 
 
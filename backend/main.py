@@ -9,7 +9,7 @@ from app.api import vad
 from app.websocket.manager import manager as websocket_manager
 
 from fastapi.middleware.cors import CORSMiddleware
-from app.database.session import init_db
+from app.database.session import dispose_async_engine, init_async_engine, init_db
 from app.utils.logger import setup_logger
 
 # 建立 logger
@@ -21,8 +21,9 @@ async def lifespan(app: FastAPI):
     """應用程式生命週期管理"""
     logger.info("正在啟動 AI Voice Transcription API...")
 
-    # 初始化資料庫
+    # 初始化資料庫；async 讀取端點的 engine 只在 API 進程建立
     init_db()
+    init_async_engine()
 
     # 啟動 WebSocket 的 Redis 監聯器（可重連、可乾淨關閉）
     websocket_manager.start()
@@ -44,6 +45,7 @@ async def lifespan(app: FastAPI):
     finally:
         logger.info("應用程式正在關閉...")
         await websocket_manager.shutdown()
+        await dispose_async_engine()
 
 
 app = FastAPI(title="AI Voice Transcription API",
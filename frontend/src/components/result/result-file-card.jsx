@@ -165,7 +165,7 @@ export function ResultFileCard({ file, onDownload }) {
                             items: downloadMenuItems,
                             onClick: ({ key }) => {
                                 if (onDownload) {
-                                    onDownload(fData.result?.[key], fData.name, key)
+                                    onDownload(fData, key)
                                 }
                             }
                         }}
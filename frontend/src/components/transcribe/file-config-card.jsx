@@ -195,10 +195,7 @@ export function FileConfigCard({
                         <Dropdown
                             menu={{
                                 items: downloadFormats,
-                                onClick: ({ key }) => {
-                                    const content = config.result?.[key]
-                                    if (content) onDownload(content, config.name, key)
-                                },
+                                onClick: ({ key }) => onDownload(config, key),
                             }}
                         >
                             <Tooltip title="下載">
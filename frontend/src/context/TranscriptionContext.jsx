@@ -5,6 +5,7 @@ import { useModelManager } from '../components/ModelManager';
 import { useTranscriptionSocket } from '../hooks/useTranscriptionSocket';
 import { useUploadQueue } from '../hooks/useUploadQueue';
 import { useDownloadBundle } from '../hooks/useDownloadBundle';
+import { resolveTranscript } from '../utils/download';
 
 const TranscriptionContext = createContext(null);
 
@@ -78,9 +79,15 @@ export const TranscriptionProvider = ({ children }) => {
     }
   }, [fileList, isProcessing]);
 
-  const handleOpenPreview = useCallback((record) => {
+  const handleOpenPreview = useCallback(async (record) => {
     setPreviewTitle(`預覽內容: ${record.name}`);
-    setPreviewContent(record.result?.txt || '沒有可預覽的文字內容。');
+    let content = '';
+    try {
+      content = await resolveTranscript(record, 'txt');
+    } catch (error) {
+      console.error('取得預覽內容失敗:', error);
+    }
+    setPreviewContent(content || '沒有可預覽的文字內容。');
     setIsPreviewModalVisible(true);
   }, []);
 
@@ -139,7 +146,9 @@ export const TranscriptionProvider = ({ children }) => {
     }
 
     const config = await getProviderConfig(provider);
-    const apiKey = config?.apiKeys?.[0];
+    const apiKeys = (config?.apiKeys || []).filter((k) => k && k.trim());
+    // 設定多把 Key 時全部送出，由後端 client 池分流並避開被限流的 Key
+    const apiKey = apiKeys.length > 1 ? apiKeys : apiKeys[0];
     const prompt = config?.prompt;
     if (!apiKey) {
       message.error(`請先在模型管理中為 ${provider} 設定 API 金鑰。`);
@@ -1,14 +1,24 @@
 import { useCallback } from 'react';
 import JSZip from 'jszip';
 import { message } from 'antd';
-import { downloadBlob, renameExtension } from '../utils/download';
+import { downloadBlob, renameExtension, resolveTranscript } from '../utils/download';
 
 /**
  * 提供「下載單檔結果」與「打包所有已完成檔案」兩個 helper。
  */
 export function useDownloadBundle(fileList) {
-  const downloadFile = useCallback((content, fileName, format) => {
-    downloadBlob(content, renameExtension(fileName, format));
+  const downloadFile = useCallback(async (file, format) => {
+    try {
+      const content = await resolveTranscript(file, format);
+      if (!content) {
+        message.warning('此格式無可用內容');
+        return;
+      }
+      downloadBlob(content, renameExtension(file.name, format));
+    } catch (error) {
+      console.error('下載字幕失敗:', error);
+      message.error(error?.message || '下載失敗');
+    }
   }, []);
 
   const downloadAllFiles = useCallback(async (format) => {
@@ -23,10 +33,12 @@ export function useDownloadBundle(fileList) {
       message.loading({ content: '正在打包檔案...', key: 'zipDownload' });
 
       const zip = new JSZip();
-      completedFiles.forEach((file) => {
-        const content = file.result[format] || '';
-        if (content) {
-          zip.file(renameExtension(file.name, format), content);
+      const contents = await Promise.all(
+        completedFiles.map((file) => resolveTranscript(file, format).catch(() => ''))
+      );
+      completedFiles.forEach((file, i) => {
+        if (contents[i]) {
+          zip.file(renameExtension(file.name, format), contents[i]);
         }
       });
 
@@ -4,7 +4,9 @@ import { useCallback, useEffect, useRef } from 'react';
  * 集中管理轉錄相關 WebSocket 連線：
  *  - 自動清理：hook 卸載時所有 socket 都會關閉
  *  - 心跳：每 30s 送一次 ping，避免代理層因閒置而中斷連線
- *  - 重連：非正常斷線 (close code !== 1000) 時依指數 backoff 重連，最多 N 次
+ *  - 重連：非正常斷線 (close code !== 1000) 時依指數 backoff 重連，最多 N 次；
+ *    重連時帶上最後收到的 ``event_id``（``?last_event_id=``），後端補送斷線期間
+ *    遺漏的狀態事件，且不再等待任務 payload
  *
  * 設計成低階 API，呼叫者透過 ``openSocket(id, url, handlers)`` 啟動連線，並收到
  * 事件 callback；同一個 ``id`` 第二次呼叫時舊連線會先被關閉。
@@ -16,7 +18,7 @@ const RECONNECT_BASE_DELAY_MS = 1_000;
 const RECONNECT_MAX_DELAY_MS = 30_000;
 
 export function useTranscriptionSocket() {
-  // { [id]: { socket, attempts, hbTimer, reconnectTimer, opts } }
+  // { [id]: { socket, attempts, hbTimer, reconnectTimer, opened, lastEventId, errorEvent, opts } }
   const slotsRef = useRef({});
 
   const _clearTimers = (slot) => {
@@ -49,12 +51,13 @@ export function useTranscriptionSocket() {
   /**
    * 建立 / 重新建立一條 WebSocket 連線。
    *
-   * @param {string} id    任務識別碼（單檔轉錄為 file uid，批次為 batchId）
+   * @param {string} id    連線識別碼（一般轉錄為 sessionId，批次為 batchId）
    * @param {string} url   WebSocket URL
    * @param {object} handlers
-   *   - onOpen(event, socket): 連線成功（可在此送出 payload）
+   *   - onOpen(event, socket, { resumed }): 連線成功；resumed 為 false 時在此送出 payload，
+   *                             true 代表斷線重連（後端會補送遺漏事件，不需再送 payload）
    *   - onMessage(event):       收到伺服器訊息
-   *   - onError(event):         連線錯誤
+   *   - onError(event):         連線錯誤（即將自動重連時不會呼叫）
    *   - onClose(event):         連線關閉（不論正常或異常）
    *   - autoReconnect:          非正常關閉時是否自動重連，預設 false
    */
@@ -77,16 +80,26 @@ export function useTranscriptionSocket() {
       attempts: 0,
       hbTimer: null,
       reconnectTimer: null,
+      opened: false,
+      lastEventId: null,
+      errorEvent: null,
       opts: { url, onOpen, onMessage, onError, onClose, autoReconnect },
     };
     slotsRef.current[id] = slot;
 
     const connect = () => {
-      const ws = new WebSocket(url);
+      // 曾經連上（payload 已送出）才以 last_event_id 續接；尚未收到任何事件時從頭補送
+      const resumed = slot.opened;
+      const resumeUrl = resumed
+        ? `${url}${url.includes('?') ? '&' : '?'}last_event_id=${encodeURIComponent(slot.lastEventId ?? '0')}`
+        : url;
+      const ws = new WebSocket(resumeUrl);
       slot.socket = ws;
+      slot.errorEvent = null;
 
       ws.onopen = (event) => {
         slot.attempts = 0;
+        slot.opened = true;
         slot.hbTimer = setInterval(() => {
           if (ws.readyState === WebSocket.OPEN) {
             try {
@@ -96,20 +109,26 @@ export function useTranscriptionSocket() {
             }
           }
         }, HEARTBEAT_INTERVAL_MS);
-        onOpen?.(event, ws);
+        onOpen?.(event, ws, { resumed });
       };
 
       ws.onmessage = (event) => {
+        try {
+          const eventId = JSON.parse(event.data)?.event_id;
+          if (eventId) slot.lastEventId = eventId;
+        } catch {
+          /* ignore */
+        }
         onMessage?.(event);
       };
 
       ws.onerror = (event) => {
-        onError?.(event);
+        // 延到 onclose 才決定是否回報：即將重連的錯誤不打擾呼叫端
+        slot.errorEvent = event;
       };
 
       ws.onclose = (event) => {
         _clearTimers(slot);
-        onClose?.(event);
 
         const stillRegistered = slotsRef.current[id] === slot;
         const shouldReconnect =
@@ -118,6 +137,11 @@ export function useTranscriptionSocket() {
           event.code !== 1000 &&
           slot.attempts < RECONNECT_MAX_ATTEMPTS;
 
+        if (slot.errorEvent && !shouldReconnect) {
+          onError?.(slot.errorEvent);
+        }
+        onClose?.(event);
+
         if (shouldReconnect) {
           const delay = Math.min(
             RECONNECT_BASE_DELAY_MS * Math.pow(2, slot.attempts),
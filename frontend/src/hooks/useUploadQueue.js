@@ -12,7 +12,8 @@ import { registerTranscribeSession } from '../utils/transcribeSessions';
  *
  * 回傳兩個高階函式：
  *   - startRegular({ provider, model, apiKey, prompt, defaults }):
- *       每個檔案各自一條 WS；單檔轉錄／Flex／Standard 模式
+ *       同一次 Start 的檔案共用一條 session WS，各檔案各自一個 Celery 任務；
+ *       單檔轉錄／Flex／Standard 模式
  *   - startBatch({ provider, model, apiKey, prompt, defaults }):
  *       所有檔案共用一條 batch WS（Gemini Batch API，50% 折扣）
  *
@@ -48,7 +49,7 @@ export function useUploadQueue({ fileList, setFileList, socketManager, onBatchSu
     );
   }, [setFileList]);
 
-  // 收到單檔 WS 訊息時更新對應 file 的 state
+  // 收到單檔狀態訊息時依 file_uid 更新對應 file 的 state
   const handleSingleMessage = useCallback((event) => {
     let data;
     try {
@@ -70,6 +71,7 @@ export function useUploadQueue({ fileList, setFileList, socketManager, onBatchSu
           next.status = 'completed';
           next.percent = 100;
           next.result = data.result?.transcripts;
+          next.task_uuid = data.result?.task_uuid ?? data.task_uuid;
           next.tokens_used = data.result?.tokens_used;
           next.cost = data.result?.cost;
           next.input_cost = data.result?.input_cost;
@@ -85,7 +87,7 @@ export function useUploadQueue({ fileList, setFileList, socketManager, onBatchSu
   }, [setFileList]);
 
   // ===============================================================
-  // 一般模式（單檔/YouTube）：每個 file uid 一條 WebSocket
+  // 一般模式（單檔/YouTube）：每次 Start 一條 session WebSocket
   // ===============================================================
   const startRegular = useCallback(async ({ provider, model, apiKey, prompt, defaults }) => {
     const candidates = fileList.filter(
@@ -115,42 +117,81 @@ export function useUploadQueue({ fileList, setFileList, socketManager, onBatchSu
       )
     );
 
-    const openTranscriptionSocket = (file, serverFilename) => {
-      socketManager.openSocket(file.uid, WS_URLS.transcription(file.uid), {
-        onOpen: () => {
-          updateFile(file.uid, { statusText: '連線成功，正在提交任務...', serverFilename });
-          const payload = buildSinglePayload({
-            serverFilename: serverFilename ?? file.name,
-            file,
-            provider,
-            model,
-            apiKey,
-            prompt,
-            defaults,
-            sessionId,
-          });
-          socketManager.sendMessage(file.uid, payload);
-        },
-        onMessage: handleSingleMessage,
-        onError: () => {
-          message.error(`檔案 ${file.name} 的連線發生錯誤。`);
-          updateFile(file.uid, {
-            status: 'error',
-            percent: 100,
-            error: '連線錯誤',
-            statusText: '連線失敗',
-          });
-        },
-      });
+    // 整個 session 共用一條 WS：檔案上傳完就在這條連線上提交，狀態以 file_uid 區分
+    const pendingUids = new Set(startTargets.map((f) => f.uid));
+    const unsent = [];
+    let connectionLost = false;
+
+    const submitFile = (file, serverFilename) => {
+      if (connectionLost) {
+        updateFile(file.uid, { status: 'error', percent: 100, error: '連線錯誤', statusText: '連線失敗' });
+        return;
+      }
+      updateFile(file.uid, { statusText: '正在提交任務...', serverFilename });
+      const payload = {
+        type: 'submit',
+        file_uid: file.uid,
+        ...buildSinglePayload({
+          serverFilename: serverFilename ?? file.name,
+          file,
+          provider,
+          model,
+          apiKey,
+          prompt,
+          defaults,
+          sessionId,
+        }),
+      };
+      // 連線尚未建立或重連中：暫存，連上後再送
+      if (!socketManager.sendMessage(sessionId, payload)) unsent.push(payload);
+    };
+
+    const settle = (uid) => {
+      pendingUids.delete(uid);
+      if (pendingUids.size === 0) socketManager.closeSocket(sessionId, 1000);
     };
 
-    // 一般檔案：先 upload 拿到伺服器檔名再開 WS
+    socketManager.openSocket(sessionId, WS_URLS.session(sessionId), {
+      autoReconnect: true,
+      // 重連時後端補送遺漏的狀態；已送出的檔案不重送，只送出尚未送達的
+      onOpen: () => {
+        while (unsent.length > 0) {
+          const payload = unsent[0];
+          if (!socketManager.sendMessage(sessionId, payload)) break;
+          unsent.shift();
+        }
+      },
+      onMessage: (event) => {
+        handleSingleMessage(event);
+        try {
+          const data = JSON.parse(event.data);
+          if (data.status_code === 'COMPLETED' || data.status_code === 'FAILED') {
+            settle(data.file_uid);
+          }
+        } catch {
+          /* ignore */
+        }
+      },
+      onError: () => {
+        connectionLost = true;
+        message.error('轉錄連線發生錯誤。');
+        setFileList((current) =>
+          current.map((f) =>
+            pendingUids.has(f.uid) && f.status === 'processing'
+              ? { ...f, status: 'error', percent: 100, error: '連線錯誤', statusText: '連線失敗' }
+              : f
+          )
+        );
+      },
+    });
+
+    // 一般檔案：先 upload 拿到伺服器檔名再提交
     for (const file of candidates) {
       try {
         const formData = new FormData();
         formData.append('file', file.originFileObj);
         const { filename: serverFilename } = await api.upload(formData);
-        openTranscriptionSocket(file, serverFilename);
+        submitFile(file, serverFilename);
       } catch (error) {
         console.error(`上傳檔案 ${file.name} 失敗:`, error);
         updateFile(file.uid, {
@@ -158,11 +199,12 @@ export function useUploadQueue({ fileList, setFileList, socketManager, onBatchSu
           statusText: '上傳失敗',
           percent: 100,
         });
+        settle(file.uid);
       }
     }
 
-    // YouTube：直接開 WS，後端會處理下載
-    youtubeUrls.forEach((file) => openTranscriptionSocket(file, file.name));
+    // YouTube：直接提交，後端會處理下載
+    youtubeUrls.forEach((file) => submitFile(file, file.name));
 
     return { skipped: false };
   }, [fileList, setFileList, updateFile, socketManager, handleSingleMessage]);
@@ -224,7 +266,9 @@ export function useUploadQueue({ fileList, setFileList, socketManager, onBatchSu
     const uploadedUidSet = new Set(uploaded.map((f) => f.uid));
 
     socketManager.openSocket(batchId, WS_URLS.batch(batchId), {
-      onOpen: () => {
+      autoReconnect: true,
+      onOpen: (event, ws, { resumed } = {}) => {
+        if (resumed) return;  // 重連：後端補送遺漏的狀態，批次不重送
         setFileList((current) =>
           current.map((f) =>
             uploadedUidSet.has(f.uid)
@@ -298,6 +342,8 @@ export function useUploadQueue({ fileList, setFileList, socketManager, onBatchSu
                 next.status = 'completed';
                 next.percent = 100;
                 next.result = data.result?.transcripts;
+                // 批次訊息的 task_uuid 是批次任務；下載其他格式需用檔案自己的 log uuid
+                next.task_uuid = data.result?.task_uuid ?? data.task_uuid;
                 next.tokens_used = data.result?.tokens_used;
                 next.cost = data.result?.cost;
                 next.input_cost = data.result?.input_cost;
@@ -4,6 +4,7 @@ import { Archive } from "lucide-react"
 import { ReloadOutlined, LoadingOutlined } from "@ant-design/icons"
 import { useModelManager } from "@/components/ModelManager"
 import { api, ApiError } from "../services/api"
+import { resolveTranscript } from "../utils/download"
 import TaskCard from "@/components/task/TaskCard"
 import SingleTaskRow from "@/components/task/SingleTaskRow"
 import TaskSessionDivider from "@/components/task/TaskSessionDivider"
@@ -128,9 +129,17 @@ export default function TaskPage() {
         message.success(`已歸檔 ${successCount} 個任務`)
     }
 
-    const downloadResult = (fileResult, format) => {
-        const content = fileResult.result?.transcripts?.[format]
-                     || fileResult.result?.[format]
+    const downloadResult = async (fileResult, format) => {
+        // 結果只帶 LRC，其他格式依 task_uuid 由下載端點即時轉換
+        let content = ""
+        try {
+            content = await resolveTranscript({
+                result: fileResult.result?.transcripts || fileResult.result,
+                task_uuid: fileResult.result?.task_uuid,
+            }, format)
+        } catch (error) {
+            console.error("下載字幕失敗:", error)
+        }
         if (!content) {
             message.warning("此格式無可用內容")
             return
@@ -142,6 +142,7 @@ export const api = {
 
 export const WS_URLS = {
   transcription: (id) => `${DEFAULT_WS_BASE}/${id}`,
+  session: (id) => `${DEFAULT_WS_BASE}/session/${id}`,
   batch: (id) => `${DEFAULT_WS_BATCH_BASE}/${id}`,
 };
 
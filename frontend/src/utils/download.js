@@ -2,6 +2,8 @@
  * 共用的 blob/檔案下載工具。
  */
 
+import { api } from '../services/api';
+
 /**
  * 以 Blob 包裝任意內容後觸發瀏覽器下載。
  *
@@ -29,3 +31,20 @@ export function renameExtension(fileName, newExt) {
   const stem = fileName.split('.').slice(0, -1).join('.') || fileName;
   return `${stem}.${newExt}`;
 }
+
+/**
+ * 取得已完成檔案指定格式的字幕內容。
+ *
+ * 完成訊息只帶 LRC；SRT / VTT / TXT 依需要向 /history/{task_uuid}/download/{fmt}
+ * 取得（後端由 DB 中的 LRC 即時轉換）。
+ *
+ * @param {object} file    含 result（{ lrc, ... }）與 task_uuid 的檔案物件
+ * @param {string} format  lrc | srt | vtt | txt
+ * @returns {Promise<string>} 字幕內容；無法取得時為空字串
+ */
+export async function resolveTranscript(file, format) {
+  const inline = file?.result?.[format];
+  if (inline) return inline;
+  if (!file?.task_uuid) return '';
+  return api.history.downloadTranscript(file.task_uuid, format);
+}
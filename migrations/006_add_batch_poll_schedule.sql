@@ -0,0 +1,5 @@
+-- Migration: batch_jobs 新增集中輪詢排程欄位
+-- Date: 2026-10-17
+
+ALTER TABLE batch_jobs ADD COLUMN IF NOT EXISTS next_poll_at TIMESTAMP;
+ALTER TABLE batch_jobs ADD COLUMN IF NOT EXISTS poll_count INTEGER DEFAULT 0;
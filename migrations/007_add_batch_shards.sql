@@ -0,0 +1,7 @@
+-- Migration: batch_jobs 新增分片所屬的前端 batch ID
+-- Date: 2026-10-17
+
+ALTER TABLE batch_jobs ADD COLUMN IF NOT EXISTS parent_batch_id VARCHAR;
+
+CREATE INDEX IF NOT EXISTS ix_batch_jobs_parent_batch_id
+    ON batch_jobs (parent_batch_id);
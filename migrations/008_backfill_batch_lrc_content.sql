@@ -0,0 +1,14 @@
+-- Migration: 由 batch_jobs.results_json 回填舊批次檔案的 transcription_logs.lrc_content
+-- Date: 2026-10-17
+-- 歷史列表的 has_transcript 改在 SQL 內計算，不再逐列解析 results_json；
+-- 回填後舊批次檔案的逐字稿也直接由 lrc_content 判斷與下載（PostgreSQL）
+
+UPDATE transcription_logs AS t
+SET lrc_content = NULLIF(BTRIM(b.results_json::jsonb -> m.key -> 'transcripts' ->> 'lrc'), '')
+FROM batch_jobs AS b,
+     jsonb_each_text(b.file_log_uuids_json::jsonb) AS m(key, value)
+WHERE t.batch_id = b.batch_id
+  AND m.value = t.task_uuid::text
+  AND (t.lrc_content IS NULL OR BTRIM(t.lrc_content) = '')
+  AND b.results_json IS NOT NULL
+  AND b.file_log_uuids_json IS NOT NULL;
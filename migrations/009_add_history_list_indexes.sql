@@ -0,0 +1,31 @@
+-- Migration: 歷史紀錄列表 / 游標分頁的複合 index
+-- Date: 2026-10-17
+--
+-- 注意：
+-- 1. 列表依 (request_timestamp, task_uuid) 倒序，游標分頁以列比較接續上一頁；
+--    各篩選組合（無 / status / is_batch / status + is_batch）各一個以排序欄位結尾的 index。
+-- 2. 新建環境會由 session.py:_migrate_add_missing_indexes() 自動補齊前四個 index，
+--    但啟動時建立會鎖住寫入；大表請先以 psql -f 執行本檔（CONCURRENTLY 不可包在交易內）。
+-- 3. keyword 以 ILIKE '%...%' 搜尋檔名 / 模型，B-tree 無法使用，改以 pg_trgm 的 GIN index
+--    （僅 PostgreSQL，不在 ORM 中宣告）。
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transcription_logs_list
+    ON transcription_logs (request_timestamp, task_uuid);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transcription_logs_status_list
+    ON transcription_logs (status, request_timestamp, task_uuid);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transcription_logs_is_batch_list
+    ON transcription_logs (is_batch, request_timestamp, task_uuid);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transcription_logs_status_is_batch_list
+    ON transcription_logs (status, is_batch, request_timestamp, task_uuid);
+
+-- keyword 搜尋 ---------------------------------------------------
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transcription_logs_original_filename_trgm
+    ON transcription_logs USING gin (original_filename gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_transcription_logs_model_used_trgm
+    ON transcription_logs USING gin (model_used gin_trgm_ops);
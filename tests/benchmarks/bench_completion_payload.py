@@ -0,0 +1,72 @@
+"""
+Size benchmark：轉錄完成訊息（全部格式 vs. 只帶 LRC）
+
+以 2 小時音檔（每 3 秒一行，共 2,400 行）的 LRC 建立完成訊息，比較原本隨訊息
+附上 LRC / SRT / VTT / TXT 四種格式與改為只帶 LRC 時，經過 Redis pub/sub、
+狀態事件流與 WebSocket 的 JSON 位元組數；另以 50 個檔案的批次估算 results_json 大小。
+不會被 pytest 自動收集，請手動執行：
+
+    python -m tests.benchmarks.bench_completion_payload
+"""
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend"))
+
+from app.services.converter.service import compact_transcripts, convert_from_lrc  # noqa: E402
+
+DURATION_SECONDS = 2 * 60 * 60
+LINE_INTERVAL_SECONDS = 3
+BATCH_FILES = 50
+
+
+def _long_lrc() -> str:
+    lines = []
+    for i, t in enumerate(range(0, DURATION_SECONDS, LINE_INTERVAL_SECONDS)):
+        minutes, seconds = divmod(t, 60)
+        lines.append(f"[{minutes:02d}:{seconds:02d}.00]Speaker {i % 2 + 1}: 這是第 {i + 1} 句逐字稿內容，用來估算訊息大小。")
+    return "\n".join(lines)
+
+
+def _message(transcripts: dict) -> bytes:
+    """與 notifier.publish_status 相同的完成訊息編碼"""
+    message = {
+        "client_id": "file-uid",
+        "task_uuid": "00000000-0000-0000-0000-000000000000",
+        "status_code": "COMPLETED",
+        "status_text": "任務完成",
+        "result": {
+            "task_uuid": "00000000-0000-0000-0000-000000000000",
+            "transcripts": transcripts,
+            "tokens_used": 123456,
+            "cost": 0.123456,
+            "input_cost": 0.1,
+            "output_cost": 0.023456,
+            "model": "gemini-2.5-flash",
+            "source_language": "zh-TW",
+            "processing_time_seconds": 321.0,
+            "audio_duration_seconds": float(DURATION_SECONDS),
+            "cost_breakdown": None,
+        },
+    }
+    return json.dumps(message, ensure_ascii=False).encode("utf-8")
+
+
+def main():
+    lrc = _long_lrc()
+    full = _message(convert_from_lrc(lrc).model_dump())
+    compact = _message(compact_transcripts(lrc))
+
+    print(f"音檔長度: {DURATION_SECONDS / 3600:.0f} 小時 ({lrc.count(chr(10)) + 1:,} 行 LRC)")
+    print(f"全部格式:   {len(full) / 1024:>9.1f} KiB")
+    print(f"只帶 LRC:   {len(compact) / 1024:>9.1f} KiB")
+    print(f"縮小倍數:   {len(full) / len(compact):>9.1f}x")
+    print(
+        f"{BATCH_FILES} 檔批次 results_json: "
+        f"{len(full) * BATCH_FILES / 1024 / 1024:.1f} MiB → {len(compact) * BATCH_FILES / 1024 / 1024:.1f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Latency benchmark：歷史紀錄分頁（OFFSET + COUNT vs. 游標分頁 + 總筆數快取）
+
+以 SQLite 暫存檔建立 ROWS 筆 transcription_logs（含 ORM 宣告的複合 index），比較
+HistoryRepository.get_logs_paginated（每次 COUNT，OFFSET 跳過前面的列）與
+get_logs_by_cursor（以 (request_timestamp, task_uuid) 接續，總筆數取自快取）
+在第一頁與深頁的查詢時間；另列出帶 status 篩選時的結果。
+不會被 pytest 自動收集，請手動執行：
+
+    python -m tests.benchmarks.bench_history_pagination
+"""
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import MagicMock
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend"))
+
+# 與 tests/conftest.py 相同：略過 torch 等重量級依賴的匯入
+for _mod in ("torch", "torchaudio", "torchaudio.transforms", "torchaudio.functional", "silero_vad", "soundfile"):
+    sys.modules.setdefault(_mod, MagicMock())
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.database.models import Base, TranscriptionLog  # noqa: E402
+from app.repositories.history_repository import HistoryRepository, encode_cursor  # noqa: E402
+
+ROWS = 200_000
+PAGE_SIZE = 20
+PAGES = (1, 100, 1_900)
+REPEAT = 20
+
+
+def _seed(engine) -> None:
+    Base.metadata.create_all(engine)
+    now = datetime(2026, 1, 1)
+    rows = [
+        {
+            "task_uuid": uuid.uuid4(),
+            "request_timestamp": now - timedelta(seconds=i),
+            "status": "FAILED" if i % 5 == 0 else "COMPLETED",
+            "original_filename": f"audio_{i}.m4a",
+            "model_used": "gemini-2.5-flash",
+            "is_batch": i % 3 == 0,
+        }
+        for i in range(ROWS)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(TranscriptionLog), rows)
+
+
+def _timed(fn) -> float:
+    """重複 REPEAT 次取中位數（ms）"""
+    samples = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)[len(samples) // 2] * 1000
+
+
+def main():
+    repo = HistoryRepository()
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        _seed(engine)
+        print(f"transcription_logs {ROWS:,} 筆，每頁 {PAGE_SIZE} 筆，取 {REPEAT} 次中位數")
+        print(f"{'篩選':<18} {'頁碼':>6} {'OFFSET + COUNT':>16} {'游標 + 快取':>14}")
+
+        with Session(engine) as db:
+            for label, filters in (("無", {}), ("status=FAILED", {"status": "FAILED"})):
+                for page in PAGES:
+                    # 取得深頁的游標：上一頁最後一筆
+                    cursor = None
+                    if page > 1:
+                        previous, _ = repo.get_logs_paginated(db, page=page - 1, page_size=PAGE_SIZE, **filters)
+                        cursor = encode_cursor(previous[-1])
+                    repo.get_logs_by_cursor(db, cursor=cursor, page_size=PAGE_SIZE, **filters)  # 暖快取
+
+                    offset_ms = _timed(lambda: repo.get_logs_paginated(
+                        db, page=page, page_size=PAGE_SIZE, **filters))
+                    cursor_ms = _timed(lambda: repo.get_logs_by_cursor(
+                        db, cursor=cursor, page_size=PAGE_SIZE, **filters))
+                    print(f"{label:<18} {page:>6} {offset_ms:>13.2f} ms {cursor_ms:>11.2f} ms")
+                    db.expunge_all()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
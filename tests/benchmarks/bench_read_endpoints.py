@@ -0,0 +1,249 @@
+"""
+Throughput benchmark：歷史紀錄與批次任務列表端點（同步 Session + threadpool vs. async engine）
+
+以 httpx.AsyncClient + ASGITransport 在同一進程內對 ``/api/v1/history`` 與
+``/api/v1/batch/tasks`` 送出並行請求，比較改版前的同步端點（Starlette threadpool，
+預設 40 條執行緒）與改版後的 async 端點（AsyncSession）的 requests/sec 與 p95 延遲。
+
+資料庫以 SQLite 暫存檔模擬，每個 SQL 額外等待一段延遲（模擬 Postgres 的網路來回與查詢時間）：
+同步 engine 在 threadpool 執行緒內等待，async engine 在 aiosqlite 的連線執行緒內等待，
+與 psycopg2 / asyncpg 佔用資源的方式相同。async engine 使用設定的連線池（DB_POOL_SIZE + DB_MAX_OVERFLOW）。
+同步版本在並行數超過連線數時會互鎖：端點回傳後 Session 仍持有連線，但回應驗證也要排 threadpool，
+而 threadpool 已被等待連線的請求佔滿，直到 pool timeout 才解開（預設 30 條連線 / 40 條執行緒即會發生）；
+為了量得到吞吐量，這裡讓同步版本的連線數不設上限。
+SQLite 的 UPDATE 即使沒有命中任何列也要拿整個資料庫的寫入鎖，會讓 /batch/tasks 開頭的
+archive_old_completed 互相排隊（Postgres 不會），因此兩個版本都略過這一步。
+每個情境以 (每個 SQL 的延遲, 被佔住的 threadpool 執行緒數) 描述，後者模擬同時進行中的上傳等同步端點。
+注意 aiosqlite 每次操作都要切換執行緒，CPU 開銷比 asyncpg 高，DB 延遲很低時 async 版本反而較慢。
+不會被 pytest 自動收集，請手動執行：
+
+    python -m tests.benchmarks.bench_read_endpoints
+"""
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend"))
+
+# 與 tests/conftest.py 相同：略過 torch 等重量級依賴的匯入
+for _mod in ("torch", "torchaudio", "torchaudio.transforms", "torchaudio.functional", "silero_vad", "soundfile"):
+    sys.modules.setdefault(_mod, MagicMock())
+
+import anyio  # noqa: E402
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI  # noqa: E402
+from fastapi.concurrency import run_in_threadpool  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+from sqlalchemy.orm import Session, sessionmaker  # noqa: E402
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool  # noqa: E402
+from sqlalchemy.util import await_only  # noqa: E402
+
+from app.api import batch, history  # noqa: E402
+from app.core.config import get_settings  # noqa: E402
+from app.database.models import Base, BatchJob, TranscriptionLog  # noqa: E402
+from app.database.session import get_async_db  # noqa: E402
+from app.repositories.batch_job_repository import AsyncBatchJobRepository, BatchJobRepository  # noqa: E402
+from app.repositories.history_repository import HistoryRepository  # noqa: E402
+from app.schemas.schemas import (  # noqa: E402
+    BatchTaskFile,
+    BatchTaskResponse,
+    HistoryListResponse,
+    HistoryLogResponse,
+)
+
+# (每個 SQL 的延遲 ms, 被佔住的 threadpool 執行緒數)
+SCENARIOS = [(2.0, 0), (20.0, 30)]
+THREADPOOL_SIZE = 40
+LOG_ROWS = 2_000
+ACTIVE_BATCHES = 20
+CONCURRENCY = 200
+REQUESTS = 1_000
+
+_settings = get_settings()
+POOL_KWARGS = {"pool_size": _settings.db_pool_size, "max_overflow": _settings.db_max_overflow}
+_db_latency_seconds = 0.0
+
+
+def _simulated_latency(statement):
+    time.sleep(_db_latency_seconds)
+
+
+def _seed(engine) -> None:
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        now = datetime.utcnow()
+        for i in range(LOG_ROWS):
+            db.add(TranscriptionLog(
+                task_uuid=uuid.uuid4(), status="COMPLETED", original_filename=f"f{i}.m4a",
+                model_used="gemini-2.5-flash", is_batch=False, cost=0.001, total_tokens=100,
+                request_timestamp=now - timedelta(seconds=i), lrc_content="[00:01.00]hi",
+            ))
+        for i in range(ACTIVE_BATCHES):
+            db.add(BatchJob(
+                batch_id=uuid.uuid4().hex, status="POLLING", file_count=2,
+                file_mapping_json=json.dumps({
+                    "0": {"file_uid": "a", "original_filename": "a.m4a"},
+                    "1": {"file_uid": "b", "original_filename": "b.m4a"},
+                }),
+            ))
+        db.commit()
+
+
+def _sync_app(engine) -> FastAPI:
+    """改版前的端點實作：同步 Session，由 Starlette threadpool 執行"""
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+    history_repo, batch_repo = HistoryRepository(), BatchJobRepository()
+
+    def get_db():
+        with SessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/api/v1/history", response_model=HistoryListResponse)
+    def get_history(db: Session = Depends(get_db)):
+        logs, total = history_repo.get_logs_paginated(db, page=1, page_size=20)
+        items = [
+            HistoryLogResponse(
+                task_uuid=str(log.task_uuid),
+                request_timestamp=str(log.request_timestamp) if log.request_timestamp else None,
+                completed_at=str(log.completed_at) if log.completed_at else None,
+                status=log.status,
+                original_filename=log.original_filename,
+                audio_duration_seconds=log.audio_duration_seconds,
+                processing_time_seconds=log.processing_time_seconds,
+                model_used=log.model_used,
+                provider=log.provider,
+                source_language=log.source_language,
+                target_language=log.target_language,
+                total_tokens=log.total_tokens,
+                cost=log.cost,
+                error_message=log.error_message,
+                is_batch=log.is_batch,
+                batch_id=log.batch_id,
+                has_transcript=history_repo.has_transcript(db, log),
+                session_id=log.session_id,
+                file_uid=log.file_uid,
+            )
+            for log in logs
+        ]
+        return HistoryListResponse(items=items, total=total, page=1, page_size=20, total_pages=total // 20 + 1)
+
+    @app.get("/api/v1/batch/tasks", response_model=list[BatchTaskResponse])
+    def get_batch_tasks(db: Session = Depends(get_db)):
+        results = []
+        for job in batch_repo.get_active_tasks(db):
+            mapping = json.loads(job.file_mapping_json)
+            files = [
+                BatchTaskFile(file_uid=mapping[i]["file_uid"], original_filename=mapping[i]["original_filename"])
+                for i in sorted(mapping, key=int)
+            ]
+            elapsed = (datetime.utcnow() - job.created_at).total_seconds() if job.created_at else None
+            results.append(BatchTaskResponse(
+                batch_id=job.batch_id, status=job.status, file_count=job.file_count or len(files),
+                is_alive=batch._job_is_alive(job, elapsed),
+                created_at=str(job.created_at) if job.created_at else None,
+                updated_at=str(job.updated_at) if job.updated_at else None,
+                elapsed_seconds=elapsed, files=files, session_id=job.session_id or job.batch_id,
+            ))
+        return results
+
+    return app
+
+
+def _async_app(async_engine) -> FastAPI:
+    """改版後：實際的 history / batch router，讀取走 AsyncSession"""
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(history.router, prefix="/api/v1/history")
+    app.include_router(batch.router, prefix="/api/v1/batch")
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    return app
+
+
+async def _load(app: FastAPI, path: str, busy_threads: int) -> tuple:
+    """以 CONCURRENCY 個並行 client 送出 REQUESTS 個請求，回傳 (req/s, p95 ms)"""
+    latencies = []
+    remaining = iter(range(REQUESTS))
+    release_busy = threading.Event()
+
+    async def worker(client):
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await client.get(path)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # 佔住部分 threadpool，模擬同時進行中的上傳 / 其他同步端點
+        busy = [asyncio.create_task(run_in_threadpool(release_busy.wait)) for _ in range(busy_threads)]
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - started
+        release_busy.set()
+        await asyncio.gather(*busy)
+
+    p95 = statistics.quantiles(latencies, n=20)[-1] * 1000
+    return REQUESTS / elapsed, p95
+
+
+async def _run(db_path: Path) -> None:
+    sync_engine = create_engine(
+        f"sqlite:///{db_path}", connect_args={"check_same_thread": False},
+        poolclass=QueuePool, pool_size=THREADPOOL_SIZE, max_overflow=-1)
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{db_path}", poolclass=AsyncAdaptedQueuePool, **POOL_KWARGS)
+
+    # 延遲發生在實際執行 SQL 的執行緒：sync 為 threadpool，async 為 aiosqlite 連線執行緒
+    @event.listens_for(sync_engine, "connect")
+    def _sync_connect(dbapi_connection, _):
+        dbapi_connection.set_trace_callback(_simulated_latency)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _async_connect(dbapi_connection, _):
+        await_only(dbapi_connection.driver_connection.set_trace_callback(_simulated_latency))
+
+    global _db_latency_seconds
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    print(f"async 連線池 {POOL_KWARGS}，並行 {CONCURRENCY}，每組 {REQUESTS} 個請求")
+    apps = {"sync + threadpool": _sync_app(sync_engine), "async engine": _async_app(async_engine)}
+    for latency_ms, busy_threads in SCENARIOS:
+        _db_latency_seconds = latency_ms / 1000
+        print(f"\n--- DB 延遲 {latency_ms} ms/SQL，佔用中的 threadpool 執行緒 {busy_threads}/{THREADPOOL_SIZE} ---")
+        for path in ("/api/v1/history", "/api/v1/batch/tasks"):
+            for label, app in apps.items():
+                rps, p95 = await _load(app, path, busy_threads)
+                print(f"{path:<22} {label:<18} {rps:>8.1f} req/s   p95 {p95:>8.1f} ms")
+
+    await async_engine.dispose()
+    sync_engine.dispose()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp, \
+            patch("app.api.batch.is_tracked", return_value=True), \
+            patch("app.api.batch._check_celery_task_alive", return_value=None), \
+            patch.object(AsyncBatchJobRepository, "archive_old_completed", AsyncMock(return_value=0)):
+        db_path = Path(tmp) / "bench.db"
+        _seed(create_engine(f"sqlite:///{db_path}"))
+        asyncio.run(_run(db_path))
+
+
+if __name__ == "__main__":
+    main()
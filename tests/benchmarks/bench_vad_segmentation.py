@@ -0,0 +1,54 @@
+"""
+Micro-benchmark：VAD 有聲區段切割（逐幀迴圈 vs. NumPy 向量化）
+
+以 2 小時音檔（50ms/幀 = 144,000 幀）的有聲遮罩比較兩種實作耗時。
+不會被 pytest 自動收集，請手動執行：
+
+    python -m tests.benchmarks.bench_vad_segmentation
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "backend"))
+
+from tests.unit.test_vad_segmentation import (  # noqa: E402
+    FRAME_LENGTH_S,
+    _bursty_mask,
+    _legacy_speech_timestamps,
+    _vectorized,
+)
+
+DURATION_SECONDS = 2 * 60 * 60
+REPEAT = 5
+
+
+def _best_of(fn, *args):
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    num_frames = int(DURATION_SECONDS / FRAME_LENGTH_S)
+    mask = _bursty_mask(np.random.default_rng(0), num_frames)
+    total_duration = float(DURATION_SECONDS)
+
+    assert _vectorized(mask, total_duration) == _legacy_speech_timestamps(mask, total_duration)
+
+    legacy = _best_of(_legacy_speech_timestamps, mask, total_duration)
+    vectorized = _best_of(_vectorized, mask, total_duration)
+
+    print(f"音檔長度: {DURATION_SECONDS / 3600:.0f} 小時 ({num_frames:,} 幀)")
+    print(f"逐幀迴圈:   {legacy * 1000:>9.2f} ms")
+    print(f"向量化:     {vectorized * 1000:>9.2f} ms")
+    print(f"加速倍數:   {legacy / vectorized:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
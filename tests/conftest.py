@@ -1,7 +1,7 @@
 """
 測試全域 Fixture 設定
 - 在所有 app 模組匯入前，先 mock 重量級依賴（torch、torchaudio 等）
-- SQLite in-memory 資料庫（取代 PostgreSQL）
+- SQLite 暫存資料庫（取代 PostgreSQL；同步與 aiosqlite 非同步 engine 共用同一個檔案）
 - 輕量 lifespan（略過 Redis / VAD 初始化）
 """
 import sys
@@ -9,8 +9,9 @@ import pytest
 from contextlib import asynccontextmanager
 from unittest.mock import MagicMock
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 
 # ─── 1. 在所有 app 模組被匯入之前，先 mock 重量級依賴 ──────────────────────
 # 避免 torch / torchaudio / silero_vad 在測試環境進行緩慢的首次匯入
@@ -27,16 +28,20 @@ for _mod in _HEAVY_MODULES:
         sys.modules[_mod] = MagicMock()
 
 
-# ─── 2. SQLite In-Memory 測試資料庫 ─────────────────────────────────────────
-TEST_DB_URL = "sqlite:///:memory:"
+# ─── 2. SQLite 測試資料庫 ───────────────────────────────────────────────────
+# async 讀取端點需要另一條（aiosqlite）連線看到相同資料，因此使用暫存檔而非 :memory:
+
+@pytest.fixture(scope="session")
+def test_db_path(tmp_path_factory):
+    return tmp_path_factory.mktemp("db") / "test.db"
 
 
 @pytest.fixture(scope="session")
-def test_engine():
-    """建立 session 級別的 SQLite in-memory engine，整個測試 session 共用。"""
+def test_engine(test_db_path):
+    """建立 session 級別的 SQLite engine，整個測試 session 共用。"""
     from app.database.models import Base
     engine = create_engine(
-        TEST_DB_URL,
+        f"sqlite:///{test_db_path}",
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
@@ -45,6 +50,12 @@ def test_engine():
     engine.dispose()
 
 
+@pytest.fixture(scope="session")
+def test_async_engine(test_engine, test_db_path):
+    """指向同一個 SQLite 檔案的 aiosqlite engine（每次取用新連線，不跨 event loop 重用）。"""
+    return create_async_engine(f"sqlite+aiosqlite:///{test_db_path}", poolclass=NullPool)
+
+
 @pytest.fixture
 def db_session(test_engine):
     """
@@ -80,14 +91,27 @@ def _make_override_get_db(test_engine):
     return override_get_db
 
 
+def _make_override_get_async_db(test_async_engine):
+    """建立一個覆蓋 get_async_db 的 async generator，綁定到測試 aiosqlite engine。"""
+    TestingAsyncSessionLocal = async_sessionmaker(
+        test_async_engine, autoflush=False, expire_on_commit=False
+    )
+
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
+
+    return override_get_async_db
+
+
 @pytest.fixture(scope="module")
-def client(test_engine):
+def client(test_engine, test_async_engine):
     """
     提供整合測試用的 FastAPI TestClient。
     - 替換 lifespan：略過 PostgreSQL init_db / Redis 監聽 / VAD 初始化
-    - 使用 SQLite in-memory 取代 PostgreSQL
+    - 使用 SQLite 取代 PostgreSQL（同步與非同步 session 都覆蓋）
     """
-    from app.database.session import get_db
+    from app.database.session import get_async_db, get_db
     from main import app
     from fastapi.testclient import TestClient
 
@@ -101,6 +125,7 @@ def client(test_engine):
     original_lifespan = app.router.lifespan_context
     app.router.lifespan_context = _test_lifespan
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = _make_override_get_async_db(test_async_engine)
 
     with TestClient(app) as c:
         yield c
@@ -0,0 +1,79 @@
+"""
+整合測試：批次任務列表 API
+測試範圍：
+  GET /api/v1/batch/tasks
+  GET /api/v1/batch/pending
+Redis 追蹤與 Celery 任務狀態以 patch 取代
+"""
+import json
+import uuid
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.database.models import BatchJob
+
+
+def _create_job(db: Session, **kwargs) -> BatchJob:
+    defaults = {
+        "batch_id": uuid.uuid4().hex,
+        "status": "POLLING",
+        "file_count": 2,
+        "file_mapping_json": json.dumps({
+            "1": {"file_uid": "uid1", "original_filename": "b.m4a"},
+            "0": {"file_uid": "uid0", "original_filename": "a.m4a"},
+        }),
+    }
+    defaults.update(kwargs)
+    job = BatchJob(**defaults)
+    db.add(job)
+    db.commit()
+    return job
+
+
+@pytest.fixture(autouse=True)
+def no_redis():
+    """預設：沒有被輪詢器追蹤、Celery 狀態無法判斷（不連線 Redis）"""
+    with patch("app.api.batch.is_tracked", return_value=False), \
+            patch("app.api.batch._check_celery_task_alive", return_value=None):
+        yield
+
+
+class TestBatchTasks:
+    def test_active_job_is_listed_with_files(self, client: TestClient, db_session: Session):
+        job = _create_job(db_session)
+
+        with patch("app.api.batch.is_tracked", return_value=True):
+            response = client.get("/api/v1/batch/tasks")
+
+        assert response.status_code == 200
+        item, = [t for t in response.json() if t["batch_id"] == job.batch_id]
+        assert [f["file_uid"] for f in item["files"]] == ["uid0", "uid1"]
+        assert item["is_alive"] is True
+        assert item["session_id"] == job.batch_id
+
+    def test_dead_celery_task_is_reported(self, client: TestClient, db_session: Session):
+        job = _create_job(db_session, status="UPLOADING", celery_task_id="celery-1")
+
+        with patch("app.api.batch._check_celery_task_alive", return_value=False):
+            response = client.get("/api/v1/batch/tasks")
+
+        item, = [t for t in response.json() if t["batch_id"] == job.batch_id]
+        assert item["is_alive"] is False
+
+    def test_retrieved_job_is_not_listed(self, client: TestClient, db_session: Session):
+        job = _create_job(db_session, status="RETRIEVED")
+        response = client.get("/api/v1/batch/tasks")
+        assert job.batch_id not in {t["batch_id"] for t in response.json()}
+
+
+class TestPendingBatches:
+    def test_pending_job_is_listed(self, client: TestClient, db_session: Session):
+        job = _create_job(db_session, status="COMPLETED")
+        response = client.get("/api/v1/batch/pending")
+        assert response.status_code == 200
+        item, = [t for t in response.json() if t["batch_id"] == job.batch_id]
+        assert item["status"] == "COMPLETED"
+        assert len(item["files"]) == 2
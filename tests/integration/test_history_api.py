@@ -166,6 +166,34 @@ class TestHistoryList:
         assert data["total_pages"] >= 3
 
 
+class TestHistoryCursor:
+    def test_cursor_pages_continue_from_first_page(self, client: TestClient, db_session: Session):
+        timestamp = datetime(2026, 1, 1, 12, 0, 0)
+        created = {_create_log(db_session, original_filename=f"cursor_api_{i}.mp3",
+                               request_timestamp=timestamp).task_uuid for i in range(5)}
+
+        first = client.get("/api/v1/history?page_size=2&keyword=cursor_api_").json()
+        seen = [item["task_uuid"] for item in first["items"]]
+        cursor = first["next_cursor"]
+        while cursor:
+            data = client.get(f"/api/v1/history?page_size=2&keyword=cursor_api_&cursor={cursor}").json()
+            assert data["page"] is None
+            assert data["total"] == 5
+            seen += [item["task_uuid"] for item in data["items"]]
+            cursor = data["next_cursor"]
+
+        assert sorted(seen) == sorted(str(u) for u in created)
+
+    def test_last_offset_page_has_no_cursor(self, client: TestClient, db_session: Session):
+        _create_log(db_session, original_filename="cursor_last_page.mp3")
+        data = client.get("/api/v1/history?keyword=cursor_last_page").json()
+        assert data["next_cursor"] is None
+
+    def test_invalid_cursor_returns_400(self, client: TestClient):
+        response = client.get("/api/v1/history?cursor=garbage")
+        assert response.status_code == 400
+
+
 # ─── 查詢單筆紀錄 ─────────────────────────────────────────────────────────────
 
 class TestHistoryDetail:
@@ -299,3 +327,10 @@ class TestHistoryDownload:
         response = client.get("/api/v1/history")
         assert response.status_code == 200
         assert any(item.get("has_transcript") for item in response.json()["items"])
+
+    def test_detail_has_transcript_follows_lrc_content(self, client: TestClient, db_session: Session):
+        with_lrc = _create_log(db_session, status="COMPLETED", lrc_content=self._SAMPLE_LRC)
+        without = _create_log(db_session, status="COMPLETED", lrc_content=None)
+
+        assert client.get(f"/api/v1/history/{with_lrc.task_uuid}").json()["has_transcript"] is True
+        assert client.get(f"/api/v1/history/{without.task_uuid}").json()["has_transcript"] is False
@@ -3,16 +3,22 @@
 測試範圍：
   ModelSettingsRepository  — model_manager_repository.py
   HistoryRepository        — history_repository.py
-使用 SQLite in-memory 資料庫，透過 db_session fixture 確保每個測試後回滾。
+  AsyncHistoryRepository / AsyncBatchJobRepository — 非同步讀取版本（與同步版本結果一致）
+使用 SQLite 測試資料庫，透過 db_session fixture 確保每個測試後回滾。
 """
+import asyncio
+import json
 import uuid
 import pytest
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import Session
 
-from app.database.models import TranscriptionLog, ModelConfiguration
+from app.database.models import BatchJob, TranscriptionLog, ModelConfiguration
+from app.repositories.batch_job_repository import AsyncBatchJobRepository
 from app.repositories.model_manager_repository import ModelSettingsRepository
-from app.repositories.history_repository import HistoryRepository
+from app.repositories import history_repository
+from app.repositories.history_repository import AsyncHistoryRepository, HistoryRepository
 from app.schemas.schemas import ModelConfigurationSchema
 
 
@@ -296,3 +302,157 @@ class TestHistoryRepository:
         page2_uuids = {str(log.task_uuid) for log in page2_logs}
         # 兩頁的紀錄不應重疊
         assert len(page1_uuids & page2_uuids) == 0
+
+
+class TestHistoryCursorPagination:
+    repo = HistoryRepository()
+
+    @pytest.fixture(autouse=True)
+    def fresh_total_cache(self, monkeypatch):
+        monkeypatch.setattr(history_repository, "_total_cache", history_repository._TotalCache(ttl_seconds=60))
+
+    def _seed(self, db: Session, prefix: str, count: int = 5):
+        # 前三筆同一時間，驗證同時間的紀錄以 task_uuid 排序、不重複也不遺漏
+        same = datetime(2026, 1, 1, 12, 0, 0)
+        for i in range(count):
+            timestamp = same if i < 3 else same - timedelta(minutes=i)
+            _create_transcription_log(db, original_filename=f"{prefix}_{i}.mp3", request_timestamp=timestamp)
+
+    def _walk(self, db: Session, keyword: str, page_size: int):
+        pages, cursor = [], None
+        while True:
+            logs, cursor, _ = self.repo.get_logs_by_cursor(db, cursor=cursor, page_size=page_size, keyword=keyword)
+            pages.append([log.task_uuid for log in logs])
+            if cursor is None:
+                return pages
+
+    def test_cursor_walk_matches_offset_order(self, db_session: Session):
+        self._seed(db_session, "cursor_walk")
+        pages = self._walk(db_session, "cursor_walk", page_size=2)
+
+        offset_logs, _ = self.repo.get_logs_paginated(db_session, page_size=10, keyword="cursor_walk")
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert [u for page in pages for u in page] == [log.task_uuid for log in offset_logs]
+
+    def test_invalid_cursor_raises_value_error(self, db_session: Session):
+        for cursor in ("not-a-cursor", history_repository.base64.urlsafe_b64encode(b"[1]").decode()):
+            with pytest.raises(ValueError):
+                self.repo.get_logs_by_cursor(db_session, cursor=cursor)
+
+    def test_total_is_cached_per_filter(self, db_session: Session):
+        self._seed(db_session, "cursor_total", count=2)
+        _, _, total = self.repo.get_logs_by_cursor(db_session, keyword="cursor_total")
+        _create_transcription_log(db_session, original_filename="cursor_total_new.mp3")
+
+        assert self.repo.get_logs_by_cursor(db_session, keyword="cursor_total")[2] == total == 2
+        assert self.repo.get_logs_by_cursor(db_session, keyword="cursor_total", status="COMPLETED")[2] == 3
+
+
+# ─── 非同步 Repository ────────────────────────────────────────────────────────
+
+@pytest.fixture
+def run_async(test_async_engine):
+    """以 aiosqlite session 執行 coroutine：run_async(lambda db: repo.method(db, ...))"""
+    Session = async_sessionmaker(test_async_engine, expire_on_commit=False)
+
+    def run(call):
+        async def _run():
+            async with Session() as db:
+                return await call(db)
+        return asyncio.run(_run())
+
+    return run
+
+
+class TestAsyncHistoryRepository:
+    repo = AsyncHistoryRepository()
+    sync_repo = HistoryRepository()
+
+    def test_paginated_matches_sync_repository(self, db_session: Session, run_async):
+        for i in range(3):
+            _create_transcription_log(db_session, original_filename=f"async_page_{i}.mp3")
+
+        logs, total = run_async(lambda db: self.repo.get_logs_paginated(
+            db, page=1, page_size=2, keyword="async_page_"))
+        sync_logs, sync_total = self.sync_repo.get_logs_paginated(
+            db_session, page=1, page_size=2, keyword="async_page_")
+
+        assert total == sync_total == 3
+        assert [log.task_uuid for log in logs] == [log.task_uuid for log in sync_logs]
+
+    def test_cursor_page_matches_sync_repository(self, db_session: Session, run_async):
+        same = datetime(2026, 1, 1, 12, 0, 0)
+        for i in range(3):
+            _create_transcription_log(db_session, original_filename=f"async_cursor_{i}.mp3", request_timestamp=same)
+
+        logs, cursor, total = run_async(lambda db: self.repo.get_logs_by_cursor(
+            db, page_size=2, keyword="async_cursor_"))
+        rest, last_cursor, _ = run_async(lambda db: self.repo.get_logs_by_cursor(
+            db, cursor=cursor, page_size=2, keyword="async_cursor_"))
+        sync_logs, _ = self.sync_repo.get_logs_paginated(db_session, page_size=3, keyword="async_cursor_")
+
+        assert total == 3 and last_cursor is None
+        assert [log.task_uuid for log in logs + rest] == [log.task_uuid for log in sync_logs]
+
+    def test_get_log_by_uuid(self, db_session: Session, run_async):
+        log = _create_transcription_log(db_session)
+        found = run_async(lambda db: self.repo.get_log_by_uuid(db, str(log.task_uuid)))
+        assert found.task_uuid == log.task_uuid
+        assert run_async(lambda db: self.repo.get_log_by_uuid(db, "not-a-uuid")) is None
+
+    def test_active_tasks_match_sync_repository(self, db_session: Session, run_async):
+        running = _create_transcription_log(db_session, status="PROCESSING", original_filename="async_active.mp3")
+        _create_transcription_log(db_session, status="PROCESSING", is_batch=True, original_filename="async_active_b.mp3")
+
+        logs = run_async(lambda db: self.repo.get_active_single_tasks(db))
+        sync_logs = self.sync_repo.get_active_single_tasks(db_session)
+
+        assert running.task_uuid in {log.task_uuid for log in logs}
+        assert {log.task_uuid for log in logs} == {log.task_uuid for log in sync_logs}
+        assert all(not log.is_batch for log in logs)
+
+    def test_stats_match_sync_repository(self, db_session: Session, run_async):
+        _create_transcription_log(db_session, status="FAILED", original_filename="async_stats.mp3")
+        assert run_async(self.repo.get_stats) == self.sync_repo.get_stats(db_session)
+
+    def test_has_transcript_is_computed_without_loading_lrc(self, db_session: Session, run_async):
+        batch_id = uuid.uuid4().hex
+        done = _create_transcription_log(
+            db_session, is_batch=True, batch_id=batch_id, lrc_content=None, original_filename="sqlflag_a.m4a")
+        failed = _create_transcription_log(
+            db_session, is_batch=True, batch_id=batch_id, lrc_content=None, status="FAILED",
+            original_filename="sqlflag_b.m4a")
+        stored = _create_transcription_log(db_session, lrc_content="[00:01.00]hi", original_filename="sqlflag_c.m4a")
+        blank = _create_transcription_log(db_session, lrc_content="  ", original_filename="sqlflag_d.m4a")
+        db_session.add(BatchJob(
+            batch_id=batch_id, status="COMPLETED",
+            file_log_uuids_json=json.dumps({"uid0": str(done.task_uuid), "uid1": str(failed.task_uuid)}),
+            results_json=json.dumps({"uid0": {"transcripts": {"lrc": "[00:01.00]hi"}}}),
+        ))
+        db_session.commit()
+
+        logs, _ = run_async(lambda db: self.repo.get_logs_paginated(db, keyword="sqlflag_"))
+
+        flags = {log.task_uuid: log.has_transcript for log in logs}
+        assert flags == {done.task_uuid: True, failed.task_uuid: False,
+                         stored.task_uuid: True, blank.task_uuid: False}
+        # lrc_content 不隨列表載入
+        assert all("lrc_content" not in log.__dict__ for log in logs)
+
+
+class TestAsyncBatchJobRepository:
+    repo = AsyncBatchJobRepository()
+
+    def test_active_tasks_and_archive(self, db_session: Session, run_async):
+        old_id, active_id = uuid.uuid4().hex, uuid.uuid4().hex
+        db_session.add(BatchJob(
+            batch_id=old_id, status="COMPLETED",
+            updated_at=datetime.utcnow() - timedelta(hours=25)))
+        db_session.add(BatchJob(batch_id=active_id, status="POLLING"))
+        db_session.commit()
+
+        assert run_async(self.repo.archive_old_completed) >= 1
+        active_ids = {job.batch_id for job in run_async(self.repo.get_active_tasks)}
+        assert active_id in active_ids
+        assert old_id not in active_ids
+        assert run_async(lambda db: self.repo.get_job(db, old_id)).status == "RETRIEVED"
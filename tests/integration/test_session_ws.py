@@ -0,0 +1,93 @@
+"""
+整合測試：多工的 session WebSocket
+測試範圍：WS /api/v1/ws/session/{session_id}
+同一條連線提交多個檔案，各自啟動 Celery 任務、狀態發布到 session 的頻道；
+Celery 與 Redis 發布以 patch 取代
+"""
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.websocket.manager import manager
+
+
+def _submit(file_uid: str, filename: str) -> dict:
+    return {
+        "type": "submit",
+        "file_uid": file_uid,
+        "filename": filename,
+        "original_filename": filename,
+        "provider": "google",
+        "model": "gemini-2.5-flash",
+        "api_keys": "key",
+        "source_lang": "zh-TW",
+        "session_id": "session-1",
+    }
+
+
+def _wait_for(predicate):
+    """訊息在伺服器端依序處理；等待處理完畢再關閉連線"""
+    for _ in range(200):
+        if predicate():
+            return
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def session_env(tmp_path):
+    """暫存上傳目錄 + 記錄啟動的轉錄任務與 publish_status 呼叫"""
+    started, published = [], []
+    with patch("app.api.transcription.TEMP_UPLOADS_DIR", tmp_path), \
+            patch("app.api.transcription.enqueue_transcription", side_effect=started.append), \
+            patch("app.api.transcription.publish_status",
+                  side_effect=lambda *args, **kwargs: published.append((args, kwargs))):
+        yield tmp_path, started, published
+
+
+class TestSessionWebSocket:
+    def test_one_socket_submits_many_files(self, client: TestClient, session_env):
+        tmp_path, started, _ = session_env
+        for name in ("a.mp3", "b.mp3", "c.mp3"):
+            (tmp_path / name).write_bytes(b"\x00")
+
+        with client.websocket_connect("/api/v1/ws/session/session-1") as ws:
+            ws.send_json({"type": "ping"})
+            for i, name in enumerate(("a.mp3", "b.mp3", "c.mp3")):
+                ws.send_json(_submit(f"uid-{i}", name))
+            _wait_for(lambda: len(started) == 3)
+            assert list(manager.active_connections) == ["session-1"]
+
+        assert [p["file_uid"] for p in started] == ["uid-0", "uid-1", "uid-2"]
+        # 狀態都發布到 session 的頻道，以 file_uid 區分檔案
+        assert {p["client_id"] for p in started} == {"session-1"}
+        assert started[0]["file_path"] == str(tmp_path / "a.mp3")
+
+    def test_missing_upload_reports_failed_for_that_file(self, client: TestClient, session_env):
+        tmp_path, started, published = session_env
+        (tmp_path / "ok.mp3").write_bytes(b"\x00")
+
+        with client.websocket_connect("/api/v1/ws/session/session-2") as ws:
+            ws.send_json(_submit("missing", "gone.mp3"))
+            ws.send_json(_submit("ok", "ok.mp3"))
+            _wait_for(lambda: started)
+
+        assert [p["file_uid"] for p in started] == ["ok"]
+        (args, kwargs), = published
+        assert args[0] == "session-2"
+        assert args[3] == "FAILED"
+        assert kwargs == {"file_uid": "missing"}
+
+    def test_invalid_submit_does_not_close_socket(self, client: TestClient, session_env):
+        tmp_path, started, published = session_env
+        (tmp_path / "ok.mp3").write_bytes(b"\x00")
+
+        with client.websocket_connect("/api/v1/ws/session/session-3") as ws:
+            ws.send_text("not json")
+            ws.send_json({"type": "submit", "file_uid": "bad"})
+            ws.send_json(_submit("ok", "ok.mp3"))
+            _wait_for(lambda: started)
+
+        assert [p["file_uid"] for p in started] == ["ok"]
+        assert [kwargs["file_uid"] for _, kwargs in published] == ["bad"]
@@ -0,0 +1,181 @@
+"""
+單元測試共用：記憶體內的假 Redis client
+只實作各 Redis store（轉錄快取、checkpoint、Gemini 檔案登記表）用到的指令，
+回傳值與 redis-py（未設定 decode_responses）相同為 bytes；
+過期時間以可控時鐘計算，存取時才清除。Lua script 不會被執行，
+register_script 改為查詢建構時傳入的 Python 對應實作（scripts={script: fn(client, keys, args)}）
+"""
+import math
+import time
+
+
+def _b(value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode("utf-8")
+
+
+def _score(value) -> float:
+    if value in ("-inf", b"-inf"):
+        return -math.inf
+    if value in ("+inf", "inf", b"+inf", b"inf"):
+        return math.inf
+    return float(value)
+
+
+class FakeRedis:
+    def __init__(self, clock=time.time, scripts=None):
+        self._clock = clock
+        self._scripts = scripts or {}
+        self._data = {}
+        self._expires = {}
+
+    # ─── 鍵與過期時間 ───────────────────────────────────────────────────────
+
+    def _live(self, key):
+        key = _b(key)
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= self._clock():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key
+
+    def _get(self, key, default_factory=None):
+        key = self._live(key)
+        if key not in self._data and default_factory is not None:
+            self._data[key] = default_factory()
+        return self._data.get(key)
+
+    def exists(self, *keys):
+        return sum(1 for key in keys if self._live(key) in self._data)
+
+    def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            key = self._live(key)
+            if self._data.pop(key, None) is not None:
+                removed += 1
+            self._expires.pop(key, None)
+        return removed
+
+    def expire(self, key, seconds):
+        key = self._live(key)
+        if key not in self._data:
+            return False
+        self._expires[key] = self._clock() + seconds
+        return True
+
+    def ttl(self, key):
+        key = self._live(key)
+        if key not in self._data:
+            return -2
+        expires_at = self._expires.get(key)
+        return -1 if expires_at is None else math.ceil(expires_at - self._clock())
+
+    # ─── string ─────────────────────────────────────────────────────────────
+
+    def get(self, key):
+        return self._get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        key = self._live(key)
+        if nx and key in self._data:
+            return None
+        self._data[key] = _b(value)
+        self._expires.pop(key, None)
+        if ex is not None:
+            self._expires[key] = self._clock() + ex
+        return True
+
+    # ─── hash ───────────────────────────────────────────────────────────────
+
+    def hget(self, key, field):
+        return (self._get(key) or {}).get(_b(field))
+
+    def hmget(self, key, *fields):
+        data = self._get(key) or {}
+        return [data.get(_b(field)) for field in fields]
+
+    def hgetall(self, key):
+        return dict(self._get(key) or {})
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        data = self._get(key, dict)
+        items = dict(mapping or {})
+        if field is not None:
+            items[field] = value
+        added = sum(1 for f in items if _b(f) not in data)
+        data.update({_b(f): _b(v) for f, v in items.items()})
+        return added
+
+    def hincrby(self, key, field, amount=1):
+        data = self._get(key, dict)
+        value = int(data.get(_b(field), b"0")) + amount
+        data[_b(field)] = _b(value)
+        return value
+
+    # ─── sorted set ─────────────────────────────────────────────────────────
+
+    def zadd(self, key, mapping):
+        zset = self._get(key, dict)
+        added = sum(1 for member in mapping if _b(member) not in zset)
+        zset.update({_b(member): float(score) for member, score in mapping.items()})
+        return added
+
+    def zscore(self, key, member):
+        return (self._get(key) or {}).get(_b(member))
+
+    def zrem(self, key, *members):
+        zset = self._get(key) or {}
+        return sum(1 for member in members if zset.pop(_b(member), None) is not None)
+
+    def zcard(self, key):
+        return len(self._get(key) or {})
+
+    def _sorted(self, key):
+        return sorted((self._get(key) or {}).items(), key=lambda item: (item[1], item[0]))
+
+    def zrangebyscore(self, key, min, max, start=None, num=None):
+        members = [m for m, s in self._sorted(key) if _score(min) <= s <= _score(max)]
+        if start is not None:
+            members = members[start:start + num]
+        return members
+
+    def zremrangebyscore(self, key, min, max):
+        members = self.zrangebyscore(key, min, max)
+        return self.zrem(key, *members) if members else 0
+
+    def zpopmin(self, key, count=1):
+        popped = self._sorted(key)[:count]
+        if popped:
+            self.zrem(key, *[m for m, _ in popped])
+        return popped
+
+    # ─── pipeline / script ──────────────────────────────────────────────────
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+    def register_script(self, script):
+        fn = self._scripts[script]
+        return lambda keys=(), args=(): fn(self, list(keys), list(args))
+
+
+class _FakePipeline:
+    """依序記錄指令，execute() 時逐一執行並回傳結果串列"""
+
+    def __init__(self, client):
+        self._client = client
+        self._calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        def queue(*args, **kwargs):
+            self._calls.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        calls, self._calls = self._calls, []
+        return [method(*args, **kwargs) for method, args, kwargs in calls]
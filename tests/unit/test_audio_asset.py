@@ -0,0 +1,238 @@
+"""
+單元測試：AudioAsset（decode-once 16kHz PCM 資源）與上傳編碼
+測試範圍：utils/audio.py 的 AudioAsset、encode_for_upload 與 vad/flows.py 的 extract_speech_segments_from_asset
+以 stdlib wave 產生測試檔、以假 ffmpeg 取代實際解碼
+"""
+import wave
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.vad import flows
+from app.utils import audio
+from app.utils.audio import AudioAsset, encode_for_upload
+
+SAMPLE_RATE = 16000
+
+
+def _write_wav(path: Path, samples: np.ndarray, sample_rate: int = SAMPLE_RATE, channels: int = 1):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(samples.astype("<i2").tobytes())
+
+
+def _bursty_pcm(seconds: float, rng) -> np.ndarray:
+    """有聲 / 靜音交錯的 int16 樣本"""
+    n = int(seconds * SAMPLE_RATE)
+    data = np.zeros(n, dtype=np.int16)
+    pos = 0
+    speaking = True
+    while pos < n:
+        length = int(rng.uniform(0.3, 3.0) * SAMPLE_RATE)
+        if speaking:
+            data[pos:pos + length] = rng.normal(0, 6000, size=min(length, n - pos)).astype(np.int16)
+        pos += length
+        speaking = not speaking
+    return data
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    """假 ffmpeg：把 decoded 內容寫到輸出路徑，並記錄呼叫次數"""
+    state = SimpleNamespace(calls=0, decoded=np.arange(-800, 800, dtype=np.int16), returncode=0, last_cmd=None)
+
+    def fake_run(cmd, **kwargs):
+        state.calls += 1
+        state.last_cmd = cmd
+        if state.returncode == 0:
+            Path(cmd[-1]).write_bytes(state.decoded.astype("<i2").tobytes())
+        return SimpleNamespace(returncode=state.returncode, stderr="boom")
+
+    monkeypatch.setattr(audio.subprocess, "run", fake_run)
+    return state
+
+
+class TestAudioAssetOpen:
+    def test_pcm16_mono_16k_wav_is_mapped_without_decoding(self, tmp_path, fake_ffmpeg):
+        samples = np.arange(-1000, 1000, dtype=np.int16)
+        path = tmp_path / "clip.wav"
+        _write_wav(path, samples)
+
+        asset = AudioAsset.open(path, tmp_path)
+
+        assert fake_ffmpeg.calls == 0
+        assert asset.cache_path is None
+        assert asset.cleanup_files == []
+        assert asset.num_samples == len(samples)
+        assert asset.duration == pytest.approx(len(samples) / SAMPLE_RATE)
+        np.testing.assert_array_equal(np.asarray(asset.samples), samples)
+
+    def test_other_formats_are_decoded_once_and_cached(self, tmp_path, fake_ffmpeg):
+        path = tmp_path / "talk.wav"
+        _write_wav(path, np.zeros(4410 * 2, dtype=np.int16), sample_rate=44100, channels=2)
+
+        first = AudioAsset.open(path, tmp_path)
+        second = AudioAsset.open(path, tmp_path)
+
+        assert fake_ffmpeg.calls == 1
+        assert first.cache_path.parent == tmp_path
+        assert first.cache_path.name.startswith("talk.") and first.cache_path.name.endswith(".16k.pcm")
+        assert second.cache_path == first.cache_path
+        assert first.num_samples == len(fake_ffmpeg.decoded)
+        np.testing.assert_array_equal(np.asarray(second.samples), fake_ffmpeg.decoded)
+
+    def test_same_stem_from_different_sources_is_not_shared(self, tmp_path, fake_ffmpeg):
+        cache_dir = tmp_path / "cache"
+        sources = []
+        for session in ("a", "b"):
+            (tmp_path / session).mkdir()
+            path = tmp_path / session / "talk.m4a"
+            path.write_bytes(session.encode())
+            sources.append(path)
+
+        first = AudioAsset.open(sources[0], cache_dir)
+        fake_ffmpeg.decoded = np.arange(0, 10, dtype=np.int16)
+        second = AudioAsset.open(sources[1], cache_dir)
+
+        assert fake_ffmpeg.calls == 2
+        assert first.cache_path != second.cache_path
+        np.testing.assert_array_equal(np.asarray(second.samples), fake_ffmpeg.decoded)
+
+    def test_overwritten_source_is_decoded_again(self, tmp_path, fake_ffmpeg):
+        path = tmp_path / "talk.m4a"
+        path.write_bytes(b"v1")
+        AudioAsset.open(path, tmp_path)
+        path.write_bytes(b"version 2")
+
+        AudioAsset.open(path, tmp_path)
+
+        assert fake_ffmpeg.calls == 2
+
+    def test_decode_failure_returns_none_and_leaves_no_partial_file(self, tmp_path, fake_ffmpeg):
+        path = tmp_path / "broken.m4a"
+        path.write_bytes(b"not audio")
+        fake_ffmpeg.returncode = 1
+
+        assert AudioAsset.open(path, tmp_path) is None
+        assert list(tmp_path.glob("*.pcm*")) == []
+
+    def test_missing_file_returns_none(self, tmp_path, fake_ffmpeg):
+        assert AudioAsset.open(tmp_path / "nope.mp3", tmp_path) is None
+        assert fake_ffmpeg.calls == 0
+
+
+class TestAudioAssetRead:
+    @pytest.fixture
+    def asset(self, tmp_path):
+        samples = np.arange(0, 32000, dtype=np.int16)
+        path = tmp_path / "ramp.wav"
+        _write_wav(path, samples)
+        return AudioAsset.open(path, tmp_path)
+
+    def test_read_range_is_float32_normalized(self, asset):
+        data = asset.read(0.5, 1.0)
+        assert data.dtype == np.float32
+        assert len(data) == 8000
+        assert data[0] == pytest.approx(8000 / 32768.0)
+
+    def test_read_clamps_to_bounds(self, asset):
+        assert len(asset.read(1.5, 10.0)) == 8000
+        assert len(asset.read(3.0)) == 0
+
+    def test_iter_blocks_covers_whole_asset(self, asset):
+        blocks = list(asset.iter_blocks(3000))
+        assert max(len(b) for b in blocks) == 3000
+        np.testing.assert_array_equal(np.concatenate(blocks), asset.read())
+
+
+class TestExtractFromAsset:
+    def test_matches_file_streaming_extraction(self, tmp_path, monkeypatch):
+        rng = np.random.default_rng(11)
+        pcm = _bursty_pcm(60, rng)
+        path = tmp_path / "speech.wav"
+        _write_wav(path, pcm)
+        asset = AudioAsset.open(path, tmp_path)
+
+        written = {}
+
+        class _Writer:
+            def __init__(self, p):
+                self.p, self.chunks = p, []
+
+            def write(self, data):
+                self.chunks.append(np.array(data, copy=True))
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                written[self.p] = np.concatenate(self.chunks)
+                return False
+
+        decoded = asset.read()[:, None]
+        fake_sf = SimpleNamespace(
+            info=lambda p: SimpleNamespace(frames=len(decoded), channels=1, samplerate=SAMPLE_RATE),
+            blocks=lambda p, blocksize, dtype, always_2d: (
+                decoded[i:i + blocksize] for i in range(0, len(decoded), blocksize)),
+            SoundFile=lambda p, mode, samplerate, channels: _Writer(p),
+        )
+        monkeypatch.setattr(flows, "sf", fake_sf)
+
+        from_asset = flows.extract_speech_segments_from_asset(asset, str(tmp_path))
+        from_asset_audio = written.pop(str(tmp_path / "speech_speech_only.wav"))
+
+        request = flows.VADProcessRequest(audio_path=str(path), output_dir=str(tmp_path))
+        from_file = flows._extract_speech_segments_streaming(request, 256 * 1024 * 1024)
+        from_file_audio = written.pop(str(tmp_path / "speech_speech_only.wav"))
+
+        assert from_asset.success and from_file.success
+        assert from_asset.segments == from_file.segments
+        np.testing.assert_array_equal(from_asset_audio, from_file_audio)
+
+
+class TestEncodeForUpload:
+    def test_compressed_source_is_uploaded_unchanged(self, tmp_path, fake_ffmpeg):
+        path = tmp_path / "talk.m4a"
+        path.write_bytes(b"m4a")
+        assert encode_for_upload(path, tmp_path, "opus") == path
+        assert fake_ffmpeg.calls == 0
+
+    def test_wav_codec_disables_encoding(self, tmp_path, fake_ffmpeg):
+        path = tmp_path / "talk_speech_only.wav"
+        _write_wav(path, np.zeros(1600, dtype=np.int16))
+        assert encode_for_upload(path, tmp_path, "wav") == path
+        assert fake_ffmpeg.calls == 0
+
+    def test_opus_encodes_16k_mono_ogg(self, tmp_path, fake_ffmpeg):
+        path = tmp_path / "talk_speech_only.wav"
+        _write_wav(path, np.zeros(1600, dtype=np.int16))
+
+        encoded = encode_for_upload(path, tmp_path, "opus", opus_bitrate_kbps=24)
+
+        assert encoded == tmp_path / "talk_speech_only.upload.ogg"
+        cmd = fake_ffmpeg.last_cmd
+        assert cmd[cmd.index("-ar") + 1] == "16000"
+        assert cmd[cmd.index("-ac") + 1] == "1"
+        assert cmd[cmd.index("-c:a") + 1] == "libopus"
+        assert cmd[cmd.index("-b:a") + 1] == "24k"
+
+    def test_flac_suffix(self, tmp_path, fake_ffmpeg):
+        path = tmp_path / "a.part1.wav"
+        _write_wav(path, np.zeros(1600, dtype=np.int16))
+        assert encode_for_upload(path, tmp_path, "FLAC").suffix == ".flac"
+
+    def test_encoder_failure_falls_back_to_wav(self, tmp_path, fake_ffmpeg):
+        path = tmp_path / "a.wav"
+        _write_wav(path, np.zeros(1600, dtype=np.int16))
+        fake_ffmpeg.returncode = 1
+        assert encode_for_upload(path, tmp_path, "opus") == path
+
+    def test_unknown_codec_falls_back_to_wav(self, tmp_path, fake_ffmpeg):
+        path = tmp_path / "a.wav"
+        _write_wav(path, np.zeros(1600, dtype=np.int16))
+        assert encode_for_upload(path, tmp_path, "mp3") == path
+        assert fake_ffmpeg.calls == 0
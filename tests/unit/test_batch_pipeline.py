@@ -0,0 +1,193 @@
+"""
+單元測試：批次前處理任務與上傳階段
+測試範圍：celery/batch_task.py 的 batch_preprocess_file_task（CPU 佇列）、
+_PreprocessedFile 的序列化、_iter_preprocessed 與 _iter_uploads（I/O 佇列）
+以假的前處理結果與上傳函式驗證交接的結果、事件順序、上傳與前處理的重疊及失敗語意
+"""
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from app.celery import batch_task
+from app.celery.batch_task import (
+    _iter_preprocessed,
+    _iter_uploads,
+    _PreprocessedFile,
+    batch_preprocess_file_task,
+)
+
+
+def _files(n, tmp_path):
+    return [
+        SimpleNamespace(
+            file_path=str(tmp_path / f"f{i}.m4a"),
+            file_uid=f"uid{i}",
+            original_filename=f"f{i}.m4a",
+        )
+        for i in range(n)
+    ]
+
+
+def _prepared(files):
+    return [
+        (i, _PreprocessedFile(
+            upload_path=Path(f.file_path).with_suffix(".ogg"),
+            duration=12.5,
+            segments=[{"start": 0.0, "end": 1.0}],
+        ).to_dict())
+        for i, f in enumerate(files)
+    ]
+
+
+@pytest.fixture
+def fake_upload(monkeypatch):
+    state = SimpleNamespace(uploaded=[], fail_upload=set())
+
+    def upload(path, client, min_remaining_seconds=None):
+        if path.stem in state.fail_upload:
+            raise RuntimeError("upload refused")
+        state.uploaded.append(path)
+        return SimpleNamespace(name=f"files/{path.stem}")
+
+    monkeypatch.setattr(batch_task, "acquire_gemini_file", upload)
+    monkeypatch.setattr(batch_task, "get_audio_duration", lambda path: 3.0)
+    return state
+
+
+class TestPreprocessFileTask:
+    @pytest.fixture
+    def published(self, monkeypatch):
+        published = []
+        monkeypatch.setattr(
+            batch_task, "_publish_batch_status",
+            lambda bid, tid, text, code="PROCESSING", result=None, file_uid=None:
+                published.append((bid, tid, file_uid)))
+        return published
+
+    def test_result_survives_json_round_trip(self, monkeypatch, published, tmp_path):
+        prepared = _PreprocessedFile(
+            upload_path=tmp_path / "f0.ogg",
+            duration=12.5,
+            segments=[{"start": 0.0, "end": 1.0}],
+            cleanup_files=[tmp_path / "f0.speech.wav", tmp_path / "f0.ogg"],
+            audio_hash="pcm:abc",
+        )
+        monkeypatch.setattr(batch_task, "_preprocess_file_for_upload", lambda *args: prepared)
+
+        (file_item,) = _files(1, tmp_path)
+        result = batch_preprocess_file_task.run(vars(file_item), "b1", "task-1")
+
+        # 前處理結果經 result backend（JSON 序列化）交給 I/O 佇列
+        assert _PreprocessedFile.from_dict(result) == prepared
+        assert published == [("b1", "task-1", "uid0")]
+
+    def test_failure_returns_none_instead_of_raising(self, monkeypatch, published, tmp_path):
+        def crash(*args):
+            raise RuntimeError("vad crashed")
+        monkeypatch.setattr(batch_task, "_preprocess_file_for_upload", crash)
+
+        (file_item,) = _files(1, tmp_path)
+        assert batch_preprocess_file_task.run(vars(file_item), "b1", "task-1") is None
+        assert published == []
+
+
+class TestPreprocessedResults:
+    def test_results_are_yielded_in_completion_order(self, monkeypatch):
+        finished = {}
+        results = {
+            "t0": SimpleNamespace(state="SUCCESS", value={"n": 0}),
+            "t1": SimpleNamespace(state="SUCCESS", value={"n": 1}),
+            "t2": SimpleNamespace(state="FAILURE", value=RuntimeError("worker lost")),
+        }
+
+        def async_result(task_id):
+            r = results[task_id]
+            return SimpleNamespace(
+                ready=lambda: task_id in finished,
+                successful=lambda: r.state == "SUCCESS",
+                result=r.value,
+            )
+        monkeypatch.setattr(batch_task.celery_app, "AsyncResult", async_result)
+        # 每次等待後依序完成 t1、t2、t0
+        order = iter(["t1", "t2", "t0"])
+        sleeps = []
+
+        def fake_sleep(seconds):
+            sleeps.append(seconds)
+            finished[next(order)] = True
+        monkeypatch.setattr(batch_task.time, "sleep", fake_sleep)
+
+        assert list(_iter_preprocessed(["t0", "t1", "t2"], poll_seconds=0.5)) == [
+            (1, {"n": 1}), (2, None), (0, {"n": 0})]
+        assert sleeps == [0.5, 0.5, 0.5]
+
+
+class TestUploadStage:
+    def test_every_file_is_uploaded_once(self, fake_upload, tmp_path):
+        files = _files(5, tmp_path)
+        events = list(_iter_uploads(files, _prepared(files), client=None))
+
+        by_file = {}
+        for event, i, _ in events:
+            by_file.setdefault(i, []).append(event)
+        assert by_file == {i: ["preprocessed", "uploaded"] for i in range(5)}
+        assert sorted(p.name for p in fake_upload.uploaded) == [f"f{i}.ogg" for i in range(5)]
+
+    def test_cache_hit_skips_upload(self, fake_upload, tmp_path):
+        files = _files(3, tmp_path)
+        events = list(_iter_uploads(
+            files, _prepared(files), client=None,
+            lookup=lambda i, prepared: "cached-lrc" if i == 1 else None))
+
+        by_file = {}
+        for event, i, _ in events:
+            by_file.setdefault(i, []).append(event)
+        assert by_file[1] == ["preprocessed", "cached"]
+        assert sorted(p.stem for p in fake_upload.uploaded) == ["f0", "f2"]
+
+    def test_upload_failure_is_reported_per_file(self, fake_upload, tmp_path):
+        fake_upload.fail_upload = {"f1"}
+        files = _files(3, tmp_path)
+        events = list(_iter_uploads(files, _prepared(files), client=None))
+
+        failed = [(i, payload) for event, i, payload in events if event == "upload_failed"]
+        uploaded = sorted(i for event, i, _ in events if event == "uploaded")
+        assert [i for i, _ in failed] == [1]
+        assert "upload refused" in str(failed[0][1])
+        assert uploaded == [0, 2]
+
+    def test_upload_starts_before_later_files_are_preprocessed(self, fake_upload, tmp_path):
+        files = _files(3, tmp_path)
+        uploaded_while_preprocessing = []
+
+        def preprocessed():
+            for i, data in _prepared(files):
+                if i > 0:
+                    # 上一個檔案的上傳在背景執行緒進行，這個檔案的前處理同時完成
+                    for _ in range(100):
+                        if len(fake_upload.uploaded) >= i:
+                            break
+                        time.sleep(0.01)
+                    uploaded_while_preprocessing.append(len(fake_upload.uploaded))
+                    time.sleep(0.05)  # 讓上傳的 future 標記完成
+                yield i, data
+
+        events = [(event, i) for event, i, _ in _iter_uploads(files, preprocessed(), client=None)]
+
+        assert uploaded_while_preprocessing == [1, 2]
+        # 已完成的上傳在下一個前處理結果之後立即交出，不等全部前處理結束
+        assert events.index(("uploaded", 0)) < events.index(("preprocessed", 2))
+
+    def test_missing_preprocess_result_falls_back_to_original_file(self, fake_upload, tmp_path):
+        files = _files(2, tmp_path)
+        preprocessed = [(0, None), _prepared(files)[1]]
+        events = list(_iter_uploads(files, preprocessed, client=None))
+
+        prepared = {i: payload for event, i, payload in events if event == "preprocessed"}
+        assert prepared[0].upload_path == Path(files[0].file_path)
+        assert prepared[0].segments is None
+        assert prepared[0].duration == 3.0
+        assert prepared[1].duration == 12.5
+        assert Path(files[0].file_path) in fake_upload.uploaded
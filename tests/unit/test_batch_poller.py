@@ -0,0 +1,171 @@
+"""
+單元測試：Gemini 批次集中輪詢
+測試範圍：celery/batch_poller.py 的 next_poll_delay 與 poll_gemini_batches
+使用 SQLite in-memory 資料庫與記憶體內的假 Redis / Gemini
+"""
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.celery import batch_poller
+from app.celery.batch_poller import next_poll_delay
+from app.database.models import BatchJob
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.store = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.store:
+            return False
+        self.store[key] = value
+        return True
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+    def register_script(self, script):
+        assert script == batch_poller._RELEASE_LOCK_SCRIPT
+
+        def compare_and_delete(keys, args):
+            if self.store.get(keys[0]) == args[0]:
+                del self.store[keys[0]]
+                return 1
+            return 0
+        return compare_and_delete
+
+
+class TestNextPollDelay:
+    def test_grows_geometrically_without_jitter(self):
+        delays = [next_poll_delay(n, min_interval=10, max_interval=1000, jitter=0) for n in range(4)]
+        assert delays == pytest.approx([10, 15, 22.5, 33.75])
+
+    def test_is_capped(self):
+        assert next_poll_delay(50, min_interval=10, max_interval=300, jitter=0) == 300
+
+    @pytest.mark.parametrize("rand_value, expected", [(0.0, 80.0), (0.5, 100.0), (1.0, 120.0)])
+    def test_jitter_bounds(self, rand_value, expected):
+        delay = next_poll_delay(
+            0, min_interval=100, max_interval=300, jitter=0.2, rand=lambda: rand_value)
+        assert delay == pytest.approx(expected)
+
+
+class TestPollGeminiBatches:
+    @pytest.fixture
+    def env(self, test_engine, monkeypatch):
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+        fake_redis = _FakeRedis()
+        states = {}
+        sent = []
+
+        monkeypatch.setattr(batch_poller, "SessionLocal", Session)
+        monkeypatch.setattr(batch_poller, "_redis_client", fake_redis)
+        monkeypatch.setattr(batch_poller, "GeminiClient", lambda key: SimpleNamespace(client=f"client-{key}"))
+        monkeypatch.setattr(
+            batch_poller, "poll_batch_job_status",
+            lambda client, name: SimpleNamespace(state=states[name]))
+        monkeypatch.setattr(batch_poller, "get_batch_job_state_name", lambda job: job.state)
+        monkeypatch.setattr(batch_poller, "publish_status", lambda *a, **k: None)
+        monkeypatch.setattr(
+            batch_poller.celery_app, "send_task",
+            lambda name, args: sent.append((name, args)) or SimpleNamespace(id=f"task-{args[0]}"))
+
+        created = []
+
+        def add_job(state, *, api_key="key-1", next_poll_at=None, poll_count=0):
+            batch_id = uuid.uuid4().hex
+            job_name = f"batches/{batch_id}"
+            states[job_name] = state
+            with Session() as db:
+                db.add(BatchJob(
+                    batch_id=batch_id, status="POLLING", gemini_job_name=job_name,
+                    next_poll_at=next_poll_at, poll_count=poll_count,
+                ))
+                db.commit()
+            if api_key:
+                batch_poller.register_batch_api_key(batch_id, api_key)
+            created.append(batch_id)
+            return batch_id
+
+        def get_job(batch_id):
+            with Session() as db:
+                return db.get(BatchJob, batch_id)
+
+        yield SimpleNamespace(add_job=add_job, get_job=get_job, sent=sent, redis=fake_redis)
+
+        with Session() as db:
+            db.query(BatchJob).filter(BatchJob.batch_id.in_(created)).delete(synchronize_session=False)
+            db.commit()
+
+    def test_running_job_is_rescheduled_with_backoff(self, env):
+        batch_id = env.add_job("JOB_STATE_RUNNING", poll_count=2)
+        before = datetime.utcnow()
+
+        stats = batch_poller.poll_gemini_batches()
+
+        job = env.get_job(batch_id)
+        assert stats["polled"] >= 1
+        assert job.status == "POLLING"
+        assert job.poll_count == 3
+        assert job.next_poll_at > before
+        assert env.sent == []
+
+    def test_completed_job_is_claimed_and_dispatched(self, env):
+        batch_id = env.add_job("JOB_STATE_SUCCEEDED")
+
+        batch_poller.poll_gemini_batches()
+
+        job = env.get_job(batch_id)
+        assert job.status == "RECOVERING"
+        assert job.celery_task_id == f"task-{batch_id}"
+        assert env.sent == [("batch_process_results_task", [batch_id])]
+
+    def test_job_not_yet_due_is_not_polled(self, env):
+        batch_id = env.add_job(
+            "JOB_STATE_SUCCEEDED", next_poll_at=datetime.utcnow() + timedelta(hours=1))
+
+        batch_poller.poll_gemini_batches()
+
+        assert env.get_job(batch_id).status == "POLLING"
+        assert env.sent == []
+
+    def test_job_without_api_key_is_skipped(self, env):
+        batch_id = env.add_job("JOB_STATE_SUCCEEDED", api_key=None)
+
+        stats = batch_poller.poll_gemini_batches()
+
+        assert stats["skipped"] >= 1
+        assert env.get_job(batch_id).status == "POLLING"
+
+    def test_lock_is_released_after_run(self, env):
+        batch_poller.poll_gemini_batches()
+        assert batch_poller._POLLER_LOCK_KEY not in env.redis.store
+
+    def test_expired_lock_taken_by_next_poller_is_not_deleted(self, env, monkeypatch):
+        env.add_job("JOB_STATE_RUNNING")
+
+        def slow_poll(client, name):
+            # 本輪超過鎖 TTL：鎖過期後由下一個輪詢器取得
+            env.redis.store[batch_poller._POLLER_LOCK_KEY] = "next-poller"
+            return SimpleNamespace(state="JOB_STATE_RUNNING")
+        monkeypatch.setattr(batch_poller, "poll_batch_job_status", slow_poll)
+
+        batch_poller.poll_gemini_batches()
+
+        assert env.redis.store[batch_poller._POLLER_LOCK_KEY] == "next-poller"
+
+    def test_concurrent_run_is_skipped_while_locked(self, env):
+        env.add_job("JOB_STATE_SUCCEEDED")
+        env.redis.set(batch_poller._POLLER_LOCK_KEY, "1")
+
+        stats = batch_poller.poll_gemini_batches()
+
+        assert stats == {"polled": 0, "dispatched": 0, "skipped": 0}
+        assert env.sent == []
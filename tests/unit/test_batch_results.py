@@ -0,0 +1,145 @@
+"""
+單元測試：批次結果的逐檔 checkpoint 與冪等處理
+測試範圍：celery/batch_task.py 的 process_gemini_batch_results
+以 SQLite in-memory 的 transcription_logs 作為每個檔案的 checkpoint，驗證重新處理時略過已完成檔案，
+以及 COMPLETED 只在日誌 flush 後推送
+"""
+import json
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.celery import batch_task
+from app.database.models import BatchJob, TranscriptionLog
+from app.repositories.batch_job_repository import BatchJobRepository
+from app.repositories.transcription_log_repository import TranscriptionLogRepository
+from app.repositories.transcription_log_writer import TranscriptionLogWriter
+
+
+@pytest.fixture
+def batch(db_session, test_engine, monkeypatch):
+    batch_id = uuid.uuid4().hex
+    uids = ["uid0", "uid1", "uid2"]
+    log_uuids = {uid: str(uuid.uuid4()) for uid in uids}
+    db_session.add(BatchJob(
+        batch_id=batch_id, status="RECOVERING", gemini_job_name="batches/x",
+        task_params_json=json.dumps({"model": "gemini-2.5-flash", "source_lang": "zh-TW"}),
+        file_mapping_json=json.dumps({
+            str(i): {"file_uid": uid, "original_filename": f"{uid}.m4a"} for i, uid in enumerate(uids)
+        }),
+        file_log_uuids_json=json.dumps(log_uuids),
+    ))
+    for uid in uids:
+        db_session.add(TranscriptionLog(
+            task_uuid=uuid.UUID(log_uuids[uid]), status="PROCESSING", file_uid=uid,
+            original_filename=f"{uid}.m4a", model_used="gemini-2.5-flash", batch_id=batch_id,
+        ))
+    db_session.commit()
+
+    state = SimpleNamespace(batch_id=batch_id, log_uuids=log_uuids, processed=[], crash_on=None)
+    batch_job = SimpleNamespace(state="JOB_STATE_SUCCEEDED", src=None, dest=None)
+
+    def fake_process(inline_response, file_item, file_task_uuid, log_writer, update_fn, **kw):
+        if file_item.file_uid == state.crash_on:
+            raise SystemExit("worker killed")
+        state.processed.append(file_item.file_uid)
+        log_writer.submit(file_task_uuid, {"status": "COMPLETED", "lrc_content": "[00:01.00]hi"})
+        update_fn("任務完成", status_code="COMPLETED",
+                  result_data={"task_uuid": file_task_uuid, "fresh": True}, file_uid=file_item.file_uid)
+
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+    writer = TranscriptionLogWriter(Session, flush_interval_seconds=60)
+    monkeypatch.setattr(batch_task, "SessionLocal", Session)
+    monkeypatch.setattr(batch_task, "get_transcription_log_writer", lambda: writer)
+    monkeypatch.setattr(batch_task, "GeminiClient", lambda key: SimpleNamespace(client=object()))
+    monkeypatch.setattr(batch_task, "poll_batch_job_status", lambda client, name: batch_job)
+    monkeypatch.setattr(
+        batch_task, "iter_batch_job_responses",
+        lambda client, job: ((None, f"resp{i}") for i in range(3)))
+    monkeypatch.setattr(batch_task, "_process_single_result", fake_process)
+    monkeypatch.setattr(batch_task, "_publish_batch_status", lambda *a, **k: None)
+    monkeypatch.setattr(batch_task, "cleanup_batch_job_files", lambda client, job: None)
+    monkeypatch.setattr(batch_task, "forget_batch_api_key", lambda bid: None)
+
+    def run():
+        return batch_task.process_gemini_batch_results(
+            batch_id, "key", BatchJobRepository(), TranscriptionLogRepository(),
+            is_recovery=False)
+
+    state.run = run
+    return state
+
+
+class TestCheckpointedResultProcessing:
+    def test_every_file_is_checkpointed_as_processed(self, batch, db_session):
+        batch.crash_on = "uid2"
+        with pytest.raises(SystemExit):
+            batch.run()
+
+        # 中途離開時已處理檔案的日誌與進度仍會寫入
+        db_session.expire_all()
+        job = db_session.get(BatchJob, batch.batch_id)
+        assert job.completed_file_count == 2
+        assert job.results_json is None
+        statuses = {
+            log.file_uid: log.status
+            for log in db_session.query(TranscriptionLog).filter(TranscriptionLog.batch_id == batch.batch_id)
+        }
+        assert statuses == {"uid0": "COMPLETED", "uid1": "COMPLETED", "uid2": "PROCESSING"}
+
+    def test_rerun_skips_files_already_done(self, batch, db_session):
+        batch.crash_on = "uid2"
+        with pytest.raises(SystemExit):
+            batch.run()
+
+        batch.crash_on = None
+        batch.processed.clear()
+        result = batch.run()
+
+        assert batch.processed == ["uid2"]
+        assert result["status"] == "COMPLETED"
+        # 先前完成的檔案由日誌重建結果，results_json 仍涵蓋全部檔案
+        stored = json.loads(db_session.get(BatchJob, batch.batch_id).results_json)
+        assert set(stored) == {"uid0", "uid1", "uid2"}
+        assert stored["uid2"]["fresh"] is True
+        assert stored["uid0"]["task_uuid"] == batch.log_uuids["uid0"]
+        assert set(stored["uid0"]["transcripts"]) == {"lrc"}
+        assert db_session.get(BatchJob, batch.batch_id).completed_file_count == 3
+
+    def test_failed_files_are_not_retried(self, batch, db_session):
+        TranscriptionLogRepository().update_log(
+            db_session, batch.log_uuids["uid1"], {"status": "FAILED", "error_message": "blocked"})
+
+        batch.run()
+
+        assert batch.processed == ["uid0", "uid2"]
+        stored = json.loads(db_session.get(BatchJob, batch.batch_id).results_json)
+        assert set(stored) == {"uid0", "uid2"}
+
+    def test_completed_is_published_after_log_is_flushed(self, batch, db_session, monkeypatch):
+        lrc_at_publish = {}
+
+        def publish(batch_id, task_id, text, code="PROCESSING", result=None, file_uid=None):
+            if code == "COMPLETED":
+                db_session.expire_all()
+                log = db_session.get(TranscriptionLog, uuid.UUID(batch.log_uuids[file_uid]))
+                lrc_at_publish[file_uid] = log.lrc_content
+        monkeypatch.setattr(batch_task, "_publish_batch_status", publish)
+        monkeypatch.setattr(batch_task, "TRANSCRIPTION_LOG_WRITE_BATCH_SIZE", 2)
+
+        batch.run()
+
+        # 前端收到 COMPLETED 即可能下載，推送時 lrc_content 必須已寫入
+        assert lrc_at_publish == {uid: "[00:01.00]hi" for uid in ("uid0", "uid1", "uid2")}
+
+    def test_missing_gemini_job_name_goes_back_to_polling(self, batch, db_session):
+        job = db_session.get(BatchJob, batch.batch_id)
+        job.gemini_job_name = None
+        db_session.commit()
+
+        assert batch.run() == {"status": "POLLING", "files": []}
+        db_session.expire_all()
+        assert db_session.get(BatchJob, batch.batch_id).status == "POLLING"
+        assert batch.processed == []
@@ -0,0 +1,425 @@
+"""
+單元測試：Gemini 批次分片提交與 JSONL 檔案輸入 / 輸出
+測試範圍：celery/batch_task.py 的 _ShardPlanner、batch_transcribe_task 分片提交，
+以及 provider/google/gemini.py 的 create_batch_transcription_job / iter_batch_job_responses
+使用 SQLite in-memory 資料庫與假的 Gemini client / 上傳管線
+"""
+import json
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.celery import batch_task
+from app.celery.batch_task import _ShardPlanner
+from app.database.models import BatchJob, TranscriptionLog
+from app.exceptions import GeminiTransientError
+from app.provider.google import gemini
+from app.provider.google.client_pool import GeminiLease
+from app.provider.google.gemini import create_batch_transcription_job, iter_batch_job_responses
+from app.repositories.batch_job_repository import BatchJobRepository
+from app.repositories.transcription_log_repository import TranscriptionLogRepository
+from app.repositories.transcription_log_writer import TranscriptionLogWriter
+from app.services.transcription.cache import (
+    BATCH_SERVICE_TIER,
+    CachedTranscript,
+    TranscriptCache,
+    _RedisTranscriptStore,
+    transcript_cache_key,
+)
+from tests.unit.fake_redis import FakeRedis
+
+
+def _gemini_file(name):
+    return SimpleNamespace(name=f"files/{name}", uri=f"https://files/{name}", mime_type="audio/ogg")
+
+
+class _FakeFiles:
+    def __init__(self, download_content=b""):
+        self.uploaded = []
+        self.deleted = []
+        self.download_content = download_content
+
+    def upload(self, file, config):
+        with open(file, encoding="utf-8") as f:
+            self.uploaded.append((config, [json.loads(line) for line in f]))
+        return SimpleNamespace(name="files/batch-input")
+
+    def download(self, file):
+        return self.download_content
+
+    def delete(self, name):
+        self.deleted.append(name)
+
+
+class _FakeBatches:
+    def __init__(self):
+        self.created = []
+
+    def create(self, model, src, config):
+        self.created.append(src)
+        return SimpleNamespace(name=f"batches/{len(self.created)}")
+
+
+class TestShardPlanner:
+    def test_closes_shard_at_file_limit(self):
+        planner = _ShardPlanner(max_files=2, max_bytes=0)
+        assert planner.add(3, 10) is None
+        shard = planner.add(1, 10)
+        assert shard.index == 0 and shard.file_indices == [3, 1]
+        assert planner.add(0, 10) is None
+        assert planner.flush().file_indices == [0]
+        assert planner.flush() is None
+
+    def test_closes_shard_at_byte_limit(self):
+        planner = _ShardPlanner(max_files=100, max_bytes=1000)
+        assert planner.add(0, 400) is None
+        shard = planner.add(1, 700)
+        assert shard.file_indices == [0, 1]
+        assert shard.total_bytes == 1100
+        # 單一超大檔案自成一個分片
+        assert planner.add(2, 5000).file_indices == [2]
+
+    def test_shard_indices_increase(self):
+        planner = _ShardPlanner(max_files=1, max_bytes=0)
+        assert [planner.add(i, 1).index for i in range(3)] == [0, 1, 2]
+
+
+class TestCreateBatchJob:
+    def test_inline_requests(self):
+        client = SimpleNamespace(files=_FakeFiles(), batches=_FakeBatches())
+        create_batch_transcription_job(client, [_gemini_file("a"), _gemini_file("b")], "m", "prompt")
+
+        src = client.batches.created[0]
+        assert isinstance(src, list) and len(src) == 2
+        assert src[1]["contents"][0]["parts"][1]["file_data"]["file_uri"] == "https://files/b"
+        assert client.files.uploaded == []
+
+    def test_file_input_uploads_keyed_jsonl(self):
+        client = SimpleNamespace(files=_FakeFiles(), batches=_FakeBatches())
+        create_batch_transcription_job(
+            client, [_gemini_file("a"), _gemini_file("b")], "m", "prompt",
+            keys=["4", "7"], use_file_input=True)
+
+        assert client.batches.created == ["files/batch-input"]
+        config, lines = client.files.uploaded[0]
+        assert config["mime_type"] == "jsonl"
+        assert [line["key"] for line in lines] == ["4", "7"]
+        assert lines[0]["request"]["contents"][0]["parts"][0]["text"] == "prompt"
+
+
+class TestIterBatchJobResponses:
+    def test_inline_responses_have_no_key(self):
+        batch_job = SimpleNamespace(dest=SimpleNamespace(inlined_responses=["r0", "r1"], file_name=None))
+        assert list(iter_batch_job_responses(None, batch_job)) == [(None, "r0"), (None, "r1")]
+
+    def test_jsonl_output_is_parsed_by_key(self):
+        lines = [
+            {"key": "7", "response": {
+                "candidates": [{"content": {"parts": [{"text": "[00:01.00]hi"}], "role": "model"}}],
+                "usageMetadata": {"promptTokenCount": 5, "candidatesTokenCount": 2, "totalTokenCount": 7},
+            }},
+            {"key": "4", "error": {"code": 400, "message": "bad audio"}},
+        ]
+        content = "\n".join(json.dumps(line) for line in lines).encode("utf-8")
+        client = SimpleNamespace(files=_FakeFiles(content))
+        batch_job = SimpleNamespace(dest=SimpleNamespace(inlined_responses=None, file_name="files/out"))
+
+        results = dict(iter_batch_job_responses(client, batch_job))
+
+        assert results["7"].response.text == "[00:01.00]hi"
+        assert results["7"].response.usage_metadata.total_token_count == 7
+        assert results["4"].response is None
+        assert "bad audio" in str(results["4"].error)
+
+
+class TestShardedSubmission:
+    @pytest.fixture
+    def env(self, test_engine, monkeypatch, tmp_path):
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+        state = SimpleNamespace(created=[], registered=[], published=[], fail_upload=set())
+
+        def fake_pipeline(files, preprocessed, client, lookup=None):
+            for i, _ in preprocessed:
+                path = tmp_path / f"f{i}.ogg"
+                path.write_bytes(b"x" * 100)
+                prepared = batch_task._PreprocessedFile(
+                    upload_path=path, duration=10.0 + i, audio_hash=f"pcm:audio{i}")
+                cached = lookup(i, prepared) if lookup is not None else None
+                yield "preprocessed", i, prepared
+                if cached is not None:
+                    yield "cached", i, cached
+                elif i in state.fail_upload:
+                    yield "upload_failed", i, RuntimeError("upload refused")
+                else:
+                    yield "uploaded", i, _gemini_file(f"f{i}")
+
+        def fake_create(client, gemini_files, model, prompt, display_name, keys, use_file_input):
+            state.created.append((keys, use_file_input))
+            return SimpleNamespace(name=f"batches/{len(state.created)}")
+
+        monkeypatch.setattr(batch_task, "SessionLocal", Session)
+        writer = TranscriptionLogWriter(Session, flush_interval_seconds=60)
+        state.writer = writer
+        monkeypatch.setattr(batch_task, "get_transcription_log_writer", lambda: writer)
+        fake_pool = SimpleNamespace(
+            acquire=lambda keys: GeminiLease(api_key="key", client=object()),
+            release=lambda lease, error=None: None,
+        )
+        monkeypatch.setattr(batch_task, "get_client_pool", lambda: fake_pool)
+        state.cache = TranscriptCache(_RedisTranscriptStore(FakeRedis()))
+        monkeypatch.setattr(batch_task, "get_transcript_cache", lambda: state.cache)
+        monkeypatch.setattr(batch_task, "_iter_uploads", fake_pipeline)
+        monkeypatch.setattr(
+            batch_task, "_iter_preprocessed", lambda task_ids: ((i, None) for i in range(len(task_ids))))
+        monkeypatch.setattr(batch_task, "create_batch_transcription_job", fake_create)
+        monkeypatch.setattr(batch_task, "release_gemini_file", lambda client, gf: None)
+        monkeypatch.setattr(
+            batch_task, "register_batch_api_key", lambda bid, key: state.registered.append(bid))
+        monkeypatch.setattr(
+            batch_task, "_publish_batch_status",
+            lambda bid, tid, text, code="PROCESSING", result=None, fuid=None: state.published.append((bid, code)))
+        monkeypatch.setattr(batch_task, "BATCH_SHARD_MAX_FILES", 2)
+
+        batch_id = uuid.uuid4().hex
+        state.batch_id = batch_id
+
+        def run(n_files):
+            params = {
+                "files": [
+                    {"file_path": str(tmp_path / f"f{i}.m4a"), "original_filename": f"f{i}.m4a", "file_uid": f"uid{i}"}
+                    for i in range(n_files)
+                ],
+                "provider": "google", "model": "gemini-2.5-flash", "api_keys": "key",
+                "source_lang": "zh-TW", "client_id": batch_id, "batch_id": batch_id, "session_id": "sess",
+            }
+            batch_task.batch_transcribe_task.run([f"pre{i}" for i in range(n_files)], params)
+
+        def jobs():
+            with Session() as db:
+                return {
+                    job.batch_id: job for job in
+                    db.query(BatchJob).filter(BatchJob.batch_id.like(f"{batch_id}%")).all()
+                }
+
+        def logs():
+            with Session() as db:
+                return {log.file_uid: log for log in db.query(TranscriptionLog).filter(
+                    TranscriptionLog.session_id == "sess").all()}
+
+        state.run, state.jobs, state.logs = run, jobs, logs
+        yield state
+
+        with Session() as db:
+            db.query(TranscriptionLog).filter(TranscriptionLog.session_id == "sess").delete(synchronize_session=False)
+            db.query(BatchJob).filter(BatchJob.batch_id.like(f"{batch_id}%")).delete(synchronize_session=False)
+            db.commit()
+
+    def test_each_shard_becomes_its_own_polling_job(self, env):
+        env.run(5)
+
+        bid = env.batch_id
+        assert [keys for keys, _ in env.created] == [["0", "1"], ["2", "3"], ["4"]]
+        jobs = env.jobs()
+        assert set(jobs) == {bid, f"{bid}-s1", f"{bid}-s2"}
+        assert all(job.status == "POLLING" and job.session_id == "sess" for job in jobs.values())
+        assert jobs[bid].parent_batch_id is None
+        assert jobs[f"{bid}-s1"].parent_batch_id == bid
+        assert json.loads(jobs[f"{bid}-s1"].file_mapping_json).keys() == {"2", "3"}
+        assert json.loads(jobs[f"{bid}-s2"].file_durations_json) == {"uid4": 14.0}
+        assert jobs[bid].file_count == 2
+        assert env.registered == [bid, f"{bid}-s1", f"{bid}-s2"]
+
+        logs = env.logs()
+        assert logs["uid1"].batch_id == bid
+        assert logs["uid3"].batch_id == f"{bid}-s1"
+        # BATCH_SUBMITTED 只在全部分片提交後送出一次，避免前端提早關閉連線
+        assert [code for _, code in env.published].count("BATCH_SUBMITTED") == 1
+        assert env.published[-1] == (bid, "BATCH_SUBMITTED")
+
+    def test_failed_uploads_are_excluded_from_shards(self, env):
+        env.fail_upload = {1}
+        env.run(3)
+
+        assert [keys for keys, _ in env.created] == [["0", "2"]]
+        assert env.logs()["uid1"].status == "FAILED"
+
+    def test_cached_files_complete_without_upload(self, env):
+        from app.core.default_prompt import build_prompt
+
+        prompt = build_prompt(source_lang="zh-TW", target_lang=None, multi_speaker=False, template=None)
+        key = transcript_cache_key("pcm:audio1", "gemini-2.5-flash", prompt, BATCH_SERVICE_TIER)
+        env.cache.put(key, CachedTranscript(lrc_text="[00:01.00]cached", total_tokens=99))
+
+        env.run(3)
+
+        assert [keys for keys, _ in env.created] == [["0", "2"]]
+        log = env.logs()["uid1"]
+        assert log.status == "COMPLETED"
+        assert log.lrc_content == "[00:01.00]cached"
+        assert log.cost == 0.0
+        mapping = json.loads(env.jobs()[env.batch_id].file_mapping_json)
+        assert mapping["2"]["cache_key"] == transcript_cache_key(
+            "pcm:audio2", "gemini-2.5-flash", prompt, BATCH_SERVICE_TIER)
+        assert env.cache.stats()["hits"] == 1
+
+    def test_mixed_cache_hits_reach_first_shard_results(self, env, monkeypatch):
+        from app.core.default_prompt import build_prompt
+
+        prompt = build_prompt(source_lang="zh-TW", target_lang=None, multi_speaker=False, template=None)
+        env.cache.put(
+            transcript_cache_key("pcm:audio1", "gemini-2.5-flash", prompt, BATCH_SERVICE_TIER),
+            CachedTranscript(lrc_text="[00:01.00]cached"))
+        env.run(3)
+        assert [keys for keys, _ in env.created] == [["0", "2"]]
+
+        def fake_process(inline_response, file_item, file_task_uuid, log_writer, update_fn, **kw):
+            log_writer.submit(file_task_uuid, {"status": "COMPLETED", "lrc_content": f"[00:01.00]{inline_response}"})
+            update_fn("任務完成", status_code="COMPLETED",
+                      result_data={"task_uuid": file_task_uuid}, file_uid=file_item.file_uid)
+        batch_job = SimpleNamespace(state="JOB_STATE_SUCCEEDED", src=None, dest=None)
+        monkeypatch.setattr(batch_task, "GeminiClient", lambda key: SimpleNamespace(client=object()))
+        monkeypatch.setattr(batch_task, "poll_batch_job_status", lambda client, name: batch_job)
+        monkeypatch.setattr(
+            batch_task, "iter_batch_job_responses", lambda client, job: iter([("0", "a"), ("2", "c")]))
+        monkeypatch.setattr(batch_task, "_process_single_result", fake_process)
+        monkeypatch.setattr(batch_task, "forget_batch_api_key", lambda bid: None)
+
+        batch_task.process_gemini_batch_results(
+            env.batch_id, "key", BatchJobRepository(), TranscriptionLogRepository(), is_recovery=False)
+
+        # 命中快取的檔案不在分片映射中，結果仍隨第一個分片存入 results_json
+        stored = json.loads(env.jobs()[env.batch_id].results_json)
+        assert set(stored) == {"uid0", "uid1", "uid2"}
+        assert stored["uid1"]["transcripts"]["lrc"] == "[00:01.00]cached"
+
+    def test_cache_hits_are_merged_when_first_shard_already_processed(self, env, monkeypatch):
+        from app.core.default_prompt import build_prompt
+
+        prompt = build_prompt(source_lang="zh-TW", target_lang=None, multi_speaker=False, template=None)
+        env.cache.put(
+            transcript_cache_key("pcm:audio3", "gemini-2.5-flash", prompt, BATCH_SERVICE_TIER),
+            CachedTranscript(lrc_text="[00:01.00]cached"))
+
+        def register(bid, key):
+            # 第一個分片在其餘檔案上傳期間就已處理完畢
+            if bid == env.batch_id:
+                with batch_task.SessionLocal() as db:
+                    BatchJobRepository().update_job(db, bid, {
+                        "status": "COMPLETED", "results_json": json.dumps({"uid0": {}, "uid1": {}})})
+        monkeypatch.setattr(batch_task, "register_batch_api_key", register)
+
+        env.run(4)
+
+        stored = json.loads(env.jobs()[env.batch_id].results_json)
+        assert set(stored) == {"uid0", "uid1", "uid3"}
+
+    def test_all_cached_completes_without_batch(self, env):
+        from app.core.default_prompt import build_prompt
+
+        prompt = build_prompt(source_lang="zh-TW", target_lang=None, multi_speaker=False, template=None)
+        for i in range(2):
+            env.cache.put(
+                transcript_cache_key(f"pcm:audio{i}", "gemini-2.5-flash", prompt, BATCH_SERVICE_TIER),
+                CachedTranscript(lrc_text=f"[00:01.00]line {i}"))
+
+        env.run(2)
+
+        assert env.created == []
+        job = env.jobs()[env.batch_id]
+        assert job.status == "COMPLETED"
+        assert set(json.loads(job.results_json)) == {"uid0", "uid1"}
+        assert env.published[-1] == (env.batch_id, "BATCH_COMPLETED")
+
+    def test_cache_hits_are_written_in_one_flush_before_publishing(self, env, monkeypatch):
+        from app.core.default_prompt import build_prompt
+
+        prompt = build_prompt(source_lang="zh-TW", target_lang=None, multi_speaker=False, template=None)
+        for i in (0, 2):
+            env.cache.put(
+                transcript_cache_key(f"pcm:audio{i}", "gemini-2.5-flash", prompt, BATCH_SERVICE_TIER),
+                CachedTranscript(lrc_text=f"[00:01.00]line {i}"))
+        writes = []
+        original_write = env.writer._write
+        monkeypatch.setattr(env.writer, "_write", lambda updates: (writes.append(dict(updates)), original_write(updates)))
+        completed_seen_in_db = []
+        publish = batch_task._publish_batch_status
+
+        def recording_publish(bid, tid, text, code="PROCESSING", result=None, fuid=None):
+            if code == "COMPLETED":
+                completed_seen_in_db.append(env.logs()[fuid].status)
+            publish(bid, tid, text, code, result, fuid)
+        monkeypatch.setattr(batch_task, "_publish_batch_status", recording_publish)
+
+        env.run(3)
+
+        cached_writes = [w for w in writes if any(u.get("status") == "COMPLETED" for u in w.values())]
+        assert len(cached_writes) == 1 and len(cached_writes[0]) >= 2
+        assert completed_seen_in_db == ["COMPLETED", "COMPLETED"]
+
+    def test_transient_error_keeps_local_files_for_retry(self, env, monkeypatch):
+        # 重試沿用 result backend 中的前處理結果，上傳檔與原始檔不能在這次嘗試結束時刪除
+        cleaned = []
+        monkeypatch.setattr(batch_task, "_cleanup_local_file", cleaned.append)
+
+        def unavailable(*args, **kwargs):
+            raise GeminiTransientError("503 UNAVAILABLE")
+        monkeypatch.setattr(batch_task, "create_batch_transcription_job", unavailable)
+
+        with pytest.raises(GeminiTransientError):
+            env.run(2)
+        assert cleaned == []
+
+    def test_large_shard_uses_file_input(self, env, monkeypatch):
+        monkeypatch.setattr(batch_task, "BATCH_INLINE_MAX_BYTES", 1)
+        env.run(2)
+        assert env.created == [(["0", "1"], True)]
+
+
+class TestShardResultProcessing:
+    def test_keyed_results_are_mapped_and_routed_to_parent_channel(self, db_session, test_engine, monkeypatch):
+        shard_id = f"{uuid.uuid4().hex}-s1"
+        db_session.add(BatchJob(
+            batch_id=shard_id, status="RECOVERING", gemini_job_name="batches/x",
+            parent_batch_id="parent",
+            task_params_json=json.dumps({"model": "m"}),
+            file_mapping_json=json.dumps({
+                "2": {"file_uid": "uid2", "original_filename": "b.m4a"},
+                "3": {"file_uid": "uid3", "original_filename": "c.m4a"},
+            }),
+        ))
+        db_session.commit()
+
+        batch_job = SimpleNamespace(
+            state="JOB_STATE_SUCCEEDED",
+            src=SimpleNamespace(file_name="files/in"),
+            dest=SimpleNamespace(file_name="files/out", inlined_responses=None),
+        )
+        processed, channels, cleaned = [], set(), []
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+        monkeypatch.setattr(batch_task, "SessionLocal", Session)
+        monkeypatch.setattr(
+            batch_task, "get_transcription_log_writer", lambda: TranscriptionLogWriter(Session))
+        monkeypatch.setattr(batch_task, "GeminiClient", lambda key: SimpleNamespace(client=object()))
+        monkeypatch.setattr(batch_task, "poll_batch_job_status", lambda client, name: batch_job)
+        monkeypatch.setattr(
+            batch_task, "iter_batch_job_responses",
+            lambda client, job: iter([("3", "resp-c"), ("2", "resp-b")]))
+        monkeypatch.setattr(
+            batch_task, "_process_single_result",
+            lambda inline_response, file_item, **kw: processed.append((file_item.file_uid, inline_response)))
+        monkeypatch.setattr(
+            batch_task, "_publish_batch_status", lambda channel, *a, **k: channels.add(channel))
+        monkeypatch.setattr(gemini, "cleanup_gemini_file", lambda client, f: cleaned.append(f.name))
+        monkeypatch.setattr(batch_task, "forget_batch_api_key", lambda bid: None)
+
+        result = batch_task.process_gemini_batch_results(
+            shard_id, "key", batch_task.BatchJobRepository(),
+            SimpleNamespace(get_logs_by_uuids=lambda db, uuids: {}),
+            is_recovery=False)
+
+        assert result["status"] == "COMPLETED"
+        assert processed == [("uid3", "resp-c"), ("uid2", "resp-b")]
+        assert channels == {"parent"}
+        assert cleaned == ["files/in", "files/out"]
@@ -0,0 +1,152 @@
+"""
+單元測試：長音檔預先切塊
+測試範圍：vad/flows.py 的 plan_chunk_boundaries 與
+transcription/flows.py 的切塊並行轉錄合併邏輯
+"""
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services.transcription.flows import TranscriptionTask, _adjust_lrc_timestamps
+from app.services.transcription.models import TranscriptionTaskResult
+from app.services.vad.flows import plan_chunk_boundaries
+
+
+def _speech(*ranges):
+    return [{"start": s, "end": e} for s, e in ranges]
+
+
+# ─── plan_chunk_boundaries ──────────────────────────────────────────────────
+
+class TestPlanChunkBoundaries:
+    def test_short_audio_returns_single_chunk(self):
+        assert plan_chunk_boundaries([], 800.0, 600.0) == [(0.0, 800.0)]
+
+    def test_disabled_target_returns_single_chunk(self):
+        assert plan_chunk_boundaries([], 3600.0, 0) == [(0.0, 3600.0)]
+
+    def test_chunk_count_follows_target(self):
+        bounds = plan_chunk_boundaries([], 3600.0, 600.0)
+        assert len(bounds) == 6
+
+    def test_no_silence_cuts_at_even_points(self):
+        bounds = plan_chunk_boundaries([], 1200.0, 600.0)
+        assert bounds == [(0.0, 600.0), (600.0, 1200.0)]
+
+    def test_cut_snaps_to_nearest_silence_midpoint(self):
+        # 靜音間隙 580~590 → 中點 585，在 ±150 秒搜尋範圍內
+        speech = _speech((0, 580), (590, 1200))
+        bounds = plan_chunk_boundaries(speech, 1200.0, 600.0)
+        assert bounds == [(0.0, 585.0), (585.0, 1200.0)]
+
+    def test_silence_outside_window_is_ignored(self):
+        # 中點 205 距理想切點 600 超過 1/4 塊長
+        speech = _speech((0, 200), (210, 1200))
+        bounds = plan_chunk_boundaries(speech, 1200.0, 600.0)
+        assert bounds == [(0.0, 600.0), (600.0, 1200.0)]
+
+    def test_short_gaps_are_ignored(self):
+        speech = _speech((0, 580), (580.5, 1200))
+        bounds = plan_chunk_boundaries(speech, 1200.0, 600.0, min_silence_duration=1.0)
+        assert bounds[0][1] == 600.0
+
+    def test_boundaries_are_contiguous_and_cover_whole_file(self):
+        speech = _speech((0, 1000), (1003, 2410), (2415, 5400))
+        bounds = plan_chunk_boundaries(speech, 5400.0, 900.0)
+        assert bounds[0][0] == 0.0
+        assert bounds[-1][1] == 5400.0
+        for (_, end), (start, _) in zip(bounds, bounds[1:]):
+            assert end == start
+            assert start > 0
+
+
+# ─── LRC 偏移（長音檔超過 99 分鐘）───────────────────────────────────────────
+
+class TestAdjustLongTimestamps:
+    def test_offset_beyond_100_minutes(self):
+        result = _adjust_lrc_timestamps("[00:01.00]hello", 6000.0)
+        assert result == "[100:01.00]hello"
+
+    def test_three_digit_minutes_are_parsed(self):
+        result = _adjust_lrc_timestamps("[100:00.00]hello", 60.0)
+        assert result == "[101:00.00]hello"
+
+
+# ─── 切塊並行轉錄 ───────────────────────────────────────────────────────────
+
+class TestTranscribeInChunks:
+    @pytest.fixture
+    def task(self, tmp_path):
+        task = TranscriptionTask(
+            client=MagicMock(),
+            model="gemini-2.5-flash",
+            prompt="prompt",
+            temp_dir=tmp_path,
+        )
+        task.vad_service = MagicMock()
+        task.chunk_target_seconds = 600
+        task.chunk_concurrency = 3
+        return task
+
+    def test_should_chunk_requires_two_chunks(self, task):
+        assert task._should_chunk(899.0) is False
+        assert task._should_chunk(900.0) is True
+
+    def test_should_chunk_disabled_without_vad(self, task):
+        task.vad_service = None
+        assert task._should_chunk(3600.0) is False
+
+    def test_chunks_are_stitched_in_timeline_order(self, task, tmp_path, monkeypatch):
+        wav = tmp_path / "long.wav"
+        wav.touch()
+        task.vad_service.split_audio_into_chunks.return_value = [
+            (str(tmp_path / "long.chunk01.wav"), 0.0, 600.0),
+            (str(tmp_path / "long.chunk02.wav"), 600.0, 1200.0),
+            (str(tmp_path / "long.chunk03.wav"), 1200.0, 1800.0),
+        ]
+
+        def fake_transcribe(path, allow_chunking=True):
+            assert allow_chunking is False
+            return TranscriptionTaskResult(
+                success=True,
+                text=f"[00:01.00]{Path(path).stem}",
+                input_tokens=10,
+                output_tokens=5,
+                total_tokens=15,
+                service_tier_used="standard",
+            )
+
+        monkeypatch.setattr(task, "transcribe_audio", fake_transcribe)
+        result = task._transcribe_in_chunks(wav, 1800.0)
+
+        assert result.success is True
+        assert result.text.splitlines() == [
+            "[00:01.00]long.chunk01",
+            "[10:01.00]long.chunk02",
+            "[20:01.00]long.chunk03",
+        ]
+        assert result.total_tokens == 45
+
+    def test_failed_chunk_fails_whole_result(self, task, tmp_path, monkeypatch):
+        wav = tmp_path / "long.wav"
+        wav.touch()
+        task.vad_service.split_audio_into_chunks.return_value = [
+            (str(tmp_path / "a.wav"), 0.0, 600.0),
+            (str(tmp_path / "b.wav"), 600.0, 1200.0),
+        ]
+        monkeypatch.setattr(
+            task,
+            "transcribe_audio",
+            lambda path, allow_chunking=True: TranscriptionTaskResult(
+                success=Path(path).stem == "a", text="[00:00.00]x"),
+        )
+        result = task._transcribe_in_chunks(wav, 1200.0)
+        assert result.success is False
+        assert "片段 2" in result.text
+
+    def test_returns_none_when_split_fails(self, task, tmp_path):
+        wav = tmp_path / "long.wav"
+        wav.touch()
+        task.vad_service.split_audio_into_chunks.return_value = []
+        assert task._transcribe_in_chunks(wav, 1800.0) is None
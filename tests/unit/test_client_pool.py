@@ -0,0 +1,127 @@
+"""
+單元測試：Gemini client 池
+測試範圍：provider/google/client_pool.py 的 parse_api_keys、is_rate_limit_error 與 GeminiClientPool
+以假的 client factory 與可控時鐘驗證 client 重用、最少進行中分流與限流 Key 暫停
+"""
+import pytest
+
+from app.exceptions import GeminiPermanentError, GeminiTransientError
+from app.provider.google.client_pool import GeminiClientPool, is_rate_limit_error, parse_api_keys
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def pool(clock):
+    created = []
+
+    def factory(key):
+        created.append(key)
+        return f"client-{key}-{len(created)}"
+
+    pool = GeminiClientPool(
+        max_clients=2, cooldown_seconds=60, max_cooldown_seconds=200,
+        client_factory=factory, clock=clock)
+    pool.created = created
+    return pool
+
+
+class TestParseApiKeys:
+    @pytest.mark.parametrize("value, expected", [
+        ("k1", ["k1"]),
+        (" k1 ", ["k1"]),
+        ('["k1", "k2", "k1", ""]', ["k1", "k2"]),
+        (["k2", "k1"], ["k2", "k1"]),
+        ("", []),
+        (None, []),
+    ])
+    def test_normalizes(self, value, expected):
+        assert parse_api_keys(value) == expected
+
+
+class TestIsRateLimitError:
+    def test_quota_errors(self):
+        assert is_rate_limit_error(GeminiTransientError("429 RESOURCE_EXHAUSTED"))
+        assert is_rate_limit_error(GeminiPermanentError("Quota exceeded for metric"))
+
+    def test_other_errors(self):
+        assert not is_rate_limit_error(GeminiTransientError("503 UNAVAILABLE"))
+        assert not is_rate_limit_error(ValueError("bad audio"))
+
+
+class TestClientReuse:
+    def test_same_key_reuses_client(self, pool):
+        assert pool.get_client("a") is pool.get_client("a")
+        assert pool.created == ["a"]
+
+    def test_least_recently_used_client_is_evicted(self, pool):
+        pool.get_client("a")
+        pool.get_client("b")
+        pool.get_client("a")
+        pool.get_client("c")  # 超過上限，移除最久未用的 b
+        pool.get_client("a")
+        pool.get_client("b")
+        assert pool.created == ["a", "b", "c", "b"]
+
+
+class TestKeySelection:
+    def test_spreads_across_keys_by_outstanding(self, pool):
+        leases = [pool.acquire(["a", "b"]) for _ in range(4)]
+        assert sorted(lease.api_key for lease in leases) == ["a", "a", "b", "b"]
+
+        pool.release(leases[0])
+        assert pool.acquire(["a", "b"]).api_key == leases[0].api_key
+
+    def test_idle_keys_are_rotated(self, pool):
+        picked = set()
+        for _ in range(4):
+            lease = pool.acquire(["a", "b"])
+            picked.add(lease.api_key)
+            pool.release(lease)
+        assert picked == {"a", "b"}
+
+    def test_rate_limited_key_is_ejected_until_cooldown(self, pool, clock):
+        lease = pool.acquire(["a"])
+        pool.release(lease, GeminiTransientError("429 Too Many Requests"))
+
+        assert all(pool.acquire(["a", "b"]).api_key == "b" for _ in range(3))
+
+        clock.now += 61
+        keys = {pool.acquire(["a", "b"]).api_key for _ in range(3)}
+        assert "a" in keys
+
+    def test_cooldown_doubles_and_is_capped(self, pool, clock):
+        for _ in range(4):
+            pool.release(pool.acquire(["a"]), GeminiTransientError("RESOURCE_EXHAUSTED"))
+        assert pool.snapshot()["****"]["ejected_for_seconds"] == pytest.approx(200)
+
+    def test_success_resets_strikes(self, pool):
+        pool.release(pool.acquire(["a"]), GeminiTransientError("429"))
+        pool.release(pool.acquire(["a"]))
+        assert pool.snapshot()["****"]["strikes"] == 0
+
+    def test_non_quota_error_does_not_eject(self, pool):
+        pool.release(pool.acquire(["a"]), ValueError("bad audio"))
+        assert pool.acquire(["a", "b"]).api_key in {"a", "b"}
+        assert pool.snapshot()["****"]["ejected_for_seconds"] == 0
+
+    def test_all_ejected_picks_soonest_recovery(self, pool, clock):
+        pool.release(pool.acquire(["a"]), GeminiTransientError("429"))
+        clock.now += 10
+        pool.release(pool.acquire(["b"]), GeminiTransientError("429"))
+        assert pool.acquire(["a", "b"]).api_key == "a"
+
+    def test_requires_a_key(self, pool):
+        with pytest.raises(ValueError):
+            pool.acquire("")
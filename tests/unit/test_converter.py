@@ -4,6 +4,7 @@
 """
 import pytest
 from app.services.converter.service import (
+    compact_transcripts,
     convert_from_lrc,
     _seconds_to_timestamp,
     _parse_lrc,
@@ -262,3 +263,13 @@ class TestConvertFromLrc:
         assert "Speaker B:" not in result.txt
         assert "Hello" in result.txt
         assert "World" in result.txt
+
+
+# ─── compact_transcripts（完成訊息的精簡結果） ──────────────────────────────
+
+class TestCompactTranscripts:
+    def test_only_lrc_is_carried(self):
+        assert compact_transcripts("[00:01.000]Hello") == {"lrc": "[00:01.000]Hello"}
+
+    def test_missing_lrc_becomes_empty_string(self):
+        assert compact_transcripts(None) == {"lrc": ""}
@@ -0,0 +1,262 @@
+"""
+單元測試：Gemini 上傳檔案登記表
+測試範圍：provider/google/file_registry.py 的 GeminiFileRegistry 與 _RedisFileStore，
+以及 celery/file_reaper.py 的 reap_gemini_files
+以假的上傳 / 刪除函式、假的 files.get、假的 Redis client 與可控時鐘驗證重用、holders 計數與延後刪除；
+假的 Redis 不執行 Lua，三個 script 以下方逐行對應的 Python 實作代替
+"""
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.celery import file_reaper
+from app.provider.google import file_registry
+from app.provider.google.file_registry import (
+    _CLAIM_SCRIPT,
+    _FILE_PREFIX,
+    _INDEX_PREFIX,
+    _LOOKUP_SCRIPT,
+    _REAP_KEY,
+    _RELEASE_SCRIPT,
+    GeminiFileRegistry,
+    _RedisFileStore,
+)
+from tests.unit.fake_redis import FakeRedis
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _lookup_script(r, keys, args):
+    name = r.get(keys[0])
+    if not name:
+        return None
+    fkey = args[2] + name.decode()
+    expires_at = r.hget(fkey, "expires_at")
+    if expires_at is None or float(expires_at) - float(args[0]) < float(args[1]):
+        return None
+    if r.zscore(keys[1], name) is None:
+        return None
+    r.hincrby(fkey, "holders", 1)
+    r.zadd(keys[1], {name: float(expires_at)})
+    return name
+
+
+def _release_script(r, keys, args):
+    if not r.exists(keys[0]):
+        return 0
+    holders = r.hincrby(keys[0], "holders", -1)
+    if holders <= 0:
+        r.hset(keys[0], "holders", 0)
+        expires_at = float(r.hget(keys[0], "expires_at"))
+        r.zadd(keys[1], {args[0]: min(float(args[1]), expires_at)})
+    return 1
+
+
+def _claim_script(r, keys, args):
+    out = []
+    for name in r.zrangebyscore(keys[0], "-inf", args[0], start=0, num=int(args[1])):
+        r.zrem(keys[0], name)
+        fkey = args[2] + name.decode()
+        api_key, index = r.hmget(fkey, "api_key", "index")
+        if index:
+            r.delete(index)
+        r.delete(fkey)
+        if api_key:
+            out.extend([name, api_key])
+    return out
+
+
+_SCRIPTS = {_LOOKUP_SCRIPT: _lookup_script, _RELEASE_SCRIPT: _release_script, _CLAIM_SCRIPT: _claim_script}
+
+
+class _Files:
+    def __init__(self):
+        self.gone = set()
+
+    def get(self, name):
+        if name in self.gone:
+            raise RuntimeError("404 NOT_FOUND")
+        return SimpleNamespace(name=name, state=SimpleNamespace(name="ACTIVE"))
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    clock = _Clock()
+    state = SimpleNamespace(uploaded=[], deleted=[], clock=clock)
+    clients = {key: SimpleNamespace(key=key, files=_Files()) for key in ("k1", "k2")}
+
+    def upload(path, client, status_callback=None):
+        state.uploaded.append((getattr(client, "key", None), path.name))
+        return SimpleNamespace(name=f"files/{len(state.uploaded)}", expiration_time=None)
+
+    def delete(client, gemini_file):
+        state.deleted.append(gemini_file.name)
+
+    monkeypatch.setattr(
+        file_registry, "get_client_pool", lambda: SimpleNamespace(get_client=lambda key: clients[key]))
+    state.redis = FakeRedis(clock, scripts=_SCRIPTS)
+    state.registry = GeminiFileRegistry(
+        _RedisFileStore(state.redis),
+        retain_seconds=3600,
+        key_resolver=lambda client: getattr(client, "key", None),
+        uploader=upload,
+        deleter=delete,
+        clock=clock,
+    )
+    state.clients = clients
+
+    def audio(name, content=b"audio"):
+        path = tmp_path / name
+        path.write_bytes(content)
+        return path
+
+    state.audio = audio
+    return state
+
+
+class TestAcquire:
+    def test_same_content_and_key_is_reused(self, env):
+        first = env.registry.acquire(env.audio("a.ogg"), env.clients["k1"])
+        again = env.registry.acquire(env.audio("b.ogg"), env.clients["k1"])
+
+        assert again.name == first.name
+        assert env.uploaded == [("k1", "a.ogg")]
+
+    def test_other_key_or_content_uploads_again(self, env):
+        env.registry.acquire(env.audio("a.ogg"), env.clients["k1"])
+        env.registry.acquire(env.audio("a.ogg"), env.clients["k2"])
+        env.registry.acquire(env.audio("c.ogg", b"other"), env.clients["k1"])
+        assert len(env.uploaded) == 3
+
+    def test_missing_remote_file_is_uploaded_again(self, env):
+        first = env.registry.acquire(env.audio("a.ogg"), env.clients["k1"])
+        env.clients["k1"].files.gone.add(first.name)
+
+        again = env.registry.acquire(env.audio("a.ogg"), env.clients["k1"])
+        assert again.name != first.name
+        assert len(env.uploaded) == 2
+
+    def test_not_enough_lifetime_left_uploads_again(self, env):
+        env.registry.acquire(env.audio("a.ogg"), env.clients["k1"])
+        env.clock.now += 40 * 3600
+        env.registry.acquire(env.audio("a.ogg"), env.clients["k1"], min_remaining_seconds=24 * 3600)
+        assert len(env.uploaded) == 2
+
+    def test_expiration_time_from_gemini_is_used(self):
+        expires = datetime(2030, 1, 1, tzinfo=timezone.utc)
+        gemini_file = SimpleNamespace(expiration_time=expires)
+        assert file_registry._expires_at(gemini_file, 0) == expires.timestamp()
+
+    def test_registration_expires_with_the_gemini_file(self, env):
+        gemini_file = env.registry.acquire(env.audio("a.ogg"), env.clients["k1"])
+        file_key = f"{_FILE_PREFIX}{gemini_file.name}"
+
+        assert env.redis.ttl(file_key) == 48 * 3600
+        assert env.redis.hget(file_key, "api_key") == b"k1"
+        index_key = env.redis.hget(file_key, "index").decode()
+        assert index_key.startswith(_INDEX_PREFIX)
+        assert env.redis.get(index_key) == gemini_file.name.encode()
+        assert env.redis.ttl(index_key) == 48 * 3600
+
+    def test_unknown_client_key_bypasses_registry(self, env):
+        client = SimpleNamespace(files=_Files())
+        gemini_file = env.registry.acquire(env.audio("a.ogg"), client)
+        env.registry.release(client, gemini_file)
+        assert env.deleted == [gemini_file.name]
+
+
+class TestReleaseAndReap:
+    def test_release_defers_deletion_until_retention_passes(self, env):
+        client = env.clients["k1"]
+        gemini_file = env.registry.acquire(env.audio("a.ogg"), client)
+        env.registry.release(client, gemini_file)
+
+        assert env.deleted == []
+        assert env.registry.reap() == 0
+
+        env.clock.now += 3601
+        assert env.registry.reap() == 1
+        assert env.deleted == [gemini_file.name]
+        # 已刪除的檔案不再被沿用
+        env.registry.acquire(env.audio("a.ogg"), client)
+        assert len(env.uploaded) == 2
+
+    def test_file_in_use_is_not_reaped(self, env):
+        client = env.clients["k1"]
+        first = env.registry.acquire(env.audio("a.ogg"), client)
+        second = env.registry.acquire(env.audio("a.ogg"), client)
+        env.registry.release(client, first)
+
+        env.clock.now += 3601
+        assert env.registry.reap() == 0
+
+        env.registry.release(client, second)
+        env.clock.now += 3601
+        assert env.registry.reap() == 1
+
+    def test_unreleased_file_leaves_the_reap_index_at_expiry(self, env):
+        # 未釋放的檔案排在到期時間；登記已隨 Gemini 檔案過期，只移出 reap 索引，不再呼叫刪除
+        env.registry.acquire(env.audio("a.ogg"), env.clients["k1"])
+        env.clock.now += 48 * 3600 - 1
+        assert env.registry.reap() == 0
+        env.clock.now += 1
+        assert env.registry.reap() == 0
+        assert env.deleted == []
+        assert env.redis.zcard(_REAP_KEY) == 0
+
+    def test_reap_removes_registration_keys(self, env):
+        client = env.clients["k1"]
+        gemini_file = env.registry.acquire(env.audio("a.ogg"), client)
+        index_key = env.redis.hget(f"{_FILE_PREFIX}{gemini_file.name}", "index")
+        env.registry.release(client, gemini_file)
+        env.clock.now += 3601
+        env.registry.reap()
+
+        assert not env.redis.exists(f"{_FILE_PREFIX}{gemini_file.name}", index_key)
+
+    def test_release_of_unregistered_file_deletes_now(self, env):
+        env.registry.release(env.clients["k1"], SimpleNamespace(name="files/unknown"))
+        assert env.deleted == ["files/unknown"]
+
+
+class TestReapTask:
+    def test_beat_task_reaps_due_files(self, env, monkeypatch):
+        monkeypatch.setattr(file_reaper, "get_file_registry", lambda: env.registry)
+        client = env.clients["k2"]
+        gemini_file = env.registry.acquire(env.audio("a.ogg"), client)
+        env.registry.release(client, gemini_file)
+        env.clock.now += 3601
+
+        assert file_reaper.reap_gemini_files() == 1
+        assert env.deleted == [gemini_file.name]
+
+    def test_store_errors_are_logged_not_raised(self, monkeypatch):
+        def broken():
+            raise ConnectionError("redis down")
+        monkeypatch.setattr(file_reaper, "get_file_registry", lambda: SimpleNamespace(reap=lambda limit: broken()))
+        assert file_reaper.reap_gemini_files() == 0
+
+
+class TestDisabledRegistry:
+    def test_plain_upload_and_delete(self, env, tmp_path):
+        uploaded, deleted = [], []
+        registry = GeminiFileRegistry(
+            None,
+            uploader=lambda path, client, cb=None: uploaded.append(path) or SimpleNamespace(name="files/x"),
+            deleter=lambda client, gf: deleted.append(gf.name),
+        )
+        client = env.clients["k1"]
+        gemini_file = registry.acquire(env.audio("a.ogg"), client)
+        registry.acquire(env.audio("a.ogg"), client)
+        registry.release(client, gemini_file)
+
+        assert len(uploaded) == 2
+        assert deleted == ["files/x"]
+        assert registry.reap() == 0
@@ -0,0 +1,119 @@
+"""
+單元測試：gevent worker 內 psycopg2 的協作式等待
+測試範圍：database/green.py 的 gevent_wait_callback 與 make_psycopg_green
+以 socketpair + 背景執行緒模擬 Postgres 來回（固定延遲），與模擬 Gemini 呼叫的
+greenlet 同時執行，驗證 DB 等待不再讓同一進程的其他 greenlet 排隊
+"""
+import select
+import socket
+import threading
+import time
+
+import pytest
+
+gevent = pytest.importorskip("gevent")
+
+from psycopg2 import extensions  # noqa: E402
+
+from app.database import green  # noqa: E402
+
+DB_LATENCY = 0.1
+GEMINI_LATENCY = 0.1
+CONCURRENCY = 5
+
+
+class _FakeConn:
+    """模擬 libpq 非同步連線：第一次 poll 送出查詢，伺服器延遲回應後才 POLL_OK"""
+
+    def __init__(self, latency: float):
+        self._client, server = socket.socketpair()
+        self._client.setblocking(False)
+        self._sent = False
+        threading.Thread(target=self._serve, args=(server, latency), daemon=True).start()
+
+    @staticmethod
+    def _serve(sock, latency):
+        sock.recv(1)
+        time.sleep(latency)
+        sock.sendall(b"x")
+        sock.close()
+
+    def fileno(self):
+        return self._client.fileno()
+
+    def poll(self):
+        if not self._sent:
+            self._client.sendall(b"q")
+            self._sent = True
+            return extensions.POLL_READ
+        try:
+            self._client.recv(1)
+        except BlockingIOError:
+            return extensions.POLL_READ
+        self._client.close()
+        return extensions.POLL_OK
+
+
+def _blocking_wait(conn, timeout=None):
+    """未安裝 callback 時 libpq 的行為：在 C 層阻塞整個執行緒直到 socket 可讀"""
+    while conn.poll() != extensions.POLL_OK:
+        select.select([conn.fileno()], [], [])
+
+
+def _run_workload(wait_callback):
+    """同時跑 CONCURRENCY 個 DB 來回與 CONCURRENCY 個 Gemini 呼叫，回傳 (總耗時, Gemini 最慢完成時間)"""
+    gemini_done = []
+    start = time.monotonic()
+
+    def db_round_trip():
+        wait_callback(_FakeConn(DB_LATENCY))
+
+    def gemini_call():
+        gevent.sleep(GEMINI_LATENCY)
+        gemini_done.append(time.monotonic() - start)
+
+    greenlets = []
+    for _ in range(CONCURRENCY):
+        greenlets.append(gevent.spawn(db_round_trip))
+        greenlets.append(gevent.spawn(gemini_call))
+    gevent.joinall(greenlets, timeout=10, raise_error=True)
+    return time.monotonic() - start, max(gemini_done)
+
+
+class TestCooperativeWait:
+    def test_blocking_driver_serialises_greenlets(self):
+        elapsed, _ = _run_workload(_blocking_wait)
+        assert elapsed >= CONCURRENCY * DB_LATENCY
+
+    def test_green_wait_overlaps_db_and_gemini_calls(self):
+        elapsed, gemini_latest = _run_workload(green.gevent_wait_callback)
+        # DB 來回彼此重疊，也不延後 Gemini 呼叫
+        assert elapsed < 2 * DB_LATENCY
+        assert gemini_latest < 2 * GEMINI_LATENCY
+
+    def test_bad_poll_state_raises(self):
+        class _Broken:
+            def poll(self):
+                return 99
+
+        with pytest.raises(green.psycopg2.OperationalError):
+            green.gevent_wait_callback(_Broken())
+
+
+class TestMakePsycopgGreen:
+    @pytest.fixture(autouse=True)
+    def _reset_callback(self):
+        yield
+        extensions.set_wait_callback(None)
+
+    def test_noop_outside_gevent_worker(self, monkeypatch):
+        monkeypatch.setattr(green, "_gevent_patched", lambda: False)
+        assert green.make_psycopg_green() is False
+        assert extensions.get_wait_callback() is None
+
+    def test_installs_callback_under_gevent(self, monkeypatch):
+        monkeypatch.setattr(green, "_gevent_patched", lambda: True)
+        assert green.make_psycopg_green() is True
+        assert extensions.get_wait_callback() is green.gevent_wait_callback
+        # 重複呼叫不會再次 dispose 連線池
+        assert green.make_psycopg_green() is True
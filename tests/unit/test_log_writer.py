@@ -0,0 +1,123 @@
+"""
+單元測試：轉錄日誌的 write-behind 佇列
+測試範圍：repositories/transcription_log_writer.py 的 TranscriptionLogWriter，
+以及 TranscriptionLogRepository.apply_updates
+以 SQLite in-memory 的 transcription_logs 驗證合併、批次寫入與失敗時的逐筆寫入
+"""
+import threading
+import uuid
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models import TranscriptionLog
+from app.repositories.transcription_log_repository import TranscriptionLogRepository
+from app.repositories.transcription_log_writer import TranscriptionLogWriter
+
+
+class _CountingRepo(TranscriptionLogRepository):
+    """記錄每次 apply_updates 的批次；fail_with 中任一 uuid 在多筆批次裡時拋錯"""
+
+    def __init__(self, fail_with=()):
+        self.batches = []
+        self.fail_with = set(fail_with)
+
+    def apply_updates(self, db, updates):
+        self.batches.append(dict(updates))
+        if self.fail_with & set(updates) and len(updates) > 1:
+            raise RuntimeError("batch rejected")
+        return super().apply_updates(db, updates)
+
+
+@pytest.fixture
+def Session(test_engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
+
+
+@pytest.fixture
+def logs(Session):
+    uuids = [str(uuid.uuid4()) for _ in range(3)]
+    with Session() as db:
+        for task_uuid in uuids:
+            db.add(TranscriptionLog(task_uuid=uuid.UUID(task_uuid), status="PROCESSING"))
+        db.commit()
+    return uuids
+
+
+def _statuses(Session, uuids):
+    with Session() as db:
+        return [db.get(TranscriptionLog, uuid.UUID(u)).status for u in uuids]
+
+
+def _writer(Session, repo, **kwargs):
+    writer = TranscriptionLogWriter(Session, repo=repo, **kwargs)
+    writer._ensure_flusher = lambda: None
+    return writer
+
+
+class TestApplyUpdates:
+    def test_updates_in_one_transaction_and_reports_missing(self, Session, logs):
+        missing_uuid = str(uuid.uuid4())
+        with Session() as db:
+            missing = TranscriptionLogRepository().apply_updates(db, {
+                logs[0]: {"status": "COMPLETED", "lrc_content": "[00:01.00]hi"},
+                logs[1]: {"status": "FAILED"},
+                missing_uuid: {"status": "COMPLETED"},
+                "not-a-uuid": {"status": "COMPLETED"},
+            })
+
+        assert missing == [missing_uuid, "not-a-uuid"]
+        assert _statuses(Session, logs) == ["COMPLETED", "FAILED", "PROCESSING"]
+
+
+class TestTranscriptionLogWriter:
+    def test_nothing_is_written_until_flush(self, Session, logs):
+        repo = _CountingRepo()
+        writer = _writer(Session, repo)
+        writer.submit(logs[0], {"status": "COMPLETED"})
+
+        assert _statuses(Session, logs[:1]) == ["PROCESSING"]
+        writer.flush()
+        assert _statuses(Session, logs[:1]) == ["COMPLETED"]
+
+    def test_updates_are_merged_and_written_in_one_batch(self, Session, logs):
+        repo = _CountingRepo()
+        writer = _writer(Session, repo)
+        writer.submit(logs[0], {"batch_id": "b-s1"})
+        writer.submit(logs[0], {"status": "COMPLETED"})
+        writer.submit(logs[1], {"status": "FAILED"})
+        writer.flush()
+        writer.flush()
+
+        assert repo.batches == [{
+            logs[0]: {"batch_id": "b-s1", "status": "COMPLETED"},
+            logs[1]: {"status": "FAILED"},
+        }]
+        with Session() as db:
+            assert db.get(TranscriptionLog, uuid.UUID(logs[0])).batch_id == "b-s1"
+
+    def test_failed_batch_falls_back_to_per_log_writes(self, Session, logs):
+        repo = _CountingRepo(fail_with=[logs[1]])
+        writer = _writer(Session, repo)
+        for task_uuid in logs:
+            writer.submit(task_uuid, {"status": "COMPLETED"})
+        writer.flush()
+
+        assert len(repo.batches) == 4
+        assert _statuses(Session, logs) == ["COMPLETED"] * 3
+
+    def test_background_flusher_writes_when_batch_is_full(self, Session, logs):
+        written = threading.Event()
+
+        class _Repo(TranscriptionLogRepository):
+            def apply_updates(self, db, updates):
+                missing = super().apply_updates(db, updates)
+                written.set()
+                return missing
+
+        writer = TranscriptionLogWriter(Session, repo=_Repo(), flush_interval_seconds=60, max_batch_size=2)
+        writer.submit(logs[0], {"status": "COMPLETED"})
+        writer.submit(logs[1], {"status": "COMPLETED"})
+
+        assert written.wait(2)
+        assert _statuses(Session, logs[:2]) == ["COMPLETED", "COMPLETED"]
@@ -0,0 +1,155 @@
+"""
+單元測試：Gemini RPM / TPM 限流器
+測試範圍：provider/google/rate_limiter.py 的 estimate_request_tokens、limit_for、
+_LocalBucketStore 與 GeminiRateLimiter，以及 client_pool.GeminiClientPool.key_for_client
+以可控時鐘與假的 sleep 驗證 bucket 回補、等待、逾時與 Redis 失效時的退路
+"""
+import pytest
+
+from app.exceptions import GeminiTransientError
+from app.provider.google import rate_limiter
+from app.provider.google.client_pool import GeminiClientPool
+from app.provider.google.rate_limiter import (
+    BATCHES_BUCKET,
+    FILES_BUCKET,
+    GeminiRateLimiter,
+    RateLimit,
+    _LocalBucketStore,
+    estimate_request_tokens,
+    limit_for,
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+def _limiter(clock, limit, store=None, max_wait=300.0):
+    return GeminiRateLimiter(
+        store if store is not None else _LocalBucketStore(clock),
+        fallback_store=_LocalBucketStore(clock),
+        max_wait_seconds=max_wait,
+        limit_resolver=lambda model: limit,
+        sleep=clock.sleep,
+        clock=clock,
+    )
+
+
+class TestEstimateRequestTokens:
+    def test_prompt_and_audio(self):
+        assert estimate_request_tokens("x" * 400, audio_seconds=10) == 100 + 320
+
+    def test_without_audio(self):
+        assert estimate_request_tokens("x" * 8) == 2
+        assert estimate_request_tokens() == 0
+
+
+class TestLimitFor:
+    def test_defaults(self, monkeypatch):
+        monkeypatch.setattr(rate_limiter, "GEMINI_MODEL_RATE_LIMITS", {})
+        monkeypatch.setattr(rate_limiter, "GEMINI_RPM_LIMIT", 100)
+        monkeypatch.setattr(rate_limiter, "GEMINI_TPM_LIMIT", 5000)
+        assert limit_for("gemini-2.5-flash") == RateLimit(rpm=100, tpm=5000)
+        # 上傳與批次建立只計請求數
+        assert limit_for(FILES_BUCKET) == RateLimit(rpm=100)
+        assert limit_for(BATCHES_BUCKET) == RateLimit(rpm=100)
+
+    def test_model_override(self, monkeypatch):
+        monkeypatch.setattr(
+            rate_limiter, "GEMINI_MODEL_RATE_LIMITS", {"gemini-2.5-pro": {"rpm": 150, "tpm": 2000000}})
+        assert limit_for("gemini-2.5-pro") == RateLimit(rpm=150, tpm=2000000)
+
+
+class TestLocalBucketStore:
+    def test_burst_up_to_capacity_then_waits(self, clock):
+        store = _LocalBucketStore(clock)
+        limit = RateLimit(rpm=60)
+        assert [store.take("b", limit, 1, 0) for _ in range(60)] == [0.0] * 60
+        assert store.take("b", limit, 1, 0) == pytest.approx(1.0)
+
+        clock.now += 1.0
+        assert store.take("b", limit, 1, 0) == 0.0
+
+    def test_token_bucket_waits_for_refill(self, clock):
+        store = _LocalBucketStore(clock)
+        limit = RateLimit(rpm=1000, tpm=600)
+        assert store.take("b", limit, 1, 500) == 0.0
+        # 剩 100，需要 300：缺 200，每秒回補 10
+        assert store.take("b", limit, 1, 300) == pytest.approx(20.0)
+
+    def test_buckets_are_independent(self, clock):
+        store = _LocalBucketStore(clock)
+        limit = RateLimit(rpm=1)
+        assert store.take("a", limit, 1, 0) == 0.0
+        assert store.take("b", limit, 1, 0) == 0.0
+        assert store.take("a", limit, 1, 0) > 0
+
+
+class TestGeminiRateLimiter:
+    def test_paces_requests(self, clock):
+        limiter = _limiter(clock, RateLimit(rpm=60))
+        for _ in range(60):
+            assert limiter.acquire("key", "m") == 0.0
+
+        assert limiter.acquire("key", "m") == pytest.approx(1.0)
+        assert clock.slept == [pytest.approx(1.0)]
+
+    def test_keys_have_separate_buckets(self, clock):
+        limiter = _limiter(clock, RateLimit(rpm=1))
+        limiter.acquire("key-a", "m")
+        assert limiter.acquire("key-b", "m") == 0.0
+        assert clock.slept == []
+
+    def test_waits_for_tokens(self, clock):
+        limiter = _limiter(clock, RateLimit(rpm=100, tpm=6000))
+        limiter.acquire("key", "m", tokens=6000)
+        assert limiter.acquire("key", "m", tokens=300) == pytest.approx(3.0)
+
+    def test_oversized_request_is_clamped_to_capacity(self, clock):
+        limiter = _limiter(clock, RateLimit(rpm=100, tpm=1000))
+        assert limiter.acquire("key", "m", tokens=50000) == 0.0
+
+    def test_exceeding_max_wait_raises_transient(self, clock):
+        limiter = _limiter(clock, RateLimit(rpm=1), max_wait=10)
+        limiter.acquire("key", "m")
+        with pytest.raises(GeminiTransientError):
+            limiter.acquire("key", "m")
+        assert clock.slept == []
+
+    def test_unlimited_skips_store(self, clock):
+        class _Boom:
+            def take(self, *a):
+                raise AssertionError("不應查詢 bucket")
+
+        assert _limiter(clock, RateLimit(rpm=0), store=_Boom()).acquire("key", "m") == 0.0
+
+    def test_store_error_falls_back_to_local_bucket(self, clock):
+        class _Down:
+            def take(self, *a):
+                raise ConnectionError("redis down")
+
+        limiter = _limiter(clock, RateLimit(rpm=1), store=_Down())
+        assert limiter.acquire("key", "m") == 0.0
+        assert limiter.acquire("key", "m") == pytest.approx(60.0)
+
+
+class TestKeyForClient:
+    def test_reverse_lookup(self):
+        pool = GeminiClientPool(client_factory=lambda key: object())
+        client = pool.get_client("k1")
+        assert pool.key_for_client(client) == "k1"
+        assert pool.key_for_client(object()) is None
@@ -0,0 +1,142 @@
+"""
+單元測試：狀態訊息合併
+測試範圍：celery/notifier.py 的 _StatusCoalescer
+PROCESSING 依 (client_id, file_uid) 在視窗內只送出最新一筆，其他狀態立即且依序送出
+以假的時鐘與 send 函式驗證，不啟動背景 flusher
+"""
+import threading
+import time
+
+import pytest
+
+from app.celery.notifier import _StatusCoalescer
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _msg(text, status_code="PROCESSING", client_id="batch-1", file_uid=None):
+    message = {"client_id": client_id, "status_code": status_code, "status_text": text}
+    if file_uid:
+        message["file_uid"] = file_uid
+    return message
+
+
+@pytest.fixture
+def env(monkeypatch):
+    clock = _Clock()
+    sent = []
+
+    def send(message):
+        sent.append(message)
+        return f"{len(sent)}-0"
+
+    coalescer = _StatusCoalescer(send, window_seconds=1.0, clock=clock)
+    monkeypatch.setattr(coalescer, "_ensure_flusher", lambda: None)
+    return coalescer, clock, sent
+
+
+def _texts(sent):
+    return [m["status_text"] for m in sent]
+
+
+class TestCoalescing:
+    def test_first_progress_is_sent_immediately(self, env):
+        coalescer, _, sent = env
+        assert coalescer.publish(_msg("a")) == "1-0"
+        assert _texts(sent) == ["a"]
+
+    def test_only_latest_progress_within_window_is_sent(self, env):
+        coalescer, clock, sent = env
+        coalescer.publish(_msg("p1"))
+        for text in ("p2", "p3", "p4"):
+            clock.now += 0.2
+            assert coalescer.publish(_msg(text)) is None
+
+        coalescer.flush_due()
+        assert _texts(sent) == ["p1"]
+        clock.now += 0.4
+        coalescer.flush_due()
+        assert _texts(sent) == ["p1", "p4"]
+
+    def test_keys_are_per_client_and_file(self, env):
+        coalescer, _, sent = env
+        coalescer.publish(_msg("f1", file_uid="f1"))
+        coalescer.publish(_msg("f2", file_uid="f2"))
+        coalescer.publish(_msg("other", client_id="batch-2", file_uid="f1"))
+        assert _texts(sent) == ["f1", "f2", "other"]
+
+    def test_progress_after_window_is_sent_immediately(self, env):
+        coalescer, clock, sent = env
+        coalescer.publish(_msg("p1"))
+        clock.now += 1.0
+        coalescer.publish(_msg("p2"))
+        assert _texts(sent) == ["p1", "p2"]
+
+    def test_disabled_window_sends_everything(self):
+        sent = []
+        coalescer = _StatusCoalescer(sent.append, window_seconds=0)
+        for text in ("a", "b", "c"):
+            coalescer.publish(_msg(text))
+        assert _texts(sent) == ["a", "b", "c"]
+
+
+class TestTerminalMessages:
+    def test_terminal_is_immediate_and_drops_superseded_progress(self, env):
+        coalescer, clock, sent = env
+        coalescer.publish(_msg("p1", file_uid="f1"))
+        coalescer.publish(_msg("p2", file_uid="f1"))
+        assert coalescer.publish(_msg("done", "COMPLETED", file_uid="f1")) == "2-0"
+
+        clock.now += 5
+        coalescer.flush_due()
+        assert _texts(sent) == ["p1", "done"]
+
+    def test_pending_progress_of_other_files_is_flushed_first(self, env):
+        coalescer, clock, sent = env
+        coalescer.publish(_msg("f2 p1", file_uid="f2"))
+        coalescer.publish(_msg("f2 p2", file_uid="f2"))
+        coalescer.publish(_msg("batch done", "BATCH_COMPLETED"))
+
+        clock.now += 5
+        coalescer.flush_due()
+        # 最終狀態之後不會再冒出較舊的進度
+        assert _texts(sent) == ["f2 p1", "f2 p2", "batch done"]
+
+    def test_terminal_messages_are_never_coalesced(self, env):
+        coalescer, _, sent = env
+        coalescer.publish(_msg("f1", "FAILED", file_uid="f1"))
+        coalescer.publish(_msg("f2", "COMPLETED", file_uid="f2"))
+        coalescer.publish(_msg("all", "BATCH_COMPLETED"))
+        assert _texts(sent) == ["f1", "f2", "all"]
+
+    def test_progress_after_terminal_starts_fresh(self, env):
+        coalescer, _, sent = env
+        coalescer.publish(_msg("p1"))
+        coalescer.publish(_msg("submitted", "BATCH_SUBMITTED"))
+        coalescer.publish(_msg("p2"))
+        assert _texts(sent) == ["p1", "submitted", "p2"]
+
+
+class TestFlusher:
+    def test_background_flusher_sends_trailing_progress(self):
+        sent = []
+        done = threading.Event()
+
+        def send(message):
+            sent.append(message)
+            if len(sent) == 2:
+                done.set()
+
+        coalescer = _StatusCoalescer(send, window_seconds=0.05, clock=time.monotonic)
+        coalescer.publish(_msg("p1"))
+        coalescer.publish(_msg("p2"))
+        coalescer.publish(_msg("p3"))
+
+        assert done.wait(2)
+        assert _texts(sent) == ["p1", "p3"]
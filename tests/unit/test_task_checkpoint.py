@@ -0,0 +1,307 @@
+"""
+單元測試：單檔轉錄的階段 checkpoint
+測試範圍：services/transcription/checkpoint.py 的 _RedisCheckpointStore（假的 Redis client）與 TaskCheckpoint，
+以及 flows.TranscriptionTask 在重試時沿用切塊 / 片段轉錄結果、暫時性錯誤不被吞掉、
+即將重試時保留本地暫存檔，與 CPU 佇列 prepare() 寫入的前處理結果交給轉錄階段沿用；
+celery/task.py 的 preprocess_media_task 在快取已有結果時略過 VAD 且不累計命中統計
+以假的上傳與 generate 函式模擬第一次嘗試中途遇到 GeminiTransientError
+"""
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.celery import task as task_module
+from app.exceptions import GeminiTransientError
+from app.services.transcription import flows
+from app.services.transcription.cache import CachedTranscript, TranscriptCache, _RedisTranscriptStore
+from app.services.transcription.checkpoint import _KEY_PREFIX, TaskCheckpoint, _RedisCheckpointStore
+from app.services.transcription.flows import TranscriptionTask
+from tests.unit.fake_redis import FakeRedis
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _store(clock=None, ttl_seconds=3600):
+    return _RedisCheckpointStore(FakeRedis(clock or _Clock()), ttl_seconds=ttl_seconds)
+
+
+class TestRedisCheckpointStore:
+    def test_stages_share_one_hash(self):
+        store = _store()
+        store.set("t1", "log", "true")
+        store.set("t1", "duration", "12.5")
+        assert store.get("t1", "log") == "true"
+        assert store.get("t1", "duration") == "12.5"
+        assert store.get("t1", "chunks:a.wav") is None
+        assert store._redis.hgetall(f"{_KEY_PREFIX}t1") == {b"log": b"true", b"duration": b"12.5"}
+
+    def test_stages_expire_together(self):
+        clock = _Clock()
+        store = _store(clock, ttl_seconds=60)
+        store.set("t1", "log", "true")
+        clock.now += 50
+        store.set("t1", "duration", "12.5")
+        # 每次寫入都延長整個任務的 TTL
+        assert store._redis.ttl(f"{_KEY_PREFIX}t1") == 60
+        clock.now += 50
+        assert store.get("t1", "log") == "true"
+        clock.now += 11
+        assert store.get("t1", "log") is None
+        assert store.get("t1", "duration") is None
+
+    def test_delete_only_affects_one_task(self):
+        store = _store()
+        store.set("t1", "log", "true")
+        store.set("t2", "log", "true")
+        store.delete("t1")
+        assert store.get("t1", "log") is None
+        assert store.get("t2", "log") == "true"
+
+
+class TestTaskCheckpoint:
+    def test_json_round_trip_and_clear(self):
+        checkpoint = TaskCheckpoint(_store(), "t1")
+        checkpoint.set("vad:a.wav", {"segments": [{"start": 0.0, "end": 1.5}]})
+        assert checkpoint.get("vad:a.wav") == {"segments": [{"start": 0.0, "end": 1.5}]}
+        assert checkpoint.get("missing") is None
+
+        checkpoint.clear()
+        assert checkpoint.get("vad:a.wav") is None
+
+    def test_disabled_without_store_or_task_id(self):
+        for checkpoint in (TaskCheckpoint(None, "t1"), TaskCheckpoint(_store(), None)):
+            checkpoint.set("log", True)
+            assert not checkpoint.enabled
+            assert checkpoint.get("log") is None
+
+    def test_store_errors_are_ignored(self):
+        class _Down:
+            def get(self, task_id, stage):
+                raise ConnectionError("redis down")
+
+            def set(self, task_id, stage, value):
+                raise ConnectionError("redis down")
+
+            def delete(self, task_id):
+                raise ConnectionError("redis down")
+
+        checkpoint = TaskCheckpoint(_Down(), "t1")
+        checkpoint.set("log", True)
+        checkpoint.clear()
+        assert checkpoint.get("log") is None
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """假的上傳 / generate：fail 內的檔名第一次呼叫時拋出暫時性錯誤"""
+    state = SimpleNamespace(calls=[], fail=set(), released=[])
+
+    def transcribe(client, gemini_file, model, prompt, service_tier=None, audio_seconds=None):
+        name = gemini_file.name
+        state.calls.append(name)
+        if name in state.fail:
+            state.fail.discard(name)
+            raise GeminiTransientError("503 UNAVAILABLE")
+        return {"success": True, "text": f"[00:01.00]{Path(name).stem}", "total_tokens": 10}
+
+    monkeypatch.setattr(flows, "encode_for_upload", lambda path, *args: path)
+    monkeypatch.setattr(flows, "acquire_gemini_file",
+                        lambda path, client, cb=None: SimpleNamespace(name=path.name))
+    monkeypatch.setattr(flows, "release_gemini_file",
+                        lambda client, gemini_file: state.released.append(gemini_file.name))
+    monkeypatch.setattr(flows, "transcribe_with_uploaded_file", transcribe)
+    return state
+
+
+def _task(tmp_path, checkpoint):
+    task = TranscriptionTask(
+        client=MagicMock(),
+        model="gemini-2.5-flash",
+        prompt="prompt",
+        temp_dir=tmp_path,
+        checkpoint=checkpoint,
+    )
+    task.vad_service = MagicMock()
+    task.chunk_target_seconds = 600
+    task.chunk_concurrency = 1
+    return task
+
+
+class TestTranscriptionTaskResume:
+    def test_transient_error_is_not_swallowed(self, tmp_path, gemini):
+        wav = tmp_path / "a.wav"
+        wav.touch()
+        gemini.fail.add("a.wav")
+        task = _task(tmp_path, TaskCheckpoint(_store(), "t1"))
+
+        with pytest.raises(GeminiTransientError):
+            task._attempt_transcription(wav)
+
+    def test_successful_result_is_reused(self, tmp_path, gemini):
+        wav = tmp_path / "a.wav"
+        wav.touch()
+        checkpoint = TaskCheckpoint(_store(), "t1")
+
+        first = _task(tmp_path, checkpoint)._attempt_transcription(wav)
+        again = _task(tmp_path, checkpoint)._attempt_transcription(wav)
+
+        assert again == first
+        assert gemini.calls == ["a.wav"]
+
+    def test_retry_resumes_at_failed_chunk(self, tmp_path, gemini):
+        wav = tmp_path / "long.wav"
+        wav.touch()
+        specs = []
+        for i in range(3):
+            chunk = tmp_path / f"long.chunk0{i + 1}.wav"
+            chunk.touch()
+            specs.append((str(chunk), i * 600.0, (i + 1) * 600.0))
+        gemini.fail.add("long.chunk02.wav")
+        checkpoint = TaskCheckpoint(_store(), "t1")
+
+        first = _task(tmp_path, checkpoint)
+        first.vad_service.split_audio_into_chunks.return_value = specs
+        first.transcribe_audio = lambda path, allow_chunking=True: first._attempt_transcription(path)
+        with pytest.raises(GeminiTransientError):
+            first._transcribe_in_chunks(wav, 1800.0)
+        first.cleanup(keep_local_files=True)
+        assert all(Path(path).exists() for path, _, _ in specs)
+
+        retry = _task(tmp_path, checkpoint)
+        retry.transcribe_audio = lambda path, allow_chunking=True: retry._attempt_transcription(path)
+        result = retry._transcribe_in_chunks(wav, 1800.0)
+
+        retry.vad_service.split_audio_into_chunks.assert_not_called()
+        # 第一次嘗試中其他片段仍會完成；重試只重新轉錄失敗的片段
+        assert sorted(gemini.calls) == [
+            "long.chunk01.wav", "long.chunk02.wav", "long.chunk02.wav", "long.chunk03.wav"]
+        assert result.success is True
+        assert result.text.splitlines() == [
+            "[00:01.00]long.chunk01",
+            "[10:01.00]long.chunk02",
+            "[20:01.00]long.chunk03",
+        ]
+        assert result.total_tokens == 30
+
+    def test_vad_result_is_reused(self, tmp_path, gemini, monkeypatch):
+        wav = tmp_path / "a.wav"
+        speech = tmp_path / "a_speech.wav"
+        wav.touch()
+        speech.touch()
+        checkpoint = TaskCheckpoint(_store(), "t1")
+        checkpoint.set("vad:a.wav", {
+            "speech_only_path": str(speech),
+            "segments": [{"start": 1.0, "end": 2.0}],
+            "speech_ratio": 0.4,
+            "speech_duration": 1.0,
+            "cleanup_files": [str(speech)],
+        })
+        monkeypatch.setattr(flows, "run_vad_extraction",
+                            lambda *a, **k: pytest.fail("不應重新執行 VAD"))
+
+        task = _task(tmp_path, checkpoint)
+        vad_result = task._extract_speech_only(wav)
+
+        assert vad_result["speech_only_path"] == str(speech)
+        assert speech in task.local_cleanup_list
+
+    def test_keep_local_files_only_releases_gemini_files(self, tmp_path, gemini):
+        temp_dir = tmp_path / "temp_uploads"
+        temp_dir.mkdir()
+        wav = temp_dir / "a.wav"
+        wav.touch()
+        task = _task(temp_dir, TaskCheckpoint(_store(), "t1"))
+        task.original_file = wav
+        task._attempt_transcription(wav)
+
+        task.cleanup(keep_local_files=True)
+        assert wav.exists()
+        assert gemini.released == ["a.wav"]
+
+        task.cleanup()
+        assert not wav.exists()
+        assert gemini.released == ["a.wav"]
+
+
+class TestPrepare:
+    def test_prepare_writes_chunks_and_vad_for_transcription_stage(self, tmp_path, gemini, monkeypatch):
+        wav = tmp_path / "long.wav"
+        wav.touch()
+        specs = []
+        for i in range(2):
+            chunk = tmp_path / f"long.chunk0{i + 1}.wav"
+            chunk.touch()
+            specs.append((str(chunk), i * 600.0, (i + 1) * 600.0))
+        vad_calls = []
+
+        def fake_vad(path, temp_dir, vad_service, asset=None):
+            vad_calls.append(Path(path).name)
+            speech = tmp_path / f"{Path(path).stem}_speech.wav"
+            speech.touch()
+            return SimpleNamespace(
+                success=True, speech_only_path=speech, segments=[{"start": 0.0, "end": 600.0}],
+                speech_ratio=1.0, speech_duration=600.0, cleanup_files=[speech])
+
+        monkeypatch.setattr(flows, "run_vad_extraction", fake_vad)
+        monkeypatch.setattr(flows, "persist_speech_extraction", lambda **kwargs: None)
+        checkpoint = TaskCheckpoint(_store(), "t1")
+
+        cpu = _task(tmp_path, checkpoint)
+        cpu._get_audio_duration = lambda path: 1200.0
+        cpu.vad_service.split_audio_into_chunks.return_value = specs
+        cpu.prepare(wav)
+
+        assert vad_calls == ["long.chunk01.wav", "long.chunk02.wav"]
+        assert gemini.calls == []
+
+        io = _task(tmp_path, checkpoint)
+        io._get_audio_duration = lambda path: 1200.0 if path == wav else 600.0
+        monkeypatch.setattr(flows, "run_vad_extraction",
+                            lambda *a, **k: pytest.fail("轉錄階段不應重新執行 VAD"))
+        result = io.transcribe_audio(wav)
+
+        io.vad_service.split_audio_into_chunks.assert_not_called()
+        assert sorted(gemini.calls) == ["long.chunk01.wav", "long.chunk02.wav"]
+        assert result.success is True
+
+    def test_prepare_is_noop_without_checkpoint(self, tmp_path, gemini, monkeypatch):
+        wav = tmp_path / "a.wav"
+        wav.touch()
+        monkeypatch.setattr(flows, "run_vad_extraction", lambda *a, **k: pytest.fail("不應執行 VAD"))
+        _task(tmp_path, TaskCheckpoint(None, None)).prepare(wav)
+
+
+class TestPreprocessMediaTask:
+    def test_cached_transcript_skips_vad_without_counting(self, tmp_path, monkeypatch):
+        audio = tmp_path / "a.wav"
+        audio.touch()
+        checkpoint = TaskCheckpoint(_store(), "t1")
+        cache = TranscriptCache(_RedisTranscriptStore(FakeRedis()))
+        params = {
+            "file_path": str(audio), "provider": "google", "model": "m", "api_keys": "key",
+            "source_lang": "zh-TW", "original_filename": "a.wav", "client_id": "c", "file_uid": "u",
+        }
+        monkeypatch.setattr(task_module, "get_task_checkpoint", lambda task_id: checkpoint)
+        monkeypatch.setattr(task_module, "get_transcript_cache", lambda: cache)
+        monkeypatch.setattr(task_module, "AudioAsset", SimpleNamespace(
+            open=lambda path, temp_dir: SimpleNamespace(duration=12.5)))
+        monkeypatch.setattr(task_module, "audio_fingerprint", lambda path, asset: "pcm:a")
+        monkeypatch.setattr(task_module, "_build_user_prompt", lambda params: "prompt")
+        monkeypatch.setattr(task_module, "publish_status", lambda *a, **k: None)
+        monkeypatch.setattr(task_module, "TranscriptionTask", lambda **kwargs: pytest.fail("不應執行 VAD"))
+        cache.put(task_module.transcript_cache_key("pcm:a", "m", "prompt", None),
+                  CachedTranscript(lrc_text="[00:01.00]hi", total_tokens=15))
+
+        task_module.preprocess_media_task.run(params, "t1")
+
+        assert checkpoint.get("duration") == 12.5
+        # 命中統計只在轉錄任務實際取用時累計，不因前處理的檢查重複計算
+        assert cache.stats() == {"entries": 1}
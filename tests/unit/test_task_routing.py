@@ -0,0 +1,98 @@
+"""
+單元測試：Celery 佇列路由與單檔轉錄 canvas
+測試範圍：celery/celery.py 的 task_routes（前處理走 CPU 佇列、其他任務走 I/O 佇列），
+celery/task.py 的 enqueue_transcription 組出 前處理 → 轉錄 的 chain，
+以及 celery/batch_task.py 的 enqueue_batch_transcription 同時派送 前處理 group 與 提交任務
+以假的 chain / group 記錄簽章，不需實際 broker
+"""
+from app.celery import batch_task
+from app.celery import task as task_module
+from app.celery.celery import celery_app
+from app.core.config import get_settings
+
+
+def _queue_for(task_name: str) -> str:
+    route = celery_app.amqp.router.route({}, task_name)
+    return route["queue"].name
+
+
+class TestQueueRouting:
+    def test_preprocess_goes_to_cpu_queue(self):
+        cpu_queue = get_settings().celery_cpu_queue
+        assert _queue_for("app.celery.task.preprocess_media_task") == cpu_queue
+        assert _queue_for("app.celery.batch_task.batch_preprocess_file_task") == cpu_queue
+
+    def test_network_bound_tasks_go_to_io_queue(self):
+        io_queue = get_settings().celery_io_queue
+        for name in (
+            "app.celery.task.transcribe_media_task",
+            "app.celery.batch_task.batch_transcribe_task",
+            "poll_gemini_batches",
+        ):
+            assert _queue_for(name) == io_queue
+
+
+class TestEnqueueTranscription:
+    def test_chains_preprocess_into_transcription_with_shared_task_id(self, monkeypatch):
+        applied = []
+
+        class _Chain:
+            def __init__(self, *signatures):
+                self.signatures = signatures
+
+            def apply_async(self):
+                applied.append(self.signatures)
+
+        monkeypatch.setattr(task_module, "chain", _Chain)
+        monkeypatch.setattr(task_module, "TRANSCRIPTION_CHECKPOINT_ENABLED", True)
+
+        task_id = task_module.enqueue_transcription({"file_uid": "f1"})
+
+        (preprocess, transcribe), = applied
+        assert preprocess.task == "app.celery.task.preprocess_media_task"
+        # 前處理寫入的 checkpoint 以轉錄任務的 task id 為 key
+        assert tuple(preprocess.args) == ({"file_uid": "f1"}, task_id)
+        assert transcribe.task == "app.celery.task.transcribe_media_task"
+        assert transcribe.options["task_id"] == task_id
+        assert preprocess.immutable and transcribe.immutable
+
+    def test_without_checkpoint_runs_transcription_directly(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(task_module, "TRANSCRIPTION_CHECKPOINT_ENABLED", False)
+        monkeypatch.setattr(task_module.transcribe_media_task, "apply_async",
+                            lambda args, task_id: calls.append((args, task_id)))
+
+        task_id = task_module.enqueue_transcription({"file_uid": "f1"})
+
+        assert calls == [(({"file_uid": "f1"},), task_id)]
+
+
+class TestEnqueueBatchTranscription:
+    def test_dispatches_preprocess_group_alongside_submit_task(self, monkeypatch):
+        groups, submitted = [], []
+
+        class _Group:
+            def __init__(self, tasks):
+                self.tasks = list(tasks)
+
+            def apply_async(self):
+                groups.append(self.tasks)
+
+        monkeypatch.setattr(batch_task, "group", _Group)
+        monkeypatch.setattr(batch_task.batch_transcribe_task, "apply_async",
+                            lambda args, task_id: submitted.append((args, task_id)))
+        files = [{"file_uid": "f1"}, {"file_uid": "f2"}]
+        params = {"batch_id": "b1", "files": files}
+
+        task_id = batch_task.enqueue_batch_transcription(params)
+
+        (header,) = groups
+        assert [sig.task for sig in header] == ["app.celery.batch_task.batch_preprocess_file_task"] * 2
+        # 前處理任務以提交任務的 task id 推送狀態
+        assert [tuple(sig.args) for sig in header] == [(f, "b1", task_id) for f in files]
+        assert all(sig.immutable for sig in header)
+        # 提交任務不等 group 完成，依前處理任務的 task id（與 files 同順序）逐檔取用結果
+        ((preprocess_task_ids, submitted_params), submitted_id), = submitted
+        assert preprocess_task_ids == [sig.options["task_id"] for sig in header]
+        assert submitted_params is params
+        assert submitted_id == task_id
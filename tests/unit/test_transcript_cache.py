@@ -0,0 +1,189 @@
+"""
+單元測試：轉錄結果快取
+測試範圍：services/transcription/cache.py 的 transcript_cache_key、audio_fingerprint、
+_RedisTranscriptStore 與 TranscriptCache，以及 utils/audio.py 的 AudioAsset.sha256
+以假的 Redis client 與可控時鐘驗證 TTL（命中時延長）/ LRU 淘汰與命中統計，以 stdlib wave 產生測試音檔
+"""
+import wave
+
+import numpy as np
+import pytest
+
+from app.services.transcription.cache import (
+    CachedTranscript,
+    TranscriptCache,
+    _ENTRY_PREFIX,
+    _LRU_KEY,
+    _RedisTranscriptStore,
+    audio_fingerprint,
+    transcript_cache_key,
+)
+from app.utils.audio import AudioAsset
+from tests.unit.fake_redis import FakeRedis
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return _Clock()
+
+
+@pytest.fixture
+def redis_client(clock):
+    return FakeRedis(clock)
+
+
+@pytest.fixture
+def make_store(redis_client, clock):
+    def make(max_entries=10, ttl_seconds=60):
+        return _RedisTranscriptStore(redis_client, max_entries=max_entries, ttl_seconds=ttl_seconds, clock=clock)
+    return make
+
+
+def _write_wav(path, samples):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(16000)
+        w.writeframes(samples.astype("<i2").tobytes())
+
+
+class TestTranscriptCacheKey:
+    def test_every_component_changes_the_key(self):
+        base = transcript_cache_key("pcm:a", "m", "prompt", "flex")
+        assert transcript_cache_key("pcm:a", "m", "prompt", "flex") == base
+        assert transcript_cache_key("pcm:b", "m", "prompt", "flex") != base
+        assert transcript_cache_key("pcm:a", "m2", "prompt", "flex") != base
+        assert transcript_cache_key("pcm:a", "m", "prompt 2", "flex") != base
+        assert transcript_cache_key("pcm:a", "m", "prompt", "batch") != base
+
+    def test_missing_tier_is_standard(self):
+        assert transcript_cache_key("h", "m", "p") == transcript_cache_key("h", "m", "p", "standard")
+
+
+class TestAudioFingerprint:
+    def test_same_pcm_gives_same_hash(self, tmp_path):
+        samples = np.arange(-1000, 1000, dtype=np.int16)
+        _write_wav(tmp_path / "a.wav", samples)
+        _write_wav(tmp_path / "b.wav", samples)
+        _write_wav(tmp_path / "c.wav", samples[::-1])
+
+        hashes = [
+            audio_fingerprint(tmp_path / name, AudioAsset.open(tmp_path / name))
+            for name in ("a.wav", "b.wav", "c.wav")
+        ]
+        assert hashes[0].startswith("pcm:")
+        assert hashes[0] == hashes[1]
+        assert hashes[0] != hashes[2]
+
+    def test_falls_back_to_file_bytes(self, tmp_path):
+        path = tmp_path / "a.m4a"
+        path.write_bytes(b"not really audio")
+        assert audio_fingerprint(path).startswith("file:")
+
+    def test_missing_file_returns_none(self, tmp_path):
+        assert audio_fingerprint(tmp_path / "missing.m4a") is None
+
+
+class TestRedisTranscriptStore:
+    def test_entries_expire(self, make_store, redis_client, clock):
+        store = make_store(ttl_seconds=60)
+        store.put("k", "v")
+        assert redis_client.ttl(f"{_ENTRY_PREFIX}k") == 60
+
+        clock.now += 61
+        assert store.get("k") is None
+        # 過期的 entry 同時從 LRU 索引移除
+        assert redis_client.zcard(_LRU_KEY) == 0
+
+    def test_hit_refreshes_ttl(self, make_store, redis_client, clock):
+        store = make_store(ttl_seconds=60)
+        store.put("k", "v")
+        clock.now += 50
+        assert store.get("k") == "v"
+        assert redis_client.ttl(f"{_ENTRY_PREFIX}k") == 60
+
+        clock.now += 50
+        assert store.get("k") == "v"
+        clock.now += 61
+        assert store.get("k") is None
+
+    def test_least_recently_used_is_evicted(self, make_store, redis_client, clock):
+        store = make_store(max_entries=2)
+        store.put("a", "1")
+        clock.now += 1
+        store.put("b", "2")
+        clock.now += 1
+        store.get("a")
+        clock.now += 1
+        store.put("c", "3")
+
+        assert redis_client.get(f"{_ENTRY_PREFIX}b") is None
+        assert store.get("a") == "1"
+        assert store.get("b") is None
+        assert store.get("c") == "3"
+        assert store.stats()["entries"] == 2
+
+    def test_put_prunes_expired_entries_from_index(self, make_store, redis_client, clock):
+        store = make_store(max_entries=2, ttl_seconds=60)
+        store.put("old", "1")
+        clock.now += 61
+        store.put("a", "2")
+        store.put("b", "3")
+        # 已過期的 old 先被清掉，不必淘汰仍有效的 a
+        assert store.get("a") == "2"
+        assert redis_client.zcard(_LRU_KEY) == 2
+
+
+class TestTranscriptCache:
+    def test_round_trip_and_counters(self, make_store):
+        cache = TranscriptCache(make_store())
+        assert cache.get("k") is None
+
+        cache.put("k", CachedTranscript(lrc_text="[00:01.00]hi", input_tokens=10, output_tokens=5, total_tokens=15))
+        cached = cache.get("k")
+
+        assert cached == CachedTranscript("[00:01.00]hi", 10, 5, 15)
+        assert cache.stats() == {"hits": 1, "misses": 1, "tokens_saved": 15, "entries": 1}
+
+    def test_contains_does_not_count_or_touch(self, make_store, redis_client, clock):
+        cache = TranscriptCache(make_store())
+        cache.put("k", CachedTranscript(lrc_text="[00:01.00]hi", total_tokens=15))
+        score = redis_client.zscore(_LRU_KEY, "k")
+        clock.now += 10
+
+        assert cache.contains("k")
+        assert not cache.contains("other")
+        assert cache.stats() == {"entries": 1}
+        assert redis_client.zscore(_LRU_KEY, "k") == score
+
+    def test_empty_lrc_is_not_cached(self, make_store):
+        cache = TranscriptCache(make_store())
+        cache.put("k", CachedTranscript(lrc_text=""))
+        assert cache.get("k") is None
+
+    def test_disabled_cache(self):
+        cache = TranscriptCache(None)
+        cache.put("k", CachedTranscript(lrc_text="x"))
+        assert not cache.enabled
+        assert cache.get("k") is None
+        assert cache.stats() == {}
+
+    def test_store_errors_are_misses(self):
+        class _Down:
+            def get(self, key):
+                raise ConnectionError("redis down")
+
+            def put(self, key, value):
+                raise ConnectionError("redis down")
+
+        cache = TranscriptCache(_Down())
+        cache.put("k", CachedTranscript(lrc_text="x"))
+        assert cache.get("k") is None
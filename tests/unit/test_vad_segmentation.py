@@ -0,0 +1,132 @@
+"""
+單元測試：VAD 有聲區段切割
+測試範圍：vad/flows.py 的 _speech_timestamps_from_mask
+向量化版本需與原本逐幀 for 迴圈版本（_legacy_speech_timestamps）輸出完全相同
+"""
+import numpy as np
+import pytest
+
+from app.services.vad.flows import _runs, _speech_timestamps_from_mask
+
+FRAME_LENGTH_S = 0.05
+MIN_SILENCE_FRAMES = int(1.0 / FRAME_LENGTH_S)
+MIN_SPEECH_FRAMES = int(0.1 / FRAME_LENGTH_S)
+
+
+def _legacy_speech_timestamps(is_speech, total_duration):
+    """重構前 extract_speech_segments 內的逐幀迴圈實作（作為對照組）。"""
+    is_speech = is_speech.copy()
+    frame_length_s = FRAME_LENGTH_S
+    min_silence_frames = MIN_SILENCE_FRAMES
+    min_speech_frames = MIN_SPEECH_FRAMES
+
+    current_silence = 0
+    for i in range(len(is_speech)):
+        if not is_speech[i]:
+            current_silence += 1
+        else:
+            if 0 < current_silence < min_silence_frames:
+                is_speech[i-current_silence:i] = True
+            current_silence = 0
+
+    speech_timestamps = []
+    is_in_speech = False
+    start_frame = 0
+    for i, speech_flag in enumerate(is_speech):
+        if speech_flag and not is_in_speech:
+            start_frame = i
+            is_in_speech = True
+        elif not speech_flag and is_in_speech:
+            end_frame = i
+            if end_frame - start_frame >= min_speech_frames:
+                start_time = max(0.0, start_frame * frame_length_s - 0.3)
+                end_time = min(total_duration, end_frame * frame_length_s + 0.3)
+                speech_timestamps.append({'start': float(start_time), 'end': float(end_time)})
+            is_in_speech = False
+
+    if is_in_speech:
+        end_frame = len(is_speech)
+        if end_frame - start_frame >= min_speech_frames:
+            start_time = max(0.0, start_frame * frame_length_s - 0.3)
+            end_time = float(total_duration)
+            speech_timestamps.append({'start': start_time, 'end': end_time})
+
+    merged_timestamps = []
+    for ts in speech_timestamps:
+        if not merged_timestamps:
+            merged_timestamps.append(ts)
+        else:
+            last_ts = merged_timestamps[-1]
+            if ts['start'] <= last_ts['end']:
+                last_ts['end'] = max(last_ts['end'], ts['end'])
+            else:
+                merged_timestamps.append(ts)
+    return merged_timestamps
+
+
+def _vectorized(is_speech, total_duration):
+    return _speech_timestamps_from_mask(
+        is_speech,
+        frame_length_s=FRAME_LENGTH_S,
+        total_duration=total_duration,
+        min_silence_frames=MIN_SILENCE_FRAMES,
+        min_speech_frames=MIN_SPEECH_FRAMES,
+    )
+
+
+def _bursty_mask(rng, num_frames):
+    """產生長短不一的有聲/靜音交錯遮罩，涵蓋短靜音、極短有聲與長靜音。"""
+    runs = []
+    flag = bool(rng.integers(0, 2))
+    while sum(runs) < num_frames:
+        runs.append(int(rng.choice([1, 2, 3, 10, 19, 20, 21, 60, 200])))
+    mask = np.zeros(sum(runs), dtype=bool)
+    pos = 0
+    for length in runs:
+        mask[pos:pos + length] = flag
+        pos += length
+        flag = not flag
+    return mask[:num_frames]
+
+
+class TestSpeechTimestampsFromMask:
+    def test_empty_mask_returns_empty(self):
+        starts, ends = _runs(np.zeros(0, dtype=bool))
+        assert starts.size == 0 and ends.size == 0
+        assert _vectorized(np.zeros(0, dtype=bool), 0.0) == []
+
+    def test_all_silence_returns_empty(self):
+        assert _vectorized(np.zeros(100, dtype=bool), 5.0) == []
+
+    def test_all_speech_spans_whole_file(self):
+        assert _vectorized(np.ones(100, dtype=bool), 5.0) == [{'start': 0.0, 'end': 5.0}]
+
+    def test_short_speech_burst_is_dropped(self):
+        mask = np.zeros(100, dtype=bool)
+        mask[50] = True
+        assert _vectorized(mask, 5.0) == []
+
+    def test_short_silence_is_filled(self):
+        mask = np.ones(200, dtype=bool)
+        mask[50:60] = False
+        assert _vectorized(mask, 10.0) == [{'start': 0.0, 'end': 10.0}]
+
+    def test_trailing_silence_is_not_filled(self):
+        mask = np.zeros(200, dtype=bool)
+        mask[:100] = True
+        result = _vectorized(mask, 10.0)
+        assert result == _legacy_speech_timestamps(mask, 10.0)
+        assert result[0]['end'] == pytest.approx(5.3)
+
+    @pytest.mark.parametrize("seed", range(25))
+    def test_matches_legacy_loop_exactly(self, seed):
+        rng = np.random.default_rng(seed)
+        num_frames = int(rng.integers(1, 5000))
+        mask = _bursty_mask(rng, num_frames)
+        total_duration = num_frames * FRAME_LENGTH_S - float(rng.uniform(0, FRAME_LENGTH_S))
+        assert _vectorized(mask, total_duration) == _legacy_speech_timestamps(mask, total_duration)
+
+    def test_matches_legacy_loop_on_random_noise(self):
+        rng = np.random.default_rng(1234)
+        mask = rng.random(20000) > 0.6
+        assert _vectorized(mask, 1000.0) == _legacy_speech_timestamps(mask, 1000.0)
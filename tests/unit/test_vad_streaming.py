@@ -0,0 +1,163 @@
+"""
+單元測試：VAD 串流模式
+測試範圍：vad/flows.py 的 _extract_speech_segments_streaming 與 _stream_block_size
+以記憶體內的假 soundfile / torchaudio 驗證串流模式與整檔模式輸出一致
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.vad import flows
+from app.services.vad.models import VADProcessRequest
+
+SAMPLE_RATE = 8000
+
+
+class _FakeSoundFileWriter:
+    def __init__(self, store, path):
+        self._store = store
+        self._path = path
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(np.array(data, copy=True))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._store[self._path] = np.concatenate(self._chunks) if self._chunks else np.zeros((0, 1))
+        return False
+
+
+class _FakeSoundFileModule:
+    """只實作 flows.py 用到的 soundfile API，資料存在記憶體中。"""
+
+    def __init__(self, sources):
+        self.sources = sources  # {path: (samples[N, C], sr)}
+        self.written = {}
+        self.max_block_len = 0
+
+    def info(self, path):
+        data, sr = self.sources[path]
+        return SimpleNamespace(frames=len(data), channels=data.shape[1], samplerate=sr)
+
+    def blocks(self, path, blocksize, dtype, always_2d):
+        data, _ = self.sources[path]
+        for start in range(0, len(data), blocksize):
+            block = data[start:start + blocksize].astype(dtype)
+            self.max_block_len = max(self.max_block_len, len(block))
+            yield block
+
+    def SoundFile(self, path, mode, samplerate, channels):
+        return _FakeSoundFileWriter(self.written, path)
+
+    def write(self, path, data, sr):
+        self.written[path] = np.array(data, copy=True)
+
+
+class _FakeWaveform:
+    def __init__(self, data):
+        self._data = data.T  # (C, N)
+        self.shape = self._data.shape
+
+    def numpy(self):
+        return self._data
+
+    def squeeze(self, axis):
+        return SimpleNamespace(numpy=lambda: self._data[axis])
+
+
+def _synthetic_audio(seconds, channels, rng):
+    """有聲 / 靜音交錯的合成音訊（float32, shape [N, C]）。"""
+    n = int(seconds * SAMPLE_RATE)
+    audio = np.zeros((n, channels), dtype=np.float32)
+    pos = 0
+    speaking = True
+    while pos < n:
+        length = int(rng.uniform(0.2, 4.0) * SAMPLE_RATE)
+        if speaking:
+            audio[pos:pos + length] = rng.normal(0, 0.2, size=(min(length, n - pos), channels))
+        pos += length
+        speaking = not speaking
+    return audio
+
+
+@pytest.fixture
+def fake_io(monkeypatch):
+    fake_sf = _FakeSoundFileModule({})
+    monkeypatch.setattr(flows, "sf", fake_sf)
+    monkeypatch.setattr(
+        flows.torchaudio, "load",
+        lambda path: (_FakeWaveform(fake_sf.sources[path][0]), fake_sf.sources[path][1]),
+        raising=False,
+    )
+    return fake_sf
+
+
+class TestStreamBlockSize:
+    def test_block_is_multiple_of_frame_length(self):
+        size = flows._stream_block_size(2, 2400, 10 * 1024 * 1024)
+        assert size % 2400 == 0
+
+    def test_tiny_budget_still_reads_one_frame(self):
+        assert flows._stream_block_size(2, 2400, 1) == 2400
+
+    def test_more_channels_means_smaller_blocks(self):
+        budget = 64 * 1024 * 1024
+        assert flows._stream_block_size(2, 800, budget) < flows._stream_block_size(1, 800, budget)
+
+
+class TestStreamingExtraction:
+    @pytest.mark.parametrize("channels", [1, 2])
+    def test_matches_in_memory_mode(self, fake_io, tmp_path, channels):
+        rng = np.random.default_rng(channels)
+        fake_io.sources["in.wav"] = (_synthetic_audio(90, channels, rng), SAMPLE_RATE)
+
+        request = VADProcessRequest(audio_path="in.wav", output_dir=str(tmp_path))
+        output_path = str(tmp_path / "in_speech_only.wav")
+
+        streaming = flows._extract_speech_segments_streaming(request, memory_budget_bytes=64 * 1024)
+        streamed_audio = fake_io.written.pop(output_path)
+
+        in_memory = flows.extract_speech_segments(request)  # 預設上限遠大於此檔，走整檔模式
+        in_memory_audio = fake_io.written.pop(output_path)
+
+        assert streaming.success and in_memory.success
+        assert streaming.segments == in_memory.segments
+        assert streaming.total_duration == in_memory.total_duration
+        np.testing.assert_array_equal(streamed_audio.reshape(in_memory_audio.shape), in_memory_audio)
+
+    def test_peak_block_respects_budget(self, fake_io, tmp_path):
+        rng = np.random.default_rng(7)
+        fake_io.sources["in.wav"] = (_synthetic_audio(120, 2, rng), SAMPLE_RATE)
+        budget = 32 * 1024
+
+        request = VADProcessRequest(audio_path="in.wav", output_dir=str(tmp_path))
+        flows._extract_speech_segments_streaming(request, memory_budget_bytes=budget)
+
+        frame_length = int(flows.FRAME_LENGTH_S * SAMPLE_RATE)
+        assert fake_io.max_block_len == flows._stream_block_size(2, frame_length, budget)
+        assert fake_io.max_block_len * 2 * 4 * 4 <= budget
+
+    def test_silent_file_fails(self, fake_io, tmp_path):
+        fake_io.sources["silent.wav"] = (np.zeros((SAMPLE_RATE * 5, 1), dtype=np.float32), SAMPLE_RATE)
+        request = VADProcessRequest(audio_path="silent.wav", output_dir=str(tmp_path))
+        result = flows._extract_speech_segments_streaming(request, memory_budget_bytes=64 * 1024)
+        assert result.success is False
+        assert result.total_duration == pytest.approx(5.0)
+
+    def test_large_file_routes_to_streaming(self, fake_io, tmp_path, monkeypatch):
+        rng = np.random.default_rng(3)
+        fake_io.sources["in.wav"] = (_synthetic_audio(30, 1, rng), SAMPLE_RATE)
+        called = {}
+
+        def fake_streaming(request, budget):
+            called["budget"] = budget
+            return flows.SpeechExtractionResult(success=False)
+
+        monkeypatch.setattr(flows, "_extract_speech_segments_streaming", fake_streaming)
+        monkeypatch.setattr(flows.get_settings(), "vad_memory_budget_mb", 0)
+        flows.extract_speech_segments(VADProcessRequest(audio_path="in.wav", output_dir=str(tmp_path)))
+        assert called["budget"] == 0
@@ -0,0 +1,261 @@
+"""
+單元測試：WebSocket 狀態更新的 per-client 頻道路由與事件流補送
+測試範圍：celery/notifier.py 的 publish_status / channel_for / stream_for，
+以及 websocket/manager.py 的 ConnectionManager 依本機連線訂閱 / 退訂、轉送，
+與帶 last_event_id 重連時從 stream 補送並去重
+以假的 Redis（pubsub + stream）與 WebSocket 驗證，不需實際 Redis
+"""
+import asyncio
+import json
+
+import pytest
+
+from app.celery import notifier
+from app.websocket import manager as manager_module
+from app.websocket.manager import ConnectionManager
+
+
+class _FakePubSub:
+    def __init__(self):
+        self.channels = set()
+        self.connection = None
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, *channels):
+        self.connection = object()
+        self.channels.update(channels)
+
+    async def unsubscribe(self, *channels):
+        if channels:
+            self.channels.difference_update(channels)
+        else:
+            self.channels.clear()
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        pass
+
+    def publish(self, channel, data):
+        """模擬 Redis：只有已訂閱的頻道會收到"""
+        if channel in self.channels:
+            self.queue.put_nowait({"type": "message", "channel": channel, "data": data})
+
+
+class _FakeRedis:
+    """假的 Redis：stream 以 list 保存，發布行為與 notifier 的 Lua script 相同"""
+
+    def __init__(self):
+        self.pubsub_instance = _FakePubSub()
+        self.streams = {}
+        self.seq = 0
+
+    def pubsub(self):
+        return self.pubsub_instance
+
+    async def close(self):
+        pass
+
+    async def xrange(self, key, min="-", max="+"):
+        after = manager_module._parse_event_id(min.lstrip("("))
+        return [(i, f) for i, f in self.streams.get(key, []) if manager_module._parse_event_id(i) > after]
+
+    def emit(self, client_id, message, live=True):
+        """寫入 stream 並（可選）發布到頻道，回傳 event_id"""
+        self.seq += 1
+        event_id = f"{self.seq}-0"
+        data = json.dumps(message)
+        self.streams.setdefault(notifier.stream_for(client_id), []).append((event_id, {"data": data}))
+        if live:
+            self.pubsub_instance.publish(
+                notifier.channel_for(client_id), json.dumps({"event_id": event_id, **message}))
+        return event_id
+
+
+class _FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        pass
+
+
+def _run_with_listener(monkeypatch, scenario, fake_redis=None):
+    """啟動 listener 後執行 scenario(manager, pubsub)"""
+    fake_redis = fake_redis or _FakeRedis()
+    monkeypatch.setattr(manager_module.redis, "from_url", lambda *a, **k: fake_redis)
+    monkeypatch.setattr(manager_module, "_IDLE_POLL_SECONDS", 0.01)
+
+    async def main():
+        manager = ConnectionManager()
+        manager.start()
+        while manager._pubsub is None:
+            await asyncio.sleep(0)
+        try:
+            await scenario(manager, fake_redis.pubsub_instance)
+        finally:
+            await manager.shutdown()
+
+    asyncio.run(main())
+
+
+async def _wait_for(predicate):
+    for _ in range(100):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+
+
+class TestPublishStatus:
+    @pytest.fixture(autouse=True)
+    def _no_coalescing(self, monkeypatch):
+        monkeypatch.setattr(notifier, "_coalescer", notifier._StatusCoalescer(notifier._publish_now, 0))
+
+    def test_appends_to_stream_and_publishes_to_client_channel(self, monkeypatch):
+        calls = []
+
+        def fake_script(keys, args):
+            calls.append((keys, args))
+            return b"1700000000000-0"
+
+        monkeypatch.setattr(notifier, "_publish_script", fake_script)
+
+        event_id = notifier.publish_status("file-1", "task-1", "處理中", file_uid="file-1")
+
+        assert event_id == "1700000000000-0"
+        (keys, (max_len, data, ttl, channel)), = calls
+        assert keys == [notifier.stream_for("file-1")]
+        assert channel == notifier.channel_for("file-1")
+        assert (max_len, ttl) == (notifier.STATUS_STREAM_MAX_LEN, notifier.STATUS_STREAM_TTL_SECONDS)
+        assert json.loads(data) == {
+            "client_id": "file-1",
+            "task_uuid": "task-1",
+            "status_code": "PROCESSING",
+            "status_text": "處理中",
+            "file_uid": "file-1",
+        }
+
+    def test_redis_error_returns_none(self, monkeypatch):
+        def broken(keys, args):
+            raise ConnectionError("redis down")
+
+        monkeypatch.setattr(notifier, "_publish_script", broken)
+        assert notifier.publish_status("file-1", "task-1", "處理中") is None
+
+
+class TestConnectionManagerRouting:
+    def test_subscribes_only_local_clients(self, monkeypatch):
+        async def scenario(manager, pubsub):
+            ws = _FakeWebSocket()
+            await manager.connect(ws, "mine")
+            assert pubsub.channels == {notifier.channel_for("mine")}
+
+            pubsub.publish(notifier.channel_for("other"), json.dumps({"client_id": "other"}))
+            pubsub.publish(notifier.channel_for("mine"), json.dumps({"client_id": "mine", "n": 1}))
+            for _ in range(50):
+                if ws.sent:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert ws.sent == [{"client_id": "mine", "n": 1}]
+
+        _run_with_listener(monkeypatch, scenario)
+
+    def test_disconnect_unsubscribes(self, monkeypatch):
+        async def scenario(manager, pubsub):
+            await manager.connect(_FakeWebSocket(), "a")
+            await manager.connect(_FakeWebSocket(), "b")
+            manager.disconnect("a")
+            await asyncio.sleep(0.01)
+            assert pubsub.channels == {notifier.channel_for("b")}
+
+        _run_with_listener(monkeypatch, scenario)
+
+    def test_reconnected_client_keeps_subscription(self, monkeypatch):
+        async def scenario(manager, pubsub):
+            await manager.connect(_FakeWebSocket(), "a")
+            manager.disconnect("a")
+            await manager.connect(_FakeWebSocket(), "a")
+            await asyncio.sleep(0.01)
+            assert pubsub.channels == {notifier.channel_for("a")}
+
+        _run_with_listener(monkeypatch, scenario)
+
+    def test_old_socket_closing_does_not_drop_new_connection(self, monkeypatch):
+        async def scenario(manager, pubsub):
+            old, new = _FakeWebSocket(), _FakeWebSocket()
+            await manager.connect(old, "a")
+            await manager.connect(new, "a")
+            manager.disconnect("a", old)
+            await asyncio.sleep(0.01)
+            assert manager.active_connections["a"] is new
+            assert pubsub.channels == {notifier.channel_for("a")}
+
+        _run_with_listener(monkeypatch, scenario)
+
+    def test_listener_resubscribes_existing_connections(self, monkeypatch):
+        fake_redis = _FakeRedis()
+        pubsub = fake_redis.pubsub_instance
+        monkeypatch.setattr(manager_module.redis, "from_url", lambda *a, **k: fake_redis)
+
+        async def main():
+            manager = ConnectionManager()
+            # listener 尚未連上 Redis 時的連線，由 listener 啟動後統一訂閱
+            await manager.connect(_FakeWebSocket(), "early")
+            manager.start()
+            while manager._pubsub is None:
+                await asyncio.sleep(0)
+            assert pubsub.channels == {notifier.channel_for("early")}
+            await manager.shutdown()
+
+        asyncio.run(main())
+
+
+class TestResumeFromLastEventId:
+    def test_replays_missed_events_then_continues_live(self, monkeypatch):
+        fake_redis = _FakeRedis()
+
+        async def scenario(manager, pubsub):
+            first = fake_redis.emit("f1", {"client_id": "f1", "status_code": "PROCESSING", "n": 1})
+            # 斷線期間發布的事件只在 stream 裡
+            fake_redis.emit("f1", {"client_id": "f1", "status_code": "PROCESSING", "n": 2}, live=False)
+            fake_redis.emit("f1", {"client_id": "f1", "status_code": "COMPLETED", "n": 3}, live=False)
+
+            ws = _FakeWebSocket()
+            await manager.connect(ws, "f1", last_event_id=first)
+            fake_redis.emit("f1", {"client_id": "f1", "status_code": "COMPLETED", "n": 4})
+            await _wait_for(lambda: len(ws.sent) >= 3)
+
+            assert [m["n"] for m in ws.sent] == [2, 3, 4]
+            assert [m["event_id"] for m in ws.sent] == ["2-0", "3-0", "4-0"]
+
+        _run_with_listener(monkeypatch, scenario, fake_redis)
+
+    def test_live_copy_of_replayed_event_is_not_sent_twice(self, monkeypatch):
+        fake_redis = _FakeRedis()
+
+        async def scenario(manager, pubsub):
+            ws = _FakeWebSocket()
+            # 已訂閱後才發布：同一事件同時出現在 stream 與 pub/sub
+            await manager.connect(ws, "f1")
+            fake_redis.emit("f1", {"client_id": "f1", "n": 1})
+            await manager.connect(ws, "f1", last_event_id="0")
+            await asyncio.sleep(0.05)
+
+            assert [m["n"] for m in ws.sent] == [1]
+
+        _run_with_listener(monkeypatch, scenario, fake_redis)
+
+    def test_parse_event_id(self):
+        assert manager_module._parse_event_id("1700000000000-5") == (1700000000000, 5)
+        assert manager_module._parse_event_id("0") == (0, 0)